@@ -0,0 +1,245 @@
+"""
+Agency Business Intelligence Rollups for Polaris Platform
+Resolves an agency's sponsored clients through its license codes and keeps per-client
+assessment metrics precomputed in agency_client_rollups, refreshed as client work lands
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+TOTAL_AREAS = 10
+GAP_RESPONSES = ("gap_exists", "no_help")
+ACTIVE_SERVICE_STATUSES = ["active", "in_progress", "pending"]
+ROLLUP_COLLECTION = "agency_client_rollups"
+
+SESSION_PROJECTION = {
+    "user_id": 1,
+    "status": 1,
+    "responses": {"$map": {
+        "input": {"$ifNull": ["$responses", []]},
+        "as": "r",
+        "in": {"response": "$$r.response", "tier_level": "$$r.tier_level", "question_id": "$$r.question_id"}
+    }},
+}
+
+
+def session_metrics(sessions: Iterable[Dict[str, Any]], evidence_status: Dict[Tuple[Any, Any], Any]) -> Dict[str, int]:
+    """
+    Area, gap and evidence counts for one client's sessions. `evidence_status` maps
+    (session_id, question_id) to the review_status of the first evidence record for it.
+    """
+    metrics = {"completed_areas": 0, "critical_gaps": 0, "evidence_required": 0,
+               "evidence_submitted": 0, "evidence_approved": 0}
+    for session in sessions:
+        if session.get("status") == "completed":
+            metrics["completed_areas"] += 1
+        for response in session.get("responses") or []:
+            if response.get("response") in GAP_RESPONSES:
+                metrics["critical_gaps"] += 1
+            elif response.get("response") == "compliant" and response.get("tier_level", 1) >= 2:
+                metrics["evidence_required"] += 1
+                key = (session["_id"], response.get("question_id"))
+                if key in evidence_status:
+                    metrics["evidence_submitted"] += 1
+                    if evidence_status[key] == "approved":
+                        metrics["evidence_approved"] += 1
+    return metrics
+
+
+def client_detail(client: Dict[str, Any], rollup: Dict[str, Any]) -> Dict[str, Any]:
+    completion_rate = (rollup["completed_areas"] / TOTAL_AREAS) * 100
+    evidence_required = rollup["evidence_required"]
+    evidence_approval_rate = (rollup["evidence_approved"] / evidence_required) * 100 if evidence_required > 0 else 0
+    compliant = rollup["critical_gaps"] == 0 and evidence_approval_rate >= 80
+    return {
+        "client_id": client["id"],
+        "client_email": client["email"],
+        "company_name": client.get("company_name", "Unknown"),
+        "registration_date": client.get("created_at"),
+        "assessment_completion": completion_rate,
+        "readiness_score": round((completion_rate * 0.6) + (evidence_approval_rate * 0.4), 1),
+        "critical_gaps": rollup["critical_gaps"],
+        "evidence_required": evidence_required,
+        "evidence_submitted": rollup["evidence_submitted"],
+        "evidence_approved": rollup["evidence_approved"],
+        "active_services": rollup["active_services"],
+        "completed_services": rollup["completed_services"],
+        "compliance_status": "compliant" if compliant else "needs_attention"
+    }
+
+
+def governance_alerts(client_metrics: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    alerts = []
+    for client in client_metrics:
+        if client["critical_gaps"] > 5:
+            alerts.append({
+                "type": "high_risk",
+                "client_email": client["client_email"],
+                "message": f"Client has {client['critical_gaps']} critical gaps requiring immediate attention"
+            })
+        if client["evidence_required"] > 0 and client["evidence_submitted"] == 0:
+            alerts.append({
+                "type": "evidence_missing",
+                "client_email": client["client_email"],
+                "message": f"Client has {client['evidence_required']} evidence submissions pending"
+            })
+    return alerts
+
+
+def agency_overview(client_metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
+    total_clients = len(client_metrics)
+    avg_readiness = sum(c["readiness_score"] for c in client_metrics) / total_clients if total_clients > 0 else 0
+    compliant_clients = len([c for c in client_metrics if c["compliance_status"] == "compliant"])
+    return {
+        "total_sponsored_clients": total_clients,
+        "average_readiness_score": round(avg_readiness, 1),
+        "compliant_clients": compliant_clients,
+        "compliance_rate": round((compliant_clients / total_clients) * 100, 1) if total_clients > 0 else 0,
+        "total_critical_gaps": sum(c["critical_gaps"] for c in client_metrics),
+        "pending_evidence_reviews": sum(c["evidence_required"] - c["evidence_submitted"] for c in client_metrics)
+    }
+
+
+class AgencyRollupStore:
+    """
+    Per-client metric rollups, keyed by client id and joined to an agency through its license
+    codes at read time so license changes need no rewrite. A rollup is recomputed when its client
+    completes a session, submits or has evidence reviewed, or changes service activity; rows
+    older than `max_age` seconds are recomputed on read to bound drift from anything else.
+    """
+
+    def __init__(self, db, max_age: int = 3600, debounce: float = 2.0):
+        self.db = db
+        self.rollups = getattr(db, ROLLUP_COLLECTION)
+        self.max_age = max_age
+        self.debounce = debounce
+        self._dirty: Set[str] = set()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._worker: Optional[asyncio.Task] = None
+
+    async def agency_clients(self, agency_id: str) -> List[Dict[str, Any]]:
+        """Clients holding any of the agency's license codes, from the license side of the join"""
+        return await self.db.license_codes.aggregate([
+            {"$match": {"agency_user_id": agency_id}},
+            {"$project": {"_id": 0, "code": 1}},
+            {"$lookup": {"from": "users", "localField": "code", "foreignField": "license_code", "as": "client"}},
+            {"$unwind": "$client"},
+            {"$replaceRoot": {"newRoot": "$client"}},
+            {"$match": {"role": "client"}},
+            {"$project": {"id": 1, "email": 1, "company_name": 1, "created_at": 1}}
+        ]).to_list(None)
+
+    async def compute(self, client_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Metrics for a batch of clients in a fixed number of queries"""
+        if not client_ids:
+            return {}
+        sessions = await self.db.tier_assessment_sessions.aggregate([
+            {"$match": {"user_id": {"$in": client_ids}}},
+            {"$project": SESSION_PROJECTION}
+        ]).to_list(None)
+
+        evidence_status: Dict[Tuple[Any, Any], Any] = {}
+        if sessions:
+            cursor = self.db.assessment_evidence.find(
+                {"session_id": {"$in": [s["_id"] for s in sessions]}},
+                {"_id": 0, "session_id": 1, "question_id": 1, "review_status": 1}
+            )
+            async for evidence in cursor:
+                # The first record per question decides, as a find_one would
+                evidence_status.setdefault((evidence.get("session_id"), evidence.get("question_id")),
+                                           evidence.get("review_status"))
+
+        active = await self._counts_by(self.db.service_requests, "client_id", client_ids,
+                                       {"status": {"$in": ACTIVE_SERVICE_STATUSES}})
+        completed = await self._counts_by(self.db.engagements, "client_id", client_ids, {"status": "completed"})
+
+        by_client: Dict[str, List[Dict[str, Any]]] = {cid: [] for cid in client_ids}
+        for session in sessions:
+            by_client.setdefault(session.get("user_id"), []).append(session)
+        return {
+            cid: {**session_metrics(by_client[cid], evidence_status),
+                  "active_services": active.get(cid, 0),
+                  "completed_services": completed.get(cid, 0)}
+            for cid in client_ids
+        }
+
+    async def _counts_by(self, collection, field: str, ids: List[str], extra: Dict[str, Any]) -> Dict[str, int]:
+        rows = await collection.aggregate([
+            {"$match": {field: {"$in": ids}, **extra}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        return {row["_id"]: row["count"] for row in rows}
+
+    async def refresh_clients(self, *client_ids: str) -> Dict[str, Dict[str, Any]]:
+        ids = [cid for cid in dict.fromkeys(client_ids) if cid]
+        metrics = await self.compute(ids)
+        if metrics:
+            now = datetime.utcnow()
+            await self.rollups.bulk_write([
+                UpdateOne({"_id": cid}, {"$set": {**values, "refreshed_at": now}}, upsert=True)
+                for cid, values in metrics.items()
+            ], ordered=False)
+        return metrics
+
+    async def refresh_quietly(self, *client_ids: str):
+        """Event-path refresh; a failure leaves the stale row for the max_age sweep"""
+        try:
+            await self.refresh_clients(*client_ids)
+        except Exception as e:
+            logger.warning(f"Agency rollup refresh failed for {client_ids}: {e}")
+
+    def schedule(self, *client_ids: str):
+        """
+        Request-path hook: mark clients for a background refresh. Events arriving within
+        `debounce` seconds of each other are refreshed together in one batch.
+        """
+        self._dirty.update(cid for cid in client_ids if cid)
+        if self._dirty:
+            self._wake.set()
+
+    async def flush(self):
+        client_ids, self._dirty = list(self._dirty), set()
+        if client_ids:
+            await self.refresh_quietly(*client_ids)
+
+    async def start(self):
+        if self._worker is None or self._worker.done():
+            self._stopping = False
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Refresh everything still marked; the batch in progress is finished, not abandoned"""
+        if self._worker is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._worker
+            self._worker = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            await self._wake.wait()
+            if not self._stopping:
+                await asyncio.sleep(self.debounce)
+            self._wake.clear()
+            await self.flush()
+
+    async def for_agency(self, agency_id: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(clients, client_details) with missing or stale rollups recomputed in one batch"""
+        clients = await self.agency_clients(agency_id)
+        ids = [c["id"] for c in clients]
+        rollups = {}
+        if ids:
+            rollups = {r["_id"]: r async for r in self.rollups.find({"_id": {"$in": ids}})}
+        cutoff = datetime.utcnow() - timedelta(seconds=self.max_age)
+        stale = [cid for cid in ids if cid not in rollups or (rollups[cid].get("refreshed_at") or cutoff) <= cutoff]
+        if stale:
+            rollups.update(await self.refresh_clients(*stale))
+        return clients, [client_detail(c, rollups[c["id"]]) for c in clients]
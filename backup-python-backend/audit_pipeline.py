@@ -0,0 +1,171 @@
+"""
+Audit Log Pipeline for Polaris Platform
+Buffers audit events in a bounded queue and writes them to MongoDB in batches
+from a background task, so request handlers never wait on the database
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+DATETIME_TAG = "$date"
+
+AUDIT_QUEUE_DEPTH = Gauge('polaris_audit_queue_depth', 'Audit events waiting to be written')
+AUDIT_FLUSH_DURATION = Histogram('polaris_audit_flush_seconds', 'Audit batch write duration')
+AUDIT_BATCH_SIZE = Histogram('polaris_audit_batch_size', 'Audit events per batch write',
+                             buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+AUDIT_EVENTS = Counter('polaris_audit_events_total', 'Audit events by outcome', ['outcome'])
+
+
+def _encode_spilled(value: Any) -> Any:
+    # Tagged so replay restores real datetimes rather than inserting their string form
+    if isinstance(value, datetime):
+        return {DATETIME_TAG: value.isoformat()}
+    return str(value)
+
+
+def _decode_spilled(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and DATETIME_TAG in obj:
+        return datetime.fromisoformat(obj[DATETIME_TAG])
+    return obj
+
+
+class AuditPipeline:
+    """
+    Bounded queue drained by a single writer task.
+
+    Batches are written when `batch_size` events are buffered or `flush_interval`
+    seconds have passed since the first buffered event. When the queue is full,
+    LOW severity events are dropped and everything else is spilled to a JSON-lines
+    file that is replayed the next time the pipeline starts.
+    """
+
+    def __init__(self, collection, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, spill_path: Optional[str] = None):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._writer: Optional[asyncio.Task] = None
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Enqueue an event without waiting; returns False if it was dropped"""
+        try:
+            self.queue.put_nowait(event)
+            AUDIT_QUEUE_DEPTH.set(self.queue.qsize())
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if event.get("severity") == "LOW" or not self.spill_path:
+            AUDIT_EVENTS.labels(outcome="dropped").inc()
+            return False
+
+        self._spill([event])
+        return True
+
+    async def start(self):
+        if self._writer is None or self._writer.done():
+            await self._replay_spill()
+            self._writer = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write everything still queued, then stop the writer"""
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+
+        while not self.queue.empty():
+            await self._flush(self._take(self.batch_size))
+
+    async def _run(self):
+        batch: List[Dict[str, Any]] = []
+        flushing: Optional[asyncio.Future] = None
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    batch.extend(self._take(self.batch_size - len(batch)))
+                    remaining = deadline - time.monotonic()
+                    if len(batch) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+                # Shielded so cancelling the writer never abandons a write half-way
+                flushing, batch = asyncio.ensure_future(self._flush(batch)), []
+                await asyncio.shield(flushing)
+        except asyncio.CancelledError:
+            # Events already taken off the queue are written before the writer exits
+            if flushing is not None and not flushing.done():
+                await flushing
+            await self._flush(batch)
+            raise
+
+    def _take(self, limit: int) -> List[Dict[str, Any]]:
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return items
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        AUDIT_QUEUE_DEPTH.set(self.queue.qsize())
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            AUDIT_EVENTS.labels(outcome="written").inc(len(batch))
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} audit events: {e}")
+            if self.spill_path:
+                self._spill(batch)
+            else:
+                AUDIT_EVENTS.labels(outcome="dropped").inc(len(batch))
+        finally:
+            AUDIT_FLUSH_DURATION.observe(time.perf_counter() - start)
+            AUDIT_BATCH_SIZE.observe(len(batch))
+
+    def _spill(self, events: List[Dict[str, Any]]):
+        try:
+            with open(self.spill_path, "a") as spill:
+                for event in events:
+                    spill.write(json.dumps({k: v for k, v in event.items() if k != "_id"},
+                                           default=_encode_spilled) + "\n")
+            AUDIT_EVENTS.labels(outcome="spilled").inc(len(events))
+        except OSError as e:
+            logger.error(f"Failed to spill {len(events)} audit events: {e}")
+            AUDIT_EVENTS.labels(outcome="dropped").inc(len(events))
+
+    async def _replay_spill(self):
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+
+        replay_path = f"{self.spill_path}.replaying"
+        os.replace(self.spill_path, replay_path)
+        with open(replay_path) as spill:
+            events = [json.loads(line, object_hook=_decode_spilled) for line in spill if line.strip()]
+
+        for i in range(0, len(events), self.batch_size):
+            await self._flush(events[i:i + self.batch_size])
+        os.remove(replay_path)
+        logger.info(f"Replayed {len(events)} spilled audit events")
@@ -0,0 +1,83 @@
+"""
+Login Benchmark for Polaris Platform
+Fires N concurrent logins at the password path, inline vs. PasswordHasher pool, and reports
+login latency percentiles alongside the latency of unrelated requests served meanwhile
+
+    python benchmarks/bench_login.py --concurrency 200 --rounds 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from password_hasher import PasswordHasher  # noqa: E402
+
+DB_LATENCY = 0.002  # simulated users lookup / update round trip
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(mode: str, concurrency: int, stored_hash: str, hasher: PasswordHasher):
+    async def login():
+        start = time.perf_counter()
+        await asyncio.sleep(DB_LATENCY)
+        if mode == "inline":
+            valid = bcrypt.checkpw(b"Benchmark-Pass-1", stored_hash.encode())
+        else:
+            valid = await hasher.verify("Benchmark-Pass-1", stored_hash)
+        assert valid
+        await asyncio.sleep(DB_LATENCY)
+        return time.perf_counter() - start
+
+    async def other_request():
+        # Stands in for any non-login request (e.g. GET /api/home) arriving during the burst
+        start = time.perf_counter()
+        await asyncio.sleep(DB_LATENCY)
+        return time.perf_counter() - start
+
+    logins = [asyncio.create_task(login()) for _ in range(concurrency)]
+    others = []
+    while not all(task.done() for task in logins):
+        others.append(await other_request())
+    login_times = await asyncio.gather(*logins)
+    return login_times, others
+
+
+def report(label, samples):
+    print(f"  {label:<16} n={len(samples):<5} p50={statistics.median(samples) * 1000:8.1f}ms "
+          f"p99={percentile(samples, 99) * 1000:8.1f}ms max={max(samples) * 1000:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor of the stored hash")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    stored_hash = bcrypt.hashpw(b"Benchmark-Pass-1", bcrypt.gensalt(rounds=args.rounds)).decode()
+    print(f"{args.concurrency} concurrent logins, bcrypt cost {args.rounds}, {args.workers} hash workers")
+
+    for mode in ("inline", "pool"):
+        hasher = PasswordHasher(max_workers=args.workers, bcrypt_rounds=args.rounds)
+        start = time.perf_counter()
+        login_times, others = asyncio.run(run(mode, args.concurrency, stored_hash, hasher))
+        hasher.shutdown()
+        print(f"{mode}: wall {time.perf_counter() - start:.2f}s")
+        report("login", login_times)
+        report("other requests", others)
+
+
+if __name__ == "__main__":
+    main()
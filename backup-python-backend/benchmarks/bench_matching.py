@@ -0,0 +1,101 @@
+"""
+Matching Benchmark for Polaris Platform
+Compares the legacy score-everything-and-sort loop with ProviderMatchIndex.top_k over a
+synthetic provider population and checks both return identical rankings
+
+    python benchmarks/bench_matching.py --providers 50000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching_engine import ProviderMatchIndex  # noqa: E402
+
+AREAS = [f"area{i}" for i in range(1, 10)]
+
+
+def legacy_top(req, providers, k, keep_zero):
+    matches = []
+    for p in providers:
+        score = 0
+        if req["area_id"] in (p.get("service_areas") or []):
+            score += 50
+        b = req.get("budget") or 0
+        pmin = p.get("price_min") or 0
+        pmax = p.get("price_max") or 0
+        if pmin and pmax and pmin <= b <= pmax:
+            score += 40
+        elif pmin and b >= pmin * 0.8:
+            score += 20
+        if p.get("availability"):
+            score += 10
+        if keep_zero or score > 0:
+            matches.append((p["_id"], score))
+    matches.sort(key=lambda x: x[1], reverse=True)
+    return matches[:k]
+
+
+def synthetic_providers(rng, count):
+    providers = []
+    for i in range(count):
+        pmin = rng.randint(100, 20000)
+        providers.append({
+            "_id": f"provider-{i}",
+            "user_id": f"user-{i}",
+            "service_areas": rng.sample(AREAS, rng.randint(1, 3)),
+            "price_min": pmin,
+            "price_max": pmin + rng.randint(500, 20000),
+            "availability": rng.random() > 0.5,
+        })
+    return providers
+
+
+def report(label, samples):
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * (len(ordered) - 1)))]
+    print(f"  {label:<8} p50={statistics.median(samples) * 1000:8.2f}ms p99={p99 * 1000:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--providers", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    providers = synthetic_providers(rng, args.providers)
+    # A quarter of budgets sit below every price band, the slow path where no area member is a perfect match
+    requests = [{"area_id": rng.choice(AREAS), "budget": rng.randint(100, 30000) if rng.random() > 0.25 else rng.randint(1, 79)}
+                for _ in range(args.queries)]
+
+    index = ProviderMatchIndex()
+    start = time.perf_counter()
+    index.load(providers)
+    print(f"{args.providers} providers, {args.queries} queries; index build {time.perf_counter() - start:.2f}s")
+
+    for label, k, keep_zero in (("matches (top 10)", 10, False), ("invite (top 5)", 5, True)):
+        legacy, indexed = [], []
+        for req in requests:
+            t0 = time.perf_counter()
+            expected = legacy_top(req, providers, k, keep_zero)
+            t1 = time.perf_counter()
+            got = [(p.provider_id, m.score) for m, p in index.top_k(req["area_id"], req["budget"], k, include_zero=keep_zero)]
+            t2 = time.perf_counter()
+            if got != expected:
+                raise SystemExit(f"Ranking mismatch for {req}: {got} != {expected}")
+            legacy.append(t1 - t0)
+            indexed.append(t2 - t1)
+        print(f"{label}: identical rankings for all queries")
+        report("legacy", legacy)
+        report("index", indexed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Search Benchmark for Polaris Platform
+Ranks queries over synthetic knowledge base articles with the BM25 index and compares
+against the unanchored case-insensitive regex scan the search endpoints used to run
+
+    python benchmarks/bench_search.py --documents 100000 --queries 200
+"""
+
+import argparse
+import itertools
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_engine import KnowledgeBaseSearch  # noqa: E402
+
+VOCABULARY = (
+    "registration sam federal contract bonding insurance cybersecurity policy password audit payroll "
+    "accounting invoice tax compliance hr hiring safety osha license permit certification minority "
+    "veteran small business procurement bid proposal capability statement past performance pricing "
+    "budget cash flow loan grant marketing website branding supplier subcontract teaming agreement "
+    "quality inventory logistics warehouse fleet vehicle software cloud backup continuity disaster "
+    "recovery training onboarding handbook benefits retirement health legal contract review dispute"
+).split()
+AREAS = [f"area{i}" for i in range(1, 11)]
+TYPES = ["template", "sop", "guide", "checklist", "compliance"]
+
+
+def synthetic_articles(rng, count, vocabulary_size):
+    # Zipf word frequencies over a realistic vocabulary: the domain terms sit among filler words
+    words = VOCABULARY + [f"w{n}" for n in range(vocabulary_size - len(VOCABULARY))]
+    rng.shuffle(words)
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    for i in range(count):
+        yield {
+            "_id": f"article-{i}",
+            "id": f"article-{i}",
+            "title": " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(3, 7))).title(),
+            "content": " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(40, 120))),
+            "tags": rng.sample(VOCABULARY, 2),
+            "area_ids": rng.sample(AREAS, rng.randint(1, 2)),
+            "content_type": rng.choice(TYPES),
+            "status": "published",
+        }
+
+
+def regex_scan(articles, q, limit):
+    """What {"$or": [{"title": {"$regex": q, "$options": "i"}}, ...]} costs: every document, unranked"""
+    pattern = re.compile(re.escape(q), re.IGNORECASE)
+    hits = [a["_id"] for a in articles if pattern.search(a["title"]) or pattern.search(a["content"])]
+    return hits[:limit], len(hits)
+
+
+def report(label, samples):
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * (len(ordered) - 1)))]
+    print(f"  {label:<12} p50={statistics.median(samples) * 1000:8.2f}ms p99={p99 * 1000:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    articles = list(synthetic_articles(rng, args.documents, args.vocabulary))
+    kb = KnowledgeBaseSearch()
+    start = time.perf_counter()
+    for article in articles:
+        kb.upsert(article)
+    print(f"{args.documents} articles, {args.queries} queries; index build {time.perf_counter() - start:.1f}s")
+
+    # Mostly one- and two-term queries over the domain terms
+    queries = [" ".join(rng.sample(VOCABULARY, rng.choice([1, 1, 2])))
+               for _ in range(args.queries)]
+    scan, bm25, paged = [], [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        regex_scan(articles, q, 20)
+        t1 = time.perf_counter()
+        first = kb.search(q, limit=20)
+        t2 = time.perf_counter()
+        if first["next_cursor"]:
+            kb.search(q, limit=20, cursor=first["next_cursor"], area_id="area3")
+        t3 = time.perf_counter()
+        scan.append(t1 - t0)
+        bm25.append(t2 - t1)
+        paged.append(t3 - t2)
+    report("regex scan", scan)
+    report("bm25", bm25)
+    report("bm25 page 2", paged)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Cache Backends for Polaris Platform
+Bounded in-process LRU tier, optional shared Redis tier and tag-based invalidation
+"""
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis_asyncio = None
+    REDIS_AVAILABLE = False
+
+CACHE_HITS = Counter('polaris_cache_hits_total', 'Cache hits', ['cache', 'tier'])
+CACHE_MISSES = Counter('polaris_cache_misses_total', 'Cache misses', ['cache', 'tier'])
+CACHE_EVICTIONS = Counter('polaris_cache_evictions_total', 'Cache evictions', ['cache', 'tier', 'reason'])
+
+
+def _encode_default(value: Any) -> Any:
+    # Datetimes must survive the round trip; handlers compare them (e.g. locked_until)
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return str(value)
+
+
+def _decode_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$date" in obj:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+def serialize(value: Any) -> str:
+    return json.dumps(value, default=_encode_default)
+
+
+def deserialize(raw) -> Any:
+    return json.loads(raw, object_hook=_decode_hook)
+
+
+class CacheBackend:
+    """Interface shared by every cache tier"""
+
+    tier = "base"
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def get_entry(self, key: str) -> Optional[Tuple[Any, Tuple[str, ...]]]:
+        """The value and the tags it was stored with, or None on a miss"""
+        value = await self.get(key)
+        return None if value is None else (value, ())
+
+    async def set(self, key: str, value: Any, ttl: int = 3600, tags: Iterable[str] = ()):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Drop every entry labelled with any of the given tags; returns entries removed"""
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+    def _hit(self):
+        CACHE_HITS.labels(cache=self.name, tier=self.tier).inc()
+
+    def _miss(self):
+        CACHE_MISSES.labels(cache=self.name, tier=self.tier).inc()
+
+    def _evicted(self, reason: str, count: int = 1):
+        if count:
+            CACHE_EVICTIONS.labels(cache=self.name, tier=self.tier, reason=reason).inc(count)
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU cache bounded by entry count, with TTL and a tag index"""
+
+    tier = "memory"
+
+    def __init__(self, name: str = "default", max_entries: int = 10000, max_ttl: Optional[int] = None):
+        super().__init__(name)
+        self.max_entries = max_entries
+        # Caps how long this worker may serve a value another worker has invalidated
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._miss()
+            return None
+
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self._evicted("expired")
+            self._miss()
+            return None
+
+        self._entries.move_to_end(key)
+        self._hit()
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int = 3600, tags: Iterable[str] = ()):
+        if self.max_ttl is not None:
+            ttl = min(ttl, self.max_ttl)
+        tags = tuple(tags)
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evicted("capacity")
+
+    async def delete(self, key: str):
+        self._remove(key)
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        keys = set()
+        for tag in tags:
+            keys |= self._tags.pop(tag, set())
+        removed = sum(1 for key in keys if self._remove(key))
+        self._evicted("invalidated", removed)
+        return removed
+
+    async def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for tag in entry[2]:
+            members = self._tags.get(tag)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._tags[tag]
+        return True
+
+
+class RedisCacheBackend(CacheBackend):
+    """Shared tier over any client speaking the redis.asyncio command subset used here"""
+
+    tier = "redis"
+
+    def __init__(self, client, name: str = "default", prefix: str = "polaris:cache"):
+        super().__init__(name)
+        self.client = client
+        self.prefix = f"{prefix}:{name}"
+
+    def _key(self, key: str) -> str:
+        # Entries are {"value", "tags"} envelopes so a local fill can be invalidated by tag
+        return f"{self.prefix}:e:{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.prefix}:t:{tag}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = await self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    async def get_entry(self, key: str) -> Optional[Tuple[Any, Tuple[str, ...]]]:
+        try:
+            raw = await self.client.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Shared cache read failed for {key}: {e}")
+            self._miss()
+            return None
+
+        if raw is None:
+            self._miss()
+            return None
+        self._hit()
+        entry = deserialize(raw)
+        return entry["value"], tuple(entry["tags"])
+
+    async def set(self, key: str, value: Any, ttl: int = 3600, tags: Iterable[str] = ()):
+        tags = tuple(tags)
+        try:
+            await self.client.set(self._key(key), serialize({"value": value, "tags": tags}), ex=ttl)
+            for tag in tags:
+                tag_key = self._tag(tag)
+                await self.client.sadd(tag_key, key)
+                # Tag sets outlive their longest member so invalidation can still find it: a
+                # shorter-lived member never lowers the expiry (EXPIRE ... GT would need Redis 7)
+                if await self.client.ttl(tag_key) < ttl * 2:
+                    await self.client.expire(tag_key, ttl * 2)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for {key}: {e}")
+
+    async def delete(self, key: str):
+        try:
+            await self.client.delete(self._key(key))
+        except Exception as e:
+            logger.warning(f"Shared cache delete failed for {key}: {e}")
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        removed = 0
+        try:
+            for tag in tags:
+                tag_key = self._tag(tag)
+                members = await self.client.smembers(tag_key)
+                keys = [self._key(m.decode() if isinstance(m, bytes) else m) for m in members]
+                if keys:
+                    removed += await self.client.delete(*keys)
+                await self.client.delete(tag_key)
+        except Exception as e:
+            logger.warning(f"Shared cache invalidation failed for {tags}: {e}")
+        self._evicted("invalidated", removed)
+        return removed
+
+    async def clear(self):
+        try:
+            keys = [k async for k in self.client.scan_iter(match=f"{self.prefix}:*")]
+            if keys:
+                await self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Shared cache clear failed: {e}")
+
+
+class TieredCache(CacheBackend):
+    """Local LRU in front of a shared tier; reads fill the local tier on a shared hit"""
+
+    tier = "tiered"
+
+    def __init__(self, local: MemoryCacheBackend, shared: Optional[CacheBackend] = None, name: str = "default"):
+        super().__init__(name)
+        self.local = local
+        self.shared = shared
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+
+        entry = await self.shared.get_entry(key)
+        if entry is None:
+            return None
+        value, tags = entry
+        await self.local.set(key, value, ttl=self.local.max_ttl or 60, tags=tags)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int = 3600, tags: Iterable[str] = ()):
+        tags = tuple(tags)
+        await self.local.set(key, value, ttl=ttl, tags=tags)
+        if self.shared is not None:
+            await self.shared.set(key, value, ttl=ttl, tags=tags)
+
+    async def delete(self, key: str):
+        await self.local.delete(key)
+        if self.shared is not None:
+            await self.shared.delete(key)
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        removed = await self.local.invalidate_tags(*tags)
+        if self.shared is not None:
+            removed += await self.shared.invalidate_tags(*tags)
+        return removed
+
+    async def clear(self):
+        await self.local.clear()
+        if self.shared is not None:
+            await self.shared.clear()
+
+
+def build_cache(name: str, max_entries: int = 10000, redis_url: Optional[str] = None,
+                local_ttl: int = 30) -> TieredCache:
+    """Create a cache for the current deployment: LRU only, or LRU in front of Redis when configured"""
+    redis_url = redis_url if redis_url is not None else os.environ.get("REDIS_URL")
+
+    shared = None
+    if redis_url and REDIS_AVAILABLE:
+        shared = RedisCacheBackend(redis_asyncio.from_url(redis_url), name=name)
+        local = MemoryCacheBackend(name=name, max_entries=max_entries, max_ttl=local_ttl)
+    else:
+        if redis_url:
+            logger.warning("REDIS_URL is set but the redis package is not installed; using per-process cache")
+        local = MemoryCacheBackend(name=name, max_entries=max_entries)
+
+    return TieredCache(local, shared, name=name)
@@ -0,0 +1,263 @@
+"""
+Certificate Render Service for Polaris Platform
+Renders certificate PDFs on a process pool and keeps the bytes on disk and in a
+byte-bounded LRU, keyed by certificate, base URL and template version
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Mapping, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi.responses import Response
+from prometheus_client import Counter, Histogram
+
+from evidence_store import parse_range
+
+logger = logging.getLogger(__name__)
+
+CERTIFICATE_REQUESTS = Counter('polaris_certificate_pdf_requests_total', 'Certificate PDFs by where they came from',
+                               ['source'])
+CERTIFICATE_RENDER_DURATION = Histogram('polaris_certificate_render_seconds', 'Time to render one certificate PDF',
+                                        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+# Bump whenever render_certificate_pdf changes what it draws; old cache entries are then never read
+TEMPLATE_VERSION = "1"
+CERTIFICATE_FIELDS = ("client_user_id", "agency_user_id", "session_id", "readiness_percent", "issued_at")
+
+
+def render_certificate_pdf(cert: Dict[str, Any], verify_url: str) -> bytes:
+    """Draw one certificate; runs in a worker process, so it only sees plain values"""
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import inch
+    from reportlab.graphics.barcode import qr
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.graphics import renderPDF
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=LETTER)
+    width, height = LETTER
+    c.setFillColorRGB(0.105, 0.211, 0.365)
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(1*inch, height-1*inch, "Polaris – Small Business Maturity Assurance")
+    c.setFont("Helvetica", 11)
+    c.drawString(1*inch, height-1.3*inch, "City of San Antonio – Procurement Readiness Platform")
+    c.setFillColorRGB(0,0,0)
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(1*inch, height-2*inch, "Certificate of Opportunity Readiness")
+    c.setFont("Helvetica", 12)
+    c.drawString(1*inch, height-2.4*inch, f"Issued to Client ID: {cert.get('client_user_id')}")
+    c.drawString(1*inch, height-2.7*inch, f"Sponsoring Agency ID: {cert.get('agency_user_id')}")
+    c.drawString(1*inch, height-3.0*inch, f"Assessment Session ID: {cert.get('session_id')}")
+    c.drawString(1*inch, height-3.3*inch, f"Readiness: {cert.get('readiness_percent')}%")
+    c.drawString(1*inch, height-3.6*inch, f"Issued at: {cert.get('issued_at')}")
+
+    qrobj = qr.QrCodeWidget(verify_url)
+    bounds = qrobj.getBounds()
+    size = 1.8*inch
+    w = bounds[2]-bounds[0]
+    h = bounds[3]-bounds[1]
+    d = Drawing(size, size, transform=[size/w, 0, 0, size/h, 0, 0])
+    d.add(qrobj)
+    renderPDF.draw(d, c, width - (size + 1*inch), height - (size + 1*inch))
+    c.setFont("Helvetica", 8)
+    c.drawString(width - (size + 1*inch), height - (size + 1*inch) - 12, f"Verified at: {verify_url}")
+
+    c.setFont("Helvetica-Oblique", 10)
+    c.drawString(1*inch, height-4.1*inch, "This certificate signifies the business has met the evidence-backed readiness threshold.")
+    c.drawString(1*inch, height-4.35*inch, "Validated by the sponsoring agency within the Polaris platform.")
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _write_atomically(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    temp.write_bytes(data)
+    os.replace(temp, path)
+
+
+def _read_if_exists(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable sink that zipfile writes into; the stream hands out what has accumulated"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class CertificateRenderer:
+    """
+    Certificates never change after issue, so a rendered PDF is valid for as long as the
+    base URL in its QR code and the template stay the same. Lookups go memory, disk, any
+    identical render in flight, then the process pool. The cache key doubles as the ETag.
+    """
+
+    def __init__(self, cache_dir: Path, max_workers: int = 2, max_memory_bytes: int = 64 * 1024 * 1024,
+                 template_version: str = TEMPLATE_VERSION, executor=None):
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+        self.max_memory_bytes = max_memory_bytes
+        self.template_version = template_version
+        # spawn rather than fork: the server process holds Mongo and executor threads
+        self._executor = executor or ProcessPoolExecutor(max_workers=max_workers,
+                                                         mp_context=multiprocessing.get_context("spawn"))
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    def cache_key(self, cert_id: str, base_url: str) -> str:
+        return hashlib.sha256(f"{cert_id}|{base_url}|{self.template_version}".encode("utf-8")).hexdigest()
+
+    def cache_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pdf"
+
+    def _remember(self, key: str, pdf: bytes):
+        if len(pdf) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = pdf
+        self._memory_bytes += len(pdf)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    async def render(self, cert: Dict[str, Any], base_url: str) -> Tuple[bytes, str]:
+        """PDF bytes and ETag for a certificate document as served under `base_url`"""
+        cert_id = cert["_id"]
+        key = self.cache_key(cert_id, base_url)
+        etag = f'"{key[:32]}"'
+
+        pdf = self._memory.get(key)
+        if pdf is not None:
+            self._memory.move_to_end(key)
+            CERTIFICATE_REQUESTS.labels("memory").inc()
+            return pdf, etag
+
+        # Every caller awaits one detached task, so a client that disconnects mid-render
+        # neither cancels the render for the others nor throws the finished PDF away
+        render = self._in_flight.get(key)
+        outcome = None
+        if render is None:
+            render = asyncio.create_task(self._load_or_render(cert, base_url, key))
+            self._in_flight[key] = render
+            render.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            outcome = "coalesced"
+
+        pdf = await asyncio.shield(render)
+        if outcome is not None:
+            CERTIFICATE_REQUESTS.labels(outcome).inc()
+        return pdf, etag
+
+    async def _load_or_render(self, cert: Dict[str, Any], base_url: str, key: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        path = self.cache_path(key)
+        pdf = await loop.run_in_executor(None, _read_if_exists, path)
+        if pdf is not None:
+            CERTIFICATE_REQUESTS.labels("disk").inc()
+        else:
+            start = time.perf_counter()
+            fields = {name: cert.get(name) for name in CERTIFICATE_FIELDS}
+            pdf = await loop.run_in_executor(self._executor, render_certificate_pdf, fields,
+                                             f"{base_url}verify/cert/{cert['_id']}")
+            CERTIFICATE_RENDER_DURATION.observe(time.perf_counter() - start)
+            CERTIFICATE_REQUESTS.labels("render").inc()
+            await loop.run_in_executor(None, _write_atomically, path, pdf)
+        self._remember(key, pdf)
+        return pdf
+
+    def _finished(self, key: str, render: asyncio.Task):
+        if self._in_flight.get(key) is render:
+            del self._in_flight[key]
+        if not render.cancelled():
+            # Mark retrieved so an error every caller abandoned is not reported as unhandled
+            render.exception()
+
+    async def stream_zip(self, certs: Iterable[Dict[str, Any]], base_url: str) -> AsyncIterator[bytes]:
+        """
+        ZIP of every certificate in `certs`, yielded as it is built. Up to twice the pool
+        size renders run ahead of the archive so the workers stay busy.
+        """
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            batch = []
+            for cert in certs:
+                batch.append(cert)
+                if len(batch) >= self.max_workers * 2:
+                    for name, pdf in await self._render_batch(batch, base_url):
+                        archive.writestr(name, pdf)
+                        yield sink.drain()
+                    batch = []
+            for name, pdf in await self._render_batch(batch, base_url):
+                archive.writestr(name, pdf)
+                yield sink.drain()
+        yield sink.drain()
+
+    async def _render_batch(self, certs, base_url: str):
+        rendered = await asyncio.gather(*(self.render(cert, base_url) for cert in certs))
+        return [(f"Polaris_Certificate_{cert['_id']}.pdf", pdf) for cert, (pdf, _) in zip(certs, rendered)]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def pdf_response(pdf: bytes, etag: str, filename: str, headers: Mapping[str, str]) -> Response:
+    """
+    Serve cached PDF bytes honouring If-None-Match, If-Range and a single byte range.
+    Certificates are immutable, so clients revalidate with the ETag instead of re-downloading.
+    """
+    common = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"
+    }
+    if etag in [tag.strip() for tag in (headers.get("if-none-match") or "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    range_header = headers.get("range")
+    if_range = headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, len(pdf))
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{len(pdf)}"})
+
+    if byte_range is None:
+        return Response(pdf, media_type="application/pdf", headers=common)
+    start, end = byte_range
+    return Response(pdf[start:end + 1], status_code=206, media_type="application/pdf",
+                    headers={**common, "Content-Range": f"bytes {start}-{end}/{len(pdf)}"})
@@ -0,0 +1,138 @@
+"""
+Chat History for Polaris Platform
+Keyset pagination over a chat's messages and per-participant read watermarks, so reading a
+page costs O(page) and marking it read is one small write to chat_participants
+"""
+
+import base64
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE = 100
+UNREAD_COUNT_CAP = 999
+NEWEST_FIRST = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+OLDEST_FIRST = [("timestamp", ASCENDING), ("_id", ASCENDING)]
+
+Position = Tuple[datetime, str]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message: Dict[str, Any]) -> str:
+    raw = f"{message['timestamp'].isoformat()}|{message['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Position:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, _, message_id = raw.partition("|")
+        return datetime.fromisoformat(timestamp), message_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def _keyset(position: Position, op: str, timestamp_field: str = "timestamp", id_field: str = "_id") -> List[Dict]:
+    """Conditions for (timestamp, _id) strictly past `position` in the direction of `op`"""
+    timestamp, message_id = position
+    return [{timestamp_field: {op: timestamp}}, {timestamp_field: timestamp, id_field: {op: message_id}}]
+
+
+def after_position(position: Position) -> Dict[str, Any]:
+    return {"$or": _keyset(position, "$gt")}
+
+
+def before_position(position: Position) -> Dict[str, Any]:
+    return {"$or": _keyset(position, "$lt")}
+
+
+def watermark_of(participant: Optional[Dict[str, Any]]) -> Optional[Position]:
+    if participant and participant.get("last_read_at") is not None:
+        return participant["last_read_at"], participant.get("last_read_id") or ""
+    return None
+
+
+def is_read(message: Dict[str, Any], user_id: str, watermark: Optional[Position]) -> bool:
+    if message.get("sender_id") == user_id:
+        return True
+    return watermark is not None and (message["timestamp"], message["_id"]) <= watermark
+
+
+class ChatHistory:
+    """
+    Messages are ordered by (timestamp, _id); the _id breaks ties between messages sent in
+    the same millisecond. A participant's read state is the position of the newest message
+    they have seen, stored on their chat_participants row and only ever moved forward.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def page(self, chat_id: str, before: Optional[str] = None, after: Optional[str] = None,
+                   limit: int = 50) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Up to `limit` messages, oldest first: the newest ones, those just older than
+        `before`, or those just newer than `after`. Also returns whether more messages
+        lie beyond the page in the direction being read.
+        """
+        limit = max(1, min(limit, MAX_PAGE))
+        query: Dict[str, Any] = {"chat_id": chat_id, "deleted": {"$ne": True}}
+        order = NEWEST_FIRST
+        if after is not None:
+            query.update(after_position(decode_cursor(after)))
+            order = OLDEST_FIRST
+        elif before is not None:
+            query.update(before_position(decode_cursor(before)))
+
+        messages = await self.db.chat_messages.find(query).sort(order).limit(limit + 1).to_list(limit + 1)
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if order is NEWEST_FIRST:
+            messages.reverse()
+        return messages, has_more
+
+    async def watermark(self, chat_id: str, user_id: str, participant: Optional[Dict[str, Any]]) -> Optional[Position]:
+        """
+        The participant's read position. Participants from before watermarks existed start
+        from the newest message their id was added to read_by on.
+        """
+        position = watermark_of(participant)
+        if position is not None or participant is None:
+            return position
+        legacy = await self.db.chat_messages.find(
+            {"chat_id": chat_id, "read_by": user_id}, {"timestamp": 1}
+        ).sort(NEWEST_FIRST).limit(1).to_list(1)
+        if not legacy:
+            return None
+        await self.mark_read(chat_id, user_id, legacy[0])
+        return legacy[0]["timestamp"], legacy[0]["_id"]
+
+    async def mark_read(self, chat_id: str, user_id: str, message: Dict[str, Any]) -> bool:
+        """Move the watermark up to `message`; returns False if it was already there or beyond"""
+        position = (message["timestamp"], message["_id"])
+        result = await self.db.chat_participants.update_one(
+            {"chat_id": chat_id, "user_id": user_id,
+             "$or": [{"last_read_at": None}, *_keyset(position, "$lt", "last_read_at", "last_read_id")]},
+            {"$set": {"last_read_at": position[0], "last_read_id": position[1], "last_seen": datetime.utcnow()}}
+        )
+        return bool(result.modified_count)
+
+    async def latest(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        newest = await self.db.chat_messages.find(
+            {"chat_id": chat_id, "deleted": {"$ne": True}}, {"timestamp": 1}
+        ).sort(NEWEST_FIRST).limit(1).to_list(1)
+        return newest[0] if newest else None
+
+    async def unread_count(self, chat_id: str, user_id: str, watermark: Optional[Position]) -> int:
+        """Messages from others after the watermark, counted up to UNREAD_COUNT_CAP"""
+        query: Dict[str, Any] = {"chat_id": chat_id, "deleted": {"$ne": True}, "sender_id": {"$ne": user_id}}
+        if watermark is not None:
+            query.update(after_position(watermark))
+        return await self.db.chat_messages.count_documents(query, limit=UNREAD_COUNT_CAP)
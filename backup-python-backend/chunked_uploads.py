@@ -0,0 +1,274 @@
+"""
+Chunked Upload Service for Polaris Platform
+Resumable uploads that accept chunks in any order, verify each one with SHA-256 and write
+it at its offset in a preallocated file, so completing an upload is a rename
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_BYTES = Counter('polaris_upload_bytes_total', 'Bytes written by chunked uploads', ['upload_type'])
+UPLOAD_CHUNK_DURATION = Histogram('polaris_upload_chunk_seconds', 'Time to receive, hash and write one chunk',
+                                  ['upload_type'])
+UPLOAD_THROUGHPUT = Histogram('polaris_upload_chunk_throughput_bytes_per_second', 'Per-chunk receive throughput',
+                              buckets=(64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6))
+UPLOADS = Counter('polaris_uploads_total', 'Chunked uploads and chunks by outcome', ['upload_type', 'outcome'])
+
+READ_SIZE = 1024 * 1024
+
+# Largest upload accepted per type; the whole size is preallocated on disk at initiate
+MAX_UPLOAD_BYTES = {
+    "business_logo": 10 * 1024 * 1024,
+    "proposal_attachment": 100 * 1024 * 1024,
+}
+DEFAULT_MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+
+
+class IncompleteUpload(ValueError):
+    def __init__(self, missing: List[int]):
+        super().__init__(f"{len(missing)} chunks have not been received")
+        self.missing = missing
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, limit: int):
+        super().__init__(f"Uploads of this type are limited to {limit} bytes")
+        self.limit = limit
+
+
+def _allocate(path: Path, size: int):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o640)
+    try:
+        if size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return
+            except OSError:
+                pass  # filesystems without fallocate still support a sparse file of the right length
+        os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+class ChunkedUploadService:
+    """
+    Upload state lives in the uploads collection: received chunk indexes and their digests
+    are recorded with $addToSet/$set, so parallel chunk requests never overwrite each
+    other. Uploads that stay incomplete for `max_age` seconds are removed by run(), which
+    also settles completions that stopped in "assembling" for `assemble_timeout` seconds.
+    """
+
+    def __init__(self, collection, base_dir: Path, chunk_size: int = 5 * 1024 * 1024, max_age: float = 86400.0,
+                 max_sizes: Optional[Dict[str, int]] = None, assemble_timeout: float = 300.0):
+        self.collection = collection
+        self.base_dir = Path(base_dir)
+        self.chunk_size = chunk_size
+        self.max_age = max_age
+        self.max_sizes = {**MAX_UPLOAD_BYTES, **(max_sizes or {})}
+        self.assemble_timeout = assemble_timeout
+
+    def max_size(self, upload_type: str) -> int:
+        return self.max_sizes.get(upload_type, DEFAULT_MAX_UPLOAD_BYTES)
+
+    def partial_path(self, upload_id: str) -> Path:
+        return self.base_dir / f"{upload_id}.partial"
+
+    def final_path(self, record: Dict[str, Any]) -> Path:
+        name = Path(record.get("file_name") or "upload").name or "upload"
+        return self.base_dir / f"{record['_id']}_{name}"
+
+    def total_chunks(self, record: Dict[str, Any]) -> int:
+        chunk_size = record.get("chunk_size") or self.chunk_size
+        return max(1, -(-int(record.get("total_size") or 0) // chunk_size))
+
+    def chunk_length(self, record: Dict[str, Any], index: int) -> int:
+        chunk_size = record.get("chunk_size") or self.chunk_size
+        return min(chunk_size, int(record.get("total_size") or 0) - index * chunk_size)
+
+    def missing_chunks(self, record: Dict[str, Any]) -> List[int]:
+        received = set(record.get("received_chunks") or [])
+        return [i for i in range(self.total_chunks(record)) if i not in received]
+
+    def status(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        missing = self.missing_chunks(record)
+        return {
+            "upload_id": record["_id"],
+            "status": record.get("status"),
+            "chunk_size": record.get("chunk_size") or self.chunk_size,
+            "total_chunks": self.total_chunks(record),
+            "received_chunks": self.total_chunks(record) - len(missing),
+            "missing_chunks": missing
+        }
+
+    async def initiate(self, upload_type: str, file_name: str, mime_type: str, total_size: int,
+                       **fields) -> Dict[str, Any]:
+        if total_size < 0:
+            raise ValueError("total_size must not be negative")
+        if total_size > self.max_size(upload_type):
+            UPLOADS.labels(upload_type, "too_large").inc()
+            raise UploadTooLarge(self.max_size(upload_type))
+        uid = str(uuid.uuid4())
+        now = datetime.utcnow()
+        record = {
+            "_id": uid, "id": uid, "type": upload_type, **fields,
+            "file_name": file_name, "mime_type": mime_type, "total_size": total_size,
+            "chunk_size": self.chunk_size, "received_chunks": [], "chunk_sha256": {},
+            "created_at": now, "updated_at": now, "status": "initiated"
+        }
+        record["total_chunks"] = self.total_chunks(record)
+        await asyncio.get_running_loop().run_in_executor(None, _allocate, self.partial_path(uid), total_size)
+        await self.collection.insert_one(record)
+        return record
+
+    async def receive_chunk(self, record: Dict[str, Any], index: int, stream, sha256: Optional[str] = None) -> str:
+        """
+        Write one chunk from `stream` (anything with an async read(n)) at its offset.
+        Raises ValueError when the index, length or checksum is wrong; the bytes on
+        disk are then simply overwritten by the retry.
+        """
+        upload_type = record.get("type", "unknown")
+        if record.get("status") != "initiated":
+            raise ValueError(f"Upload is {record.get('status')}")
+        if not 0 <= index < self.total_chunks(record):
+            raise ValueError(f"chunk_index must be between 0 and {self.total_chunks(record) - 1}")
+
+        start = time.perf_counter()
+        expected = self.chunk_length(record, index)
+        offset = index * (record.get("chunk_size") or self.chunk_size)
+        digest = hashlib.sha256()
+        written = 0
+        loop = asyncio.get_running_loop()
+        fd = os.open(self.partial_path(record["_id"]), os.O_WRONLY | os.O_CREAT, 0o640)
+        try:
+            while True:
+                data = await stream.read(READ_SIZE)
+                if not data:
+                    break
+                if written + len(data) > expected:
+                    raise ValueError(f"Chunk {index} is longer than {expected} bytes")
+                digest.update(data)
+                await loop.run_in_executor(None, os.pwrite, fd, data, offset + written)
+                written += len(data)
+        except ValueError:
+            UPLOADS.labels(upload_type, "rejected_chunk").inc()
+            raise
+        finally:
+            os.close(fd)
+
+        if written != expected:
+            UPLOADS.labels(upload_type, "rejected_chunk").inc()
+            raise ValueError(f"Chunk {index} has {written} bytes, expected {expected}")
+        hexdigest = digest.hexdigest()
+        if sha256 and sha256.lower() != hexdigest:
+            UPLOADS.labels(upload_type, "rejected_chunk").inc()
+            raise ValueError(f"Chunk {index} failed its SHA-256 check")
+
+        await self.collection.update_one(
+            {"_id": record["_id"]},
+            {"$addToSet": {"received_chunks": index},
+             "$set": {f"chunk_sha256.{index}": hexdigest, "updated_at": datetime.utcnow()}}
+        )
+        elapsed = time.perf_counter() - start
+        UPLOAD_BYTES.labels(upload_type).inc(written)
+        UPLOAD_CHUNK_DURATION.labels(upload_type).observe(elapsed)
+        if elapsed > 0:
+            UPLOAD_THROUGHPUT.observe(written / elapsed)
+        return hexdigest
+
+    async def complete(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Move the assembled file into place; raises IncompleteUpload listing missing chunks"""
+        if record.get("status") == "completed":
+            return record
+        missing = self.missing_chunks(record)
+        if missing:
+            raise IncompleteUpload(missing)
+
+        claimed = await self.collection.update_one({"_id": record["_id"], "status": "initiated"},
+                                                   {"$set": {"status": "assembling", "updated_at": datetime.utcnow()}})
+        if not claimed.modified_count:
+            raise ValueError("Upload is already being completed")
+
+        final_path = self.final_path(record)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.replace, self.partial_path(record["_id"]), final_path)
+        except OSError:
+            await self.collection.update_one({"_id": record["_id"]}, {"$set": {"status": "initiated"}})
+            raise
+        update = {"status": "completed", "stored_path": str(final_path), "final_size": int(record["total_size"]),
+                  "completed_at": datetime.utcnow()}
+        await self.collection.update_one({"_id": record["_id"]}, {"$set": update})
+        UPLOADS.labels(record.get("type", "unknown"), "completed").inc()
+        return {**record, **update}
+
+    async def cleanup_abandoned(self) -> int:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.max_age)
+        removed = 0
+        # Records from before chunk tracking have no updated_at, so select on created_at and recheck
+        async for record in self.collection.find({"status": "initiated", "created_at": {"$lt": cutoff}},
+                                                 {"_id": 1, "type": 1, "updated_at": 1}):
+            if (record.get("updated_at") or cutoff) > cutoff:
+                continue
+            claimed = await self.collection.update_one(
+                {"_id": record["_id"], "status": "initiated", "updated_at": record.get("updated_at")},
+                {"$set": {"status": "abandoned", "abandoned_at": datetime.utcnow()}}
+            )
+            if not claimed.modified_count:
+                continue
+            self.partial_path(record["_id"]).unlink(missing_ok=True)
+            # Part directories left by the previous per-chunk file layout
+            shutil.rmtree(self.base_dir / record["_id"], ignore_errors=True)
+            UPLOADS.labels(record.get("type", "unknown"), "abandoned").inc()
+            removed += 1
+        if removed:
+            logger.info(f"Removed {removed} abandoned uploads")
+        return removed
+
+    async def recover_assembling(self) -> int:
+        """
+        Settle uploads whose completion stopped between claiming "assembling" and recording
+        the result: completed when the rename happened, otherwise open for chunks again
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.assemble_timeout)
+        recovered = 0
+        async for record in self.collection.find({"status": "assembling", "updated_at": {"$lt": cutoff}}):
+            final_path = self.final_path(record)
+            now = datetime.utcnow()
+            if final_path.exists() and not self.partial_path(record["_id"]).exists():
+                update = {"status": "completed", "stored_path": str(final_path),
+                          "final_size": int(record["total_size"]), "completed_at": now}
+            else:
+                update = {"status": "initiated", "updated_at": now}
+            settled = await self.collection.update_one(
+                {"_id": record["_id"], "status": "assembling", "updated_at": record["updated_at"]},
+                {"$set": update}
+            )
+            if not settled.modified_count:
+                continue
+            UPLOADS.labels(record.get("type", "unknown"), f"recovered_{update['status']}").inc()
+            recovered += 1
+        if recovered:
+            logger.info(f"Recovered {recovered} uploads stuck assembling")
+        return recovered
+
+    async def run(self, interval: float = 3600.0):
+        while True:
+            try:
+                await self.recover_assembling()
+                await self.cleanup_abandoned()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Abandoned upload cleanup failed: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,209 @@
+"""
+Client Home Dashboard Read Model for Polaris Platform
+Builds the /home/client payload from one concurrent round of reads and caches it per user
+until an assessment, evidence or service event invalidates it
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOTAL_AREAS = 10
+GAP_RESPONSES = ("gap_exists", "no_help")
+ACTIVE_SERVICE_STATUSES = ["active", "in_progress", "pending"]
+
+# Only the fields the dashboard reads; the question bank stays on the server
+SESSION_PIPELINE_PROJECTION = {
+    "area_id": 1,
+    "user_id": 1,
+    "status": 1,
+    "question_count": {"$size": {"$ifNull": ["$questions", []]}},
+    "responses": {"$map": {
+        "input": {"$ifNull": ["$responses", []]},
+        "as": "r",
+        "in": {"response": "$$r.response", "tier_level": "$$r.tier_level", "question_id": "$$r.question_id"}
+    }},
+}
+
+EMPTY_CLIENT_DASHBOARD = {
+    "readiness": 0,
+    "completion_percentage": 0,
+    "critical_gaps": 0,
+    "active_services": 0,
+    "total_questions": 0,
+    "answered_questions": 0,
+    "evidence_required": 0,
+    "evidence_submitted": 0,
+    "has_certificate": False,
+    "opportunities": 0,
+    "profile_complete": False,
+    "agency_info": None,
+    "assessment_areas": {"total": TOTAL_AREAS, "completed": 0, "in_progress": 0}
+}
+
+
+def valid_tier_sessions(sessions: Iterable[Dict[str, Any]], user_id: str) -> List[Dict[str, Any]]:
+    """Drop malformed sessions: area ids must be area1..area10 and belong to the user"""
+    valid = []
+    for session in sessions:
+        area_id = session.get("area_id") or ""
+        if area_id.startswith("area") and session.get("user_id") == user_id:
+            try:
+                if 1 <= int(area_id.replace("area", "")) <= TOTAL_AREAS:
+                    valid.append(session)
+            except ValueError:
+                continue
+    return valid
+
+
+def summarize_tier_sessions(sessions: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Completion, gap and evidence counts over projected sessions. `evidence_keys` holds one
+    (session_id, question_id) per compliant Tier 2+ answer, in answer order.
+    """
+    completed_area_ids: Set[str] = set()
+    summary = {"critical_gaps": 0, "total_questions": 0, "answered_questions": 0, "in_progress": 0,
+               "evidence_keys": []}
+    for session in sessions:
+        if session.get("status") == "completed" and session.get("area_id"):
+            completed_area_ids.add(session["area_id"])
+        elif session.get("status") == "active":
+            summary["in_progress"] += 1
+        responses = session.get("responses") or []
+        summary["total_questions"] += session.get("question_count", 0)
+        summary["answered_questions"] += len(responses)
+        for response in responses:
+            if response.get("response") in GAP_RESPONSES:
+                summary["critical_gaps"] += 1
+            elif response.get("response") == "compliant" and response.get("tier_level", 1) >= 2:
+                summary["evidence_keys"].append((session["_id"], response.get("question_id")))
+    summary["completed_areas"] = min(len(completed_area_ids), TOTAL_AREAS)
+    return summary
+
+
+def client_dashboard_view(summary: Dict[str, Any], evidence_present: Set[Tuple[Any, Any]], approved_evidence: int,
+                          active_services: int, has_certificate: bool, opportunities: int,
+                          profile_complete: bool, agency_info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    completion_percentage = round((summary["completed_areas"] / TOTAL_AREAS) * 100, 1)
+    completion_percentage = min(100.0, max(0.0, completion_percentage))
+
+    evidence_required = len(summary["evidence_keys"])
+    evidence_submitted = sum(1 for key in summary["evidence_keys"] if key in evidence_present)
+    evidence_approval_rate = 0
+    if evidence_required > 0:
+        evidence_approval_rate = min(100.0, (approved_evidence / evidence_required) * 100)
+    readiness = round((completion_percentage * 0.6) + (evidence_approval_rate * 0.4), 1)
+
+    return {
+        "readiness": readiness,
+        "completion_percentage": completion_percentage,
+        "critical_gaps": summary["critical_gaps"],
+        "active_services": active_services,
+        "total_questions": summary["total_questions"],
+        "answered_questions": summary["answered_questions"],
+        "evidence_required": evidence_required,
+        "evidence_submitted": evidence_submitted,
+        "has_certificate": has_certificate,
+        "opportunities": opportunities,
+        "profile_complete": profile_complete,
+        "agency_info": agency_info,
+        "assessment_areas": {
+            "total": TOTAL_AREAS,
+            "completed": summary["completed_areas"],
+            "in_progress": summary["in_progress"]
+        }
+    }
+
+
+class ClientDashboardReadModel:
+    """
+    Per-user cache of the client home payload. Entries are tagged dashboard:{user_id};
+    anything that changes a client's sessions, evidence, services, certificates or
+    opportunity unlock calls invalidate(), and the TTL bounds everything else.
+    """
+
+    def __init__(self, db, cache, count_opportunities: Callable[[Dict[str, Any]], Awaitable[int]], ttl: int = 120):
+        self.db = db
+        self.cache = cache
+        self.count_opportunities = count_opportunities
+        self.ttl = ttl
+
+    async def get(self, current: Dict[str, Any]) -> Dict[str, Any]:
+        cached = await self.cache.get(current["id"])
+        if cached is not None:
+            return cached
+        view = await self.build(current)
+        await self.cache.set(current["id"], view, ttl=self.ttl, tags=[f"dashboard:{current['id']}"])
+        return view
+
+    async def invalidate(self, *user_ids: str):
+        tags = [f"dashboard:{uid}" for uid in user_ids if uid]
+        if tags:
+            await self.cache.invalidate_tags(*tags)
+
+    async def build(self, current: Dict[str, Any]) -> Dict[str, Any]:
+        uid = current["id"]
+        db = self.db
+        sessions, approved, active_services, cert, opportunities, profile, agency_info = await asyncio.gather(
+            db.tier_assessment_sessions.aggregate([
+                {"$match": {"user_id": uid}},
+                {"$project": SESSION_PIPELINE_PROJECTION}
+            ]).to_list(None),
+            db.assessment_evidence.count_documents({"user_id": uid, "review_status": "approved"}),
+            db.service_requests.count_documents({"client_id": uid, "status": {"$in": ACTIVE_SERVICE_STATUSES}}),
+            db.certificates.find_one({"client_user_id": uid}, {"_id": 1}),
+            self._opportunities(current),
+            db.business_profiles.find_one({"user_id": uid}, {"logo_upload_id": 1}),
+            self._agency_info(current)
+        )
+        summary = summarize_tier_sessions(valid_tier_sessions(sessions, uid))
+        evidence_present = await self._evidence_present(summary["evidence_keys"])
+        return client_dashboard_view(
+            summary, evidence_present, approved, active_services,
+            has_certificate=bool(cert),
+            opportunities=opportunities,
+            profile_complete=bool(profile and profile.get("logo_upload_id")),
+            agency_info=agency_info
+        )
+
+    async def _evidence_present(self, keys: List[Tuple[Any, Any]]) -> Set[Tuple[Any, Any]]:
+        """One $in query for every required answer instead of a find_one each"""
+        if not keys:
+            return set()
+        cursor = self.db.assessment_evidence.find(
+            {"session_id": {"$in": list({sid for sid, _ in keys})},
+             "question_id": {"$in": list({qid for _, qid in keys})}},
+            {"_id": 0, "session_id": 1, "question_id": 1}
+        )
+        wanted = set(keys)
+        present = set()
+        async for evidence in cursor:
+            key = (evidence.get("session_id"), evidence.get("question_id"))
+            if key in wanted:
+                present.add(key)
+        return present
+
+    async def _opportunities(self, current: Dict[str, Any]) -> int:
+        try:
+            return await self.count_opportunities(current)
+        except Exception as e:
+            logger.warning(f"Opportunity count unavailable for dashboard: {e}")
+            return 0
+
+    async def _agency_info(self, current: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not current.get("license_code"):
+            return None
+        license_record = await self.db.license_codes.find_one({"code": current["license_code"]}, {"agency_user_id": 1})
+        if not license_record:
+            return None
+        agency = await self.db.users.find_one({"id": license_record.get("agency_user_id")},
+                                              {"id": 1, "email": 1, "company_name": 1})
+        if not agency:
+            return None
+        return {
+            "agency_id": agency["id"],
+            "agency_email": agency["email"],
+            "company_name": agency.get("company_name", "Local Agency")
+        }
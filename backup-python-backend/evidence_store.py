@@ -0,0 +1,216 @@
+"""
+Evidence Blob Store for Polaris Platform
+Stores evidence files once under their SHA-256, hashing uploads as they stream to disk off
+the event loop, and serves them back with HTTP range support
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from prometheus_client import Counter, Histogram
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+EVIDENCE_BYTES = Counter('polaris_evidence_bytes_total', 'Evidence bytes received', ['outcome'])
+EVIDENCE_PUT_DURATION = Histogram('polaris_evidence_put_seconds', 'Time to stream, hash and store one evidence file')
+EVIDENCE_DOWNLOADS = Counter('polaris_evidence_downloads_total', 'Evidence downloads by kind', ['kind'])
+
+READ_SIZE = 1024 * 1024
+DELETING_RETRY_SECONDS = 0.05
+DELETING_RETRIES = 100
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+def _write_at(fd: int, data: bytes, offset: int):
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+class EvidenceBlobStore:
+    """
+    Blob files live at root/blobs/ab/cd/<sha256>; evidence_blobs holds one document per
+    blob with its size and a reference count. put() takes a reference and release()
+    drops one; collect_garbage() deletes blobs nobody has referenced for `grace` seconds,
+    marking the document "deleting" while the file goes so put() cannot take a reference.
+    """
+
+    def __init__(self, db, root: Path, grace: float = 86400.0):
+        self.blobs = db.evidence_blobs
+        self.root = Path(root)
+        self.grace = grace
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / digest[2:4] / digest
+
+    def _stream_to_temp(self) -> Path:
+        incoming = self.root / "incoming"
+        incoming.mkdir(parents=True, exist_ok=True)
+        return incoming / uuid.uuid4().hex
+
+    async def put(self, stream, mime_type: Optional[str] = None, max_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Store everything `stream.read(n)` yields and take one reference to it. Returns
+        sha256, size, path and whether the bytes were new. Raises BlobTooLarge past max_size.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        temp = self._stream_to_temp()
+        digest = hashlib.sha256()
+        size = 0
+        fd = await loop.run_in_executor(None, os.open, temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o640)
+        try:
+            try:
+                while True:
+                    data = await stream.read(READ_SIZE)
+                    if not data:
+                        break
+                    size += len(data)
+                    if max_size is not None and size > max_size:
+                        raise BlobTooLarge(f"File exceeds {max_size // (1024 * 1024)}MB limit")
+                    digest.update(data)
+                    await loop.run_in_executor(None, _write_at, fd, data, size - len(data))
+            finally:
+                os.close(fd)
+
+            sha256 = digest.hexdigest()
+            path = self.blob_path(sha256)
+            now = datetime.utcnow()
+            # Reference first: a concurrent collect_garbage() then sees ref_count > 0 and keeps the file.
+            # A blob it is already deleting cannot be referenced; the upsert collides with the
+            # marked document until it is gone and then stores the bytes afresh.
+            for attempt in range(DELETING_RETRIES):
+                try:
+                    result = await self.blobs.update_one(
+                        {"_id": sha256, "deleting": {"$exists": False}},
+                        {"$inc": {"ref_count": 1},
+                         "$set": {"last_referenced_at": now},
+                         "$setOnInsert": {"size": size, "mime_type": mime_type, "path": str(path), "created_at": now}},
+                        upsert=True
+                    )
+                    break
+                except DuplicateKeyError:
+                    if attempt == DELETING_RETRIES - 1:
+                        raise
+                    await asyncio.sleep(DELETING_RETRY_SECONDS)
+            created = result.upserted_id is not None or not path.exists()
+            if created:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                await loop.run_in_executor(None, os.replace, temp, path)
+        finally:
+            temp.unlink(missing_ok=True)
+
+        EVIDENCE_BYTES.labels("stored" if created else "deduplicated").inc(size)
+        EVIDENCE_PUT_DURATION.observe(time.perf_counter() - start)
+        return {"sha256": sha256, "size": size, "path": str(path), "created": created}
+
+    async def release(self, sha256: str):
+        await self.blobs.update_one({"_id": sha256}, {"$inc": {"ref_count": -1},
+                                                      "$set": {"released_at": datetime.utcnow()}})
+
+    async def collect_garbage(self) -> int:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.grace)
+        removed = 0
+        async for blob in self.blobs.find({"ref_count": {"$lte": 0}, "released_at": {"$lt": cutoff}}, {"_id": 1}):
+            # Marked documents are included so a sweep that stopped midway is finished
+            marked = await self.blobs.update_one({"_id": blob["_id"], "ref_count": {"$lte": 0}},
+                                                 {"$set": {"deleting": datetime.utcnow()}})
+            if not marked.modified_count:
+                continue
+            self.blob_path(blob["_id"]).unlink(missing_ok=True)
+            await self.blobs.delete_one({"_id": blob["_id"], "deleting": {"$exists": True}})
+            removed += 1
+        if removed:
+            logger.info(f"Removed {removed} unreferenced evidence blobs")
+        return removed
+
+    async def run(self, interval: float = 3600.0):
+        while True:
+            try:
+                await self.collect_garbage()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Evidence blob garbage collection failed: {e}")
+            await asyncio.sleep(interval)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) for a single "bytes=" range, None to send the whole file.
+    Raises ValueError when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None  # multiple or malformed ranges: RFC 9110 allows ignoring the header
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+async def _iter_range(path: str, start: int, end: int):
+    loop = asyncio.get_running_loop()
+    fd = await loop.run_in_executor(None, os.open, path, os.O_RDONLY)
+    try:
+        offset = start
+        while offset <= end:
+            data = await loop.run_in_executor(None, os.pread, fd, min(READ_SIZE, end - offset + 1), offset)
+            if not data:
+                break
+            offset += len(data)
+            yield data
+    finally:
+        os.close(fd)
+
+
+def blob_response(path: str, filename: str, range_header: Optional[str] = None,
+                  media_type: str = "application/octet-stream") -> Response:
+    """
+    Whole-file downloads go out as a FileResponse, which hands the path to servers that
+    support the ASGI pathsend extension for sendfile; byte ranges are read with pread
+    """
+    size = os.stat(path).st_size
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        EVIDENCE_DOWNLOADS.labels("full").inc()
+        return FileResponse(path, filename=filename, media_type=media_type, headers={"Accept-Ranges": "bytes"})
+
+    start, end = byte_range
+    EVIDENCE_DOWNLOADS.labels("range").inc()
+    return StreamingResponse(_iter_range(path, start, end), status_code=206, media_type=media_type, headers={
+        "Accept-Ranges": "bytes",
+        "Content-Range": f"bytes {start}-{end}/{size}",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"
+    })
@@ -0,0 +1,173 @@
+"""
+Geospatial Matching for Polaris Platform
+Provider locations as GeoJSON points resolved from zip_centroids, $geoNear radius search
+and bulk centroid loading
+"""
+
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Histogram
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+GEO_SEARCH_DURATION = Histogram('polaris_geo_search_seconds', 'Provider radius search duration')
+GEO_BACKFILL_DURATION = Histogram('polaris_geo_backfill_seconds', 'Provider location backfill duration')
+
+METERS_PER_MILE = 1609.344
+PROVIDER_LOCATION_FIELD = "geo_location"
+SEARCHABLE_PROVIDERS = {"role": "provider", "approval_status": "approved", "is_active": True}
+
+
+def geo_point(lat: float, lng: float) -> Dict[str, Any]:
+    """GeoJSON point; note GeoJSON orders coordinates longitude first"""
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def parse_centroid(raw: Dict[str, Any]) -> Optional[Tuple[str, float, float]]:
+    """Validate one uploaded centroid; returns (zip, lat, lng) or None"""
+    try:
+        zip_code = str(raw.get("zip")).strip()
+        lat, lng = float(raw.get("lat")), float(raw.get("lng"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    # 2dsphere indexes reject out-of-range coordinates, so bad rows must not reach providers
+    if not zip_code or zip_code == "None" or not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+        return None
+    return zip_code, lat, lng
+
+
+def centroid_operations(centroids: Iterable[Dict[str, Any]]) -> List[UpdateOne]:
+    ops = []
+    for raw in centroids:
+        parsed = parse_centroid(raw) if isinstance(raw, dict) else None
+        if parsed is None:
+            continue
+        zip_code, lat, lng = parsed
+        ops.append(UpdateOne(
+            {"zip": zip_code},
+            {"$set": {"zip": zip_code, "lat": lat, "lng": lng, "location": geo_point(lat, lng)}},
+            upsert=True
+        ))
+    return ops
+
+
+async def upsert_zip_centroids(collection, centroids: Iterable[Dict[str, Any]], batch_size: int = 1000) -> int:
+    """Upsert centroids through unordered bulk writes; returns the number of valid rows written"""
+    ops = centroid_operations(centroids)
+    for i in range(0, len(ops), batch_size):
+        await collection.bulk_write(ops[i:i + batch_size], ordered=False)
+    return len(ops)
+
+
+def provider_zip(user: Dict[str, Any]) -> Optional[str]:
+    zip_code = (user.get("location") or {}).get("zipcode") or user.get("zipcode")
+    return str(zip_code) if zip_code else None
+
+
+async def _locate_batch(db, users: List[Dict[str, Any]]) -> int:
+    zips = {user["_id"]: provider_zip(user) for user in users}
+
+    # Same fallback as before: business profile zip when the user record has none
+    missing = [uid for uid, zip_code in zips.items() if not zip_code]
+    if missing:
+        async for profile in db.business_profiles.find({"user_id": {"$in": missing}}, {"user_id": 1, "zipcode": 1}):
+            if profile.get("zipcode") and not zips.get(profile["user_id"]):
+                zips[profile["user_id"]] = str(profile["zipcode"])
+
+    wanted = {zip_code for zip_code in zips.values() if zip_code}
+    centroids = {}
+    if wanted:
+        async for c in db.zip_centroids.find({"zip": {"$in": list(wanted)}}, {"zip": 1, "lat": 1, "lng": 1}):
+            parsed = parse_centroid(c)
+            if parsed is not None:
+                centroids[parsed[0]] = geo_point(parsed[1], parsed[2])
+
+    ops = []
+    for user in users:
+        zip_code = zips.get(user["_id"])
+        point = centroids.get(zip_code) if zip_code else None
+        if point is not None:
+            if user.get(PROVIDER_LOCATION_FIELD) != point or user.get("geo_zip") != zip_code:
+                ops.append(UpdateOne({"_id": user["_id"]}, {"$set": {PROVIDER_LOCATION_FIELD: point, "geo_zip": zip_code}}))
+        elif user.get(PROVIDER_LOCATION_FIELD) is not None:
+            ops.append(UpdateOne({"_id": user["_id"]}, {"$unset": {PROVIDER_LOCATION_FIELD: "", "geo_zip": ""}}))
+
+    if ops:
+        await db.users.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+async def locate_provider(db, user_id: str) -> bool:
+    """Resolve one provider's point after their zip may have changed; returns whether it was written"""
+    projection = {"role": 1, "location": 1, "zipcode": 1, "geo_zip": 1, PROVIDER_LOCATION_FIELD: 1}
+    user = await db.users.find_one({"id": user_id}, projection)
+    if not user or user.get("role") != "provider":
+        return False
+    try:
+        return bool(await _locate_batch(db, [user]))
+    except Exception as e:
+        # The next backfill repairs it; a profile save must not fail over search placement
+        logger.error(f"Failed to locate provider {user_id}: {e}")
+        return False
+
+
+async def backfill_provider_locations(db, batch_size: int = 500) -> int:
+    """Resolve every provider's zip to a point; only changed locations are written"""
+    start = time.perf_counter()
+    updated, batch = 0, []
+    projection = {"location": 1, "zipcode": 1, "geo_zip": 1, PROVIDER_LOCATION_FIELD: 1}
+    try:
+        async for user in db.users.find({"role": "provider"}, projection):
+            batch.append(user)
+            if len(batch) >= batch_size:
+                updated += await _locate_batch(db, batch)
+                batch = []
+        if batch:
+            updated += await _locate_batch(db, batch)
+    except Exception as e:
+        # Runs as a background task; a partial pass is picked up by the next one
+        logger.error(f"Provider location backfill stopped after {updated} updates: {e}")
+        return updated
+    GEO_BACKFILL_DURATION.observe(time.perf_counter() - start)
+    logger.info(f"Provider location backfill updated {updated} providers")
+    return updated
+
+
+def geo_near_pipeline(lat: float, lng: float, radius_miles: float, offset: int, limit: int,
+                      query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Single aggregation: nearest-first providers within the radius, one page plus the total"""
+    return [
+        {"$geoNear": {
+            "near": geo_point(lat, lng),
+            "key": PROVIDER_LOCATION_FIELD,
+            "distanceField": "distance_miles",
+            "distanceMultiplier": 1 / METERS_PER_MILE,
+            "maxDistance": radius_miles * METERS_PER_MILE,
+            "spherical": True,
+            "query": query if query is not None else SEARCHABLE_PROVIDERS
+        }},
+        {"$facet": {
+            "providers": [
+                {"$skip": offset},
+                {"$limit": limit},
+                {"$project": {"company_name": 1, "name": 1, "rating": 1, "distance_miles": 1}}
+            ],
+            "total": [{"$count": "count"}]
+        }}
+    ]
+
+
+async def search_providers_near(users, lat: float, lng: float, radius_miles: float,
+                                offset: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], int]:
+    start = time.perf_counter()
+    try:
+        page = await users.aggregate(geo_near_pipeline(lat, lng, radius_miles, offset, limit)).to_list(1)
+    finally:
+        GEO_SEARCH_DURATION.observe(time.perf_counter() - start)
+    if not page:
+        return [], 0
+    total = page[0]["total"][0]["count"] if page[0]["total"] else 0
+    return page[0]["providers"], total
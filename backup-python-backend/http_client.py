@@ -0,0 +1,156 @@
+"""
+Outbound HTTP Client for Polaris Platform
+Process-wide aiohttp session with pooled keep-alive connections, per-host limits,
+timeouts, jittered retries and request metrics
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+HTTP_CLIENT_REQUESTS = Counter('polaris_http_client_requests_total', 'Outbound HTTP requests',
+                               ['host', 'method', 'outcome'])
+HTTP_CLIENT_DURATION = Histogram('polaris_http_client_request_seconds', 'Outbound HTTP request duration',
+                                 ['host', 'method'])
+HTTP_CLIENT_RETRIES = Counter('polaris_http_client_retries_total', 'Outbound HTTP retries', ['host', 'method'])
+HTTP_CLIENT_IN_FLIGHT = Gauge('polaris_http_client_in_flight', 'Outbound HTTP requests in flight', ['host'])
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# What request() raises when no response was received
+TRANSPORT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class HTTPResponse:
+    """Fully read response; the connection is back in the pool by the time callers see it"""
+
+    __slots__ = ("status", "headers", "body", "url")
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, url: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+
+    @property
+    def status_code(self) -> int:
+        # Same spelling as requests.Response so call sites read the same
+        return self.status
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class AsyncHTTPClient:
+    """
+    Shared outbound client.
+
+    The aiohttp session is created lazily inside the running event loop and reused by
+    every caller. Idempotent methods are retried on connection errors, timeouts and
+    RETRY_STATUSES; other methods only when the caller passes `retries` explicitly.
+    """
+
+    def __init__(self, max_connections: int = 100, max_per_host: int = 20, timeout: float = 10.0,
+                 connect_timeout: float = 5.0, retries: int = 2, backoff_base: float = 0.2,
+                 backoff_max: float = 5.0, keepalive_timeout: float = 30.0):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry number (0-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def request(self, method: str, url: str, *, retries: Optional[int] = None,
+                      retry_statuses: Iterable[int] = RETRY_STATUSES,
+                      timeout: Optional[float] = None, **kwargs) -> HTTPResponse:
+        method = method.upper()
+        host = urlsplit(url).hostname or "unknown"
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        retry_statuses = frozenset(retry_statuses)
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        session = self._get_session()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            HTTP_CLIENT_IN_FLIGHT.labels(host=host).inc()
+            try:
+                async with session.request(method, url, **kwargs) as resp:
+                    body = await resp.read()
+                    response = HTTPResponse(resp.status, dict(resp.headers), body, str(resp.url))
+                error = None
+            except TRANSPORT_ERRORS as e:
+                response, error = None, e
+            finally:
+                HTTP_CLIENT_IN_FLIGHT.labels(host=host).dec()
+                HTTP_CLIENT_DURATION.labels(host=host, method=method).observe(time.perf_counter() - start)
+
+            retryable = error is not None or response.status in retry_statuses
+            if not retryable or attempt >= retries:
+                outcome = type(error).__name__ if error is not None else f"{response.status // 100}xx"
+                HTTP_CLIENT_REQUESTS.labels(host=host, method=method, outcome=outcome).inc()
+                if error is not None:
+                    raise error
+                return response
+
+            HTTP_CLIENT_RETRIES.labels(host=host, method=method).inc()
+            delay = self.backoff(attempt)
+            if response is not None and response.headers.get("Retry-After", "").isdigit():
+                delay = min(self.backoff_max, float(response.headers["Retry-After"]))
+            logger.warning(f"Retrying {method} {host} after {error or response.status} (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, url: str, **kwargs) -> HTTPResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> HTTPResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def build_http_client() -> AsyncHTTPClient:
+    """Client sized from HTTP_CLIENT_* environment settings"""
+    return AsyncHTTPClient(
+        max_connections=int(os.environ.get("HTTP_CLIENT_MAX_CONNECTIONS", "100")),
+        max_per_host=int(os.environ.get("HTTP_CLIENT_MAX_PER_HOST", "20")),
+        timeout=float(os.environ.get("HTTP_CLIENT_TIMEOUT", "10")),
+        retries=int(os.environ.get("HTTP_CLIENT_RETRIES", "2"))
+    )
@@ -0,0 +1,272 @@
+"""
+MongoDB Index Registry for Polaris Platform
+Declares the indexes each hot collection's queries rely on, applies them idempotently
+at startup and reports missing or unused indexes from $indexStats
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Each entry mirrors the arguments of Collection.create_index: "keys" is the key
+# pattern, every other field is passed through as an index option.
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {
+    "users": [
+        # get_current_user runs {"id": uid} on every authenticated request
+        {"keys": [("id", ASCENDING)], "unique": True, "sparse": True},
+        {"keys": [("email", ASCENDING)], "unique": True, "sparse": True},
+        {"keys": [("role", ASCENDING), ("approval_status", ASCENDING)]},
+        {"keys": [("license_code", ASCENDING)], "sparse": True},
+        {"keys": [("created_at", DESCENDING)]},
+        # Admin user search matches email and name by prefix
+        {"keys": [("name", ASCENDING)], "sparse": True},
+        # $geoNear radius search over provider locations resolved from zip_centroids
+        {"keys": [("geo_location", GEOSPHERE)]},
+    ],
+    "tier_assessment_sessions": [
+        {"keys": [("user_id", ASCENDING), ("status", ASCENDING)]},
+        {"keys": [("user_id", ASCENDING), ("started_at", DESCENDING)]},
+        {"keys": [("status", ASCENDING), ("completed_at", DESCENDING)]},
+        {"keys": [("created_at", DESCENDING)]},
+    ],
+    "assessment_sessions": [
+        {"keys": [("user_id", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "assessment_evidence": [
+        {"keys": [("session_id", ASCENDING), ("question_id", ASCENDING)]},
+        {"keys": [("user_id", ASCENDING), ("status", ASCENDING)]},
+    ],
+    # Agency BI joins license -> clients; the compound key keeps the license side covered
+    "license_codes": [
+        {"keys": [("agency_user_id", ASCENDING), ("code", ASCENDING)]},
+        {"keys": [("code", ASCENDING)]},
+    ],
+    "agency_licenses": [
+        # License minting relies on this index to reject duplicate codes; balance documents
+        # in the same collection carry no code, hence the partial filter
+        {"keys": [("license_code", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"license_code": {"$type": "string"}}},
+        {"keys": [("agency_user_id", ASCENDING), ("status", ASCENDING)]},
+    ],
+    # License quota is reserved with a conditional $inc on the agency's month
+    "subscription_usage": [
+        {"keys": [("agency_user_id", ASCENDING), ("month", ASCENDING)], "unique": True},
+    ],
+    "agency_tier_configurations": [
+        {"keys": [("agency_id", ASCENDING)]},
+    ],
+    "business_profiles": [
+        {"keys": [("user_id", ASCENDING)]},
+    ],
+    "user_access": [
+        {"keys": [("user_id", ASCENDING)]},
+    ],
+    "audit_logs": [
+        {"keys": [("timestamp", DESCENDING)]},
+        {"keys": [("user_id", ASCENDING), ("timestamp", DESCENDING)]},
+    ],
+    # Keyset pagination orders by (timestamp, _id); _id breaks same-millisecond ties
+    "chat_messages": [
+        {"keys": [("chat_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]},
+    ],
+    "chat_participants": [
+        {"keys": [("chat_id", ASCENDING), ("user_id", ASCENDING)]},
+        {"keys": [("chat_id", ASCENDING), ("last_seen", DESCENDING)]},
+    ],
+    "notifications": [
+        {"keys": [("user_id", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("user_id", ASCENDING), ("read", ASCENDING)]},
+    ],
+    "service_requests": [
+        {"keys": [("client_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("area_id", ASCENDING), ("status", ASCENDING)]},
+    ],
+    "provider_responses": [
+        {"keys": [("request_id", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("provider_id", ASCENDING), ("created_at", DESCENDING)]},
+        # Landing KPI median response time scans the last 60 days
+        {"keys": [("created_at", DESCENDING)]},
+    ],
+    # Notification fan-out streams every active provider in a service area
+    "enhanced_provider_profiles": [
+        {"keys": [("service_areas", ASCENDING), ("profile_status", ASCENDING)]},
+    ],
+    "provider_notifications": [
+        {"keys": [("provider_id", ASCENDING), ("status", ASCENDING)]},
+    ],
+    "engagements": [
+        {"keys": [("client_user_id", ASCENDING), ("status", ASCENDING)]},
+        {"keys": [("provider_user_id", ASCENDING), ("status", ASCENDING)]},
+    ],
+    "certificates": [
+        {"keys": [("client_user_id", ASCENDING)]},
+        {"keys": [("agency_user_id", ASCENDING), ("issued_at", ASCENDING)]},
+    ],
+    "service_gigs": [
+        {"keys": [("provider_user_id", ASCENDING), ("status", ASCENDING)]},
+        {"keys": [("status", ASCENDING), ("category", ASCENDING)]},
+        {"keys": [("title", TEXT), ("tags", TEXT), ("description", TEXT)],
+         "weights": {"title": 10, "tags": 5, "description": 1}},
+    ],
+    "service_offerings": [
+        {"keys": [("status", ASCENDING), ("category", ASCENDING)]},
+        {"keys": [("title", TEXT), ("tags", TEXT), ("description", TEXT)],
+         "weights": {"title": 10, "tags": 5, "description": 1}},
+    ],
+    # Relevance search; a collection holds at most one text index, so it carries the weights
+    "opportunities": [
+        {"keys": [("status", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("title", TEXT), ("tags", TEXT), ("description", TEXT)],
+         "weights": {"title": 10, "tags": 5, "description": 1}},
+    ],
+    "service_orders": [
+        {"keys": [("client_id", ASCENDING), ("provider_id", ASCENDING), ("status", ASCENDING)]},
+    ],
+    "match_requests": [
+        {"keys": [("user_id", ASCENDING), ("status", ASCENDING)]},
+    ],
+    "provider_profiles": [
+        {"keys": [("user_id", ASCENDING)]},
+    ],
+    "provider_invites": [
+        {"keys": [("provider_profile_id", ASCENDING), ("request_id", ASCENDING)]},
+        {"keys": [("request_id", ASCENDING), ("provider_profile_id", ASCENDING)]},
+    ],
+    "zip_centroids": [
+        {"keys": [("zip", ASCENDING)], "unique": True},
+    ],
+    # Blobs are keyed by their SHA-256; the collector scans unreferenced, released blobs
+    "evidence_blobs": [
+        {"keys": [("ref_count", ASCENDING), ("released_at", ASCENDING)]},
+    ],
+    # Chunk uploads look records up by id; the janitor scans stale incomplete uploads
+    "uploads": [
+        {"keys": [("status", ASCENDING), ("created_at", ASCENDING)]},
+        {"keys": [("type", ASCENDING), ("response_id", ASCENDING), ("status", ASCENDING)]},
+    ],
+    # Idempotency records for batch answer submissions; a retry a day later is a new request
+    "assessment_batch_requests": [
+        {"keys": [("created_at", ASCENDING)], "expireAfterSeconds": 24 * 3600},
+    ],
+    # Real-time sync rows are only meaningful for a week
+    "dashboard_updates": [
+        {"keys": [("user_id", ASCENDING), ("timestamp", DESCENDING)]},
+        {"keys": [("timestamp", ASCENDING)], "expireAfterSeconds": 7 * 24 * 3600},
+        # The push relay drains unprocessed rows oldest first
+        {"keys": [("processed", ASCENDING), ("timestamp", ASCENDING)],
+         "partialFilterExpression": {"processed": False}},
+    ],
+    # Webhook outbox: workers claim due or lease-expired rows oldest first; owners list a
+    # webhook's deliveries by status. Delivered rows are kept 30 days for replay
+    "webhook_deliveries": [
+        {"keys": [("status", ASCENDING), ("next_attempt_at", ASCENDING)]},
+        {"keys": [("webhook_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]},
+        {"keys": [("delivered_at", ASCENDING)], "expireAfterSeconds": 30 * 24 * 3600},
+    ],
+    "webhooks": [
+        {"keys": [("events", ASCENDING), ("active", ASCENDING)]},
+    ],
+    # Matches the 90-day retention enforced by SecurityManager.cleanup_expired_blocks
+    "security_events": [
+        {"keys": [("timestamp", ASCENDING)], "expireAfterSeconds": 90 * 24 * 3600},
+    ],
+}
+
+
+def _key_signature(keys) -> tuple:
+    """Normalize a key pattern (list of pairs or SON/dict) into a comparable tuple"""
+    items = keys.items() if hasattr(keys, "items") else keys
+    signature = []
+    for field, direction in items:
+        if direction == TEXT or field in ("_fts", "_ftsx"):
+            # MongoDB lists any text index as _fts/_ftsx, whatever fields were declared
+            if ("_fts", TEXT) not in signature:
+                signature += [("_fts", TEXT), ("_ftsx", 1)]
+            continue
+        signature.append((field, int(direction) if isinstance(direction, (int, float)) else direction))
+    return tuple(signature)
+
+
+class IndexRegistry:
+    """Applies INDEX_REGISTRY to a database and reports on index health"""
+
+    def __init__(self, db, registry: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        self.db = db
+        self.registry = registry if registry is not None else INDEX_REGISTRY
+
+    async def ensure_indexes(self) -> Dict[str, Any]:
+        """Create every declared index; existing identical indexes are a no-op"""
+        created, failed = [], []
+        for collection_name, specs in self.registry.items():
+            collection = self.db[collection_name]
+            for spec in specs:
+                options = {k: v for k, v in spec.items() if k != "keys"}
+                try:
+                    name = await collection.create_index(spec["keys"], background=True, **options)
+                    created.append(f"{collection_name}.{name}")
+                except OperationFailure as e:
+                    # Conflicting options or duplicate data must not block startup
+                    failed.append({
+                        "collection": collection_name,
+                        "keys": _key_signature(spec["keys"]),
+                        "error": str(e)
+                    })
+                    logger.error(f"Index creation failed on {collection_name} {spec['keys']}: {e}")
+
+        logger.info(f"Index registry applied: {len(created)} ensured, {len(failed)} failed")
+        return {"ensured": created, "failed": failed}
+
+    async def report(self) -> Dict[str, Any]:
+        """Compare declared vs. existing indexes and flag ones with no recorded use"""
+        collections = {}
+        totals = {"missing": 0, "unused": 0, "undeclared": 0}
+
+        for collection_name, specs in self.registry.items():
+            collection = self.db[collection_name]
+            declared = {_key_signature(spec["keys"]) for spec in specs}
+
+            existing = {}
+            async for index in collection.list_indexes():
+                existing[_key_signature(index["key"])] = index["name"]
+
+            usage = {}
+            try:
+                async for stat in collection.aggregate([{"$indexStats": {}}]):
+                    usage[stat["name"]] = {
+                        "ops": stat.get("accesses", {}).get("ops", 0),
+                        "since": stat.get("accesses", {}).get("since")
+                    }
+            except OperationFailure as e:
+                logger.warning(f"$indexStats unavailable for {collection_name}: {e}")
+
+            missing = [list(sig) for sig in declared if sig not in existing]
+            unused = [
+                {"name": name, "since": usage[name]["since"]}
+                for name in existing.values()
+                if name != "_id_" and name in usage and usage[name]["ops"] == 0
+            ]
+            undeclared = [
+                name for sig, name in existing.items()
+                if sig not in declared and name != "_id_"
+            ]
+
+            totals["missing"] += len(missing)
+            totals["unused"] += len(unused)
+            totals["undeclared"] += len(undeclared)
+            collections[collection_name] = {
+                "missing": missing,
+                "unused": unused,
+                "undeclared": undeclared,
+                "usage": usage
+            }
+
+        return {
+            "generated_at": datetime.utcnow().isoformat(),
+            "totals": totals,
+            "collections": collections
+        }
@@ -0,0 +1,185 @@
+"""
+Platform KPI Materializer for Polaris Platform
+Keeps the public landing KPIs in one platform_kpis document, recomputed on an interval and
+nudged by write-path increments, so the unauthenticated endpoint never touches hot collections
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import Histogram
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+KPI_REFRESH_DURATION = Histogram('polaris_kpi_refresh_seconds', 'Platform KPI recomputation duration')
+
+KPI_DOCUMENT_ID = "landing"
+YES_ANSWERS = ["yes", "y", True, "true", 1]
+# Fields a write path may bump between recomputations; windowed KPIs only change on refresh
+INCREMENTAL_FIELDS = {"total_clients", "engagements", "certificates"}
+
+EMPTY_KPIS = {
+    "total_clients": 0,
+    "engagements": 0,
+    "certificates": 0,
+    "opportunities_open": 0,
+    "gaps_addressed_30d": 0,
+    "avg_yes_answers": 0.0,
+    "clients_started_assessment": 0,
+    "median_provider_response_hrs": None
+}
+
+
+def median(values: List[float]) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    return ordered[mid] if len(ordered) % 2 == 1 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def response_hours_pipeline(since: datetime, sample: int) -> List[Dict[str, Any]]:
+    """Hours from service request to provider response, joined server-side in one pass"""
+    return [
+        {"$match": {"created_at": {"$gte": since}}},
+        {"$limit": sample},
+        {"$project": {"request_id": 1, "created_at": 1}},
+        {"$lookup": {"from": "service_requests", "localField": "request_id", "foreignField": "_id", "as": "request"}},
+        {"$unwind": "$request"},
+        {"$match": {"created_at": {"$type": "date"}, "request.created_at": {"$type": "date"}}},
+        {"$project": {"_id": 0, "hours": {"$divide": [{"$subtract": ["$created_at", "$request.created_at"]}, 3600000]}}},
+        {"$match": {"hours": {"$gte": 0}}}
+    ]
+
+
+def kpi_etag(kpis: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(json.dumps(kpis, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+class KPIMaterializer:
+    """
+    Serves the latest platform_kpis snapshot from memory. run() recomputes it every
+    `interval` seconds unless another worker has written a fresher document, and
+    increment() applies counter changes to both the document and the local copy.
+    """
+
+    def __init__(self, db, interval: float = 300.0, response_sample: int = 500):
+        self.db = db
+        self.interval = interval
+        self.response_sample = response_sample
+        self._kpis: Optional[Dict[str, Any]] = None
+        self._etag = ""
+        self._lock: Optional[asyncio.Lock] = None
+        self.computed_at: Optional[datetime] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self._kpis if self._kpis is not None else EMPTY_KPIS)
+
+    @property
+    def etag(self) -> str:
+        return self._etag or kpi_etag(EMPTY_KPIS)
+
+    def _adopt(self, kpis: Dict[str, Any], computed_at: Optional[datetime]):
+        self._kpis = {field: kpis.get(field, default) for field, default in EMPTY_KPIS.items()}
+        self._etag = kpi_etag(self._kpis)
+        self.computed_at = computed_at
+
+    async def compute(self) -> Dict[str, Any]:
+        db = self.db
+        now = datetime.utcnow()
+        (total_clients, engagements, certificates, opportunities_open, gaps_30d, progress, hours) = await asyncio.gather(
+            db.users.count_documents({"role": "client"}),
+            db.engagements.count_documents({}),
+            db.certificates.count_documents({}),
+            db.opportunities.count_documents({"status": "open"}),
+            db.resource_access_logs.count_documents({"accessed_at": {"$gte": now - timedelta(days=30)}}),
+            db.assessment_answers.aggregate([
+                {"$match": {"answer": {"$in": YES_ANSWERS}}},
+                {"$group": {"_id": "$user_id", "yes_count": {"$sum": 1}}},
+                {"$group": {"_id": None, "avg_yes": {"$avg": "$yes_count"}, "started_clients": {"$sum": 1}}}
+            ]).to_list(1),
+            db.provider_responses.aggregate(
+                response_hours_pipeline(now - timedelta(days=60), self.response_sample)
+            ).to_list(None)
+        )
+        med_hours = median([row["hours"] for row in hours])
+        return {
+            "total_clients": total_clients,
+            "engagements": engagements,
+            "certificates": certificates,
+            "opportunities_open": opportunities_open,
+            "gaps_addressed_30d": gaps_30d,
+            "avg_yes_answers": round(float(progress[0]["avg_yes"]), 1) if progress else 0.0,
+            "clients_started_assessment": int(progress[0]["started_clients"]) if progress else 0,
+            "median_provider_response_hrs": round(med_hours, 1) if med_hours is not None else None
+        }
+
+    async def refresh(self) -> Dict[str, Any]:
+        """
+        Recompute and store the snapshot. Counters are corrected with $inc by how far the
+        stored value was from the recount when it started, so increments that land while
+        the recount runs are kept rather than overwritten.
+        """
+        start = time.perf_counter()
+        counters = {field: 1 for field in INCREMENTAL_FIELDS}
+        before = await self.db.platform_kpis.find_one({"_id": KPI_DOCUMENT_ID}, counters) or {}
+        kpis = await self.compute()
+        now = datetime.utcnow()
+        stored = await self.db.platform_kpis.find_one_and_update(
+            {"_id": KPI_DOCUMENT_ID},
+            {"$set": {**{k: v for k, v in kpis.items() if k not in INCREMENTAL_FIELDS}, "computed_at": now},
+             "$inc": {field: kpis[field] - (before.get(field) or 0) for field in INCREMENTAL_FIELDS}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._adopt(stored, now)
+        KPI_REFRESH_DURATION.observe(time.perf_counter() - start)
+        return self.snapshot()
+
+    async def sync(self):
+        """Adopt the shared document if it is fresh, otherwise recompute it"""
+        doc = await self.db.platform_kpis.find_one({"_id": KPI_DOCUMENT_ID})
+        computed_at = (doc or {}).get("computed_at")
+        if computed_at and computed_at > datetime.utcnow() - timedelta(seconds=self.interval):
+            self._adopt(doc, computed_at)
+        else:
+            await self.refresh()
+
+    async def ensure_ready(self):
+        """First request before the background task has run: one caller syncs, the rest wait"""
+        if self._kpis is not None:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._kpis is None:
+                await self.sync()
+
+    async def run(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Platform KPI refresh failed, serving previous snapshot: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def increment(self, field: str, amount: int = 1):
+        """Count a write between refreshes; failures only delay the number until the next one"""
+        if field not in INCREMENTAL_FIELDS:
+            raise ValueError(f"{field} is not an incremental KPI")
+        try:
+            await self.db.platform_kpis.update_one({"_id": KPI_DOCUMENT_ID}, {"$inc": {field: amount}})
+        except Exception as e:
+            logger.warning(f"Platform KPI increment of {field} failed: {e}")
+            return
+        if self._kpis is not None:
+            self._adopt({**self._kpis, field: self._kpis[field] + amount}, self.computed_at)
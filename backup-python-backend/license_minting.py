@@ -0,0 +1,135 @@
+"""
+License Code Minting for Polaris Platform
+Generates license codes with the secrets CSPRNG and inserts whole batches at once,
+leaving uniqueness to the license_code unique index and retrying only the collisions
+"""
+
+import logging
+import secrets
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from prometheus_client import Counter, Histogram
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+LICENSE_CODES_MINTED = Counter('polaris_license_codes_minted_total', 'License codes inserted', ['source'])
+LICENSE_CODE_COLLISIONS = Counter('polaris_license_code_collisions_total',
+                                  'Generated license codes rejected by the unique index')
+LICENSE_MINT_DURATION = Histogram('polaris_license_mint_seconds', 'Time to mint one batch of license codes',
+                                  buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+
+CODE_DIGITS = 10
+MAX_BATCH = 10000
+DUPLICATE_KEY = 11000
+
+
+class LicenseMintingError(RuntimeError):
+    def __init__(self, message: str, minted: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.minted = minted
+
+
+def generate_codes(count: int, digits: int = CODE_DIGITS, exclude: Optional[Set[str]] = None) -> List[str]:
+    """`count` distinct zero-padded numeric codes, none of them in `exclude`"""
+    exclude = exclude or set()
+    codes: Set[str] = set()
+    while len(codes) < count:
+        code = str(secrets.randbelow(10 ** digits)).zfill(digits)
+        if code not in exclude:
+            codes.add(code)
+    return list(codes)
+
+
+def _collided(error: BulkWriteError) -> List[int]:
+    """Batch positions rejected because their license_code already exists; anything else is re-raised"""
+    positions = []
+    for write_error in error.details.get("writeErrors", []):
+        if write_error.get("code") != DUPLICATE_KEY or "license_code" not in (write_error.get("keyPattern") or {}):
+            raise error
+        positions.append(write_error["index"])
+    return positions
+
+
+class LicenseMinter:
+    """
+    One insert_many(ordered=False) per attempt: every code that does not collide is written
+    in the first round trip, and only the rejected positions get fresh codes. With 10^10
+    codes a retry is rare, so a batch of 10,000 normally costs a single write.
+    """
+
+    def __init__(self, collection, max_attempts: int = 5):
+        self.collection = collection
+        self.max_attempts = max_attempts
+
+    async def mint(self, quantity: int, source: str = "agency", **fields) -> List[Dict[str, Any]]:
+        """Insert `quantity` available licenses carrying `fields`; returns the inserted documents"""
+        if not 1 <= quantity <= MAX_BATCH:
+            raise ValueError(f"quantity must be between 1 and {MAX_BATCH}")
+
+        start = time.perf_counter()
+        now = datetime.utcnow()
+        tried: Set[str] = set()
+        minted: List[Dict[str, Any]] = []
+        pending = quantity
+        for _ in range(self.max_attempts):
+            codes = generate_codes(pending, exclude=tried)
+            tried.update(codes)
+            docs = [{
+                "_id": str(uuid.uuid4()),
+                "license_code": code,
+                **fields,
+                "status": "available",
+                "created_at": now
+            } for code in codes]
+            try:
+                await self.collection.insert_many(docs, ordered=False)
+                rejected = []
+            except BulkWriteError as e:
+                rejected = _collided(e)
+            rejected_set = set(rejected)
+            minted.extend(doc for i, doc in enumerate(docs) if i not in rejected_set)
+            pending = len(rejected)
+            if not pending:
+                break
+            LICENSE_CODE_COLLISIONS.inc(pending)
+        else:
+            LICENSE_CODES_MINTED.labels(source).inc(len(minted))
+            raise LicenseMintingError(f"{pending} license codes still collided after {self.max_attempts} attempts",
+                                      minted)
+
+        LICENSE_CODES_MINTED.labels(source).inc(len(minted))
+        LICENSE_MINT_DURATION.observe(time.perf_counter() - start)
+        return minted
+
+
+async def reserve_license_quota(usage, agency_user_id: str, month: str, quantity: int,
+                                monthly_limit: int) -> Optional[Dict[str, Any]]:
+    """
+    Count `quantity` codes against the agency's month in one conditional $inc, so two
+    concurrent requests cannot both pass the limit. Returns the updated usage document,
+    or None when the request would exceed `monthly_limit` (-1 means unlimited).
+    """
+    key = {"agency_user_id": agency_user_id, "month": month}
+    await usage.update_one(key, {"$setOnInsert": {
+        "_id": str(uuid.uuid4()),
+        "license_codes_generated": 0,
+        "clients_active": 0,
+        "api_calls": 0,
+        "storage_used_mb": 0
+    }}, upsert=True)
+    query = dict(key)
+    if monthly_limit != -1:
+        query["license_codes_generated"] = {"$lte": monthly_limit - quantity}
+    return await usage.find_one_and_update(query, {"$inc": {"license_codes_generated": quantity}},
+                                           return_document=ReturnDocument.AFTER)
+
+
+async def release_license_quota(usage, agency_user_id: str, month: str, quantity: int):
+    """Give back codes that were reserved but not minted"""
+    await usage.update_one({"agency_user_id": agency_user_id, "month": month},
+                           {"$inc": {"license_codes_generated": -quantity}})
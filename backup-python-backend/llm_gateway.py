@@ -0,0 +1,187 @@
+"""
+LLM Gateway for Polaris Platform
+Single entry point for model calls with a normalized-prompt exact cache, an optional
+embedding-similarity tier and coalescing of identical in-flight prompts
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from cache import CacheBackend
+
+logger = logging.getLogger(__name__)
+
+# (system_message, prompt, provider, model, session_id) -> completion text
+CompletionFn = Callable[[str, str, str, str, str], Awaitable[str]]
+EmbedFn = Callable[[str], Sequence[float]]
+
+_WHITESPACE = re.compile(r"\s+")
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_prompt(text: str) -> str:
+    """Canonical form used for cache keys: NFKC, case-folded, whitespace collapsed"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip().casefold()
+
+
+def prompt_key(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(normalize_prompt(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+class HashingEmbedder:
+    """Dependency-free embedding: hashed unigrams and bigrams, L2-normalized"""
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def __call__(self, text: str) -> List[float]:
+        tokens = _TOKEN.findall(normalize_prompt(text))
+        vector = [0.0] * self.dimensions
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+
+class SemanticCache:
+    """
+    In-process vector index of answered prompts.
+
+    Entries are partitioned by scope (feature plus everything that must match exactly,
+    such as the area or the user's context) so similarity only ever compares the free-text
+    part of otherwise identical requests. Each partition is an LRU of at most
+    `max_entries_per_scope` unit vectors searched by cosine similarity.
+    """
+
+    def __init__(self, embed: Optional[EmbedFn] = None, threshold: float = 0.92,
+                 max_entries_per_scope: int = 256, max_scopes: int = 1000, ttl: int = 3600):
+        self.embed = embed or HashingEmbedder()
+        self.threshold = threshold
+        self.max_entries_per_scope = max_entries_per_scope
+        self.max_scopes = max_scopes
+        self.ttl = ttl
+        self._scopes: "OrderedDict[str, OrderedDict[str, Tuple[List[float], str, float]]]" = OrderedDict()
+
+    def lookup(self, scope: str, text: str) -> Optional[Tuple[str, float]]:
+        entries = self._scopes.get(scope)
+        if not entries:
+            return None
+        self._scopes.move_to_end(scope)
+
+        query = list(self.embed(text))
+        now = time.monotonic()
+        best_key, best_score = None, -1.0
+        for key, (vector, _, expires_at) in list(entries.items()):
+            if expires_at <= now:
+                del entries[key]
+                continue
+            score = sum(a * b for a, b in zip(query, vector))
+            if score > best_score:
+                best_key, best_score = key, score
+
+        if best_key is None or best_score < self.threshold:
+            return None
+        entries.move_to_end(best_key)
+        return entries[best_key][1], best_score
+
+    def add(self, scope: str, text: str, response: str):
+        entries = self._scopes.setdefault(scope, OrderedDict())
+        self._scopes.move_to_end(scope)
+        key = normalize_prompt(text)
+        entries[key] = (list(self.embed(text)), response, time.monotonic() + self.ttl)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries_per_scope:
+            entries.popitem(last=False)
+        while len(self._scopes) > self.max_scopes:
+            self._scopes.popitem(last=False)
+
+
+class LLMGateway:
+    """
+    Wraps a completion function with caching and request coalescing.
+
+    Lookup order is exact cache, then the semantic tier (only when the caller supplies
+    `semantic_text`), then any identical call already in flight, then the model. Every
+    outcome is observed in `duration_metric` labelled by feature and cache result, so
+    hit ratios per feature come from the histogram counts.
+    """
+
+    def __init__(self, complete: CompletionFn, cache: CacheBackend, ttl: int = 3600,
+                 semantic: Optional[SemanticCache] = None, duration_metric=None):
+        self._complete = complete
+        self.cache = cache
+        self.ttl = ttl
+        self.semantic = semantic
+        self.duration_metric = duration_metric
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _observe(self, feature: str, result: str, started: float):
+        if self.duration_metric is not None:
+            self.duration_metric.labels(feature=feature, cache=result).observe(time.perf_counter() - started)
+
+    async def complete(self, feature: str, prompt: str, system_message: str = "",
+                       provider: str = "openai", model: str = "gpt-4o-mini",
+                       session_id: Optional[str] = None, ttl: Optional[int] = None,
+                       semantic_text: Optional[str] = None, semantic_scope: str = "") -> str:
+        started = time.perf_counter()
+        key = prompt_key(feature, provider, model, system_message, prompt)
+
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self._observe(feature, "exact", started)
+            return cached
+
+        scope = None
+        if self.semantic is not None and semantic_text:
+            scope = prompt_key(feature, provider, model, system_message, semantic_scope)
+            match = self.semantic.lookup(scope, semantic_text)
+            if match is not None:
+                self._observe(feature, "semantic", started)
+                return match[0]
+
+        # The model call runs in its own task shared by every identical caller, so one
+        # caller giving up neither cancels it for the others nor wastes the answer
+        call = self._in_flight.get(key)
+        result = "coalesced"
+        if call is None:
+            call = asyncio.create_task(self._call(
+                key, feature, prompt, system_message, provider, model,
+                session_id or f"{feature}_{uuid.uuid4().hex[:8]}", ttl, scope, semantic_text
+            ))
+            self._in_flight[key] = call
+            call.add_done_callback(lambda done: self._finished(key, done))
+            result = "miss"
+
+        response = await asyncio.shield(call)
+        self._observe(feature, result, started)
+        return response
+
+    async def _call(self, key: str, feature: str, prompt: str, system_message: str, provider: str, model: str,
+                    session_id: str, ttl: Optional[int], scope: Optional[str], semantic_text: Optional[str]) -> str:
+        response = await self._complete(system_message, prompt, provider, model, session_id)
+        if response and str(response).strip():
+            await self.cache.set(key, response, ttl=ttl or self.ttl, tags=[f"llm:{feature}"])
+            if scope is not None:
+                self.semantic.add(scope, semantic_text, response)
+        return response
+
+    def _finished(self, key: str, call: asyncio.Task):
+        if self._in_flight.get(key) is call:
+            del self._in_flight[key]
+        if not call.cancelled():
+            # Mark retrieved so an error every caller abandoned is not reported as unhandled
+            call.exception()
+
+    async def invalidate(self, feature: str):
+        """Forget cached exact-match answers for one feature"""
+        await self.cache.invalidate_tags(f"llm:{feature}")
@@ -0,0 +1,291 @@
+"""
+Provider Matching Engine for Polaris Platform
+In-memory index of provider profiles by service area and price band with heap-based
+top-k selection and the single scoring function used by every /match endpoint
+"""
+
+import asyncio
+import bisect
+import heapq
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+MATCH_INDEX_SIZE = Gauge('polaris_match_index_providers', 'Providers held in the matching index')
+MATCH_INDEX_REFRESH = Histogram('polaris_match_index_refresh_seconds', 'Full matching index rebuild duration')
+MATCH_QUERY_DURATION = Histogram('polaris_match_query_seconds', 'Matching index top-k query duration',
+                                 buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+
+AREA_POINTS = 50
+BUDGET_IN_RANGE_POINTS = 40
+BUDGET_NEAR_POINTS = 20
+AVAILABILITY_POINTS = 10
+# A budget within 20% below a provider's minimum still earns partial credit
+BUDGET_NEAR_RATIO = 0.8
+
+
+class ProviderEntry:
+    """The fields of a provider_profiles document that matching reads"""
+
+    __slots__ = ("provider_id", "user_id", "service_areas", "areas", "price_min", "price_max", "available", "ordinal")
+
+    def __init__(self, doc: Dict[str, Any], ordinal: int = 0):
+        self.provider_id = doc["_id"]
+        self.user_id = doc.get("user_id")
+        self.service_areas = doc.get("service_areas", [])
+        self.areas = frozenset(doc.get("service_areas") or [])
+        self.price_min = doc.get("price_min") or 0
+        self.price_max = doc.get("price_max") or 0
+        self.available = bool(doc.get("availability"))
+        # Position in collection scan order; breaks score ties exactly like the old stable sort
+        self.ordinal = ordinal
+
+    @property
+    def price_range(self) -> str:
+        if self.price_min and self.price_max:
+            return f"${self.price_min}-${self.price_max}"
+        return "Contact for pricing"
+
+
+class MatchScore:
+    """Score breakdown for one (request, provider) pair"""
+
+    __slots__ = ("score", "area_match", "budget_points", "eligible")
+
+    def __init__(self, score: int, area_match: bool, budget_points: int, eligible: bool):
+        self.score = score
+        self.area_match = area_match
+        self.budget_points = budget_points
+        self.eligible = eligible
+
+
+def budget_points(budget: float, pmin: float, pmax: float) -> int:
+    if pmin and pmax and pmin <= budget <= pmax:
+        return BUDGET_IN_RANGE_POINTS
+    if pmin and budget >= pmin * BUDGET_NEAR_RATIO:
+        return BUDGET_NEAR_POINTS
+    return 0
+
+
+def score_match(area_id: Any, budget: float, provider: ProviderEntry) -> MatchScore:
+    """
+    Score a match request against a provider.
+
+    `score` ranks providers for a client (area 50, budget in range 40 or near 20,
+    availability 10). `eligible` is the provider-side filter: the area matches and the
+    budget fits the provider's range, with an unset range accepting any budget.
+    """
+    area_match = area_id in provider.areas
+    pmin, pmax = provider.price_min, provider.price_max
+    points = budget_points(budget, pmin, pmax)
+    score = (AREA_POINTS if area_match else 0) + points + (AVAILABILITY_POINTS if provider.available else 0)
+    budget_ok = (not pmin and not pmax) or (pmin <= budget <= (pmax or budget))
+    return MatchScore(score, area_match, points, area_match and budget_ok)
+
+
+class ProviderMatchIndex:
+    """
+    Providers indexed by service area and by minimum price.
+
+    A query ranks the request's area members first (they score at least 50). Only if those
+    cannot fill `k` slots above 50 are outside providers considered, and then only the ones
+    whose minimum price the budget reaches (a bisect over the sorted price band). Everyone
+    else scores 10 or 0; those ties fill any remaining slots in collection order.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Any, ProviderEntry] = {}
+        # area -> [(ordinal, provider_id)] kept sorted, so members are visited in collection order
+        self._by_area: Dict[Any, List[Tuple[int, Any]]] = {}
+        self._price_band: List[Tuple[float, int, Any]] = []
+        self._available: set = set()
+        self._next_ordinal = 0
+        self.loaded = False
+        # Rebuilds run one at a time so an older scan can never replace a newer one
+        self._refresh_lock = asyncio.Lock()
+        self._loading: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, docs: Iterable[Dict[str, Any]]):
+        """Replace the whole index; `docs` must be in collection scan order"""
+        fresh = ProviderMatchIndex()
+        for doc in docs:
+            fresh.upsert(doc)
+        self._entries, self._by_area = fresh._entries, fresh._by_area
+        self._price_band, self._available = fresh._price_band, fresh._available
+        self._next_ordinal = fresh._next_ordinal
+        self.loaded = True
+        MATCH_INDEX_SIZE.set(len(self._entries))
+
+    def upsert(self, doc: Dict[str, Any]):
+        existing = self._entries.get(doc["_id"])
+        if existing is not None:
+            ordinal = existing.ordinal
+            self._unlink(existing)
+        else:
+            ordinal = self._next_ordinal
+            self._next_ordinal += 1
+
+        entry = ProviderEntry(doc, ordinal)
+        self._entries[entry.provider_id] = entry
+        for area in entry.areas:
+            bisect.insort(self._by_area.setdefault(area, []), (entry.ordinal, entry.provider_id))
+        if entry.price_min:
+            bisect.insort(self._price_band, (entry.price_min, entry.ordinal, entry.provider_id))
+        if entry.available:
+            self._available.add(entry.provider_id)
+        MATCH_INDEX_SIZE.set(len(self._entries))
+
+    def remove(self, provider_id: Any):
+        entry = self._entries.pop(provider_id, None)
+        if entry is not None:
+            self._unlink(entry)
+        MATCH_INDEX_SIZE.set(len(self._entries))
+
+    def _unlink(self, entry: ProviderEntry):
+        for area in entry.areas:
+            members = self._by_area.get(area)
+            if members is not None:
+                position = bisect.bisect_left(members, (entry.ordinal, entry.provider_id))
+                if position < len(members) and members[position][1] == entry.provider_id:
+                    del members[position]
+                if not members:
+                    del self._by_area[area]
+        if entry.price_min:
+            position = bisect.bisect_left(self._price_band, (entry.price_min, entry.ordinal, entry.provider_id))
+            if position < len(self._price_band) and self._price_band[position][2] == entry.provider_id:
+                del self._price_band[position]
+        self._available.discard(entry.provider_id)
+
+    def _scored(self, provider_ids: Iterable[Any], area_match: bool, budget: float, floor: int,
+                stop_after: int = 0, max_budget_points: int = BUDGET_IN_RANGE_POINTS) -> List[tuple]:
+        """
+        Hot loop: same arithmetic as score_match without building a MatchScore per provider.
+        With `stop_after`, ids must arrive in collection order and the scan ends once that many
+        best-possible scores are found, since nothing later can outrank them.
+        """
+        base = AREA_POINTS if area_match else 0
+        perfect = base + max_budget_points + AVAILABILITY_POINTS
+        entries = self._entries
+        scored = []
+        perfect_found = 0
+        for provider_id in provider_ids:
+            entry = entries[provider_id]
+            score = base + budget_points(budget, entry.price_min, entry.price_max)
+            if entry.available:
+                score += AVAILABILITY_POINTS
+            if score > floor:
+                scored.append((-score, entry.ordinal, entry))
+                if score == perfect:
+                    perfect_found += 1
+                    if perfect_found == stop_after:
+                        break
+        return scored
+
+    def top_k(self, area_id: Any, budget: float, k: int,
+              include_zero: bool = False) -> List[Tuple[MatchScore, ProviderEntry]]:
+        """Best `k` providers by score, ties in collection order; zero scores only if `include_zero`"""
+        start = time.perf_counter()
+        rank = lambda item: item[:2]  # noqa: E731
+
+        # The price band bounds the budget points anyone can earn, which bounds the best score
+        ceiling = budget / BUDGET_NEAR_RATIO
+        cut = bisect.bisect_right(self._price_band, (ceiling * (1 + 1e-9), float("inf")))
+        if cut and self._price_band[0][0] <= budget:
+            max_budget_points = BUDGET_IN_RANGE_POINTS
+        else:
+            max_budget_points = BUDGET_NEAR_POINTS if cut else 0
+
+        # Area members always outrank everyone else down to 50 points
+        area_members = (pid for _, pid in self._by_area.get(area_id, ()))
+        scored = self._scored(area_members, True, budget, floor=0, stop_after=k, max_budget_points=max_budget_points)
+        best = heapq.nsmallest(k, scored, key=rank)
+
+        if len(best) < k or -best[-1][0] <= AREA_POINTS:
+            # Outside the area only budget points lift a provider above availability alone
+            reachable = (pid for _, _, pid in self._price_band[:cut] if area_id not in self._entries[pid].areas)
+            scored.extend(self._scored(reachable, False, budget, floor=AVAILABILITY_POINTS))
+            best = heapq.nsmallest(k, scored, key=rank)
+        best = [(score_match(area_id, budget, entry), entry) for _, _, entry in best]
+
+        # Lower tiers are plain ties (availability only, then nothing), so they fill in collection order
+        tiers = [AVAILABILITY_POINTS, 0] if include_zero else [AVAILABILITY_POINTS]
+        for tier in tiers:
+            if len(best) >= k or (tier == AVAILABILITY_POINTS and not self._available):
+                continue
+            for entry in self._entries.values():
+                if len(best) >= k:
+                    break
+                match = score_match(area_id, budget, entry)
+                if match.score == tier:
+                    best.append((match, entry))
+
+        MATCH_QUERY_DURATION.observe(time.perf_counter() - start)
+        return best
+
+    async def refresh(self, collection):
+        """Rebuild from the collection in natural order"""
+        async with self._refresh_lock:
+            await self._rebuild(collection)
+
+    async def _rebuild(self, collection):
+        start = time.perf_counter()
+        docs = []
+        async for doc in collection.find({}, {"user_id": 1, "service_areas": 1, "price_min": 1,
+                                              "price_max": 1, "availability": 1}):
+            docs.append(doc)
+        self.load(docs)
+        MATCH_INDEX_REFRESH.observe(time.perf_counter() - start)
+        logger.info(f"Matching index loaded {len(docs)} providers")
+
+    async def ensure_loaded(self, collection):
+        """First queries before the watcher has loaded: all of them share one rebuild"""
+        if self.loaded:
+            return
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.ensure_future(self._load_once(collection))
+        await asyncio.shield(self._loading)
+
+    async def _load_once(self, collection):
+        async with self._refresh_lock:
+            if not self.loaded:
+                await self._rebuild(collection)
+
+    async def watch(self, collection, fallback_interval: float = 300.0):
+        """
+        Keep the index current: apply change-stream events as they arrive, or rebuild every
+        `fallback_interval` seconds when change streams are unavailable (standalone mongod).
+        """
+        while True:
+            try:
+                async with collection.watch(full_document="updateLookup") as stream:
+                    # Load after the stream is open so no change falls between the two
+                    await self.refresh(collection)
+                    async for change in stream:
+                        self.apply_change(change)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Matching index change stream unavailable, polling instead: {e}")
+                await asyncio.sleep(fallback_interval)
+                try:
+                    await self.refresh(collection)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Matching index refresh failed, serving the previous index: {e}")
+
+    def apply_change(self, change: Dict[str, Any]):
+        operation = change.get("operationType")
+        if operation == "delete":
+            self.remove(change["documentKey"]["_id"])
+        elif operation in ("insert", "update", "replace") and change.get("fullDocument"):
+            self.upsert(change["fullDocument"])
+        elif operation in ("drop", "invalidate"):
+            self.load([])
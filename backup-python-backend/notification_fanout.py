@@ -0,0 +1,139 @@
+"""
+Provider Notification Fan-out for Polaris Platform
+Delivers new service request notifications to every matching provider from a background
+worker, streaming providers with a cursor and writing both collections in batches
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+FANOUT_DURATION = Histogram('polaris_notification_fanout_seconds', 'Service request notification fan-out duration')
+FANOUT_RECIPIENTS = Histogram('polaris_notification_fanout_recipients', 'Providers notified per service request',
+                              buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000))
+FANOUT_JOBS = Counter('polaris_notification_fanout_jobs_total', 'Fan-out jobs by outcome', ['outcome'])
+FANOUT_NOTIFICATIONS = Counter('polaris_notification_fanout_notifications_total', 'Provider notifications written')
+FANOUT_QUEUE_DEPTH = Gauge('polaris_notification_fanout_queue_depth', 'Fan-out jobs waiting to run')
+
+RESPONSE_WINDOW = timedelta(hours=48)
+_STOP = object()
+
+
+def notification_documents(provider_id: str, service_request: Dict[str, Any], service_area: str,
+                           now: datetime) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """The provider_notifications row and the dashboard_updates row that mirrors it"""
+    notification = {
+        "_id": str(uuid.uuid4()),
+        "provider_id": provider_id,
+        "request_id": service_request["_id"],
+        "service_area": service_area,
+        "client_budget": service_request.get("budget", 0),
+        "notification_type": "new_service_request",
+        "status": "pending",
+        "created_at": now,
+        "expires_at": now + RESPONSE_WINDOW
+    }
+    update = {
+        "_id": str(uuid.uuid4()),
+        "user_id": provider_id,
+        "update_type": "new_service_request_notification",
+        "data": notification,
+        "timestamp": now,
+        "processed": False
+    }
+    return notification, update
+
+
+class NotificationFanout:
+    """
+    Jobs are queued by submit() and run one at a time by a single worker, so a burst of
+    service requests cannot open an unbounded number of cursors. stop() lets the worker
+    finish the job it is running and everything still queued before returning.
+    """
+
+    def __init__(self, db, batch_size: int = 500):
+        self.db = db
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def submit(self, service_area: str, request_id: str):
+        self.queue.put_nowait((service_area, request_id))
+        FANOUT_QUEUE_DEPTH.set(self.queue.qsize())
+
+    async def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            # The worker finishes the job in hand and everything queued before the sentinel
+            self.queue.put_nowait(_STOP)
+            await self._worker
+            self._worker = None
+
+        while not self.queue.empty():
+            job = self.queue.get_nowait()
+            if job is not _STOP:
+                await self._process(*job)
+
+    async def _run(self):
+        while True:
+            job = await self.queue.get()
+            if job is _STOP:
+                return
+            await self._process(*job)
+
+    async def _process(self, service_area: str, request_id: str):
+        FANOUT_QUEUE_DEPTH.set(self.queue.qsize())
+        try:
+            sent = await self.fan_out(service_area, request_id)
+            FANOUT_JOBS.labels(outcome="sent" if sent is not None else "missing_request").inc()
+        except Exception as e:
+            FANOUT_JOBS.labels(outcome="failed").inc()
+            logger.error(f"Error notifying matching providers for {request_id}: {e}")
+
+    async def fan_out(self, service_area: str, request_id: str) -> Optional[int]:
+        """Notify every active provider serving `service_area`; None if the request is gone"""
+        start = time.perf_counter()
+        service_request = await self.db.service_requests.find_one({"_id": request_id}, {"budget": 1})
+        if not service_request:
+            return None
+
+        now = datetime.utcnow()
+        providers = self.db.enhanced_provider_profiles.find(
+            {"service_areas": service_area, "profile_status": "active"},
+            {"_id": 0, "provider_id": 1}
+        ).batch_size(self.batch_size)
+
+        sent = 0
+        batch: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        async for provider in providers:
+            batch.append(notification_documents(provider["provider_id"], service_request, service_area, now))
+            if len(batch) >= self.batch_size:
+                sent += await self._write(batch)
+                batch = []
+        if batch:
+            sent += await self._write(batch)
+
+        FANOUT_DURATION.observe(time.perf_counter() - start)
+        FANOUT_RECIPIENTS.observe(sent)
+        logger.info(f"Sent {sent} notifications for service request {request_id}")
+        return sent
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> int:
+        # Notifications first: a dashboard update never points at a notification that was not written
+        await self.db.provider_notifications.insert_many([n for n, _ in batch], ordered=False)
+        try:
+            await self.db.dashboard_updates.insert_many([u for _, u in batch], ordered=False)
+        except Exception as e:
+            logger.error(f"Error updating provider dashboards: {e}")
+        FANOUT_NOTIFICATIONS.inc(len(batch))
+        return len(batch)
@@ -0,0 +1,134 @@
+"""
+Password Hashing Service for Polaris Platform
+Runs bcrypt/pbkdf2 hashing on a bounded thread pool so logins never stall the
+event loop, and upgrades legacy hashes to the current scheme on successful login
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+from passlib.hash import pbkdf2_sha256
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_HASH_DURATION = Histogram('polaris_password_hash_seconds', 'Time spent hashing or verifying a password',
+                                   ['operation', 'scheme'],
+                                   buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+PASSWORD_POOL_WAIT = Histogram('polaris_password_pool_wait_seconds', 'Time spent waiting for a hashing slot',
+                               buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+PASSWORD_POOL_WAITING = Gauge('polaris_password_pool_waiting', 'Password operations waiting for a hashing slot')
+PASSWORD_REHASHES = Counter('polaris_password_rehashes_total', 'Stored hashes upgraded on login', ['from_scheme'])
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+# bcrypt only reads the first 72 bytes; longer passwords stay on pbkdf2 rather than being truncated
+BCRYPT_MAX_BYTES = 72
+
+
+def hash_scheme(hashed: str) -> str:
+    """Identify the scheme of a stored hash"""
+    if hashed.startswith(BCRYPT_PREFIXES):
+        return "bcrypt"
+    if pbkdf2_sha256.identify(hashed):
+        return "pbkdf2_sha256"
+    return "unknown"
+
+
+class PasswordHasher:
+    """
+    Async front end over the CPU-bound hash functions.
+
+    At most `max_workers` hashes run at once (bcrypt and hashlib release the GIL, so a
+    thread pool gives real parallelism); further callers wait on a semaphore rather than
+    piling up inside the executor, which keeps the wait time measurable.
+    """
+
+    def __init__(self, max_workers: int = 4, bcrypt_rounds: int = 12):
+        self.max_workers = max_workers
+        self.bcrypt_rounds = bcrypt_rounds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _run(self, operation: str, scheme: str, func, *args):
+        # Created on first use so the semaphore binds to the serving loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        queued_at = time.perf_counter()
+        PASSWORD_POOL_WAITING.inc()
+        try:
+            await self._slots.acquire()
+        finally:
+            PASSWORD_POOL_WAITING.dec()
+        PASSWORD_POOL_WAIT.observe(time.perf_counter() - queued_at)
+
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._slots.release()
+            PASSWORD_HASH_DURATION.labels(operation=operation, scheme=scheme).observe(time.perf_counter() - start)
+
+    def _current_scheme_for(self, password: str) -> str:
+        return "bcrypt" if len(password.encode("utf-8")) <= BCRYPT_MAX_BYTES else "pbkdf2_sha256"
+
+    def _hash_sync(self, password: str) -> str:
+        if self._current_scheme_for(password) == "bcrypt":
+            return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.bcrypt_rounds)).decode("utf-8")
+        return pbkdf2_sha256.hash(password)
+
+    @staticmethod
+    def _verify_sync(password: str, hashed: str) -> bool:
+        try:
+            if hashed.startswith(BCRYPT_PREFIXES):
+                return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+            return pbkdf2_sha256.verify(password, hashed)
+        except Exception as e:
+            logger.error(f"Password verification error: {e}")
+            return False
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self._current_scheme_for(password), self._hash_sync, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        if not hashed:
+            return False
+        return await self._run("verify", hash_scheme(hashed), self._verify_sync, password, hashed)
+
+    def needs_rehash(self, password: str, hashed: str) -> bool:
+        """True when a verified hash is not in the scheme (or cost) new hashes would use"""
+        target = self._current_scheme_for(password)
+        scheme = hash_scheme(hashed)
+        if scheme != target:
+            return True
+        if scheme == "bcrypt":
+            try:
+                return int(hashed.split("$")[2]) < self.bcrypt_rounds
+            except (IndexError, ValueError):
+                return True
+        return False
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; on success also return a replacement hash if the stored one is outdated"""
+        if not await self.verify(password, hashed):
+            return False, None
+        if not self.needs_rehash(password, hashed):
+            return True, None
+        PASSWORD_REHASHES.labels(from_scheme=hash_scheme(hashed)).inc()
+        return True, await self.hash(password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def build_password_hasher() -> PasswordHasher:
+    """Hasher sized from PASSWORD_HASH_WORKERS / PASSWORD_BCRYPT_ROUNDS"""
+    return PasswordHasher(
+        max_workers=int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        bcrypt_rounds=int(os.environ.get("PASSWORD_BCRYPT_ROUNDS", "12"))
+    )
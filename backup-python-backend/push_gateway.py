@@ -0,0 +1,312 @@
+"""
+Real-time Push Gateway for Polaris Platform
+Per-connection subscriptions to user and chat channels, fed by an in-process pub/sub hub with
+a pluggable cross-worker backplane, and a relay that delivers dashboard_updates as they are
+inserted instead of leaving them for clients to poll
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis_asyncio = None
+    REDIS_AVAILABLE = False
+
+PUSH_CONNECTIONS = Gauge('polaris_push_connections', 'Open push connections in this worker')
+PUSH_EVENTS_PUBLISHED = Counter('polaris_push_events_published_total', 'Events published to push channels', ['type'])
+PUSH_EVENTS_DELIVERED = Counter('polaris_push_events_delivered_total', 'Events queued for local push connections')
+PUSH_RESYNCS = Counter('polaris_push_resyncs_total', 'Connections that fell behind and were told to refetch')
+
+RESYNC = json.dumps({"type": "resync"})
+
+
+def user_channel(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def chat_channel(chat_id: str) -> str:
+    return f"chat:{chat_id}"
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_event(event_type: str, channel: str, data: Any) -> str:
+    """The JSON text frame every push transport sends"""
+    return json.dumps({"type": event_type, "channel": channel, "data": data}, default=_encode_default)
+
+
+Deliver = Callable[[str, str], None]
+
+
+class LocalBackplane:
+    """Single-worker deployments: publishing delivers straight back into this process"""
+
+    def __init__(self):
+        self.deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+
+    async def publish(self, channel: str, message: str):
+        if self.deliver is not None:
+            self.deliver(channel, message)
+
+    async def subscribe(self, channel: str):
+        pass
+
+    async def unsubscribe(self, channel: str):
+        pass
+
+    async def stop(self):
+        self.deliver = None
+
+
+class RedisBackplane:
+    """
+    Redis pub/sub between workers. Each worker subscribes only to the channels its own
+    connections listen on, so an event crosses the network once per interested worker.
+    """
+
+    def __init__(self, client, prefix: str = "polaris:push"):
+        self.client = client
+        self.prefix = prefix
+        self.pubsub = None
+        self.deliver: Optional[Deliver] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    def _key(self, channel: str) -> str:
+        return f"{self.prefix}:{channel}"
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+        self.pubsub = self.client.pubsub()
+        # A standing subscription keeps the reader valid while no connection is open
+        await self.pubsub.subscribe(self._key("_"))
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        offset = len(self.prefix) + 1
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Push backplane read failed: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            channel, data = message["channel"], message["data"]
+            channel = channel.decode() if isinstance(channel, bytes) else channel
+            self.deliver(channel[offset:], data.decode() if isinstance(data, bytes) else data)
+
+    async def publish(self, channel: str, message: str):
+        await self.client.publish(self._key(channel), message)
+
+    async def subscribe(self, channel: str):
+        await self.pubsub.subscribe(self._key(channel))
+
+    async def unsubscribe(self, channel: str):
+        await self.pubsub.unsubscribe(self._key(channel))
+
+    async def stop(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+        if self.pubsub is not None:
+            await self.pubsub.aclose()
+
+
+def build_backplane(redis_url: Optional[str] = None):
+    """Redis pub/sub when configured, otherwise delivery within this worker only"""
+    redis_url = redis_url if redis_url is not None else os.environ.get("REDIS_URL")
+    if redis_url and REDIS_AVAILABLE:
+        return RedisBackplane(redis_asyncio.from_url(redis_url))
+    if redis_url:
+        logger.warning("REDIS_URL is set but the redis package is not installed; push events stay in this worker")
+    return LocalBackplane()
+
+
+class Subscription:
+    """
+    One connection's queue of encoded events. A connection that falls `max_queue` events
+    behind loses its backlog and receives a single resync event, telling the client to
+    refetch over HTTP, so a slow reader never holds memory for everyone else.
+    """
+
+    def __init__(self, user_id: str, max_queue: int):
+        self.user_id = user_id
+        self.channels: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    def offer(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            PUSH_RESYNCS.inc()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        """The next event, or None if nothing arrived within `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PushHub:
+    """
+    In-process pub/sub keyed by channel. Every publish goes through the backplane, which
+    hands it back to the hub of each worker holding a subscriber for that channel.
+    """
+
+    def __init__(self, backplane=None, max_queue: int = 256):
+        self.backplane = backplane if backplane is not None else LocalBackplane()
+        self.max_queue = max_queue
+        self._channels: Dict[str, Set[Subscription]] = {}
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        await self.backplane.start(self._deliver)
+
+    async def stop(self):
+        await self.backplane.stop()
+
+    async def connect(self, user_id: str) -> Subscription:
+        subscription = Subscription(user_id, self.max_queue)
+        await self.join(subscription, user_channel(user_id))
+        PUSH_CONNECTIONS.inc()
+        return subscription
+
+    async def disconnect(self, subscription: Subscription):
+        for channel in list(subscription.channels):
+            await self.leave(subscription, channel)
+        PUSH_CONNECTIONS.dec()
+
+    async def join(self, subscription: Subscription, channel: str):
+        async with self._lock:
+            subscribers = self._channels.setdefault(channel, set())
+            if not subscribers:
+                await self.backplane.subscribe(channel)
+            subscribers.add(subscription)
+            subscription.channels.add(channel)
+
+    async def leave(self, subscription: Subscription, channel: str):
+        async with self._lock:
+            subscription.channels.discard(channel)
+            subscribers = self._channels.get(channel)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._channels[channel]
+                await self.backplane.unsubscribe(channel)
+
+    async def publish(self, channel: str, event_type: str, data: Any):
+        PUSH_EVENTS_PUBLISHED.labels(event_type).inc()
+        try:
+            await self.backplane.publish(channel, encode_event(event_type, channel, data))
+        except Exception as e:
+            # Pushes are a latency optimisation; clients still read the same data over HTTP
+            logger.warning(f"Push publish to {channel} failed: {e}")
+
+    async def publish_users(self, user_ids: Iterable[str], event_type: str, data: Any):
+        for user_id in {uid for uid in user_ids if uid}:
+            await self.publish(user_channel(user_id), event_type, data)
+
+    def _deliver(self, channel: str, message: str):
+        for subscription in self._channels.get(channel, ()):
+            subscription.offer(message)
+            PUSH_EVENTS_DELIVERED.inc()
+
+
+class DashboardUpdateRelay:
+    """
+    Pushes dashboard_updates documents to their users. Inserts wake the relay through a
+    change stream, or it polls when change streams are unavailable (standalone mongod).
+    Each batch is claimed with a conditional update_many before it is published, so with
+    several workers every update is pushed once. Updates older than `max_age` are only
+    marked processed; their users have long since refreshed.
+    """
+
+    def __init__(self, collection, hub: PushHub, batch_size: int = 500, max_age: timedelta = timedelta(minutes=10)):
+        self.collection = collection
+        self.hub = hub
+        self.batch_size = batch_size
+        self.max_age = max_age
+
+    async def drain(self) -> int:
+        """Claim and publish every unprocessed update; returns how many were pushed"""
+        pushed = 0
+        while True:
+            pending = await self.collection.find({"processed": False}, {"_id": 1}) \
+                .sort("timestamp", 1).limit(self.batch_size).to_list(self.batch_size)
+            if not pending:
+                return pushed
+            ids = [doc["_id"] for doc in pending]
+            claim = str(uuid.uuid4())
+            now = datetime.utcnow()
+            await self.collection.update_many(
+                {"_id": {"$in": ids}, "processed": False},
+                {"$set": {"processed": True, "processed_at": now, "claim": claim}}
+            )
+            claimed = await self.collection.find({"_id": {"$in": ids}, "claim": claim}).to_list(None)
+            for update in claimed:
+                timestamp = update.get("timestamp")
+                if timestamp is not None and timestamp < now - self.max_age:
+                    continue
+                await self.hub.publish(user_channel(update["user_id"]), "dashboard.update", {
+                    "id": update["_id"],
+                    "update_type": update.get("update_type"),
+                    "data": update.get("data"),
+                    "timestamp": timestamp
+                })
+                pushed += 1
+            if len(pending) < self.batch_size:
+                return pushed
+
+    async def run(self, fallback_interval: float = 5.0):
+        while True:
+            try:
+                async with self.collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+                    # Drain after the stream is open so no insert falls between the two
+                    await self.drain()
+                    async for _ in stream:
+                        # A bulk insert arrives as one event per document; drain once for all of them
+                        while await stream.try_next() is not None:
+                            pass
+                        await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Poll once, then try the stream again; a standalone mongod keeps landing here
+                logger.warning(f"dashboard_updates change stream unavailable, polling instead: {e}")
+                await asyncio.sleep(fallback_interval)
+                try:
+                    await self.drain()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Dashboard update relay failed: {e}")
@@ -0,0 +1,253 @@
+"""
+Rate Limiting for Polaris Platform
+GCRA limiter with constant-time checks, bounded in-memory or shared Redis state,
+and an ASGI middleware that applies per-route, per-user limits with Retry-After
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis_asyncio = None
+    REDIS_AVAILABLE = False
+
+RATE_LIMIT_DECISIONS = Counter('polaris_rate_limit_decisions_total', 'Rate limiter decisions', ['rule', 'allowed'])
+
+
+class RateLimitDecision:
+    """Outcome of a single limiter check"""
+
+    __slots__ = ("allowed", "limit", "remaining", "retry_after", "reset_after")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, retry_after: float, reset_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+        self.reset_after = reset_after
+
+
+def gcra(tat: Optional[float], now: float, limit: int, period: float) -> Tuple[bool, float, float, int]:
+    """
+    Generic Cell Rate Algorithm step.
+
+    Returns (allowed, new_tat, retry_after, remaining). `limit` requests may burst at once and
+    then refill evenly over `period` seconds; the only state is the theoretical arrival time.
+    """
+    interval = period / limit
+    tat = max(tat if tat is not None else now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - period
+
+    if now < allow_at:
+        return False, tat, allow_at - now, 0
+
+    remaining = int((now - allow_at) / interval)
+    return True, new_tat, 0.0, min(remaining, limit - 1)
+
+
+class MemoryRateLimitStore:
+    """Per-process GCRA state; an LRU bound keeps memory flat under address scans"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    async def check(self, key: str, limit: int, period: float, now: Optional[float] = None) -> Tuple[bool, float, float, int]:
+        now = time.time() if now is None else now
+        tat = self._tats.get(key)
+        allowed, new_tat, retry_after, remaining = gcra(tat, now, limit, period)
+
+        if allowed:
+            self._tats[key] = new_tat
+            self._tats.move_to_end(key)
+            if len(self._tats) > self.max_keys:
+                # The least recently limited key is the one closest to having fully refilled
+                self._tats.popitem(last=False)
+        return allowed, new_tat, retry_after, remaining
+
+
+# KEYS[1] = limiter key; ARGV = now, limit, period. Runs atomically so every worker sees one budget.
+GCRA_LUA = """
+local tat = tonumber(redis.call('GET', KEYS[1]))
+local now = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local interval = period / limit
+if not tat or tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if now < allow_at then
+  return {0, tostring(tat), tostring(allow_at - now), 0}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+local remaining = math.floor((now - allow_at) / interval)
+if remaining > limit - 1 then remaining = limit - 1 end
+return {1, tostring(new_tat), '0', remaining}
+"""
+
+
+class RedisRateLimitStore:
+    """GCRA state shared by every worker; keys expire as soon as their bucket is full again"""
+
+    def __init__(self, client, prefix: str = "polaris:ratelimit"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(GCRA_LUA)
+
+    async def check(self, key: str, limit: int, period: float, now: Optional[float] = None) -> Tuple[bool, float, float, int]:
+        now = time.time() if now is None else now
+        allowed, tat, retry_after, remaining = await self._script(
+            keys=[f"{self.prefix}:{key}"], args=[repr(now), limit, period]
+        )
+        return bool(int(allowed)), float(tat), float(retry_after), int(remaining)
+
+
+class RateLimiter:
+    """Front door for limiter checks; fails open if the shared store is unreachable"""
+
+    def __init__(self, store):
+        self.store = store
+
+    async def hit(self, key: str, limit: int, period: float) -> RateLimitDecision:
+        try:
+            allowed, tat, retry_after, remaining = await self.store.check(key, limit, period)
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable, allowing {key}: {e}")
+            return RateLimitDecision(True, limit, limit - 1, 0.0, 0.0)
+        reset_after = max(0.0, tat - time.time())
+        return RateLimitDecision(allowed, limit, remaining, retry_after, reset_after)
+
+
+class RateLimitRule:
+    """Budget for one route (exact path) or route family (prefix)"""
+
+    def __init__(self, name: str, path: str, limit: int, period: float,
+                 methods: Optional[List[str]] = None, per: str = "user", prefix: bool = False):
+        if per not in ("user", "ip"):
+            raise ValueError(f"Unsupported rate limit key: {per}")
+        self.name = name
+        self.path = path
+        self.limit = limit
+        self.period = period
+        self.methods = {m.upper() for m in methods} if methods else None
+        self.per = per
+        self.prefix = prefix
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        return path.startswith(self.path) if self.prefix else path == self.path
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying the first matching RateLimitRule.
+
+    `identify(scope)` returns the authenticated user id or None; anonymous callers and
+    rules with per="ip" are keyed on the client address instead.
+    """
+
+    def __init__(self, app, limiter: RateLimiter, rules: List[RateLimitRule],
+                 identify: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+                 on_limited: Optional[Callable[[RateLimitRule, str], Awaitable[None]]] = None,
+                 enabled: bool = True):
+        self.app = app
+        self.limiter = limiter
+        self.rules = rules
+        self.identify = identify
+        self.on_limited = on_limited
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope["method"], scope["path"]
+        rule = next((r for r in self.rules if r.matches(method, path)), None)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        identity = self._identity(scope, rule)
+        decision = await self.limiter.hit(f"{rule.name}:{identity}", rule.limit, rule.period)
+        RATE_LIMIT_DECISIONS.labels(rule=rule.name, allowed=str(decision.allowed).lower()).inc()
+
+        if not decision.allowed:
+            if self.on_limited is not None:
+                try:
+                    await self.on_limited(rule, identity)
+                except Exception as e:
+                    logger.error(f"Rate limit callback failed: {e}")
+            await self._reject(send, decision)
+            return
+
+        headers = self._headers(decision)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def _identity(self, scope, rule: RateLimitRule) -> str:
+        if rule.per == "user" and self.identify is not None:
+            try:
+                user_id = self.identify(scope)
+            except Exception:
+                user_id = None
+            if user_id:
+                return f"user:{user_id}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    @staticmethod
+    def _headers(decision: RateLimitDecision) -> List[Tuple[bytes, bytes]]:
+        return [
+            (b"x-ratelimit-limit", str(decision.limit).encode()),
+            (b"x-ratelimit-remaining", str(decision.remaining).encode()),
+            (b"x-ratelimit-reset", str(math.ceil(decision.reset_after)).encode()),
+        ]
+
+    async def _reject(self, send, decision: RateLimitDecision):
+        body = json.dumps({
+            "detail": {
+                "error_code": "POL-2005",
+                "message": "Rate limit exceeded",
+                "retry_after": math.ceil(decision.retry_after)
+            }
+        }).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(decision.retry_after))).encode()),
+        ] + self._headers(decision)
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def build_rate_limiter(redis_url: Optional[str] = None, max_keys: int = 100000) -> RateLimiter:
+    """Shared Redis budget when REDIS_URL is configured, bounded per-process budget otherwise"""
+    redis_url = redis_url if redis_url is not None else os.environ.get("REDIS_URL")
+    if redis_url and REDIS_AVAILABLE:
+        return RateLimiter(RedisRateLimitStore(redis_asyncio.from_url(redis_url)))
+    if redis_url:
+        logger.warning("REDIS_URL is set but the redis package is not installed; rate limits are per process")
+    return RateLimiter(MemoryRateLimitStore(max_keys=max_keys))
@@ -0,0 +1,340 @@
+"""
+Search Engine for Polaris Platform
+Relevance-ranked search: weighted Mongo text indexes for marketplace collections and an in-memory
+BM25 inverted index for knowledge base articles, with keyset cursors, facet counts and snippets
+"""
+
+import asyncio
+import base64
+import heapq
+import html
+import json
+import logging
+import math
+import re
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from prometheus_client import Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DURATION = Histogram('polaris_search_seconds', 'Search query duration', ['index'],
+                            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+KB_INDEX_SIZE = Gauge('polaris_kb_search_documents', 'Articles held in the knowledge base search index')
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this to was what "
+    "when where which who why will with you your".split()
+)
+SNIPPET_WIDTH = 160
+MAX_FACET_VALUES = 20
+
+
+def tokenize(text: Any) -> List[str]:
+    if not text:
+        return []
+    if isinstance(text, (list, tuple)):
+        text = " ".join(str(t) for t in text)
+    return [t for t in TOKEN_RE.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+def encode_cursor(score: float, doc_id: Any) -> str:
+    """Opaque keyset cursor: the (score, id) of the last row on the page"""
+    return base64.urlsafe_b64encode(json.dumps([score, doc_id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(score), doc_id
+    except (ValueError, TypeError):
+        raise ValueError("Invalid search cursor")
+
+
+def highlight(text: Any, terms: Iterable[str], width: int = SNIPPET_WIDTH) -> str:
+    """HTML-escaped excerpt around the first matching term, with matches wrapped in <mark>"""
+    text = " ".join(str(t) for t in text) if isinstance(text, (list, tuple)) else str(text or "")
+    words = [re.escape(t) for t in terms if t]
+    if not words or not text:
+        return html.escape(text[:width])
+    pattern = re.compile(r"\b(" + "|".join(sorted(words, key=len, reverse=True)) + r")", re.IGNORECASE)
+    first = pattern.search(text)
+    start = 0 if first is None else max(0, first.start() - width // 4)
+    excerpt = text[start:start + width]
+    parts, last = [], 0
+    for match in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        last = match.end()
+    parts.append(html.escape(excerpt[last:]))
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if start + width < len(text) else "")
+
+
+# ---------------- Mongo text indexes ----------------
+
+def text_search_pipeline(filters: Dict[str, Any], q: str, limit: int,
+                         cursor: Optional[str] = None, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    Relevance-ordered page: textScore descending, _id ascending as the tie-break. A cursor
+    resumes after the last row seen; `offset` remains for callers that page by position.
+    """
+    pipeline = [
+        {"$match": {**filters, "$text": {"$search": q}}},
+        {"$addFields": {"_score": {"$meta": "textScore"}}},
+    ]
+    if cursor:
+        score, doc_id = decode_cursor(cursor)
+        pipeline.append({"$match": {"$or": [{"_score": {"$lt": score}}, {"_score": score, "_id": {"$gt": doc_id}}]}})
+    pipeline.append({"$sort": {"_score": -1, "_id": 1}})
+    if offset and not cursor:
+        pipeline.append({"$skip": offset})
+    pipeline.append({"$limit": limit + 1})
+    return pipeline
+
+
+def facet_pipeline(match: Dict[str, Any], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """Value counts per field (array fields count each element) plus the total, in one pass"""
+    facets = {
+        field: [
+            {"$unwind": f"${field}"},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": MAX_FACET_VALUES}
+        ]
+        for field in fields
+    }
+    facets["_total"] = [{"$count": "count"}]
+    return [{"$match": match}, {"$facet": facets}]
+
+
+def _facet_result(row: Optional[Dict[str, Any]], fields: Sequence[str]) -> Tuple[Dict[str, List[Dict[str, Any]]], int]:
+    row = row or {}
+    total = row["_total"][0]["count"] if row.get("_total") else 0
+    facets = {field: [{"value": r["_id"], "count": r["count"]} for r in row.get(field, [])] for field in fields}
+    return facets, total
+
+
+async def text_search(collection, filters: Dict[str, Any], q: str, limit: int = 20, cursor: Optional[str] = None,
+                      offset: int = 0, facet_fields: Sequence[str] = (), highlight_fields: Sequence[str] = (),
+                      index: str = "text") -> Dict[str, Any]:
+    """
+    Run a $text query against `collection`. Returns the page of documents (each with
+    `_score` and `_highlights`), the cursor for the next page, the total match count and
+    facet counts over every match.
+    """
+    start = time.perf_counter()
+    try:
+        page, facet_rows = await asyncio.gather(
+            collection.aggregate(text_search_pipeline(filters, q, limit, cursor, offset)).to_list(limit + 1),
+            collection.aggregate(facet_pipeline({**filters, "$text": {"$search": q}}, facet_fields)).to_list(1)
+        )
+    finally:
+        SEARCH_DURATION.labels(index).observe(time.perf_counter() - start)
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    terms = tokenize(q)
+    for doc in page:
+        doc["_highlights"] = {field: highlight(doc.get(field), terms) for field in highlight_fields if doc.get(field)}
+    facets, total = _facet_result(facet_rows[0] if facet_rows else None, facet_fields)
+    return {
+        "items": page,
+        "next_cursor": encode_cursor(page[-1]["_score"], page[-1]["_id"]) if has_more and page else None,
+        "total": total,
+        "facets": facets
+    }
+
+
+# ---------------- BM25 inverted index ----------------
+
+class BM25Index:
+    """
+    Okapi BM25 over weighted fields. Term frequency is the weighted sum of occurrences
+    across fields, so a title hit with weight 3 counts like three body hits.
+    """
+
+    def __init__(self, fields: Dict[str, float], k1: float = 1.2, b: float = 0.75,
+                 stored_fields: Sequence[str] = ()):
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+        self.stored_fields = tuple(stored_fields)
+        self._postings: Dict[str, Dict[Any, float]] = {}
+        self._lengths: Dict[Any, float] = {}
+        self._terms: Dict[Any, Tuple[str, ...]] = {}
+        self._stored: Dict[Any, Dict[str, Any]] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def get(self, doc_id: Any) -> Optional[Dict[str, Any]]:
+        return self._stored.get(doc_id)
+
+    def upsert(self, doc_id: Any, doc: Dict[str, Any]):
+        self.remove(doc_id)
+        frequencies: Counter = Counter()
+        for field, weight in self.fields.items():
+            for term in tokenize(doc.get(field)):
+                frequencies[term] += weight
+        length = sum(frequencies.values())
+        for term, tf in frequencies.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._lengths[doc_id] = length
+        self._terms[doc_id] = tuple(frequencies)
+        self._stored[doc_id] = {field: doc.get(field) for field in self.stored_fields}
+        self._total_length += length
+
+    def remove(self, doc_id: Any):
+        if doc_id not in self._lengths:
+            return
+        for term in self._terms.pop(doc_id):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+        self._stored.pop(doc_id, None)
+
+    def scores(self, query: str) -> Dict[Any, float]:
+        """BM25 score of every document containing at least one query term"""
+        n = len(self._lengths)
+        if not n:
+            return {}
+        avgdl = self._total_length / n or 1.0
+        k1, b = self.k1, self.b
+        lengths = self._lengths
+        scores: Dict[Any, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = k1 * (1 - b + b * lengths[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, limit: int = 20, cursor: Optional[str] = None,
+               predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+               facet_fields: Sequence[str] = ()) -> Dict[str, Any]:
+        """Ranked page of (score, doc_id) ordered by score then id, with facets over all matches"""
+        start = time.perf_counter()
+        scores = self.scores(query)
+        if predicate is not None:
+            scores = {doc_id: s for doc_id, s in scores.items() if predicate(self._stored[doc_id])}
+
+        facets = {}
+        for field in facet_fields:
+            counts: Counter = Counter()
+            for doc_id in scores:
+                value = self._stored[doc_id].get(field)
+                for v in (value if isinstance(value, (list, tuple)) else [value]):
+                    if v is not None:
+                        counts[v] += 1
+            ranked = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:MAX_FACET_VALUES]
+            facets[field] = [{"value": v, "count": c} for v, c in ranked]
+
+        candidates = scores.items()
+        if cursor:
+            after_score, after_id = decode_cursor(cursor)
+            after = (-after_score, str(after_id))
+            candidates = [(d, s) for d, s in candidates if (-s, str(d)) > after]
+        page = heapq.nsmallest(limit + 1, candidates, key=lambda item: (-item[1], str(item[0])))
+        has_more = len(page) > limit
+        page = page[:limit]
+        SEARCH_DURATION.labels("kb_bm25").observe(time.perf_counter() - start)
+        return {
+            "items": [(score, doc_id) for doc_id, score in page],
+            "next_cursor": encode_cursor(page[-1][1], page[-1][0]) if has_more and page else None,
+            "total": len(scores),
+            "facets": facets
+        }
+
+
+class KnowledgeBaseSearch:
+    """
+    BM25 index over kb_articles. Article writes on this worker upsert it directly; reload()
+    runs every `interval` seconds to pick up writes made elsewhere.
+    """
+
+    FIELDS = {"title": 3.0, "tags": 2.0, "content": 1.0}
+    STORED = ("id", "title", "content", "area_ids", "tags", "content_type", "status", "difficulty_level")
+
+    def __init__(self, interval: float = 300.0):
+        self.index = BM25Index(self.FIELDS, stored_fields=self.STORED)
+        self.interval = interval
+        self.loaded = False
+        self._loading: Optional[asyncio.Future] = None
+
+    def upsert(self, article: Dict[str, Any]):
+        self.index.upsert(article["_id"], article)
+        KB_INDEX_SIZE.set(len(self.index))
+
+    def remove(self, article_id: Any):
+        self.index.remove(article_id)
+        KB_INDEX_SIZE.set(len(self.index))
+
+    async def reload(self, collection):
+        fresh = BM25Index(self.FIELDS, stored_fields=self.STORED)
+        projection = {field: 1 for field in set(self.FIELDS) | set(self.STORED)}
+        async for article in collection.find({}, projection):
+            fresh.upsert(article["_id"], article)
+        self.index = fresh
+        self.loaded = True
+        KB_INDEX_SIZE.set(len(fresh))
+        logger.info(f"Knowledge base search index loaded {len(fresh)} articles")
+
+    async def ensure_loaded(self, collection):
+        """Load the index on first use; concurrent first searches share one load"""
+        if self.loaded:
+            return
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.ensure_future(self.reload(collection))
+        await asyncio.shield(self._loading)
+
+    async def run(self, collection):
+        while True:
+            try:
+                await self.reload(collection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Knowledge base search reload failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def search(self, q: str, limit: int = 20, cursor: Optional[str] = None,
+               area_id: Optional[str] = None, content_type: Optional[str] = None,
+               include_drafts: bool = False) -> Dict[str, Any]:
+        def allowed(doc: Dict[str, Any]) -> bool:
+            if not include_drafts and doc.get("status") != "published":
+                return False
+            if area_id and area_id not in (doc.get("area_ids") or []):
+                return False
+            return not content_type or doc.get("content_type") == content_type
+
+        result = self.index.search(q, limit=limit, cursor=cursor, predicate=allowed,
+                                   facet_fields=("area_ids", "content_type"))
+        terms = tokenize(q)
+        articles = []
+        for score, article_id in result["items"]:
+            doc = self.index.get(article_id)
+            articles.append({
+                "id": doc.get("id") or article_id,
+                "title": doc.get("title"),
+                "area_ids": doc.get("area_ids") or [],
+                "tags": doc.get("tags") or [],
+                "content_type": doc.get("content_type"),
+                "difficulty_level": doc.get("difficulty_level"),
+                "score": round(score, 4),
+                "highlights": {
+                    "title": highlight(doc.get("title"), terms),
+                    "content": highlight(doc.get("content"), terms)
+                }
+            })
+        return {**result, "items": articles}
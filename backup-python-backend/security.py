@@ -17,12 +17,14 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import ipaddress
 import json
 
+from rate_limiter import build_rate_limiter
+
 logger = logging.getLogger(__name__)
 
 class SecurityManager:
     def __init__(self, db_client: AsyncIOMotorClient):
         self.db = db_client.polaris_db
-        self.rate_limit_cache = {}
+        self.rate_limiter = build_rate_limiter()
         
         # Security configurations
         self.RATE_LIMITS = {
@@ -43,38 +45,22 @@ class SecurityManager:
     async def rate_limit(self, identifier: str, limit_type: str = 'api') -> bool:
         """Check if request should be rate limited"""
         try:
-            current_time = int(time.time())
             config = self.RATE_LIMITS.get(limit_type, self.RATE_LIMITS['api'])
-            window_start = current_time - config['window']
-            
-            # Clean old entries
-            self.rate_limit_cache = {
-                k: v for k, v in self.rate_limit_cache.items()
-                if v['timestamp'] > window_start
-            }
+            decision = await self.rate_limiter.hit(f"{identifier}:{limit_type}", config['requests'], config['window'])
             
-            # Check current count
-            key = f"{identifier}:{limit_type}"
-            if key in self.rate_limit_cache:
-                if self.rate_limit_cache[key]['count'] >= config['requests']:
-                    # Log rate limit violation
-                    await self.log_security_event(
-                        event_type='rate_limit_exceeded',
-                        identifier=identifier,
-                        details={
-                            'limit_type': limit_type,
-                            'requests': self.rate_limit_cache[key]['count'],
-                            'window': config['window']
-                        }
-                    )
-                    return False
-                else:
-                    self.rate_limit_cache[key]['count'] += 1
-            else:
-                self.rate_limit_cache[key] = {
-                    'count': 1,
-                    'timestamp': current_time
-                }
+            if not decision.allowed:
+                # Log rate limit violation
+                await self.log_security_event(
+                    event_type='rate_limit_exceeded',
+                    identifier=identifier,
+                    details={
+                        'limit_type': limit_type,
+                        'requests': config['requests'],
+                        'window': config['window'],
+                        'retry_after': round(decision.retry_after, 1)
+                    }
+                )
+                return False
             
             return True
             
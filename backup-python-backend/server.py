@@ -1,32 +1,54 @@
 from fastapi import FastAPI, APIRouter, UploadFile, File, Form, HTTPException, Depends, Header, Query, Request, Response, Body
+from fastapi import WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 from pydantic import BaseModel, Field, EmailStr, HttpUrl, validator
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta, timezone
-from passlib.hash import pbkdf2_sha256
-import bcrypt
 from jose import jwt, JWTError
 import os
 import logging
+import logging.handlers
+import queue
 from pathlib import Path
 import uuid
-import aiofiles
-import requests
 import hashlib
 import secrets
 import re
-import random
-from functools import wraps
 import time
+import copy
 import json
 import asyncio
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 from cryptography.fernet import Fernet
 from decimal import Decimal
+from indexes import IndexRegistry
+from cache import build_cache
+from rate_limiter import RateLimitMiddleware, RateLimitRule, build_rate_limiter
+from audit_pipeline import AuditPipeline
+from http_client import TRANSPORT_ERRORS, build_http_client
+from password_hasher import build_password_hasher
+from llm_gateway import LLMGateway, SemanticCache
+from matching_engine import ProviderEntry, ProviderMatchIndex, score_match
+from geo import backfill_provider_locations, locate_provider, search_providers_near, upsert_zip_centroids
+from client_dashboard import EMPTY_CLIENT_DASHBOARD, ClientDashboardReadModel
+from agency_rollups import AgencyRollupStore, agency_overview, governance_alerts
+from kpi_materializer import KPIMaterializer
+from search_engine import KnowledgeBaseSearch, text_search
+from notification_fanout import NotificationFanout
+from chunked_uploads import ChunkedUploadService, IncompleteUpload, UploadTooLarge
+from evidence_store import BlobTooLarge, EvidenceBlobStore, blob_response
+from certificate_renderer import CERTIFICATE_FIELDS, CertificateRenderer, pdf_response
+from license_minting import MAX_BATCH, LicenseMinter, LicenseMintingError, release_license_quota, reserve_license_quota
+from tier_responses import SessionNotActive, TierResponseStore, new_response
+from tier_entitlements import TierEntitlementResolver, default_tier_configuration
+from push_gateway import DashboardUpdateRelay, PushHub, build_backplane, chat_channel, user_channel
+from chat_history import ChatHistory, InvalidCursor, encode_cursor, is_read
+from webhook_delivery import DEAD, WebhookOutbox
 
 # Enhanced caching for Knowledge Base content
 from functools import lru_cache
@@ -38,11 +60,9 @@ def get_cached_assessment_schema():
     return ASSESSMENT_SCHEMA.copy()
 
 # Helper functions for tier-based assessment system
-async def get_client_tier_access(user_id: str) -> Dict[str, int]:
+async def get_client_tier_access(user: Dict[str, Any]) -> Dict[str, int]:
     """Get client's maximum tier access levels based on their agency configuration"""
     try:
-        # Get client's agency through license code
-        user = await db.users.find_one({"id": user_id})
         if not user or user.get("role") != "client":
             return {}
         
@@ -53,90 +73,13 @@ async def get_client_tier_access(user_id: str) -> Dict[str, int]:
         except Exception:
             pass
         
-        license_code = user.get("license_code")
-        if not license_code:
-            # Default to tier 1 for all areas
-            return {f"area{i}": 1 for i in range(1, 11)}
-        
-        # Get agency from license
-        license_record = await db.agency_licenses.find_one({"license_code": license_code})
-        if not license_record:
-            return {f"area{i}": 1 for i in range(1, 11)}
-        
-        # Try both possible field names for backward compatibility
-        agency_user_id = license_record.get("agency_user_id") or license_record.get("agency_id")
-        if not agency_user_id:
-            return {f"area{i}": 1 for i in range(1, 11)}
-        
-        # Get agency tier configuration
-        agency_config = await db.agency_tier_configurations.find_one({"agency_id": agency_user_id})
-        if not agency_config:
-            # Check for default tier 3 configuration (for QA and testing)
-            default_config = await db.agency_tier_configurations.find_one({"agency_id": "default"})
-            if default_config:
-                return default_config.get("tier_access_levels", {f"area{i}": 3 for i in range(1, 11)})
-            
-            # Fallback: create tier 1 configuration
-            fallback_config = {f"area{i}": 1 for i in range(1, 11)}
-            await db.agency_tier_configurations.insert_one({
-                "_id": str(uuid.uuid4()),
-                "agency_id": agency_user_id,
-                "tier_access_levels": fallback_config,
-                "pricing_per_tier": {"tier1": 25.0, "tier2": 50.0, "tier3": 100.0},
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            })
-            return fallback_config
-        
-        return agency_config.get("tier_access_levels", {f"area{i}": 1 for i in range(1, 11)})
+        return await tier_entitlements.resolve(user)
         
     except Exception as e:
         logger.error(f"Error getting client tier access: {e}")
         # Return default tier 1 access as fallback
         return {f"area{i}": 1 for i in range(1, 11)}
 
-def calculate_tier_completion_score(responses: List[Dict], tier_level: int) -> float:
-    """Calculate completion score for a tier-based assessment"""
-    if not responses:
-        return 0.0
-    
-    total_score = 0
-    max_score = 0
-    
-    for response in responses:
-        # Base scoring
-        if response["response"].lower() in ["yes", "true", "1"]:
-            response_score = 100
-        elif response["response"].lower() in ["no", "false", "0"]:
-            response_score = 0
-        elif response["response"].lower() in ["partial", "in_progress"]:
-            response_score = 50
-        else:
-            response_score = 25  # "No, I need help" or other
-        
-        # Tier-specific scoring multipliers
-        if tier_level == 1:
-            multiplier = 1.0  # Self assessment
-        elif tier_level == 2:
-            # Evidence required - higher weight for documented responses
-            if response.get("evidence_provided") or response.get("evidence_url"):
-                multiplier = 1.2
-            else:
-                multiplier = 0.8  # Penalize lack of evidence
-        else:  # tier_level == 3
-            # Verification tier - highest standards
-            if response.get("verification_status") == "verified":
-                multiplier = 1.5
-            elif response.get("evidence_provided") or response.get("evidence_url"):
-                multiplier = 1.0
-            else:
-                multiplier = 0.6
-        
-        total_score += response_score * multiplier
-        max_score += 100 * multiplier
-    
-    return round((total_score / max_score * 100), 2) if max_score > 0 else 0.0
-
 # AI-Powered Localized Resource Generation
 async def generate_ai_localized_resources(city: str, state: str, area_context: str, gaps_context: str) -> List[Dict]:
     """Generate localized resources using AI based on city, business area, and maturity gaps"""
@@ -171,16 +114,13 @@ Do not include URLs - those will be handled separately.
 
 Generate realistic, helpful resources that would actually exist in {city}, {state}."""
 
-        # Initialize AI chat
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"resources_{city}_{state}_{int(time.time())}",
-            system_message="You are a knowledgeable small business resource specialist with expertise in local business development programs and government contracting support."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        # Send message
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        # Local resources change slowly, so identical city/area/gaps prompts are reused for a day
+        response = await llm_gateway.complete(
+            "localized_resources",
+            prompt,
+            system_message="You are a knowledgeable small business resource specialist with expertise in local business development programs and government contracting support.",
+            ttl=86400
+        )
         
         if response and response.strip():
             # Try to parse JSON response
@@ -327,12 +267,7 @@ def generate_enhanced_static_resources(city: str, state: str, area_context: str)
     
     return resources
 
-# Optimize database queries with indexes (MongoDB commands to run separately)
-# db.users.createIndex({"email": 1, "role": 1})
-# db.assessment_sessions.createIndex({"user_id": 1, "created_at": -1})
-# db.service_requests.createIndex({"client_id": 1, "status": 1, "created_at": -1})
-# db.service_gigs.createIndex({"provider_id": 1, "status": 1})
-# db.service_orders.createIndex({"client_id": 1, "provider_id": 1, "status": 1})
+# Database indexes are declared in indexes.py and applied by the startup hook
 POLARIS_ERROR_CODES = {
     "POL-1001": "Invalid authentication credentials provided",
     "POL-1002": "User account not found or disabled", 
@@ -571,6 +506,8 @@ compliance_logger = logging.getLogger("polaris.compliance")
 # Ensure security log directory exists
 os.makedirs('/var/log/polaris', exist_ok=True)
 
+# File writes happen on a listener thread; request handlers only enqueue the record
+security_log_handlers = []
 for logger in [security_logger, audit_logger, compliance_logger]:
     logger.setLevel(logging.INFO)
     
@@ -580,7 +517,12 @@ for logger in [security_logger, audit_logger, compliance_logger]:
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    security_log_handlers.append(logging.handlers.QueueListener(log_queue, handler))
+
+for listener in security_log_handlers:
+    listener.start()
 
 class AuditLogger:
     """Comprehensive audit logging for compliance and security"""
@@ -618,16 +560,15 @@ class AuditLogger:
         }
         
         # Log to appropriate logger
+        serialized = json.dumps(event_data, default=str)
         if event_data["compliance_relevant"]:
-            compliance_logger.info(json.dumps(event_data, default=str))
+            compliance_logger.info(serialized)
         
-        security_logger.info(json.dumps(event_data, default=str))
+        security_logger.info(serialized)
         
-        # Store in database for querying
-        try:
-            await db.audit_logs.insert_one(event_data)
-        except Exception as e:
-            security_logger.error(f"Failed to store audit log: {str(e)}")
+        # Store in database for querying; written in batches by the background pipeline
+        if not audit_pipeline.submit(event_data):
+            security_logger.warning(f"Audit queue full, dropped {event_data['event_type']} event")
     
     @staticmethod
     def _calculate_severity(event_type: SecurityEventType, success: bool) -> str:
@@ -846,6 +787,7 @@ class GDPRComplianceService:
         
         # Delete user profile (pseudonymize critical business records)
         user_result = await db.users.delete_one({"_id": user_id})
+        await invalidate_principal(user_id)
         deletion_report["deleted_records"]["user_profile"] = user_result.deleted_count
         
         # Pseudonymize assessment data (keep for business purposes but remove PII)
@@ -943,45 +885,6 @@ class DataClassificationService:
         classification = DataClassificationService.classify_field(field_name)
         return classification in [DataClassification.RESTRICTED, DataClassification.CONFIDENTIAL]
 
-def rate_limit(max_requests: int, window_seconds: int):
-    """Rate limiting decorator"""
-    def decorator(func):
-        requests_count = {}
-        
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            # Find the Request object in the arguments
-            http_request = None
-            for arg in args:
-                if hasattr(arg, 'client') and hasattr(arg, 'method'):
-                    http_request = arg
-                    break
-            
-            if not http_request:
-                # If no Request object found, skip rate limiting
-                return await func(*args, **kwargs)
-            
-            client_ip = http_request.client.host if http_request.client else "unknown"
-            current_time = time.time()
-            
-            # Clean old entries
-            requests_count[client_ip] = [
-                req_time for req_time in requests_count.get(client_ip, [])
-                if current_time - req_time < window_seconds
-            ]
-            
-            # Check rate limit
-            if len(requests_count.get(client_ip, [])) >= max_requests:
-                log_security_event("RATE_LIMIT_EXCEEDED", details={"ip": client_ip})
-                raise HTTPException(status_code=429, detail="Rate limit exceeded")
-            
-            # Add current request
-            requests_count.setdefault(client_ip, []).append(current_time)
-            
-            return await func(*args, **kwargs)
-        return wrapper
-    return decorator
-
 try:
     from emergentintegrations.llm.chat import LlmChat, UserMessage
     EMERGENT_OK = True
@@ -997,9 +900,28 @@ EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 # Prometheus metrics
 REQUEST_COUNT = Counter('polaris_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status'])
 REQUEST_DURATION = Histogram('polaris_request_duration_seconds', 'HTTP request duration', ['method', 'endpoint'])
-AI_REQUEST_DURATION = Histogram('polaris_ai_request_duration_seconds', 'AI request duration', ['feature'])
+# cache is one of miss/exact/semantic/coalesced; per-feature hit ratio = non-miss count / total count
+AI_REQUEST_DURATION = Histogram('polaris_ai_request_duration_seconds', 'AI request duration', ['feature', 'cache'])
 ERROR_COUNT = Counter('polaris_errors_total', 'Total errors', ['error_code', 'endpoint'])
 
+async def _llm_complete(system_message: str, prompt: str, provider: str, model: str, session_id: str) -> str:
+    chat = LlmChat(
+        api_key=EMERGENT_LLM_KEY,
+        session_id=session_id,
+        system_message=system_message
+    ).with_model(provider, model)
+    return await chat.send_message(UserMessage(text=prompt))
+
+# All model calls go through the gateway so identical prompts are answered once
+llm_gateway = LLMGateway(
+    _llm_complete,
+    build_cache("llm", max_entries=int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2000"))),
+    ttl=int(os.environ.get("LLM_CACHE_TTL", "3600")),
+    semantic=SemanticCache(threshold=float(os.environ.get("LLM_SEMANTIC_THRESHOLD", "0.92")))
+    if os.environ.get("LLM_SEMANTIC_CACHE", "false").lower() == "true" else None,
+    duration_metric=AI_REQUEST_DURATION
+)
+
 # RP CRM-lite specific metrics
 RP_LEADS_CREATED = Counter('polaris_rp_leads_created_total', 'Total RP leads created', ['rp_type'])
 RP_LEADS_UPDATED = Counter('polaris_rp_leads_updated_total', 'Total RP lead updates', ['status_from', 'status_to'])
@@ -1040,6 +962,21 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+audit_pipeline = AuditPipeline(
+    db.audit_logs,
+    max_queue=int(os.environ.get("AUDIT_QUEUE_SIZE", "10000")),
+    spill_path="/var/log/polaris/audit_spill.jsonl"
+)
+
+# Service request notifications fan out to matching providers off the request path
+notification_fanout = NotificationFanout(db, batch_size=int(os.environ.get("NOTIFICATION_FANOUT_BATCH_SIZE", "500")))
+
+# Every outbound call (OAuth providers, webhooks) shares one pooled, non-blocking client
+http_client = build_http_client()
+
+# Password hashing is CPU-bound; it runs on a bounded pool instead of the event loop
+password_hasher = build_password_hasher()
+
 app = FastAPI(
     title="Polaris - Small Business Procurement Readiness Platform",
     description="Secure platform for assessing small business procurement readiness",
@@ -1049,6 +986,48 @@ app = FastAPI(
 )
 api = APIRouter(prefix="/api")
 
+# Rate limiting runs innermost so CORS headers still reach clients on a 429
+RATE_LIMIT_RULES = [
+    RateLimitRule("auth_register", "/api/auth/register", limit=5, period=300, methods=["POST"], per="ip"),
+    RateLimitRule("auth_login", "/api/auth/login", limit=10, period=300, methods=["POST"], per="ip"),
+    RateLimitRule("ai_assistance", "/api/knowledge-base/ai-assistance", limit=10, period=60, methods=["POST"]),
+]
+# The API-wide budget was never enforced before; deployments opt in to it explicitly
+if os.environ.get("RATE_LIMIT_GLOBAL_ENABLED", "false").lower() == "true":
+    RATE_LIMIT_RULES.append(
+        RateLimitRule("api", "/api/", limit=PRODUCTION_SECURITY_CONFIG["RATE_LIMIT_PER_MINUTE"], period=60, prefix=True)
+    )
+
+def rate_limit_identity(scope) -> Optional[str]:
+    """Resolve the caller's user id from the bearer token without touching the database"""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                payload = jwt.decode(token, PRODUCTION_SECURITY_CONFIG["JWT_SECRET_KEY"], algorithms=[PRODUCTION_SECURITY_CONFIG["JWT_ALGORITHM"]])
+            except JWTError:
+                return None
+            return payload.get("sub")
+    return None
+
+async def log_rate_limited(rule: RateLimitRule, identity: str):
+    await AuditLogger.log_security_event(
+        event_type=SecurityEventType.SUSPICIOUS_ACTIVITY,
+        success=False,
+        details={"reason": "rate_limit_exceeded", "rule": rule.name, "identity": identity, "error_code": "POL-2005"}
+    )
+
+app.add_middleware(
+    RateLimitMiddleware,
+    limiter=build_rate_limiter(),
+    rules=RATE_LIMIT_RULES,
+    identify=rate_limit_identity,
+    on_limited=log_rate_limited,
+    enabled=os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+)
+
 # Security Middleware
 app.add_middleware(
     TrustedHostMiddleware, 
@@ -1134,6 +1113,25 @@ async def audit_logging_middleware(request: Request, call_next):
 UPLOAD_BASE = ROOT_DIR / "uploads"
 UPLOAD_BASE.mkdir(parents=True, exist_ok=True)
 
+# Logo and proposal uploads share one resumable, out-of-order chunk engine
+chunked_uploads = ChunkedUploadService(
+    db.uploads,
+    UPLOAD_BASE,
+    chunk_size=int(os.environ.get("UPLOAD_CHUNK_SIZE", str(5 * 1024 * 1024))),
+    max_age=float(os.environ.get("UPLOAD_ABANDON_SECONDS", "86400")),
+    max_sizes={
+        "business_logo": int(os.environ.get("UPLOAD_MAX_LOGO_BYTES", str(10 * 1024 * 1024))),
+        "proposal_attachment": int(os.environ.get("UPLOAD_MAX_PROPOSAL_BYTES", str(100 * 1024 * 1024))),
+    }
+)
+
+# Evidence files are stored once per SHA-256 and shared by every question they are attached to
+evidence_store = EvidenceBlobStore(
+    db,
+    Path(os.environ.get("EVIDENCE_ROOT", str(ROOT_DIR / "evidence"))),
+    grace=float(os.environ.get("EVIDENCE_GC_GRACE_SECONDS", "86400"))
+)
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -1337,8 +1335,12 @@ async def create_user(email: str, password: str, role: str) -> dict:
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     uid = str(uuid.uuid4())
-    user_doc = {"_id": uid, "id": uid, "email": email.lower(), "hashed_password": pbkdf2_sha256.hash(password), "role": role, "created_at": datetime.utcnow()}
+    user_doc = {"_id": uid, "id": uid, "email": email.lower(), "hashed_password": await password_hasher.hash(password), "role": role, "created_at": datetime.utcnow()}
     await db.users.insert_one(user_doc)
+    if role == "client":
+        await kpi_materializer.increment("total_clients")
+    elif role == "provider":
+        await locate_provider(db, uid)
     return user_doc
 
 async def verify_user(email: str, password: str) -> Optional[dict]:
@@ -1351,21 +1353,20 @@ async def verify_user(email: str, password: str) -> Optional[dict]:
     if not password_field:
         return None
     
-    # Try bcrypt first (for newer users), then pbkdf2_sha256 (for legacy users)
-    try:
-        if password_field.startswith("$2a$") or password_field.startswith("$2b$"):
-            # bcrypt hash
-            if bcrypt.checkpw(password.encode('utf-8'), password_field.encode('utf-8')):
-                return user
-        else:
-            # pbkdf2_sha256 hash
-            if pbkdf2_sha256.verify(password, password_field):
-                return user
-    except Exception as e:
-        logger.error(f"Password verification error: {e}")
+    # bcrypt for newer users, pbkdf2_sha256 for legacy users; legacy hashes are upgraded in place
+    password_valid, new_hash = await password_hasher.verify_and_update(password, password_field)
+    if not password_valid:
         return None
-    
-    return None
+    if new_hash:
+        await store_rehashed_password(user["id"], new_hash)
+    return user
+
+async def store_rehashed_password(user_id: str, new_hash: str):
+    """Replace an outdated stored hash after a successful verification"""
+    await db.users.update_one(
+        {"id": user_id},
+        {"$set": {"hashed_password": new_hash}, "$unset": {"password": ""}}
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token with production security settings"""
@@ -1374,6 +1375,24 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, PRODUCTION_SECURITY_CONFIG["JWT_SECRET_KEY"], algorithm=PRODUCTION_SECURITY_CONFIG["JWT_ALGORITHM"])
 
+# Authenticated principals are cached per (user, session) so most requests skip the users lookup.
+# Entries are tagged user:{id}; anything that changes a user's auth state must call invalidate_principal.
+PRINCIPAL_CACHE_TTL = int(os.environ.get("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_PROJECTION = {
+    "hashed_password": 0,
+    "password": 0,
+    "password_history": 0,
+    "mfa_secret": 0,
+    "mfa_backup_codes": 0
+}
+principal_cache = build_cache("principals", max_entries=20000, local_ttl=5)
+
+async def invalidate_principal(*user_ids: str):
+    """Drop cached principals for the given users so the next request re-reads them"""
+    tags = [f"user:{uid}" for uid in user_ids if uid]
+    if tags:
+        await principal_cache.invalidate_tags(*tags)
+
 async def get_current_user(authorization: Optional[str] = Header(None)) -> Optional[dict]:
     """Enhanced user authentication with session tracking and audit logging"""
     if not authorization:
@@ -1391,7 +1410,15 @@ async def get_current_user(authorization: Optional[str] = Header(None)) -> Optio
         if uid is None:
             return None
             
-        user = await db.users.find_one({"id": uid})
+        cache_key = f"{uid}:{session_id or '-'}"
+        user = await principal_cache.get(cache_key)
+        if user is not None:
+            # Only principals that passed the session check are cached; lock state is still re-checked
+            if user.get("locked_until") and user["locked_until"] > datetime.utcnow():
+                return None
+            return dict(user)
+
+        user = await db.users.find_one({"id": uid}, PRINCIPAL_PROJECTION)
         if not user:
             return None
             
@@ -1408,8 +1435,9 @@ async def get_current_user(authorization: Optional[str] = Header(None)) -> Optio
         # Check if account is locked
         if user.get("locked_until") and user["locked_until"] > datetime.utcnow():
             return None
-            
-        return user
+
+        await principal_cache.set(cache_key, user, ttl=PRINCIPAL_CACHE_TTL, tags=[f"user:{uid}"])
+        return dict(user)
         
     except jwt.ExpiredSignatureError:
         if uid:
@@ -1671,7 +1699,6 @@ async def require_agency(current=Depends(require_user)) -> dict:
     return current
 
 @api.post("/auth/register")
-@rate_limit(max_requests=5, window_seconds=300)  # 5 registrations per 5 minutes
 async def register_user(request: Request, user: UserRegistrationIn):
     if not user.terms_accepted:
         log_security_event("REGISTRATION_TERMS_NOT_ACCEPTED", details={"email": user.email})
@@ -1701,7 +1728,7 @@ async def register_user(request: Request, user: UserRegistrationIn):
         approval_status = "pending"  # Providers need vetting by navigators
     
     user_id = str(uuid.uuid4())
-    hashed_password = pbkdf2_sha256.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     
     user_doc = {
         "_id": user_id,
@@ -1729,8 +1756,13 @@ async def register_user(request: Request, user: UserRegistrationIn):
             {"license_code": user.license_code},
             {"$set": {"status": "used", "used_by": user_id, "used_at": datetime.utcnow()}}
         )
+        await tier_entitlements.invalidate_license(user.license_code)
     
     await db.users.insert_one(user_doc)
+    if user_doc.get("role") == "client":
+        await kpi_materializer.increment("total_clients")
+    elif user_doc.get("role") == "provider":
+        await locate_provider(db, user_id)
     
     log_security_event("USER_REGISTERED", details={
         "user_id": user_id, 
@@ -1746,7 +1778,6 @@ async def register_user(request: Request, user: UserRegistrationIn):
         return {"message": "Registration successful", "status": "approved"}
 
 @api.post("/auth/login", response_model=Token)
-@rate_limit(max_requests=10, window_seconds=300)  # 10 login attempts per 5 minutes
 async def login_user(request: Request, user: UserLogin):
     """Enhanced login with comprehensive security logging and audit trail"""
     
@@ -1793,17 +1824,7 @@ async def login_user(request: Request, user: UserLogin):
     # Handle both 'password' and 'hashed_password' field names for backward compatibility
     password_field = db_user.get("hashed_password") or db_user.get("password", "")
     
-    password_valid = False
-    try:
-        if password_field.startswith("$2a$") or password_field.startswith("$2b$"):
-            # bcrypt hash
-            password_valid = bcrypt.checkpw(user.password.encode('utf-8'), password_field.encode('utf-8'))
-        else:
-            # pbkdf2_sha256 hash
-            password_valid = pbkdf2_sha256.verify(user.password, password_field)
-    except Exception as e:
-        logger.error(f"Password verification error: {e}")
-        password_valid = False
+    password_valid, new_hash = await password_hasher.verify_and_update(user.password, password_field)
     
     if not password_valid:
         # Increment failed attempts
@@ -1820,6 +1841,8 @@ async def login_user(request: Request, user: UserLogin):
             update_data["locked_until"] = lock_until
             
         await db.users.update_one({"id": db_user["id"]}, {"$set": update_data})
+        if "locked_until" in update_data:
+            await invalidate_principal(db_user["id"])
         
         await AuditLogger.log_security_event(
             event_type=SecurityEventType.LOGIN_FAILURE,
@@ -1871,6 +1894,10 @@ async def login_user(request: Request, user: UserLogin):
             "current_session_id": session_id
         }}
     )
+    # The previous session's principal must stop authenticating immediately
+    await invalidate_principal(db_user["id"])
+    if new_hash:
+        await store_rehashed_password(db_user["id"], new_hash)
     
     # Create JWT token with enhanced expiry based on role
     token_expiry = timedelta(minutes=PRODUCTION_SECURITY_CONFIG["JWT_EXPIRE_MINUTES"])
@@ -2013,6 +2040,13 @@ async def get_current_user_info(current=Depends(require_user)):
         profile_complete=current.get("profile_complete", False)
     )
 
+@api.post("/auth/logout")
+async def logout(current=Depends(require_user)):
+    """End the current session; tokens carrying it stop authenticating immediately"""
+    await db.users.update_one({"id": current["id"]}, {"$unset": {"current_session_id": ""}})
+    await invalidate_principal(current["id"])
+    return {"message": "Logged out"}
+
 class OAuthCallbackIn(BaseModel):
     session_id: str
     role: str
@@ -2034,7 +2068,7 @@ async def oauth_callback(payload: OAuthCallbackIn, response: Response):
         
         # Call Emergent auth API to get user data (as per verified playbook)
         headers = {"X-Session-ID": session_id}
-        emergent_response = requests.get("https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data", headers=headers)
+        emergent_response = await http_client.get("https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data", headers=headers)
         
         if emergent_response.status_code != 200:
             raise HTTPException(status_code=400, detail="Invalid session ID")
@@ -2063,6 +2097,10 @@ async def oauth_callback(payload: OAuthCallbackIn, response: Response):
                 "updated_at": datetime.utcnow()
             }
             await db.users.insert_one(user_data)
+            if user_data.get("role") == "client":
+                await kpi_materializer.increment("total_clients")
+            elif user_data.get("role") == "provider":
+                await locate_provider(db, user_id)
         
         # Save session token in sessions table with 7-day expiry (as per verified playbook)
         session_token = oauth_data.get("session_token")
@@ -2100,7 +2138,7 @@ async def oauth_callback(payload: OAuthCallbackIn, response: Response):
     except HTTPException:
         # Re-raise HTTPExceptions (like 400 Invalid session ID) without converting to 500
         raise
-    except requests.RequestException:
+    except TRANSPORT_ERRORS:
         raise HTTPException(status_code=500, detail="Failed to validate OAuth session")
     except Exception as e:
         logger.error(f"OAuth callback error: {e}")
@@ -2461,6 +2499,7 @@ async def verify_mfa_setup(
         
         # Clean up temporary setup
         await db.mfa_setup_temp.delete_one({"_id": temp_setup["_id"]})
+        await invalidate_principal(current_user["id"])
         
         return MFAVerificationOut(
             verified=True,
@@ -2641,9 +2680,11 @@ async def get_users_admin(
             query["status"] = status
             
         if search:
+            # The anchored email prefix walks the email index (emails are stored lowercased);
+            # the case-insensitive name match cannot use an index and scans
             query["$or"] = [
-                {"email": {"$regex": search, "$options": "i"}},
-                {"name": {"$regex": search, "$options": "i"}}
+                {"email": {"$regex": f"^{re.escape(search.strip().lower())}"}},
+                {"name": {"$regex": f"^{re.escape(search.strip())}", "$options": "i"}}
             ]
         
         # Get total count
@@ -2713,6 +2754,7 @@ async def bulk_user_action(
                 }
             }
         )
+        await invalidate_principal(*request.user_ids)
         
         # Log bulk action
         await db.audit_logs.insert_one({
@@ -2770,6 +2812,7 @@ async def user_action(
             return {"action": "edit", "user_id": user_id}
         else:
             raise HTTPException(status_code=400, detail="Invalid action")
+        await invalidate_principal(user_id)
         
         # Log action
         await db.audit_logs.insert_one({
@@ -2862,6 +2905,15 @@ async def get_audit_logs(
         logger.error(f"Error getting audit logs: {e}")
         raise HTTPException(status_code=500, detail="Failed to load audit logs")
 
+@api.get("/admin/indexes")
+async def get_index_report(admin_user: dict = Depends(require_admin)):
+    """Report declared indexes that are missing and existing indexes with no recorded use"""
+    try:
+        return await IndexRegistry(db).report()
+    except Exception as e:
+        logger.error(f"Error building index report: {e}")
+        raise HTTPException(status_code=500, detail="Failed to build index report")
+
 # Enhanced audit logging helper
 async def create_audit_log(
     user_id: str,
@@ -2908,7 +2960,7 @@ async def get_tier_based_assessment_schema(current_user: dict = Depends(get_curr
     """
     try:
         # Get client's agency tier configuration
-        client_tier_access = await get_client_tier_access(current_user["id"])
+        client_tier_access = await get_client_tier_access(current_user)
         
         enhanced_schema = {
             "areas": [],
@@ -2951,7 +3003,7 @@ async def create_tier_based_session(
     """Create a new tier-based assessment session"""
     try:
         # Get client's tier access and use maximum available tier if not specified
-        client_tier_access = await get_client_tier_access(current_user["id"])
+        client_tier_access = await get_client_tier_access(current_user)
         max_tier = client_tier_access.get(area_id, 1)
         
         # If no tier level specified, use the maximum available tier
@@ -3007,6 +3059,10 @@ async def create_tier_based_session(
             "tier_name": tier_data["name"],
             "questions": all_questions,
             "responses": [],
+            "total_questions": len(all_questions),
+            "answered_count": 0,
+            "score_points": 0,
+            "score_weight": 0,
             "status": "active",
             "started_at": datetime.utcnow(),
             "completed_at": None,
@@ -3014,6 +3070,7 @@ async def create_tier_based_session(
         }
         
         await db.tier_assessment_sessions.insert_one(session_doc)
+        await invalidate_client_dashboard(current_user["id"])
         
         return {
             "session_id": session_id,
@@ -3031,6 +3088,8 @@ async def create_tier_based_session(
         logger.error(f"Error creating tier-based session: {e}")
         raise HTTPException(status_code=500, detail="Failed to create tier-based assessment session")
 
+tier_responses = TierResponseStore(db.tier_assessment_sessions)
+
 @api.post("/assessment/tier-session/{session_id}/response")
 async def submit_tier_response(
     session_id: str,
@@ -3042,11 +3101,8 @@ async def submit_tier_response(
 ):
     """Submit response to tier-based assessment question with evidence enforcement"""
     try:
-        # Get session
-        session = await db.tier_assessment_sessions.find_one({
-            "_id": session_id,
-            "user_id": current_user["id"]
-        })
+        # Get session counters and only the question being answered
+        session = await tier_responses.load(session_id, current_user["id"], question_id)
         
         if not session:
             raise HTTPException(status_code=404, detail="Assessment session not found")
@@ -3054,12 +3110,7 @@ async def submit_tier_response(
         if session["status"] != "active":
             raise HTTPException(status_code=400, detail="Assessment session is not active")
         
-        # Find the question in the session to get tier level
-        question = None
-        for q in session.get("questions", []):
-            if q["id"] == question_id:
-                question = q
-                break
+        question = (session.get("questions") or [None])[0]
         
         if not question:
             raise HTTPException(status_code=404, detail="Question not found in session")
@@ -3084,60 +3135,23 @@ async def submit_tier_response(
                         detail=f"Evidence upload is required for Tier {tier_level} compliant responses. Please upload supporting documentation before submitting your response."
                     )
         
-        # Update or add response
-        responses = session.get("responses", [])
-        existing_response_index = None
-        
-        for i, resp in enumerate(responses):
-            if resp["question_id"] == question_id:
-                existing_response_index = i
-                break
+        response_data = new_response(question_id, response, tier_level,
+                                     evidence_provided.lower() == "true" if evidence_provided else False,
+                                     evidence_url)
         
-        response_data = {
-            "question_id": question_id,
-            "response": response,
-            "tier_level": tier_level,
-            "evidence_required": tier_level >= 2 and response == "compliant",
-            "evidence_provided": evidence_provided.lower() == "true" if evidence_provided else False,
-            "evidence_url": evidence_url,
-            "submitted_at": datetime.utcnow(),
-            "verification_status": "pending" if tier_level >= 2 else None
-        }
+        # One atomic write per answer; completion and score come from the running sums
+        try:
+            counters, completed_now = await tier_responses.record(session, response_data)
+        except SessionNotActive as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        if existing_response_index is not None:
-            responses[existing_response_index] = response_data
-        else:
-            responses.append(response_data)
+        total_questions = counters["total_questions"]
+        completed_questions = counters["answered_count"]
         
-        # Update session
-        await db.tier_assessment_sessions.update_one(
-            {"_id": session_id},
-            {
-                "$set": {
-                    "responses": responses,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
+        if completed_now:
+            agency_rollups.schedule(current_user["id"])
         
-        # Check if assessment is complete
-        total_questions = len(session["questions"])
-        completed_questions = len(responses)
-        
-        if completed_questions >= total_questions:
-            # Calculate completion score
-            tier_score = calculate_tier_completion_score(responses, tier_level)
-            
-            await db.tier_assessment_sessions.update_one(
-                {"_id": session_id},
-                {
-                    "$set": {
-                        "status": "completed",
-                        "completed_at": datetime.utcnow(),
-                        "tier_completion_score": tier_score
-                    }
-                }
-            )
+        await invalidate_client_dashboard(current_user["id"])
         
         # Return appropriate response based on evidence requirements
         result = {
@@ -3162,6 +3176,142 @@ async def submit_tier_response(
         logger.error(f"Error submitting tier response: {e}")
         raise HTTPException(status_code=500, detail="Failed to submit response")
 
+class TierAnswerIn(BaseModel):
+    question_id: str
+    response: str
+    evidence_provided: Optional[bool] = False
+    evidence_url: Optional[str] = None
+
+class TierAnswerBatchIn(BaseModel):
+    answers: List[TierAnswerIn] = Field(..., min_items=1, max_items=200)
+
+# How long an idempotency claim stays owned by the request that made it
+TIER_BATCH_CLAIM_LEASE_SECONDS = int(os.environ.get("TIER_BATCH_CLAIM_LEASE_SECONDS", "60"))
+
+@api.post("/assessment/tier-session/{session_id}/responses")
+async def submit_tier_responses_batch(
+    session_id: str,
+    payload: TierAnswerBatchIn,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Submit many answers for a tier-based session in one call. Evidence rules are checked
+    against one session read and the answers are written with one bulk_write; each answer
+    gets its own result. Send an Idempotency-Key header to make retries safe.
+    """
+    idem_key = request.headers.get("idempotency-key") or request.headers.get("x-idempotency-key")
+    claim_id = f"{current_user['id']}:{session_id}:{idem_key}" if idem_key else None
+    lease_id = str(uuid.uuid4())
+    if claim_id:
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=TIER_BATCH_CLAIM_LEASE_SECONDS)
+        # A key reused with a different body is a client bug, not a retry
+        answers_hash = hashlib.sha256(
+            json.dumps([a.dict() for a in payload.answers], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        try:
+            await db.assessment_batch_requests.insert_one({"_id": claim_id, "status": "processing", "lease_id": lease_id,
+                                                           "lease_until": lease_until, "answers_hash": answers_hash,
+                                                           "created_at": now})
+        except DuplicateKeyError:
+            # A claim whose worker died mid-request is taken over once its lease runs out
+            taken_over = await db.assessment_batch_requests.find_one_and_update(
+                {"_id": claim_id, "status": "processing", "answers_hash": answers_hash,
+                 "$or": [{"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]},
+                {"$set": {"lease_id": lease_id, "lease_until": lease_until}}
+            )
+            if not taken_over:
+                prior = await db.assessment_batch_requests.find_one({"_id": claim_id})
+                if prior and prior.get("answers_hash", answers_hash) != answers_hash:
+                    raise HTTPException(status_code=422,
+                                        detail="This idempotency key was already used with a different request body")
+                if prior and prior.get("status") == "completed":
+                    return prior["result"]
+                raise HTTPException(status_code=409, detail="A request with this idempotency key is still being processed")
+    
+    try:
+        result = await apply_tier_answer_batch(session_id, payload.answers, current_user, batch_id=claim_id or lease_id)
+    except Exception as e:
+        if claim_id:
+            await db.assessment_batch_requests.delete_one({"_id": claim_id, "lease_id": lease_id})
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Error submitting tier response batch: {e}")
+        raise HTTPException(status_code=500, detail="Failed to submit responses")
+    
+    if claim_id:
+        # A worker whose lease was taken over leaves the result to the one that took it
+        await db.assessment_batch_requests.update_one(
+            {"_id": claim_id, "lease_id": lease_id},
+            {"$set": {"status": "completed", "result": result}, "$unset": {"lease_id": "", "lease_until": ""}}
+        )
+    return result
+
+async def apply_tier_answer_batch(session_id: str, answers: List[TierAnswerIn], current_user: dict, batch_id: str) -> dict:
+    session = await tier_responses.load(session_id, current_user["id"])
+    if not session:
+        raise HTTPException(status_code=404, detail="Assessment session not found")
+    if session["status"] != "active":
+        raise HTTPException(status_code=400, detail="Assessment session is not active")
+    
+    questions = {q["id"]: q for q in session.get("questions", [])}
+    # A question answered twice in one batch keeps its last answer
+    latest = {answer.question_id: i for i, answer in enumerate(answers)}
+    needs_evidence = [a.question_id for a in answers if a.response == "compliant" and not (a.evidence_provided or a.evidence_url)
+                      and questions.get(a.question_id, {}).get("tier_level", session.get("tier_level", 1)) >= 2]
+    evidenced = set()
+    if needs_evidence:
+        evidenced = {e["question_id"] for e in await db.assessment_evidence.find(
+            {"session_id": session_id, "user_id": current_user["id"], "question_id": {"$in": needs_evidence}},
+            {"question_id": 1}
+        ).to_list(None)}
+    
+    results = []
+    accepted = []
+    for i, answer in enumerate(answers):
+        question = questions.get(answer.question_id)
+        item = {"question_id": answer.question_id}
+        if latest[answer.question_id] != i:
+            item.update(status="superseded", status_code=409, detail="A later answer in this batch replaces this one")
+        elif not question:
+            item.update(status="rejected", status_code=404, detail="Question not found in session")
+        else:
+            tier_level = question.get("tier_level", session.get("tier_level", 1))
+            if answer.question_id in needs_evidence and answer.question_id not in evidenced:
+                item.update(status="rejected", status_code=422,
+                            detail=f"Evidence upload is required for Tier {tier_level} compliant responses. Please upload supporting documentation before submitting your response.")
+            else:
+                accepted.append(new_response(answer.question_id, answer.response, tier_level, bool(answer.evidence_provided), answer.evidence_url))
+        results.append(item)
+    
+    counters = session
+    completed_now = False
+    outcomes = {}
+    if accepted:
+        counters, completed_now, outcomes = await tier_responses.record_many(session, accepted, batch_id)
+    for item in results:
+        if "status" in item:
+            continue
+        if outcomes.get(item["question_id"]) == "saved":
+            item.update(status="saved", status_code=200)
+        else:
+            item.update(status="rejected", status_code=400, detail="Assessment session is not active")
+    
+    if completed_now:
+        agency_rollups.schedule(current_user["id"])
+    if accepted:
+        await invalidate_client_dashboard(current_user["id"])
+    
+    return {
+        "success": all(item["status"] in ("saved", "superseded") for item in results),
+        "results": results,
+        "saved": sum(1 for item in results if item["status"] == "saved"),
+        "completed_questions": counters["answered_count"],
+        "total_questions": counters["total_questions"],
+        "assessment_complete": counters.get("status") == "completed"
+    }
+
 @api.get("/assessment/tier-session/{session_id}/progress")
 async def get_tier_session_progress(
     session_id: str,
@@ -3651,6 +3801,9 @@ async def approve_provider(payload: ProviderApprovalIn, current=Depends(require_
         {"id": payload.provider_user_id},
         {"$set": {"approval_status": payload.approval_status, "updated_at": datetime.utcnow()}}
     )
+    await invalidate_principal(payload.provider_user_id)
+    if payload.approval_status == "approved":
+        await locate_provider(db, payload.provider_user_id)
     
     # Create approval record
     approval_id = str(uuid.uuid4())
@@ -3747,6 +3900,9 @@ async def approve_agency(payload: AgencyApprovalIn, current=Depends(require_role
         {"id": payload.agency_user_id},
         {"$set": {"approval_status": payload.approval_status, "updated_at": datetime.utcnow()}}
     )
+    await invalidate_principal(payload.agency_user_id)
+    if payload.approval_status == "approved":
+        await tier_entitlements.ensure_configuration(payload.agency_user_id)
 
     # Create approval record
     approval_id = str(uuid.uuid4())
@@ -4397,6 +4553,9 @@ async def upsert_business_profile(payload: BusinessProfileIn, current=Depends(re
         doc = {"_id": pid, "id": pid, "user_id": current["id"], **payload.dict(), "role": current["role"], "created_at": now, "updated_at": now}
         await db.business_profiles.insert_one(doc)
         prof = doc
+    if current["role"] == "provider":
+        # The business profile zip places providers that have none on their user record
+        await locate_provider(db, current["id"])
     return BusinessProfileOut(id=pid, role=prof.get("role"), logo_upload_id=prof.get("logo_upload_id"), **{k: prof.get(k) for k in BusinessProfileIn.model_fields.keys()})
 
 @api.get("/business/profile/me/completion")
@@ -4414,53 +4573,64 @@ async def business_profile_completion(current=Depends(require_user)):
             missing.append("logo_upload_id")
     return {"complete": len(missing)==0, "missing": missing}
 
+async def receive_upload_chunk(rec: dict, chunk_index: int, file: UploadFile, sha256: Optional[str]):
+    try:
+        digest = await chunked_uploads.receive_chunk(rec, chunk_index, file, sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"ok": True, "chunk_index": chunk_index, "sha256": digest}
+
+async def complete_chunked_upload(rec: dict, total_chunks: Optional[int]) -> dict:
+    if total_chunks is not None and total_chunks != chunked_uploads.total_chunks(rec):
+        raise HTTPException(status_code=400, detail=f"Upload has {chunked_uploads.total_chunks(rec)} chunks")
+    try:
+        return await chunked_uploads.complete(rec)
+    except IncompleteUpload as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "missing_chunks": e.missing})
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 @api.post("/business/logo/initiate")
 async def biz_logo_initiate(file_name: str = Form(...), total_size: int = Form(...), mime_type: str = Form("application/octet-stream"), current=Depends(require_user)):
     if current.get("role") not in ("client","provider"):
         raise HTTPException(status_code=403, detail="Not applicable")
-    uid = str(uuid.uuid4())
-    doc = {"_id": uid, "id": uid, "type": "business_logo", "user_id": current["id"], "file_name": file_name, "mime_type": mime_type, "total_size": total_size, "created_at": datetime.utcnow(), "status": "initiated"}
-    await db.uploads.insert_one(doc)
-    (UPLOAD_BASE / uid).mkdir(parents=True, exist_ok=True)
-    return {"upload_id": uid, "chunk_size": 5*1024*1024}
+    try:
+        rec = await chunked_uploads.initiate("business_logo", file_name, mime_type, total_size, user_id=current["id"])
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"upload_id": rec["_id"], "chunk_size": rec["chunk_size"], "total_chunks": rec["total_chunks"]}
 
 @api.post("/business/logo/chunk")
-async def biz_logo_chunk(upload_id: str = Form(...), chunk_index: int = Form(...), file: UploadFile = File(...), current=Depends(require_user)):
+async def biz_logo_chunk(upload_id: str = Form(...), chunk_index: int = Form(...), file: UploadFile = File(...), sha256: Optional[str] = Form(None), current=Depends(require_user)):
     rec = await db.uploads.find_one({"_id": upload_id, "type": "business_logo", "user_id": current["id"]})
     if not rec:
         raise HTTPException(status_code=404, detail="Upload not found")
-    part_path = UPLOAD_BASE / upload_id / f"part_{chunk_index}"
-    async with aiofiles.open(part_path, "wb") as out:
-        while True:
-            data = await file.read(1024 * 1024)
-            if not data:
-                break
-            await out.write(data)
-    return {"ok": True}
+    return await receive_upload_chunk(rec, chunk_index, file, sha256)
+
+@api.get("/business/logo/{upload_id}/status")
+async def biz_logo_status(upload_id: str, current=Depends(require_user)):
+    rec = await db.uploads.find_one({"_id": upload_id, "type": "business_logo", "user_id": current["id"]})
+    if not rec:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return chunked_uploads.status(rec)
 
 @api.post("/business/logo/complete")
-async def biz_logo_complete(upload_id: str = Form(...), total_chunks: int = Form(...), current=Depends(require_user)):
+async def biz_logo_complete(upload_id: str = Form(...), total_chunks: Optional[int] = Form(None), current=Depends(require_user)):
     rec = await db.uploads.find_one({"_id": upload_id, "type": "business_logo", "user_id": current["id"]})
     if not rec:
         raise HTTPException(status_code=404, detail="Upload not found")
-    final_path = UPLOAD_BASE / f"{upload_id}_{rec.get('file_name') or 'logo'}"
-    async with aiofiles.open(final_path, "wb") as out:
-        for i in range(int(total_chunks)):
-            part_path = UPLOAD_BASE / upload_id / f"part_{i}"
-            async with aiofiles.open(part_path, "rb") as f:
-                while True:
-                    data = await f.read(1024 * 1024)
-                    if not data:
-                        break
-                    await out.write(data)
-    size = final_path.stat().st_size
-    await db.uploads.update_one({"_id": upload_id}, {"$set": {"status": "completed", "stored_path": str(final_path), "final_size": size, "completed_at": datetime.utcnow()}})
+    rec = await complete_chunked_upload(rec, total_chunks)
     await db.business_profiles.update_one({"user_id": current["id"]}, {"$set": {"logo_upload_id": upload_id, "updated_at": datetime.utcnow()}}, upsert=True)
-    return {"ok": True, "upload_id": upload_id, "size": size}
+    await invalidate_client_dashboard(current["id"])
+    return {"ok": True, "upload_id": upload_id, "size": rec["final_size"]}
 
 # ---------------- License Management for Agencies ----------------
+license_minter = LicenseMinter(db.agency_licenses)
+
 class LicenseGenerationIn(BaseModel):
-    quantity: int = Field(..., ge=1, le=100)  # Generate 1-100 licenses at a time
+    quantity: int = Field(..., ge=1, le=MAX_BATCH)  # Up to 10,000 licenses per request for large sponsors
     expires_days: Optional[int] = Field(30, ge=7, le=365)  # License validity in days
 
 class LicenseOut(BaseModel):
@@ -4479,13 +4649,6 @@ async def generate_licenses(request: LicenseGenerationIn, current=Depends(requir
     if not user_record or user_record.get("approval_status") != "approved":
         raise HTTPException(status_code=403, detail="Agency must be approved to generate license codes")
     
-    # Check subscription limits
-    current_month = datetime.utcnow().strftime("%Y-%m")
-    usage = await db.subscription_usage.find_one({
-        "agency_user_id": current["id"],
-        "month": current_month
-    }) or {"license_codes_generated": 0}
-    
     subscription = await db.agency_subscriptions.find_one({"agency_user_id": current["id"]})
     
     # Determine limits based on subscription
@@ -4496,54 +4659,26 @@ async def generate_licenses(request: LicenseGenerationIn, current=Depends(requir
         # Trial limits
         monthly_limit = 10
     
-    current_usage = usage["license_codes_generated"]
-    
-    # Check if request would exceed limits
-    if monthly_limit != -1 and (current_usage + request.quantity) > monthly_limit:
-        remaining = max(0, monthly_limit - current_usage)
+    # Reserve the codes against this month's limit before minting them
+    current_month = datetime.utcnow().strftime("%Y-%m")
+    usage = await reserve_license_quota(db.subscription_usage, current["id"], current_month, request.quantity, monthly_limit)
+    if usage is None:
+        used = await db.subscription_usage.find_one({"agency_user_id": current["id"], "month": current_month})
+        remaining = max(0, monthly_limit - (used or {}).get("license_codes_generated", 0))
         raise HTTPException(
             status_code=402, 
             detail=f"License code limit reached. You can generate {remaining} more codes this month. Upgrade your subscription for higher limits."
         )
+    generated_total = usage["license_codes_generated"]
     
-    licenses = []
     expires_at = datetime.utcnow() + timedelta(days=request.expires_days) if request.expires_days else None
-    
-    for _ in range(request.quantity):
-        license_code = ''.join([str(random.randint(0, 9)) for _ in range(10)])
-        
-        # Ensure uniqueness
-        while await db.agency_licenses.find_one({"license_code": license_code}):
-            license_code = ''.join([str(random.randint(0, 9)) for _ in range(10)])
-        
-        license_doc = {
-            "_id": str(uuid.uuid4()),
-            "license_code": license_code,
-            "agency_id": current["id"],
-            "status": "available",
-            "created_at": datetime.utcnow(),
-            "expires_at": expires_at
-        }
-        
-        await db.agency_licenses.insert_one(license_doc)
-        licenses.append(license_doc)
-    
-    # Update usage tracking
-    await db.subscription_usage.update_one(
-        {"agency_user_id": current["id"], "month": current_month},
-        {
-            "$inc": {"license_codes_generated": request.quantity},
-            "$setOnInsert": {
-                "_id": str(uuid.uuid4()),
-                "agency_user_id": current["id"],
-                "month": current_month,
-                "clients_active": 0,
-                "api_calls": 0,
-                "storage_used_mb": 0
-            }
-        },
-        upsert=True
-    )
+    try:
+        licenses = await license_minter.mint(request.quantity, agency_id=current["id"], expires_at=expires_at)
+    except Exception as e:
+        minted = len(e.minted) if isinstance(e, LicenseMintingError) else 0
+        await release_license_quota(db.subscription_usage, current["id"], current_month, request.quantity - minted)
+        logger.error(f"License minting failed for agency {current['id']}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate license codes")
     
     return {
         "message": f"Generated {request.quantity} license codes",
@@ -4554,9 +4689,9 @@ async def generate_licenses(request: LicenseGenerationIn, current=Depends(requir
             } for lic in licenses
         ],
         "usage_update": {
-            "codes_generated_this_month": current_usage + request.quantity,
+            "codes_generated_this_month": generated_total,
             "monthly_limit": monthly_limit if monthly_limit != -1 else "Unlimited",
-            "remaining_this_month": max(0, monthly_limit - (current_usage + request.quantity)) if monthly_limit != -1 else "Unlimited"
+            "remaining_this_month": max(0, monthly_limit - generated_total) if monthly_limit != -1 else "Unlimited"
         }
     }
 
@@ -4617,6 +4752,11 @@ async def approve_user(user_id: str, current=Depends(require_role("navigator")))
             }
         }
     )
+    await invalidate_principal(user_record.get("id", user_id))
+    if user_record.get("role") == "agency":
+        await tier_entitlements.ensure_configuration(user_record.get("id", user_id))
+    elif user_record.get("role") == "provider":
+        await locate_provider(db, user_record.get("id", user_id))
     
     return {"message": f"User {user_record['email']} approved successfully"}
 
@@ -4638,6 +4778,7 @@ async def reject_user(user_id: str, reason: str, current=Depends(require_role("n
             }
         }
     )
+    await invalidate_principal(user_record.get("id", user_id))
     
     return {"message": f"User {user_record['email']} rejected"}
 
@@ -4737,12 +4878,15 @@ async def create_engagement(payload: EngagementCreateIn, current=Depends(require
     eid = str(uuid.uuid4())
     doc = {"_id": eid, "id": eid, "request_id": req["_id"], "response_id": resp["_id"], "client_user_id": current["id"], "provider_user_id": resp.get("provider_id"), "status": "active", "agreed_fee": payload.agreed_fee, "created_at": datetime.utcnow(), "area_id": req.get("area_id")}
     await db.engagements.insert_one(doc)
+    await kpi_materializer.increment("engagements")
     fee = round(payload.agreed_fee * 0.05, 2)
     rid = str(uuid.uuid4())
     tx = {"_id": rid, "id": rid, "transaction_type": "marketplace_fee", "amount": fee, "currency": "USD", "status": "pending", "created_at": datetime.utcnow(), "metadata": {"engagement_id": eid, "request_id": req["_id"], "response_id": resp["_id"], "agreed_fee": payload.agreed_fee, "pct": 0.05}}
     await db.revenue_transactions.insert_one(tx)
     # Update service_requests collection (not match_requests)
     await db.service_requests.update_one({"_id": req["_id"]}, {"$set": {"status": "engaged", "engagement_id": eid}})
+    await invalidate_client_dashboard(current["id"])
+    agency_rollups.schedule(current["id"])
     return {"ok": True, "engagement_id": eid, "fee": fee}
 
 @api.get("/navigator/engagements")
@@ -5009,6 +5153,7 @@ async def handle_successful_payment(transaction: dict, checkout_status: dict):
                 "created_at": datetime.utcnow()
             }
             await db.engagements.insert_one(engagement_doc)
+            await kpi_materializer.increment("engagements")
             
             # Update service request status
             await db.match_requests.update_one(
@@ -5196,7 +5341,7 @@ async def update_engagement_status(
                     "created_at": DataValidator.standardize_timestamp(),
                     "data_version": "1.0"
                 }
-                await db.notifications.insert_one(notification)
+                await insert_notification(notification)
             except Exception as e:
                 logger.error(f"Failed to notify user {target_id}: {e}")
         
@@ -5368,15 +5513,14 @@ async def upload_assessment_evidence(question_id: str = Form(...), files: List[U
     uploaded_files = []
     
     for file in files:
-        if file.size > 10 * 1024 * 1024:  # 10MB limit
+        if file.size and file.size > 10 * 1024 * 1024:  # 10MB limit
             raise HTTPException(status_code=400, detail=f"File {file.filename} exceeds 10MB limit")
         
-        # Generate unique filename
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'bin'
-        unique_filename = f"{current['id']}_{question_id}_{uuid.uuid4().hex[:8]}.{file_extension}"
-        
-        # Save file content
-        file_content = await file.read()
+        # Stream, hash and store the content; the size check also covers uploads without a declared size
+        try:
+            blob = await evidence_store.put(file, file.content_type, max_size=10 * 1024 * 1024)
+        except BlobTooLarge:
+            raise HTTPException(status_code=400, detail=f"File {file.filename} exceeds 10MB limit")
         
         # Store file metadata in database
         file_id = str(uuid.uuid4())
@@ -5385,18 +5529,25 @@ async def upload_assessment_evidence(question_id: str = Form(...), files: List[U
             "user_id": current["id"],
             "question_id": question_id,
             "original_filename": file.filename,
-            "stored_filename": unique_filename,
-            "file_size": len(file_content),
+            "stored_filename": blob["sha256"],
+            "sha256": blob["sha256"],
+            "file_path": blob["path"],
+            "file_size": blob["size"],
             "mime_type": file.content_type,
             "upload_date": datetime.utcnow()
         }
         
-        await db.assessment_evidence.insert_one(file_doc)
+        try:
+            await db.assessment_evidence.insert_one(file_doc)
+        except Exception:
+            await evidence_store.release(blob["sha256"])
+            raise
         uploaded_files.append({
             "file_id": file_id,
             "original_filename": file.filename,
-            "file_size": len(file_content)
+            "file_size": blob["size"]
         })
+    await invalidate_client_dashboard(current["id"])
     
     return {
         "message": f"Successfully uploaded {len(uploaded_files)} evidence files",
@@ -5792,17 +5943,14 @@ async def generate_ai_content(prompt: str, content_type: str = "guide") -> str:
         if not EMERGENT_OK:
             return f"AI content generation not available. Manual {content_type} needed."
             
-        chat = LlmChat(
-            api_key=os.environ.get('EMERGENT_LLM_KEY'),
-            session_id=f"kb_generation_{str(uuid.uuid4())[:8]}",
+        response = await llm_gateway.complete(
+            "kb_content",
+            prompt,
             system_message=f"""You are an expert business consultant specializing in small business procurement readiness. 
             Generate comprehensive, actionable {content_type} content for government contracting compliance.
             Focus on practical steps, required documentation, and compliance standards.
             Use clear headings, bullet points, and actionable advice."""
-        ).with_model("openai", "gpt-4o-mini")
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        )
         return response
     except Exception as e:
         logger.error(f"AI content generation failed: {e}")
@@ -5917,6 +6065,7 @@ async def create_kb_article(article: KBArticleIn, current=Depends(require_role("
         }
         
         await db.kb_articles.insert_one(article_doc)
+        kb_search.upsert(article_doc)
         return KBArticleOut(**article_doc)
     except Exception as e:
         logger.error(f"Error creating KB article: {e}")
@@ -5953,6 +6102,30 @@ async def list_kb_articles(
         logger.error(f"Error listing KB articles: {e}")
         raise HTTPException(status_code=500, detail="Failed to list articles")
 
+kb_search = KnowledgeBaseSearch(interval=float(os.environ.get("KB_SEARCH_REFRESH_SECONDS", "300")))
+
+@api.get("/knowledge-base/search")
+async def search_kb_articles(
+    q: str = Query(..., min_length=1, max_length=200),
+    area_id: Optional[str] = Query(None),
+    content_type: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    current=Depends(require_user)
+):
+    """BM25-ranked knowledge base search with snippets and area/content-type facets"""
+    try:
+        await kb_search.ensure_loaded(db.kb_articles)
+        result = kb_search.search(q, limit=limit, cursor=cursor, area_id=area_id, content_type=content_type,
+                                  include_drafts=current.get("role") == "navigator")
+        return {"articles": result["items"], "total": result["total"], "next_cursor": result["next_cursor"],
+                "facets": result["facets"]}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching KB articles: {e}")
+        raise HTTPException(status_code=500, detail="Failed to search articles")
+
 @api.get("/knowledge-base/articles/{article_id}", response_model=KBArticleOut)
 async def get_kb_article(article_id: str, current=Depends(require_user)):
     """Get a specific knowledge base article"""
@@ -6014,6 +6187,7 @@ async def update_kb_article(
         )
         
         updated_article = await db.kb_articles.find_one({"_id": article_id})
+        kb_search.upsert(updated_article)
         return KBArticleOut(**updated_article)
     except HTTPException:
         raise
@@ -6028,6 +6202,7 @@ async def delete_kb_article(article_id: str, current=Depends(require_role("navig
         result = await db.kb_articles.delete_one({"_id": article_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Article not found")
+        kb_search.remove(article_id)
         return {"success": True}
     except HTTPException:
         raise
@@ -6092,7 +6267,6 @@ async def generate_kb_content(
 
 # AI Assistant for Contextual Help
 @api.post("/knowledge-base/ai-assistance")
-@rate_limit(max_requests=10, window_seconds=60)
 async def get_ai_assistance(http_request: Request, request: AIAssistanceRequest, current=Depends(require_user)):
     """Get AI-powered assistance and guidance - Premium feature"""
     try:
@@ -6180,14 +6354,14 @@ async def get_ai_assistance(http_request: Request, request: AIAssistanceRequest,
                 "source": "system_message"
             }
         
-        chat = LlmChat(
-            api_key=os.environ.get('EMERGENT_LLM_KEY'),
-            session_id=f"ai_assistance_{current['id']}_{str(uuid.uuid4())[:8]}",
-            system_message="You are an expert business consultant for small business procurement readiness. Provide concise, actionable advice in under 200 words with clear next steps."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
+        # Rephrasings of the same question in the same context may share an answer (semantic tier)
+        response = await llm_gateway.complete(
+            "ai_assistance",
+            prompt,
+            system_message="You are an expert business consultant for small business procurement readiness. Provide concise, actionable advice in under 200 words with clear next steps.",
+            semantic_text=request.question,
+            semantic_scope=context_str
+        )
         
         # Log the AI assistance interaction
         await db.analytics.insert_one({
@@ -6392,11 +6566,8 @@ async def list_opportunities(area: Optional[str] = None, q: Optional[str] = None
     if area:
         query["area_ids"] = {"$in": [area]}
     if q:
-        query["$or"] = [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}},
-            {"tags": {"$regex": q, "$options": "i"}},
-        ]
+        result = await text_search(db.opportunities, query, q, limit=100, index="opportunities")
+        return {"opportunities": result["items"]}
     items = await db.opportunities.find(query).sort("created_at", -1).to_list(100)
     return {"opportunities": items}
 
@@ -6487,72 +6658,21 @@ async def get_opportunity_match(opp_id: str, current=Depends(require_user)):
 
 # ---------------- Enhanced Client Dashboard APIs ----------------
 
+kpi_materializer = KPIMaterializer(db, interval=float(os.environ.get("PLATFORM_KPI_REFRESH_SECONDS", "300")))
+
 @api.get("/metrics/landing")
-async def landing_metrics():
-    """Public-facing KPIs for landing page (authenticated users will see live metrics)."""
+async def landing_metrics(request: Request):
+    """Public-facing KPIs for landing page, served from the materialized platform_kpis snapshot."""
     try:
-        # Total clients
-        total_clients = await db.users.count_documents({"role": "client"})
-        # Engagements initiated
-        total_engagements = await db.engagements.count_documents({})
-        # Certificates issued
-        total_certs = await db.certificates.count_documents({})
-        # Opportunities open
-        total_opps_open = await db.opportunities.count_documents({"status": "open"}) if hasattr(db, 'opportunities') else 0
-        # Gaps addressed (resource clicks) last 30 days
-        since = datetime.utcnow() - timedelta(days=30)
-        gaps_addr_30d = await db.resource_access_logs.count_documents({"accessed_at": {"$gte": since}})
-        
-        # Readiness progress: avg 'yes' answers per started client
-        pipeline = [
-            {"$match": {"answer": {"$in": ["yes", "y", True, "true", 1]}}},
-            {"$group": {"_id": "$user_id", "yes_count": {"$sum": 1}}},
-            {"$group": {"_id": None, "avg_yes": {"$avg": "$yes_count"}, "started_clients": {"$sum": 1}}}
-        ]
-        prog = await db.assessment_answers.aggregate(pipeline).to_list(1)
-        avg_yes = float(prog[0]["avg_yes"]) if prog else 0.0
-        started_clients = int(prog[0]["started_clients"]) if prog else 0
-        
-        # Provider response time median (hrs) in last 60 days
-        since60 = datetime.utcnow() - timedelta(days=60)
-        responses = await db.provider_responses.find({"created_at": {"$gte": since60}}).limit(500).to_list(500)
-        med_hours = None
-        if responses:
-            deltas = []
-            for r in responses:
-                req = await db.service_requests.find_one({"_id": r.get("request_id")})
-                if req and req.get("created_at") and r.get("created_at"):
-                    dt = (r["created_at"] - req["created_at"]).total_seconds() / 3600.0
-                    if dt >= 0:
-                        deltas.append(dt)
-            if deltas:
-                deltas.sort()
-                m = len(deltas)//2
-                med_hours = deltas[m] if len(deltas)%2==1 else (deltas[m-1]+deltas[m])/2
-        
-        return {
-            "total_clients": total_clients,
-            "engagements": total_engagements,
-            "certificates": total_certs,
-            "opportunities_open": total_opps_open,
-            "gaps_addressed_30d": gaps_addr_30d,
-            "avg_yes_answers": round(avg_yes, 1),
-            "clients_started_assessment": started_clients,
-            "median_provider_response_hrs": round(med_hours, 1) if med_hours is not None else None
-        }
+        await kpi_materializer.ensure_ready()
     except Exception as e:
         logger.error(f"landing_metrics error: {e}")
-        # return safe zeros to avoid breaking landing
-        return {
-            "total_clients": 0,
-            "engagements": 0,
-            "certificates": 0,
-            "opportunities_open": 0,
-            "gaps_addressed_30d": 0,
-            "avg_yes_answers": 0.0,
-            "clients_started_assessment": 0,
-            "median_provider_response_hrs": None
-        }
+        # fall through to the last snapshot, or safe zeros, to avoid breaking landing
+    headers = {"ETag": kpi_materializer.etag, "Cache-Control": "public, max-age=60"}
+    if request.headers.get("if-none-match") == kpi_materializer.etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(kpi_materializer.snapshot(), headers=headers)
+
 @api.get("/assessment/progress/{user_id}")
 async def get_assessment_progress(user_id: str, current=Depends(require_user)):
     """Get assessment progress and completion data"""
@@ -6907,6 +7027,8 @@ async def request_professional_help(request_data: StandardizedEngagementRequest,
         
         # Store in database
         await db.service_requests.insert_one(service_request)
+        await invalidate_client_dashboard(current["id"])
+        agency_rollups.schedule(current["id"])
         
         # Find and notify matching providers
         matching_providers = await db.users.find({
@@ -6936,7 +7058,7 @@ async def request_professional_help(request_data: StandardizedEngagementRequest,
                     "created_at": DataValidator.standardize_timestamp(),
                     "data_version": "1.0"
                 }
-                await db.notifications.insert_one(notification)
+                await insert_notification(notification)
                 notifications_sent += 1
             except Exception as e:
                 logger.error(f"Failed to notify provider {provider['id']}: {e}")
@@ -7080,7 +7202,7 @@ async def respond_to_service_request(response_data: StandardizedProviderResponse
         }
         
         try:
-            await db.notifications.insert_one(client_notification)
+            await insert_notification(client_notification)
             logger.info(f"Client {service_request['client_id']} notified of new proposal from provider {current['id']}")
         except Exception as e:
             logger.error(f"Failed to notify client: {e}")
@@ -7382,6 +7504,11 @@ async def get_provider_ratings(current=Depends(require_role("provider"))):
 
 # ---------------- Agency Tier Management System ----------------
 
+tier_entitlements = TierEntitlementResolver(
+    db, build_cache("tier_entitlements", max_entries=20000),
+    ttl=int(os.environ.get("TIER_ENTITLEMENT_CACHE_TTL", "300"))
+)
+
 @api.get("/agency/tier-configuration")
 async def get_agency_tier_configuration(current=Depends(require_role("agency"))):
     """Get current tier configuration and pricing for the agency"""
@@ -7389,23 +7516,8 @@ async def get_agency_tier_configuration(current=Depends(require_role("agency")))
         config = await db.agency_tier_configurations.find_one({"agency_id": current["id"]})
         
         if not config:
-            # Create default configuration
-            default_config = {
-                "_id": str(uuid.uuid4()),
-                "agency_id": current["id"],
-                "tier_access_levels": {f"area{i}": 1 for i in range(1, 11)},  # Default to tier 1 for all areas
-                "pricing_per_tier": {
-                    "tier1": 25.0,   # Self Assessment - $25
-                    "tier2": 50.0,   # Evidence Required - $50
-                    "tier3": 100.0   # Verification - $100
-                },
-                "monthly_assessments_limit": 50,  # Default limit
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-            
-            await db.agency_tier_configurations.insert_one(default_config)
-            config = default_config
+            # Agencies approved before configurations were created at onboarding
+            config = default_tier_configuration(current["id"])
         
         return {
             "agency_id": config["agency_id"],
@@ -7432,6 +7544,7 @@ async def upgrade_agency_tier_access(
             raise HTTPException(status_code=400, detail="Invalid business area ID")
         
         # Get current configuration
+        await tier_entitlements.ensure_configuration(current["id"])
         config = await db.agency_tier_configurations.find_one({"agency_id": current["id"]})
         
         if not config:
@@ -7454,18 +7567,16 @@ async def upgrade_agency_tier_access(
             upgrade_cost += pricing.get(f"tier{tier}", 0)
         
         # Update tier access
-        new_tier_levels = config["tier_access_levels"].copy()
-        new_tier_levels[area_id] = target_tier
-        
         await db.agency_tier_configurations.update_one(
             {"agency_id": current["id"]},
             {
                 "$set": {
-                    "tier_access_levels": new_tier_levels,
+                    f"tier_access_levels.{area_id}": target_tier,
                     "updated_at": datetime.utcnow()
                 }
             }
         )
+        await tier_entitlements.invalidate_agency(current["id"])
         
         # Log the upgrade for billing
         await db.tier_upgrades.insert_one({
@@ -7587,7 +7698,7 @@ async def get_agency_usage_billing(
 async def get_client_tier_access_info(current=Depends(require_role("client"))):
     """Get client's available tier access levels based on their agency"""
     try:
-        tier_access = await get_client_tier_access(current["id"])
+        tier_access = await get_client_tier_access(current)
         
         # Get area information with tier details
         areas_info = []
@@ -7671,10 +7782,10 @@ async def trigger_dashboard_update(
         
         elif update_type == "service_request_created":
             # Notify matching providers
-            await notify_matching_providers(data.get("service_area"), data.get("request_id"))
+            await notify_matching_providers(parsed_data.get("service_area"), parsed_data.get("request_id"))
             
             # Update agency dashboard
-            await update_agency_service_tracking(user_id, data.get("request_id"))
+            await update_agency_service_tracking(user_id, parsed_data.get("request_id"))
         
         return {"success": True, "update_triggered": True}
         
@@ -7754,6 +7865,7 @@ async def update_client_dashboard_progress(user_id: str):
             },
             upsert=True
         )
+        await response_cache.invalidate_tags(f"user:{user_id}")
         
         return True
     except Exception as e:
@@ -7797,6 +7909,7 @@ async def update_agency_client_progress(user_id: str):
             },
             upsert=True
         )
+        await response_cache.invalidate_tags(f"agency:{agency_user_id}")
         
         return True
     except Exception as e:
@@ -8064,67 +8177,14 @@ async def get_user_service_request_ids(user_id: str) -> List[str]:
         return []
 
 async def notify_matching_providers(service_area: str, request_id: str):
-    """Notify providers who match the service area about new service requests"""
+    """Queue notifications for providers who match the service area; delivery runs in the background"""
     try:
-        # Find providers with matching service areas
-        matching_providers = await db.enhanced_provider_profiles.find({
-            "service_areas": {"$in": [service_area]},
-            "profile_status": "active"
-        }).to_list(None)
-        
-        # Get service request details
-        service_request = await db.service_requests.find_one({"_id": request_id})
-        if not service_request:
-            return False
-        
-        notifications_sent = 0
-        for provider in matching_providers:
-            # Create notification record
-            notification_doc = {
-                "_id": str(uuid.uuid4()),
-                "provider_id": provider["provider_id"],
-                "request_id": request_id,
-                "service_area": service_area,
-                "client_budget": service_request.get("budget", 0),
-                "notification_type": "new_service_request",
-                "status": "pending",
-                "created_at": datetime.utcnow(),
-                "expires_at": datetime.utcnow() + timedelta(hours=48)  # 48-hour response window
-            }
-            
-            await db.provider_notifications.insert_one(notification_doc)
-            notifications_sent += 1
-            
-            # Update provider dashboard (real-time sync)
-            await update_provider_dashboard_notifications(provider["provider_id"], notification_doc)
-        
-        logger.info(f"Sent {notifications_sent} notifications for service request {request_id}")
+        notification_fanout.submit(service_area, request_id)
         return True
-        
     except Exception as e:
         logger.error(f"Error notifying matching providers: {e}")
         return False
 
-async def update_provider_dashboard_notifications(provider_id: str, notification_data: dict):
-    """Update provider dashboard with new notification"""
-    try:
-        # Store real-time update for provider dashboard
-        update_doc = {
-            "_id": str(uuid.uuid4()),
-            "user_id": provider_id,
-            "update_type": "new_service_request_notification",
-            "data": notification_data,
-            "timestamp": datetime.utcnow(),
-            "processed": False
-        }
-        
-        await db.dashboard_updates.insert_one(update_doc)
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error updating provider dashboard: {e}")
-        return False
-
 async def update_agency_service_tracking(user_id: str, request_id: str):
     """Update agency dashboard with client service request tracking"""
     try:
@@ -8195,6 +8255,7 @@ async def update_agency_dashboard_stats(agency_id: str):
             {"$set": stats_doc},
             upsert=True
         )
+        await response_cache.invalidate_tags(f"agency:{agency_id}")
         
         return True
         
@@ -8838,24 +8899,16 @@ async def generate_licenses_for_purchase(transaction: dict, checkout_status: dic
         generated_licenses = []
         
         for tier, count in config.items():
-            for _ in range(count):
-                # Generate 10-digit license code
-                license_code = ''.join([str(random.randint(0, 9)) for _ in range(10)])
-                
-                license_doc = {
-                    "_id": str(uuid.uuid4()),
-                    "code": license_code,
-                    "agency_id": agency_id,
-                    "tier": tier,
-                    "status": "available",
-                    "created_at": datetime.utcnow(),
-                    "expires_at": datetime.utcnow() + timedelta(days=365),  # 1 year expiry
-                    "purchase_transaction_id": transaction["id"],
-                    "generated_from_package": package_id
-                }
-                
-                await db.agency_licenses.insert_one(license_doc)
-                generated_licenses.append(license_code)
+            licenses = await license_minter.mint(
+                count,
+                source="purchase",
+                agency_id=agency_id,
+                tier=tier,
+                expires_at=datetime.utcnow() + timedelta(days=365),  # 1 year expiry
+                purchase_transaction_id=transaction["id"],
+                generated_from_package=package_id
+            )
+            generated_licenses.extend(lic["license_code"] for lic in licenses)
         
         # Update agency statistics
         await db.agencies.update_one(
@@ -9487,6 +9540,9 @@ async def create_match_request(payload: MatchRequestIn, current=Depends(require_
     await db.match_requests.insert_one(doc)
     return {"request_id": request_id}
 
+# Provider profiles indexed by area and price band; kept current by the startup watcher
+provider_match_index = ProviderMatchIndex()
+
 @api.get("/match/{request_id}/matches")
 async def get_matches(request_id: str, current=Depends(require_role("client"))):
     req = await db.match_requests.find_one({"_id": request_id, "user_id": current["id"]})
@@ -9494,32 +9550,19 @@ async def get_matches(request_id: str, current=Depends(require_role("client"))):
         raise HTTPException(status_code=404, detail="Request not found")
     
     # Find providers that match the request criteria
-    providers = await db.provider_profiles.find({}).to_list(5000)
-    matches = []
-    for p in providers:
-        score = 0
-        if req["area_id"] in (p.get("service_areas") or []):
-            score += 50
-        b = req.get("budget") or 0
-        pmin = p.get("price_min") or 0
-        pmax = p.get("price_max") or 0
-        if pmin and pmax and pmin <= b <= pmax:
-            score += 40
-        elif pmin and b >= pmin * 0.8:
-            score += 20
-        if p.get("availability"):
-            score += 10
-        if score > 0:
-            matches.append({
-                "provider_id": p["_id"],
-                "user_id": p.get("user_id"),
-                "score": score,
-                "service_areas": p.get("service_areas", []),
-                "price_range": f"${pmin}-${pmax}" if pmin and pmax else "Contact for pricing"
-            })
-    
-    matches.sort(key=lambda x: x["score"], reverse=True)
-    return {"matches": matches[:10]}  # Return top 10 matches
+    await provider_match_index.ensure_loaded(db.provider_profiles)
+    top = provider_match_index.top_k(req["area_id"], req.get("budget") or 0, 10)
+    matches = [
+        {
+            "provider_id": p.provider_id,
+            "user_id": p.user_id,
+            "score": m.score,
+            "service_areas": p.service_areas,
+            "price_range": p.price_range
+        }
+        for m, p in top
+    ]
+    return {"matches": matches}  # Return top 10 matches
 
 @api.post("/match/respond")
 async def provider_respond(request_id: str = Form(...), proposal_note: str = Form(...), current=Depends(require_role("provider"))):
@@ -9584,25 +9627,11 @@ async def invite_top5(request_id: str, current=Depends(require_role("client"))):
     req = await db.match_requests.find_one({"_id": request_id, "user_id": current["id"]})
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
-    providers = await db.provider_profiles.find({}).to_list(5000)
-    matches = []
-    for p in providers:
-        score = 0
-        if req["area_id"] in (p.get("service_areas") or []):
-            score += 50
-        b = req.get("budget") or 0
-        pmin = p.get("price_min") or 0
-        pmax = p.get("price_max") or 0
-        if pmin and pmax and pmin <= b <= pmax:
-            score += 40
-        elif pmin and b >= pmin * 0.8:
-            score += 20
-        if p.get("availability"):
-            score += 10
-        matches.append({"provider_profile_id": p["_id"], "score": score})
-    matches.sort(key=lambda x: x["score"], reverse=True)
+    await provider_match_index.ensure_loaded(db.provider_profiles)
+    top = provider_match_index.top_k(req["area_id"], req.get("budget") or 0, 5, include_zero=True)
+    matches = [{"provider_profile_id": p.provider_id, "score": m.score} for m, p in top]
     invited = []
-    for m in matches[:5]:
+    for m in matches:
         iid = str(uuid.uuid4())
         rec = {"_id": iid, "id": iid, "request_id": request_id, "provider_profile_id": m["provider_profile_id"], "client_user_id": current["id"], "created_at": datetime.utcnow()}
         await db.provider_invites.update_one({"request_id": request_id, "provider_profile_id": m["provider_profile_id"]}, {"$set": rec}, upsert=True)
@@ -9614,19 +9643,29 @@ async def get_eligible_for_provider(current=Depends(require_role("provider"))):
     prof = await db.provider_profiles.find_one({"user_id": current["id"]})
     if not prof:
         return {"requests": []}
-    service_areas = prof.get("service_areas", [])
-    pmin = prof.get("price_min") or 0
-    pmax = prof.get("price_max") or 0
-    reqs = await db.match_requests.find({"status": {"$in": ["open","engaged"]}}).to_list(5000)
+    provider = ProviderEntry(prof)
+    # Area filtering happens in Mongo; natural order keeps the same requests first as before
+    cursor = db.match_requests.find({
+        "status": {"$in": ["open","engaged"]},
+        "area_id": {"$in": list(provider.areas)}
+    }).sort("$natural", 1)
     out = []
-    for r in reqs:
-        if r.get("area_id") in service_areas:
-            b = r.get("budget") or 0
-            budget_ok = (not pmin and not pmax) or (pmin <= b <= (pmax or b))
-            if budget_ok:
-                invited = await db.provider_invites.find_one({"request_id": r["_id"], "provider_profile_id": prof["_id"]})
-                out.append({"id": r["_id"], "area_id": r.get("area_id"), "budget": b, "timeline": r.get("timeline"), "description": r.get("description"), "invited": bool(invited)})
-    return {"requests": out[:20]}
+    async for r in cursor:
+        b = r.get("budget") or 0
+        if score_match(r.get("area_id"), b, provider).eligible:
+            out.append({"id": r["_id"], "area_id": r.get("area_id"), "budget": b, "timeline": r.get("timeline"), "description": r.get("description"), "invited": False})
+            if len(out) >= 20:
+                break
+    await cursor.close()
+    if out:
+        invites = db.provider_invites.find(
+            {"provider_profile_id": prof["_id"], "request_id": {"$in": [o["id"] for o in out]}},
+            {"request_id": 1}
+        )
+        invited_ids = {inv["request_id"] async for inv in invites}
+        for o in out:
+            o["invited"] = o["id"] in invited_ids
+    return {"requests": out}
 
 # ---------------- Provider proposal attachments ----------------
 @api.post("/provider/proposals/upload/initiate")
@@ -9634,44 +9673,36 @@ async def proposal_upload_initiate(response_id: str = Form(...), file_name: str
     resp = await db.match_responses.find_one({"_id": response_id, "provider_user_id": current["id"]})
     if not resp:
         raise HTTPException(status_code=404, detail="Response not found")
-    uid = str(uuid.uuid4())
-    doc = {"_id": uid, "id": uid, "type": "proposal_attachment", "response_id": response_id, "file_name": file_name, "mime_type": mime_type, "total_size": total_size, "created_at": datetime.utcnow(), "status": "initiated"}
-    await db.uploads.insert_one(doc)
-    (UPLOAD_BASE / uid).mkdir(parents=True, exist_ok=True)
-    return {"upload_id": uid, "chunk_size": 5*1024*1024}
+    try:
+        rec = await chunked_uploads.initiate("proposal_attachment", file_name, mime_type, total_size,
+                                             response_id=response_id, user_id=current["id"])
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"upload_id": rec["_id"], "chunk_size": rec["chunk_size"], "total_chunks": rec["total_chunks"]}
 
 @api.post("/provider/proposals/upload/chunk")
-async def proposal_upload_chunk(upload_id: str = Form(...), chunk_index: int = Form(...), file: UploadFile = File(...), current=Depends(require_role("provider"))):
-    rec = await db.uploads.find_one({"_id": upload_id, "type": "proposal_attachment"})
+async def proposal_upload_chunk(upload_id: str = Form(...), chunk_index: int = Form(...), file: UploadFile = File(...), sha256: Optional[str] = Form(None), current=Depends(require_role("provider"))):
+    rec = await db.uploads.find_one({"_id": upload_id, "type": "proposal_attachment", "user_id": current["id"]})
     if not rec:
         raise HTTPException(status_code=404, detail="Upload not found")
-    part_path = UPLOAD_BASE / upload_id / f"part_{chunk_index}"
-    async with aiofiles.open(part_path, "wb") as out:
-        while True:
-            data = await file.read(1024 * 1024)
-            if not data:
-                break
-            await out.write(data)
-    return {"ok": True}
+    return await receive_upload_chunk(rec, chunk_index, file, sha256)
+
+@api.get("/provider/proposals/upload/{upload_id}/status")
+async def proposal_upload_status(upload_id: str, current=Depends(require_role("provider"))):
+    rec = await db.uploads.find_one({"_id": upload_id, "type": "proposal_attachment", "user_id": current["id"]})
+    if not rec:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return chunked_uploads.status(rec)
 
 @api.post("/provider/proposals/upload/complete")
-async def proposal_upload_complete(upload_id: str = Form(...), total_chunks: int = Form(...), current=Depends(require_role("provider"))):
-    rec = await db.uploads.find_one({"_id": upload_id, "type": "proposal_attachment"})
+async def proposal_upload_complete(upload_id: str = Form(...), total_chunks: Optional[int] = Form(None), current=Depends(require_role("provider"))):
+    rec = await db.uploads.find_one({"_id": upload_id, "type": "proposal_attachment", "user_id": current["id"]})
     if not rec:
         raise HTTPException(status_code=404, detail="Upload not found")
-    final_path = UPLOAD_BASE / f"{upload_id}_{rec.get('file_name') or 'attach'}"
-    async with aiofiles.open(final_path, "wb") as out:
-        for i in range(int(total_chunks)):
-            part_path = UPLOAD_BASE / upload_id / f"part_{i}"
-            async with aiofiles.open(part_path, "rb") as f:
-                while True:
-                    data = await f.read(1024 * 1024)
-                    if not data:
-                        break
-                    await out.write(data)
-    size = final_path.stat().st_size
-    await db.uploads.update_one({"_id": upload_id}, {"$set": {"status": "completed", "stored_path": str(final_path), "final_size": size, "completed_at": datetime.utcnow()}})
-    return {"ok": True, "upload_id": upload_id, "size": size}
+    rec = await complete_chunked_upload(rec, total_chunks)
+    return {"ok": True, "upload_id": upload_id, "size": rec["final_size"]}
 
 @api.get("/provider/proposals/{response_id}/attachments")
 async def proposal_attachments(response_id: str, current=Depends(require_user)):
@@ -9700,6 +9731,7 @@ async def client_assessment_pay(current=Depends(require_role("client"))):
     rid = str(uuid.uuid4())
     tx = {"_id": rid, "id": rid, "transaction_type": "assessment_fee", "amount": ASSESSMENT_FLAT_AMOUNT, "currency": "USD", "status": "processed", "created_at": datetime.utcnow(), "metadata": {"client_user_id": current["id"], "self_paid": True}}
     await db.revenue_transactions.insert_one(tx)
+    await invalidate_client_dashboard(current["id"])
     return {"ok": True, "transaction_id": rid}
 
 @api.get("/opportunities/available")
@@ -9714,9 +9746,26 @@ async def available_opportunities(current=Depends(require_role("client"))):
         return {"opportunities": opps, "unlock": "self_paid"}
     return {"opportunities": []}
 
+async def count_available_opportunities(current: Dict[str, Any]) -> int:
+    """len(available_opportunities(...)["opportunities"]) without loading the documents"""
+    inv = await db.agency_invitations.find_one({"client_user_id": current["id"], "status": "accepted"}, {"agency_user_id": 1})
+    if inv:
+        return await db.agency_opportunities.count_documents({"created_by": inv["agency_user_id"]}, limit=2000)
+    paid = await db.revenue_transactions.find_one({"transaction_type": "assessment_fee", "status": "processed", "metadata.client_user_id": current["id"]}, {"_id": 1})
+    if paid:
+        return await db.agency_opportunities.count_documents({}, limit=5000)
+    return 0
+
 # ---------------- Certificates (JSON + PDF + Public verify) ----------------
 CERT_MIN_READINESS = float(os.environ.get("CERT_MIN_READINESS", 75))
 
+# PDFs render on a process pool and are cached on disk and in memory; certificates are immutable
+certificate_renderer = CertificateRenderer(
+    UPLOAD_BASE / "certificates",
+    max_workers=int(os.environ.get("CERTIFICATE_RENDER_WORKERS", "2")),
+    max_memory_bytes=int(os.environ.get("CERTIFICATE_CACHE_BYTES", str(64 * 1024 * 1024)))
+)
+
 class IssueCertIn(BaseModel):
     client_user_id: str
 
@@ -9755,6 +9804,8 @@ async def issue_certificate(payload: IssueCertIn, current=Depends(require_role("
     cid = str(uuid.uuid4())
     doc = {"_id": cid, "id": cid, "title": "Small Business Maturity Assurance", "agency_user_id": current["id"], "client_user_id": payload.client_user_id, "session_id": sid, "readiness_percent": rpct, "issued_at": datetime.utcnow()}
     await db.certificates.insert_one(doc)
+    await kpi_materializer.increment("certificates")
+    await invalidate_client_dashboard(payload.client_user_id)
     return CertOut(**doc)
 
 @api.get("/agency/certificates")
@@ -9762,6 +9813,19 @@ async def list_agency_certificates(current=Depends(require_role("agency"))):
     certs = await db.certificates.find({"agency_user_id": current["id"]}).to_list(1000)
     return {"certificates": certs}
 
+@api.get("/agency/certificates/download")
+async def download_agency_certificates(request: Request, current=Depends(require_role("agency"))):
+    """Every certificate the agency has issued as one ZIP, streamed while it renders"""
+    certs = await db.certificates.find(
+        {"agency_user_id": current["id"]},
+        {"_id": 1, **{field: 1 for field in CERTIFICATE_FIELDS}}
+    ).sort("issued_at", 1).to_list(None)
+    return StreamingResponse(
+        certificate_renderer.stream_zip(certs, str(request.base_url)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="Polaris_Certificates_{current["id"]}.zip"'}
+    )
+
 @api.get("/client/certificates")
 async def list_client_certificates(current=Depends(require_role("client"))):
     certs = await db.certificates.find({"client_user_id": current["id"]}).to_list(1000)
@@ -11695,51 +11759,8 @@ async def download_certificate_pdf(cert_id: str, request: Request, current=Depen
         raise HTTPException(status_code=404, detail="Not found")
     if current.get("role") not in ("navigator",) and current.get("id") not in (cert.get("agency_user_id"), cert.get("client_user_id")):
         raise HTTPException(status_code=403, detail="Forbidden")
-    from reportlab.lib.pagesizes import LETTER
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import inch
-    from reportlab.graphics.barcode import qr
-    from reportlab.graphics.shapes import Drawing
-    from reportlab.graphics import renderPDF
-
-    base = str(request.base_url)
-    verify_url = f"{base}verify/cert/{cert_id}"
-
-    tmp_path = UPLOAD_BASE / f"certificate_{cert_id}.pdf"
-    c = canvas.Canvas(str(tmp_path), pagesize=LETTER)
-    width, height = LETTER
-    c.setFillColorRGB(0.105, 0.211, 0.365)
-    c.setFont("Helvetica-Bold", 20)
-    c.drawString(1*inch, height-1*inch, "Polaris – Small Business Maturity Assurance")
-    c.setFont("Helvetica", 11)
-    c.drawString(1*inch, height-1.3*inch, "City of San Antonio – Procurement Readiness Platform")
-    c.setFillColorRGB(0,0,0)
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(1*inch, height-2*inch, "Certificate of Opportunity Readiness")
-    c.setFont("Helvetica", 12)
-    c.drawString(1*inch, height-2.4*inch, f"Issued to Client ID: {cert.get('client_user_id')}")
-    c.drawString(1*inch, height-2.7*inch, f"Sponsoring Agency ID: {cert.get('agency_user_id')}")
-    c.drawString(1*inch, height-3.0*inch, f"Assessment Session ID: {cert.get('session_id')}")
-    c.drawString(1*inch, height-3.3*inch, f"Readiness: {cert.get('readiness_percent')}%")
-    c.drawString(1*inch, height-3.6*inch, f"Issued at: {cert.get('issued_at')}")
-
-    qrobj = qr.QrCodeWidget(verify_url)
-    bounds = qrobj.getBounds()
-    size = 1.8*inch
-    w = bounds[2]-bounds[0]
-    h = bounds[3]-bounds[1]
-    d = Drawing(size, size, transform=[size/w, 0, 0, size/h, 0, 0])
-    d.add(qrobj)
-    renderPDF.draw(d, c, width - (size + 1*inch), height - (size + 1*inch))
-    c.setFont("Helvetica", 8)
-    c.drawString(width - (size + 1*inch), height - (size + 1*inch) - 12, f"Verified at: {verify_url}")
-
-    c.setFont("Helvetica-Oblique", 10)
-    c.drawString(1*inch, height-4.1*inch, "This certificate signifies the business has met the evidence-backed readiness threshold.")
-    c.drawString(1*inch, height-4.35*inch, "Validated by the sponsoring agency within the Polaris platform.")
-    c.showPage()
-    c.save()
-    return FileResponse(str(tmp_path), media_type="application/pdf", filename=f"Polaris_Certificate_{cert_id}.pdf")
+    pdf, etag = await certificate_renderer.render(cert, str(request.base_url))
+    return pdf_response(pdf, etag, f"Polaris_Certificate_{cert_id}.pdf", request.headers)
 
 # ---------------- Agency impact for home ----------------
 @api.get("/agency/dashboard/impact")
@@ -11762,161 +11783,26 @@ async def agency_impact(current=Depends(require_role("agency"))):
     return {"invites": {"total": invites_total, "paid": invites_paid, "accepted": invites_accepted}, "revenue": {"assessment_fees": assessment_revenue, "marketplace_fees": marketplace_revenue}, "opportunities": {"count": opp_count}}
 
 # ---------------- Home dashboards ----------------
+client_dashboard = ClientDashboardReadModel(
+    db, build_cache("client_dashboard", max_entries=20000),
+    count_opportunities=count_available_opportunities,
+    ttl=int(os.environ.get("CLIENT_DASHBOARD_CACHE_TTL", "120"))
+)
+
+async def invalidate_client_dashboard(*user_ids: str):
+    """Drop cached /home/client payloads; call after assessment, evidence, service or certificate writes"""
+    await client_dashboard.invalidate(*user_ids)
+    await push_hub.publish_users(user_ids, "dashboard.invalidate", {"dashboard": "client"})
+
 @api.get("/home/client")
 async def home_client(current=Depends(require_role("client"))):
     """Enhanced client dashboard with accurate tier-based assessment data"""
     try:
-        # Get tier-based assessment sessions with data validation
-        tier_sessions = await db.tier_assessment_sessions.find({
-            "user_id": current["id"]
-        }).to_list(None)
-        
-        # Clean up any malformed sessions (defensive programming)
-        valid_sessions = []
-        for session in tier_sessions:
-            # Validate session has required fields and proper area_id
-            area_id = session.get("area_id", "")
-            if area_id.startswith("area") and session.get("user_id") == current["id"]:
-                # Extract area number and validate it's between 1-10
-                try:
-                    area_num = int(area_id.replace("area", ""))
-                    if 1 <= area_num <= 10:
-                        valid_sessions.append(session)
-                except ValueError:
-                    continue  # Skip invalid area IDs
-        
-        tier_sessions = valid_sessions
-        
-        # Calculate assessment completion and gaps with proper validation
-        total_areas = 10  # 10 business areas
-        completed_area_ids = set()  # Use set to prevent counting duplicates
-        critical_gaps = 0
-        total_questions = 0
-        answered_questions = 0
-        evidence_required_questions = 0
-        evidence_submitted_questions = 0
-        
-        for session in tier_sessions:
-            # Track completed areas uniquely
-            if session.get("status") == "completed":
-                area_id = session.get("area_id")
-                if area_id:
-                    completed_area_ids.add(area_id)
-                
-            # Count questions and responses
-            session_questions = len(session.get("questions", []))
-            session_responses = len(session.get("responses", []))
-            total_questions += session_questions
-            answered_questions += session_responses
-            
-            # Check for gaps (no_help responses)
-            for response in session.get("responses", []):
-                if response.get("response") in ["gap_exists", "no_help"]:
-                    critical_gaps += 1
-                elif response.get("response") == "compliant":
-                    # Check if evidence was required and submitted
-                    question_tier = response.get("tier_level", 1)
-                    if question_tier >= 2:
-                        evidence_required_questions += 1
-                        # Check if evidence was submitted
-                        evidence_record = await db.assessment_evidence.find_one({
-                            "session_id": session["_id"],
-                            "question_id": response.get("question_id")
-                        })
-                        if evidence_record:
-                            evidence_submitted_questions += 1
-        
-        # Apply proper validation and capping to prevent impossible values
-        completed_areas = min(len(completed_area_ids), total_areas)  # Count unique areas only
-        completion_percentage = round((completed_areas / total_areas) * 100, 1) if total_areas > 0 else 0
-        completion_percentage = min(100.0, max(0.0, completion_percentage))  # Cap between 0-100%
-        
-        # Calculate readiness score based on evidence-approved answers
-        evidence_approval_rate = 0
-        if evidence_required_questions > 0:
-            # Get approved evidence count
-            approved_evidence = await db.assessment_evidence.count_documents({
-                "user_id": current["id"],
-                "review_status": "approved"
-            })
-            evidence_approval_rate = min(100.0, (approved_evidence / evidence_required_questions) * 100)
-        
-        # Base readiness on completion and evidence approval with proper capping
-        readiness_score = round((completion_percentage * 0.6) + (evidence_approval_rate * 0.4), 1)
-        readiness_score = min(100.0, max(0.0, readiness_score))  # Cap between 0-100%
-        readiness_score = round((completion_percentage * 0.6) + (evidence_approval_rate * 0.4), 1)
-        
-        # Get active service requests
-        active_services = await db.service_requests.count_documents({
-            "client_id": current["id"],
-            "status": {"$in": ["active", "in_progress", "pending"]}
-        })
-        
-        # Get certificates
-        cert = await db.certificates.find_one({"client_user_id": current["id"]})
-        
-        # Get opportunities
-        try:
-            avail = await available_opportunities(current=current)
-            opportunities_count = len(avail.get("opportunities", []))
-        except:
-            opportunities_count = 0
-        
-        # Get profile completion
-        prof = await db.business_profiles.find_one({"user_id": current["id"]})
-        
-        # Get agency information for governance
-        agency_info = None
-        if current.get("license_code"):
-            # Find agency that issued this license
-            license_record = await db.license_codes.find_one({"code": current["license_code"]})
-            if license_record:
-                agency = await db.users.find_one({"id": license_record.get("agency_user_id")})
-                if agency:
-                    agency_info = {
-                        "agency_id": agency["id"],
-                        "agency_email": agency["email"],
-                        "company_name": agency.get("company_name", "Local Agency")
-                    }
-        
-        return {
-            "readiness": readiness_score,
-            "completion_percentage": completion_percentage,
-            "critical_gaps": critical_gaps,
-            "active_services": active_services,
-            "total_questions": total_questions,
-            "answered_questions": answered_questions,
-            "evidence_required": evidence_required_questions,
-            "evidence_submitted": evidence_submitted_questions,
-            "has_certificate": bool(cert),
-            "opportunities": opportunities_count,
-            "profile_complete": bool(prof and prof.get("logo_upload_id")),
-            "agency_info": agency_info,
-            "assessment_areas": {
-                "total": total_areas,
-                "completed": completed_areas,
-                "in_progress": len([s for s in tier_sessions if s.get("status") == "active"])
-            }
-        }
-        
+        return await client_dashboard.get(current)
     except Exception as e:
         logger.error(f"Error getting client dashboard data: {e}")
         # Fallback to basic data
-        return {
-            "readiness": 0,
-            "completion_percentage": 0,
-            "critical_gaps": 0,
-            "active_services": 0,
-            "total_questions": 0,
-            "answered_questions": 0,
-            "evidence_required": 0,
-            "evidence_submitted": 0,
-            "has_certificate": False,
-            "opportunities": 0,
-            "profile_complete": False,
-            "agency_info": None,
-            "assessment_areas": {"total": 10, "completed": 0, "in_progress": 0}
-        }
+        return copy.deepcopy(EMPTY_CLIENT_DASHBOARD)
 
 @api.get("/home/provider")
 async def home_provider(current=Depends(require_role("provider"))):
@@ -12029,7 +11915,7 @@ async def google_callback(code: Optional[str] = None, state: Optional[str] = Non
     if not code:
         raise HTTPException(status_code=400, detail="Missing code")
     # Exchange code
-    token_resp = requests.post("https://oauth2.googleapis.com/token", data={
+    token_resp = await http_client.post("https://oauth2.googleapis.com/token", data={
         "code": code,
         "client_id": GOOGLE_CLIENT_ID,
         "client_secret": GOOGLE_CLIENT_SECRET,
@@ -12043,7 +11929,7 @@ async def google_callback(code: Optional[str] = None, state: Optional[str] = Non
     if not access_token:
         raise HTTPException(status_code=400, detail="No access token")
     # Fetch userinfo
-    ui = requests.get("https://www.googleapis.com/oauth2/v3/userinfo", headers={"Authorization": f"Bearer {access_token}"})
+    ui = await http_client.get("https://www.googleapis.com/oauth2/v3/userinfo", headers={"Authorization": f"Bearer {access_token}"})
     if ui.status_code != 200:
         raise HTTPException(status_code=400, detail="Failed to fetch userinfo")
     info = ui.json()
@@ -12616,6 +12502,8 @@ async def generate_certificate(
         }
         
         await db.certificates.insert_one(certificate_data)
+        await kpi_materializer.increment("certificates")
+        await invalidate_client_dashboard(client_user_id)
         
         return {
             "certificate_id": certificate_id,
@@ -12701,10 +12589,11 @@ async def search_opportunities(
     budget_max: Optional[float] = Query(None),
     location: Optional[str] = Query(None),
     tags: Optional[str] = Query(None),  # comma-separated
-    sort_by: Optional[str] = Query("created_at"),
+    sort_by: Optional[str] = Query(None),  # relevance when q is given, else created_at
     sort_order: Optional[str] = Query("desc"),
     limit: int = Query(20, le=100),
     offset: int = Query(0),
+    cursor: Optional[str] = Query(None),
     current=Depends(require_user)
 ):
     """Advanced search for procurement opportunities"""
@@ -12712,12 +12601,6 @@ async def search_opportunities(
         # Build search query
         query = {"status": "open"}
         
-        if q:
-            query["$or"] = [
-                {"title": {"$regex": q, "$options": "i"}},
-                {"description": {"$regex": q, "$options": "i"}}
-            ]
-        
         if area_ids:
             area_list = area_ids.split(",")
             query["area_ids"] = {"$in": area_list}
@@ -12731,17 +12614,34 @@ async def search_opportunities(
             query["budget_max"] = budget_query
         
         if location:
-            query["location"] = {"$regex": location, "$options": "i"}
+            query["location"] = {"$regex": re.escape(location), "$options": "i"}
         
         if tags:
             tag_list = tags.split(",")
             query["tags"] = {"$in": tag_list}
         
+        if q and sort_by in (None, "relevance"):
+            # Relevance-ranked; pass next_cursor back as cursor for the following page
+            result = await text_search(db.opportunities, query, q, limit=limit, cursor=cursor, offset=offset,
+                                       facet_fields=("area_ids", "tags"),
+                                       highlight_fields=("title", "description"), index="opportunities")
+            return {
+                "opportunities": result["items"],
+                "total": result["total"],
+                "limit": limit,
+                "offset": offset,
+                "has_more": result["next_cursor"] is not None,
+                "next_cursor": result["next_cursor"],
+                "facets": result["facets"]
+            }
+        if q:
+            query["$text"] = {"$search": q}
+        
         # Execute search with sorting and pagination
         sort_direction = -1 if sort_order == "desc" else 1
         
         opportunities = await db.opportunities.find(query)\
-            .sort(sort_by, sort_direction)\
+            .sort(sort_by or "created_at", sort_direction)\
             .skip(offset)\
             .limit(limit)\
             .to_list(limit)
@@ -12756,6 +12656,10 @@ async def search_opportunities(
             "has_more": offset + limit < total_count
         }
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error searching opportunities: {e}")
         raise HTTPException(status_code=500, detail="Search failed")
@@ -12788,7 +12692,7 @@ async def send_notification(notification: NotificationIn, current=Depends(requir
             "created_at": datetime.utcnow()
         }
         
-        await db.notifications.insert_one(notification_doc)
+        await insert_notification(notification_doc)
         
         # In production, this would trigger push notifications, emails, etc.
         
@@ -12932,7 +12836,6 @@ async def get_dashboard_stats(current=Depends(require_user)):
 
 # Evidence Upload and Navigator Review Endpoints
 from fastapi import File, UploadFile
-import shutil
 import os
 
 @api.post("/assessment/evidence/upload")
@@ -12954,51 +12857,50 @@ async def upload_evidence(
         if not session:
             raise HTTPException(status_code=404, detail="Assessment session not found")
         
-        # Create evidence directory if it doesn't exist
-        evidence_dir = f"/app/evidence/{session_id}/{question_id}"
-        os.makedirs(evidence_dir, exist_ok=True)
-        
         uploaded_files = []
+        allowed_extensions = {'.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.txt'}
         
-        for file in files:
-            # Validate file type
-            allowed_extensions = {'.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.txt'}
-            file_extension = os.path.splitext(file.filename)[1].lower()
-            
-            if file_extension not in allowed_extensions:
-                raise HTTPException(status_code=400, detail=f"File type {file_extension} not allowed")
-            
-            # Generate unique filename
-            import uuid
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(evidence_dir, unique_filename)
+        try:
+            for file in files:
+                # Validate file type
+                file_extension = os.path.splitext(file.filename)[1].lower()
+                
+                if file_extension not in allowed_extensions:
+                    raise HTTPException(status_code=400, detail=f"File type {file_extension} not allowed")
+                
+                # Stream into the content-addressed store; identical documents share one blob
+                blob = await evidence_store.put(file, file.content_type)
+                uploaded_files.append({
+                    "original_name": file.filename,
+                    "stored_name": f"{blob['sha256']}{file_extension}",
+                    "sha256": blob["sha256"],
+                    "file_path": blob["path"],
+                    "file_size": blob["size"],
+                    "mime_type": file.content_type,
+                    "uploaded_at": datetime.utcnow()
+                })
             
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            # Store evidence metadata in database
+            evidence_record = {
+                "id": str(uuid.uuid4()),
+                "session_id": session_id,
+                "question_id": question_id,
+                "user_id": current_user["id"],
+                "evidence_description": evidence_description,
+                "files": uploaded_files,
+                "uploaded_at": datetime.utcnow(),
+                "review_status": "pending",
+                "navigator_review": None
+            }
             
-            uploaded_files.append({
-                "original_name": file.filename,
-                "stored_name": unique_filename,
-                "file_path": file_path,
-                "file_size": os.path.getsize(file_path),
-                "uploaded_at": datetime.utcnow()
-            })
-        
-        # Store evidence metadata in database
-        evidence_record = {
-            "id": str(uuid.uuid4()),
-            "session_id": session_id,
-            "question_id": question_id,
-            "user_id": current_user["id"],
-            "evidence_description": evidence_description,
-            "files": uploaded_files,
-            "uploaded_at": datetime.utcnow(),
-            "review_status": "pending",
-            "navigator_review": None
-        }
-        
-        await db.assessment_evidence.insert_one(evidence_record)
+            await db.assessment_evidence.insert_one(evidence_record)
+        except Exception:
+            # Nothing refers to these blobs without the record; the collector reclaims any left unreferenced
+            for stored in uploaded_files:
+                await evidence_store.release(stored["sha256"])
+            raise
+        await invalidate_client_dashboard(current_user["id"])
+        agency_rollups.schedule(current_user["id"])
         
         return {
             "evidence_id": evidence_record["id"],
@@ -13006,6 +12908,8 @@ async def upload_evidence(
             "status": "uploaded"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading evidence: {e}")
         raise HTTPException(status_code=500, detail="Failed to upload evidence")
@@ -13091,6 +12995,8 @@ async def review_evidence(
         # Send notification to user about review completion
         evidence = await db.assessment_evidence.find_one({"id": evidence_id})
         if evidence:
+            await invalidate_client_dashboard(evidence.get("user_id"))
+            agency_rollups.schedule(evidence.get("user_id"))
             notification = {
                 "_id": str(uuid.uuid4()),
                 "id": str(uuid.uuid4()),
@@ -13102,7 +13008,7 @@ async def review_evidence(
                 "read": False,
                 "created_at": datetime.utcnow()
             }
-            await db.notifications.insert_one(notification)
+            await insert_notification(notification)
         
         return {
             "status": "reviewed",
@@ -13503,9 +13409,10 @@ async def ai_contract_matching(
 async def download_evidence_file(
     evidence_id: str,
     file_name: str,
+    request: Request,
     current=Depends(require_role("navigator"))
 ):
-    """Download evidence file for navigator review"""
+    """Download evidence file for navigator review; supports single byte-range requests"""
     try:
         # Get evidence record
         evidence = await db.assessment_evidence.find_one({"id": evidence_id})
@@ -13522,158 +13429,59 @@ async def download_evidence_file(
         if not target_file:
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Return file for download
-        from fastapi.responses import FileResponse
-        return FileResponse(
-            path=target_file["file_path"],
-            filename=target_file["original_name"],
-            media_type='application/octet-stream'
-        )
+        try:
+            return blob_response(
+                target_file["file_path"],
+                target_file["original_name"],
+                request.headers.get("range"),
+                media_type=target_file.get("mime_type") or "application/octet-stream"
+            )
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error downloading evidence file: {e}")
         raise HTTPException(status_code=500, detail="Failed to download file")
 
 # Agency Business Intelligence Dashboard
+agency_rollups = AgencyRollupStore(
+    db,
+    max_age=int(os.environ.get("AGENCY_ROLLUP_MAX_AGE", "3600")),
+    debounce=float(os.environ.get("AGENCY_ROLLUP_DEBOUNCE_SECONDS", "2"))
+)
+
 @api.get("/agency/business-intelligence")
 async def get_agency_business_intelligence(current=Depends(require_role("agency"))):
     """Get comprehensive business intelligence dashboard for agency to track sponsored businesses"""
     try:
-        # Get all clients sponsored by this agency
-        sponsored_clients = await db.users.find({
-            "role": "client",
-            "license_code": {"$exists": True}
-        }).to_list(None)
-        
-        # Filter clients that belong to this agency
-        agency_clients = []
-        for client in sponsored_clients:
-            if client.get("license_code"):
-                license_record = await db.license_codes.find_one({"code": client["license_code"]})
-                if license_record and license_record.get("agency_user_id") == current["id"]:
-                    agency_clients.append(client)
-        
-        # Calculate comprehensive metrics for each client
-        client_metrics = []
-        for client in agency_clients:
-            # Get tier-based assessment data
-            tier_sessions = await db.tier_assessment_sessions.find({
-                "user_id": client["id"]
-            }).to_list(None)
-            
-            # Calculate client metrics
-            total_areas = 10
-            completed_areas = 0
-            critical_gaps = 0
-            evidence_required = 0
-            evidence_submitted = 0
-            evidence_approved = 0
-            
-            for session in tier_sessions:
-                if session.get("status") == "completed":
-                    completed_areas += 1
-                
-                for response in session.get("responses", []):
-                    if response.get("response") in ["gap_exists", "no_help"]:
-                        critical_gaps += 1
-                    elif response.get("response") == "compliant" and response.get("tier_level", 1) >= 2:
-                        evidence_required += 1
-                        # Check evidence submission and approval
-                        evidence_record = await db.assessment_evidence.find_one({
-                            "session_id": session["_id"],
-                            "question_id": response.get("question_id")
-                        })
-                        if evidence_record:
-                            evidence_submitted += 1
-                            if evidence_record.get("review_status") == "approved":
-                                evidence_approved += 1
-            
-            # Get service request activity
-            active_services = await db.service_requests.count_documents({
-                "client_id": client["id"],
-                "status": {"$in": ["active", "in_progress", "pending"]}
-            })
-            
-            completed_services = await db.engagements.count_documents({
-                "client_id": client["id"],
-                "status": "completed"
-            })
-            
-            # Calculate readiness score
-            completion_rate = (completed_areas / total_areas) * 100 if total_areas > 0 else 0
-            evidence_approval_rate = (evidence_approved / evidence_required) * 100 if evidence_required > 0 else 0
-            readiness_score = round((completion_rate * 0.6) + (evidence_approval_rate * 0.4), 1)
-            
-            client_metrics.append({
-                "client_id": client["id"],
-                "client_email": client["email"],
-                "company_name": client.get("company_name", "Unknown"),
-                "registration_date": client.get("created_at"),
-                "assessment_completion": completion_rate,
-                "readiness_score": readiness_score,
-                "critical_gaps": critical_gaps,
-                "evidence_required": evidence_required,
-                "evidence_submitted": evidence_submitted,
-                "evidence_approved": evidence_approved,
-                "active_services": active_services,
-                "completed_services": completed_services,
-                "compliance_status": "compliant" if critical_gaps == 0 and evidence_approval_rate >= 80 else "needs_attention"
-            })
-        
-        # Calculate aggregate metrics
-        total_clients = len(agency_clients)
-        avg_readiness = sum(c["readiness_score"] for c in client_metrics) / total_clients if total_clients > 0 else 0
-        compliant_clients = len([c for c in client_metrics if c["compliance_status"] == "compliant"])
-        total_gaps = sum(c["critical_gaps"] for c in client_metrics)
-        total_evidence_pending = sum(c["evidence_required"] - c["evidence_submitted"] for c in client_metrics)
+        agency_clients, client_metrics = await agency_rollups.for_agency(current["id"])
+        client_ids = [c["id"] for c in agency_clients]
         
         # Get monthly trends
-        from datetime import datetime, timedelta
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         
         recent_assessments = await db.tier_assessment_sessions.count_documents({
-            "user_id": {"$in": [c["id"] for c in agency_clients]},
+            "user_id": {"$in": client_ids},
             "created_at": {"$gte": thirty_days_ago},
             "status": "completed"
         })
         
         recent_evidence_submissions = await db.assessment_evidence.count_documents({
-            "user_id": {"$in": [c["id"] for c in agency_clients]},
+            "user_id": {"$in": client_ids},
             "uploaded_at": {"$gte": thirty_days_ago}
         })
         
-        # Governance alerts
-        governance_alerts = []
-        for client in client_metrics:
-            if client["critical_gaps"] > 5:
-                governance_alerts.append({
-                    "type": "high_risk",
-                    "client_email": client["client_email"],
-                    "message": f"Client has {client['critical_gaps']} critical gaps requiring immediate attention"
-                })
-            if client["evidence_required"] > 0 and client["evidence_submitted"] == 0:
-                governance_alerts.append({
-                    "type": "evidence_missing",
-                    "client_email": client["client_email"],
-                    "message": f"Client has {client['evidence_required']} evidence submissions pending"
-                })
-        
         return {
-            "agency_overview": {
-                "total_sponsored_clients": total_clients,
-                "average_readiness_score": round(avg_readiness, 1),
-                "compliant_clients": compliant_clients,
-                "compliance_rate": round((compliant_clients / total_clients) * 100, 1) if total_clients > 0 else 0,
-                "total_critical_gaps": total_gaps,
-                "pending_evidence_reviews": total_evidence_pending
-            },
+            "agency_overview": agency_overview(client_metrics),
             "monthly_activity": {
                 "assessments_completed": recent_assessments,
                 "evidence_submissions": recent_evidence_submissions,
                 "period": "last_30_days"
             },
             "client_details": client_metrics,
-            "governance_alerts": governance_alerts,
+            "governance_alerts": governance_alerts(client_metrics),
             "generated_at": datetime.utcnow().isoformat()
         }
         
@@ -13727,7 +13535,7 @@ async def verify_business_documents(
         await db.document_verifications.insert_one(verification_doc)
         
         # Send notification to navigators for review
-        await db.notifications.insert_one({
+        await insert_notification({
             "_id": str(uuid.uuid4()),
             "user_id": "navigator_queue",  # Special queue for navigators
             "title": "Document Verification Required",
@@ -14173,6 +13981,7 @@ async def submit_verification(
             {"_id": current["id"]},
             {"$set": {"verification_status": "pending", "verification_submitted_at": datetime.utcnow()}}
         )
+        await invalidate_principal(current["id"])
         
         return {
             "success": True,
@@ -14602,6 +14411,7 @@ async def bulk_update_users(
             {"id": {"$in": user_ids}},
             {"$set": sanitized_data}
         )
+        await invalidate_principal(*user_ids)
         
         return {
             "updated_count": result.modified_count,
@@ -14850,6 +14660,8 @@ async def generate_branded_certificate(
         }
         
         await db.certificates.insert_one(certificate_data)
+        await kpi_materializer.increment("certificates")
+        await invalidate_client_dashboard(client_user_id)
         
         # Log certificate generation
         await db.analytics.insert_one({
@@ -15289,7 +15101,8 @@ async def search_service_offerings(
     query: str = Query(None),
     category: str = Query(None),
     limit: int = Query(20, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None)
 ):
     """Search available service offerings"""
     try:
@@ -15298,20 +15111,32 @@ async def search_service_offerings(
         if category:
             filters["category"] = category
             
+        extra = {}
         if query:
-            filters["$text"] = {"$search": query}
-        
-        services = await db.service_offerings.find(filters).skip(offset).limit(limit).to_list(length=None)
+            result = await text_search(db.service_offerings, filters, query, limit=limit, cursor=cursor, offset=offset,
+                                       facet_fields=("category",), highlight_fields=("title", "description"),
+                                       index="service_offerings")
+            services, total = result["items"], result["total"]
+            extra = {"next_cursor": result["next_cursor"], "facets": result["facets"]}
+        else:
+            services, total = await asyncio.gather(
+                db.service_offerings.find(filters).skip(offset).limit(limit).to_list(length=None),
+                db.service_offerings.count_documents(filters)
+            )
         
         # Add provider information
+        provider_ids = list({service["provider_id"] for service in services})
+        providers = {p["_id"]: p async for p in db.users.find({"_id": {"$in": provider_ids}}, {"business_profile": 1, "rating": 1})}
         for service in services:
-            provider = await db.users.find_one({"_id": service["provider_id"]})
+            provider = providers.get(service["provider_id"])
             if provider:
                 service["provider_name"] = provider.get("business_profile", {}).get("company_name", "Professional Provider")
                 service["provider_rating"] = provider.get("rating", 4.5)
         
-        return {"services": services, "total": len(services)}
+        return {"services": services, "total": total, **extra}
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error searching service offerings: {e}")
         raise HTTPException(status_code=500, detail="Failed to search services")
@@ -15383,28 +15208,20 @@ async def search_gigs(
     delivery_time: int = 30,
     rating: float = 0,
     limit: int = 20,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """Search and discover service gigs"""
     try:
         # Build search filters
         filters = {"status": "active"}
         
-        if q:
-            filters["$or"] = [
-                {"title": {"$regex": q, "$options": "i"}},
-                {"description": {"$regex": q, "$options": "i"}},
-                {"tags": {"$in": [q]}}
-            ]
-        
         if category:
             filters["category"] = category
         
-        # Price filter (check all packages)
+        # Price filter: any single package within the range (combined with the text query, not replacing it)
         if min_price > 0 or max_price < 999999:
-            filters["$or"] = [
-                {"packages.price": {"$gte": min_price * 100, "$lte": max_price * 100}}
-            ]
+            filters["packages"] = {"$elemMatch": {"price": {"$gte": min_price * 100, "$lte": max_price * 100}}}
         
         # Delivery time filter
         if delivery_time < 30:
@@ -15414,25 +15231,42 @@ async def search_gigs(
         if rating > 0:
             filters["rating"] = {"$gte": rating}
         
-        # Execute search with pagination
-        gigs = await db.service_gigs.find(filters).skip(offset).limit(limit).to_list(limit)
+        extra = {}
+        if q:
+            result = await text_search(db.service_gigs, filters, q, limit=limit, cursor=cursor, offset=offset,
+                                       facet_fields=("category", "tags"), highlight_fields=("title", "description"),
+                                       index="service_gigs")
+            gigs, total_count = result["items"], result["total"]
+            has_more = result["next_cursor"] is not None
+            extra = {"next_cursor": result["next_cursor"], "facets": result["facets"]}
+        else:
+            # Execute search with pagination
+            gigs, total_count = await asyncio.gather(
+                db.service_gigs.find(filters).skip(offset).limit(limit).to_list(limit),
+                db.service_gigs.count_documents(filters)
+            )
+            has_more = (offset + limit) < total_count
         
         # Enrich with provider data
+        provider_ids = list({gig["provider_user_id"] for gig in gigs})
+        providers = {p["_id"]: p async for p in db.users.find({"_id": {"$in": provider_ids}},
+                                                              {"name": 1, "avatar_url": 1, "provider_level": 1})}
         for gig in gigs:
-            provider = await db.users.find_one({"_id": gig["provider_user_id"]})
+            provider = providers.get(gig["provider_user_id"])
             if provider:
                 gig["provider_name"] = provider.get("name", "Anonymous")
                 gig["provider_avatar"] = provider.get("avatar_url", "")
                 gig["provider_level"] = provider.get("provider_level", "New Seller")
         
-        total_count = await db.service_gigs.count_documents(filters)
-        
         return {
             "gigs": gigs,
             "total_count": total_count,
-            "has_more": (offset + limit) < total_count
+            "has_more": has_more,
+            **extra
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error searching gigs: {e}")
         raise HTTPException(status_code=500, detail="Failed to search gigs")
@@ -15945,15 +15779,19 @@ async def get_zip_centroid(zip_code: str):
     except Exception:
         return None
 
-from math import cos, asin, sqrt
+def schedule_provider_location_backfill():
+    """
+    Start a backfill pass on app.state, which keeps the task referenced until it finishes.
+    A pass requested while another runs waits for it, so passes never overlap.
+    """
+    previous = getattr(app.state, "provider_location_backfill", None)
 
-def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float):
-    try:
-        p = 0.017453292519943295
-        a = 0.5 - cos((lat2-lat1)*p)/2 + cos(lat1*p)*cos(lat2*p)*(1-cos((lon2-lon1)*p))/2
-        return 3958.7613 * 2 * asin(sqrt(a))
-    except Exception:
-        return None
+    async def run():
+        if previous is not None and not previous.done():
+            await asyncio.wait([previous])
+        return await backfill_provider_locations(db)
+
+    app.state.provider_location_backfill = asyncio.create_task(run())
 
 @api.post("/admin/zip-centroids")
 async def admin_upload_zip_centroids(payload: Dict[str, Any] = Body(...), current=Depends(require_user)):
@@ -15963,15 +15801,9 @@ async def admin_upload_zip_centroids(payload: Dict[str, Any] = Body(...), curren
     centroids = payload.get("centroids") or []
     if not isinstance(centroids, list) or not centroids:
         raise HTTPException(status_code=400, detail="centroids array required")
-    count = 0
-    for c in centroids:
-        try:
-            z = str(c.get("zip"))
-            lat = float(c.get("lat")); lng = float(c.get("lng"))
-            await db.zip_centroids.update_one({"zip": z}, {"$set": {"zip": z, "lat": lat, "lng": lng}}, upsert=True)
-            count += 1
-        except Exception:
-            continue
+    count = await upsert_zip_centroids(db.zip_centroids, centroids)
+    # New centroids can place providers that had no point yet; resolve them off the request path
+    schedule_provider_location_backfill()
     return {"count": count}
 
 @api.post("/v2/matching/search-by-zip")
@@ -15982,36 +15814,24 @@ async def v2_matching_search_by_zip(payload: Dict[str, Any] = Body(...), current
         return {"enabled": False, "message": "ENABLE_RADIUS_MATCHING is false"}
     zipcode = str(payload.get("zip") or payload.get("zipcode") or "").strip()
     radius = float(payload.get("radius_miles", 50))
+    offset = max(int(payload.get("offset", 0)), 0)
+    limit = min(max(int(payload.get("limit", 100)), 1), 1000)
     if not zipcode:
         raise HTTPException(status_code=400, detail="zip is required")
     center = await get_zip_centroid(zipcode)
     if not center:
         return {"providers": [], "count": 0, "note": "Zip centroid not found. Upload centroids via /api/admin/zip-centroids."}
-    providers = await db.users.find({"role": "provider", "approval_status": "approved", "is_active": True}).limit(1000).to_list(1000)
+    providers, total = await search_providers_near(db.users, center["lat"], center["lng"], radius, offset, limit)
     results = []
-    for pdoc in providers:
-        prov_zip = (pdoc.get("location") or {}).get("zipcode") or pdoc.get("zipcode")
-        if not prov_zip:
-            b = await db.business_profiles.find_one({"user_id": pdoc.get("_id")})
-            prov_zip = (b or {}).get("zipcode")
-        if not prov_zip:
-            continue
-        cz = await get_zip_centroid(str(prov_zip))
-        if not cz:
-            continue
-        d = haversine_miles(center["lat"], center["lng"], cz["lat"], cz["lng"]) or 9999
-        if d <= radius:
-            results.append({
-                "providerId": pdoc.get("_id"),
-                "businessName": pdoc.get("company_name") or pdoc.get("name") or "Unknown Business",
-                "distanceMiles": round(d, 1),
-                "rating": pdoc.get("rating")
-            })
-    results.sort(key=lambda r: r["distanceMiles"])
-    top5_ids = [r["providerId"] for r in results[:5]]
-    for r in results:
-        r["inTop5"] = r["providerId"] in top5_ids
-    return {"providers": results, "count": len(results)}
+    for rank, pdoc in enumerate(providers, start=offset):
+        results.append({
+            "providerId": pdoc.get("_id"),
+            "businessName": pdoc.get("company_name") or pdoc.get("name") or "Unknown Business",
+            "distanceMiles": round(pdoc.get("distance_miles", 0), 1),
+            "rating": pdoc.get("rating"),
+            "inTop5": rank < 5
+        })
+    return {"providers": results, "count": total, "offset": offset, "limit": limit}
 
 @api.post("/v2/rp/requirements")
 async def v2_set_rp_requirements(payload: Dict[str, Any] = Body(...), current=Depends(require_user)):
@@ -16319,6 +16139,109 @@ async def get_client_insights(client_id: str, current=Depends(require_user)):
         logger.error(f"Client insights error: {e}")
         raise HTTPException(status_code=500, detail="Unable to generate insights")
 
+# ---------------- Real-time push ----------------
+push_hub = PushHub(build_backplane(), max_queue=int(os.environ.get("PUSH_QUEUE_SIZE", "256")))
+dashboard_update_relay = DashboardUpdateRelay(db.dashboard_updates, push_hub)
+chat_history = ChatHistory(db)
+PUSH_AUTH_TIMEOUT = float(os.environ.get("PUSH_AUTH_TIMEOUT_SECONDS", "10"))
+PUSH_HEARTBEAT_SECONDS = float(os.environ.get("PUSH_HEARTBEAT_SECONDS", "25"))
+
+async def insert_notification(notification: Dict[str, Any]):
+    """Store a notification and push it to its recipient's open connections"""
+    result = await db.notifications.insert_one(notification)
+    await push_hub.publish(user_channel(notification["user_id"]), "notification", notification)
+    return result
+
+async def set_chat_presence(chat_id: str, current: Dict[str, Any], online: bool):
+    await db.chat_participants.update_one(
+        {"chat_id": chat_id, "user_id": current["id"]},
+        {"$set": {"last_seen": datetime.utcnow(), "active": online}}
+    )
+    await push_hub.publish(chat_channel(chat_id), "chat.presence", {
+        "chat_id": chat_id,
+        "user_id": current["id"],
+        "name": current.get("name", current.get("email", "Unknown")),
+        "role": current.get("role", "user"),
+        "online": online
+    })
+
+@api.websocket("/push")
+async def push_socket(websocket: WebSocket):
+    """
+    Push channel for notifications, chat and dashboard updates. The first frame must be
+    {"token": "<access token>"}; afterwards the client may send {"action": "subscribe" |
+    "unsubscribe", "chat_id": ...} for chats it participates in, or {"action": "ping"}.
+    """
+    await websocket.accept()
+    try:
+        auth = await asyncio.wait_for(websocket.receive_json(), timeout=PUSH_AUTH_TIMEOUT)
+        current = await get_current_user(f"Bearer {auth.get('token', '')}") if isinstance(auth, dict) else None
+    except (asyncio.TimeoutError, WebSocketDisconnect, ValueError):
+        current = None
+    if not current:
+        await websocket.close(code=4401)
+        return
+
+    subscription = await push_hub.connect(current["id"])
+    if current.get("role") == "navigator":
+        await push_hub.join(subscription, user_channel("navigator_queue"))
+    chats = set()
+
+    async def forward():
+        while True:
+            message = await subscription.get(timeout=PUSH_HEARTBEAT_SECONDS)
+            await websocket.send_text(message if message is not None else '{"type": "heartbeat"}')
+
+    sender = asyncio.create_task(forward())
+    try:
+        await websocket.send_json({"type": "ready", "user_id": current["id"]})
+        while True:
+            frame = await websocket.receive_json()
+            action = frame.get("action") if isinstance(frame, dict) else None
+            chat_id = frame.get("chat_id") if isinstance(frame, dict) else None
+            if action == "ping":
+                await websocket.send_json({"type": "pong"})
+            elif action == "subscribe" and chat_id:
+                participant = await db.chat_participants.find_one({"chat_id": chat_id, "user_id": current["id"]},
+                                                                  {"_id": 1})
+                if not participant:
+                    await websocket.send_json({"type": "error", "chat_id": chat_id, "detail": "Not a participant"})
+                    continue
+                await push_hub.join(subscription, chat_channel(chat_id))
+                chats.add(chat_id)
+                await set_chat_presence(chat_id, current, True)
+            elif action == "unsubscribe" and chat_id in chats:
+                await push_hub.leave(subscription, chat_channel(chat_id))
+                chats.discard(chat_id)
+                await set_chat_presence(chat_id, current, False)
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        await push_hub.disconnect(subscription)
+        for chat_id in chats:
+            try:
+                await set_chat_presence(chat_id, current, False)
+            except Exception as e:
+                logger.warning(f"Could not clear chat presence for {current['id']}: {e}")
+
+@api.get("/push/stream")
+async def push_stream(request: Request, current=Depends(require_user)):
+    """Server-sent events fallback for networks that block WebSockets; user channel only"""
+    subscription = await push_hub.connect(current["id"])
+
+    async def events():
+        try:
+            yield f"data: {json.dumps({'type': 'ready', 'user_id': current['id']})}\n\n"
+            while not await request.is_disconnected():
+                message = await subscription.get(timeout=PUSH_HEARTBEAT_SECONDS)
+                yield f"data: {message}\n\n" if message is not None else ": heartbeat\n\n"
+        finally:
+            await push_hub.disconnect(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Real-Time Chat System Endpoints
 @api.post("/chat/send")
 async def send_chat_message(payload: Dict[str, Any] = Body(...), current=Depends(require_user)):
@@ -16343,14 +16266,22 @@ async def send_chat_message(payload: Dict[str, Any] = Body(...), current=Depends
             "context": context,
             "context_id": context_id,
             "timestamp": datetime.utcnow(),
-            "read_by": [current["id"]],  # Sender has automatically read
             "edited": False,
             "deleted": False
         }
         
         await db.chat_messages.insert_one(message)
+        await push_hub.publish(chat_channel(chat_id), "chat.message", {
+            "chat_id": chat_id,
+            "id": message["_id"],
+            "sender_id": message["sender_id"],
+            "sender_name": message["sender_name"],
+            "sender_role": message["sender_role"],
+            "content": message["content"],
+            "timestamp": message["timestamp"]
+        })
         
-        # Update chat participants
+        # Update chat participants; the sender has read up to their own message
         await db.chat_participants.update_one(
             {"chat_id": chat_id, "user_id": current["id"]},
             {
@@ -16359,6 +16290,8 @@ async def send_chat_message(payload: Dict[str, Any] = Body(...), current=Depends
                     "user_id": current["id"],
                     "user_role": current.get("role"),
                     "last_seen": datetime.utcnow(),
+                    "last_read_at": message["timestamp"],
+                    "last_read_id": message["_id"],
                     "active": True
                 }
             },
@@ -16372,8 +16305,14 @@ async def send_chat_message(payload: Dict[str, Any] = Body(...), current=Depends
         raise HTTPException(status_code=500, detail="Failed to send message")
 
 @api.get("/chat/messages/{chat_id}")
-async def get_chat_messages(chat_id: str, current=Depends(require_user)):
-    """Get messages for a specific chat"""
+async def get_chat_messages(
+    chat_id: str,
+    before: Optional[str] = Query(None, description="Cursor: return messages older than this one"),
+    after: Optional[str] = Query(None, description="Cursor: return messages newer than this one"),
+    limit: int = Query(50, ge=1, le=100),
+    current=Depends(require_user)
+):
+    """Get a page of messages for a specific chat, newest page first"""
     try:
         # Verify user has access to this chat
         participant = await db.chat_participants.find_one({
@@ -16383,7 +16322,7 @@ async def get_chat_messages(chat_id: str, current=Depends(require_user)):
         
         if not participant:
             # Auto-add user to chat if they're accessing it
-            await db.chat_participants.insert_one({
+            participant = {
                 "_id": str(uuid.uuid4()),
                 "chat_id": chat_id,
                 "user_id": current["id"],
@@ -16391,24 +16330,22 @@ async def get_chat_messages(chat_id: str, current=Depends(require_user)):
                 "joined_at": datetime.utcnow(),
                 "last_seen": datetime.utcnow(),
                 "active": True
+            }
+            await db.chat_participants.insert_one(participant)
+        
+        messages, has_more = await chat_history.page(chat_id, before=before, after=after, limit=limit)
+        watermark = await chat_history.watermark(chat_id, current["id"], participant)
+        
+        # Reading a page moves the reader's watermark to its newest message
+        newest = messages[-1] if messages else None
+        if newest and not is_read(newest, current["id"], watermark) and \
+                await chat_history.mark_read(chat_id, current["id"], newest):
+            watermark = (newest["timestamp"], newest["_id"])
+            await push_hub.publish(chat_channel(chat_id), "chat.read", {
+                "chat_id": chat_id, "user_id": current["id"],
+                "last_read_at": newest["timestamp"], "last_read_id": newest["_id"]
             })
         
-        # Get recent messages (last 50)
-        messages = await db.chat_messages.find(
-            {"chat_id": chat_id, "deleted": {"$ne": True}}
-        ).sort("timestamp", -1).limit(50).to_list(50)
-        
-        # Reverse to show oldest first
-        messages.reverse()
-        
-        # Mark messages as read by current user
-        message_ids = [m["_id"] for m in messages if current["id"] not in m.get("read_by", [])]
-        if message_ids:
-            await db.chat_messages.update_many(
-                {"_id": {"$in": message_ids}},
-                {"$addToSet": {"read_by": current["id"]}}
-            )
-        
         # Clean message data for frontend
         clean_messages = []
         for msg in messages:
@@ -16419,11 +16356,27 @@ async def get_chat_messages(chat_id: str, current=Depends(require_user)):
                 "sender_role": msg["sender_role"],
                 "content": msg["content"],
                 "timestamp": msg["timestamp"].isoformat(),
-                "read": current["id"] in msg.get("read_by", [])
+                "read": is_read(msg, current["id"], watermark)
             })
         
-        return {"messages": clean_messages}
+        # Other participants' watermarks, for read receipts
+        receipts = await db.chat_participants.find(
+            {"chat_id": chat_id, "user_id": {"$ne": current["id"]}, "last_read_at": {"$ne": None}},
+            {"user_id": 1, "last_read_at": 1, "last_read_id": 1}
+        ).to_list(100)
+        
+        return {
+            "messages": clean_messages,
+            "unread_count": await chat_history.unread_count(chat_id, current["id"], watermark),
+            "read_receipts": [{"user_id": r["user_id"], "last_read_at": r["last_read_at"].isoformat(),
+                               "last_read_id": r.get("last_read_id")} for r in receipts],
+            "has_more": has_more,
+            "before": encode_cursor(messages[0]) if messages else before,
+            "after": encode_cursor(messages[-1]) if messages else after
+        }
         
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Chat messages error: {e}")
         return {"messages": []}
@@ -16474,15 +16427,13 @@ async def mark_chat_messages_read(payload: Dict[str, Any] = Body(...), current=D
         if not chat_id:
             raise HTTPException(status_code=400, detail="chat_id required")
         
-        # Mark all messages in chat as read by current user
-        await db.chat_messages.update_many(
-            {
-                "chat_id": chat_id,
-                "sender_id": {"$ne": current["id"]},  # Don't mark own messages
-                "read_by": {"$ne": current["id"]}  # Only unread messages
-            },
-            {"$addToSet": {"read_by": current["id"]}}
-        )
+        # Move the reader's watermark to the newest message in the chat
+        newest = await chat_history.latest(chat_id)
+        if newest and await chat_history.mark_read(chat_id, current["id"], newest):
+            await push_hub.publish(chat_channel(chat_id), "chat.read", {
+                "chat_id": chat_id, "user_id": current["id"],
+                "last_read_at": newest["timestamp"], "last_read_id": newest["_id"]
+            })
         
         return {"marked_read": True}
         
@@ -16562,16 +16513,15 @@ ASSESSMENT AREAS FOR REFERENCE:
 
 Focus on helping them understand what they need to do next to improve their procurement readiness."""
 
-        # Initialize conversation with context
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
+        # The system message carries the user's progress, so cache hits stay user-appropriate
+        response = await llm_gateway.complete(
+            "ai_coach",
+            user_message,
+            system_message=system_message,
+            model="gpt-4o",
             session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-4o")
-        
-        # Send user message
-        user_msg = UserMessage(text=user_message)
-        response = await chat.send_message(user_msg)
+            semantic_text=user_message
+        )
         
         # Store conversation in database for history
         conversation_record = {
@@ -16587,9 +16537,6 @@ Focus on helping them understand what they need to do next to improve their proc
         
         await db.ai_coach_conversations.insert_one(conversation_record)
         
-        # Track AI request metrics
-        AI_REQUEST_DURATION.labels(feature="ai_coach").observe(1.0)  # Placeholder timing
-        
         return {
             "response": response,
             "session_id": session_id,
@@ -16900,6 +16847,14 @@ async def add_performance_headers(request: Request, call_next):
     return response
 
 # Webhook System for External Integrations
+# Deliveries go through a MongoDB outbox drained by background workers, never the request path
+webhook_outbox = WebhookOutbox(
+    db, http_client,
+    workers=int(os.environ.get("WEBHOOK_WORKERS", "8")),
+    per_endpoint=int(os.environ.get("WEBHOOK_PER_ENDPOINT_CONCURRENCY", "2")),
+    max_attempts=int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "8"))
+)
+
 @api.post("/webhooks/register")
 async def register_webhook(payload: Dict[str, Any] = Body(...), current=Depends(require_user)):
     """Register webhook endpoint for event notifications"""
@@ -16928,6 +16883,11 @@ async def register_webhook(payload: Dict[str, Any] = Body(...), current=Depends(
         if invalid_events:
             raise HTTPException(status_code=400, detail=f"Invalid events: {invalid_events}")
         
+        # Payloads are signed with HMAC-SHA256; generate a secret when none is supplied
+        generated_secret = not secret
+        if generated_secret:
+            secret = secrets.token_hex(32)
+        
         # Create webhook registration
         webhook_id = str(uuid.uuid4())
         webhook_doc = {
@@ -16946,13 +16906,19 @@ async def register_webhook(payload: Dict[str, Any] = Body(...), current=Depends(
         
         await db.webhooks.insert_one(webhook_doc)
         
-        return {
+        response = {
             "webhook_id": webhook_id,
             "url": url,
             "events": events,
             "status": "registered"
         }
+        if generated_secret:
+            # Shown once; deliveries carry X-Polaris-Signature computed with it
+            response["secret"] = secret
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Webhook registration error: {e}")
         raise HTTPException(status_code=500, detail="Failed to register webhook")
@@ -17000,81 +16966,44 @@ async def delete_webhook(webhook_id: str, current=Depends(require_user)):
         logger.error(f"Delete webhook error: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete webhook")
 
+@api.get("/webhooks/{webhook_id}/deliveries")
+async def list_webhook_deliveries(
+    webhook_id: str,
+    status: Optional[str] = Query(None, pattern="^(pending|delivering|delivered|dead|cancelled)$"),
+    limit: int = Query(50, ge=1, le=200),
+    current=Depends(require_user)
+):
+    """Recent deliveries for one of the user's webhooks; status=dead lists the dead-letter queue"""
+    query = {"webhook_id": webhook_id, "user_id": current["id"]}
+    if status:
+        query["status"] = status
+    deliveries = await db.webhook_deliveries.find(
+        query, {"data": 0, "lease_id": 0}
+    ).sort("created_at", -1).limit(limit).to_list(limit)
+    return {"deliveries": deliveries}
+
+@api.post("/webhooks/{webhook_id}/replay")
+async def replay_webhook_deliveries(webhook_id: str, current=Depends(require_user)):
+    """Queue every dead delivery of one of the user's webhooks again"""
+    replayed = await webhook_outbox.replay({"webhook_id": webhook_id, "user_id": current["id"]}, statuses=[DEAD])
+    return {"webhook_id": webhook_id, "replayed": replayed}
+
+@api.post("/webhooks/deliveries/{delivery_id}/replay")
+async def replay_webhook_delivery(delivery_id: str, current=Depends(require_user)):
+    """Queue one dead or delivered delivery again"""
+    replayed = await webhook_outbox.replay({"_id": delivery_id, "user_id": current["id"]})
+    if not replayed:
+        raise HTTPException(status_code=404, detail="No dead or delivered delivery with that id")
+    return {"delivery_id": delivery_id, "status": "pending"}
+
 # Webhook trigger utility function
 async def trigger_webhooks(event_type: str, event_data: Dict[str, Any], user_id: str = None):
-    """Trigger webhooks for specific event"""
+    """Queue deliveries of an event to every subscribed webhook"""
     try:
-        # Find active webhooks for this event type
-        query = {"active": True, "events": event_type}
-        if user_id:
-            query["user_id"] = user_id
-        
-        webhooks = await db.webhooks.find(query).to_list(100)
-        
-        for webhook in webhooks:
-            try:
-                # Prepare webhook payload
-                payload = {
-                    "event": event_type,
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "data": event_data,
-                    "metadata": {
-                        "webhook_id": webhook["webhook_id"],
-                        "attempt": 1,
-                        "signature": "sha256=..."  # Would implement HMAC signature
-                    }
-                }
-                
-                # Send webhook (async in background)
-                import asyncio
-                asyncio.create_task(send_webhook(webhook, payload))
-                
-            except Exception as e:
-                logger.error(f"Webhook trigger error for {webhook['webhook_id']}: {e}")
-        
+        await webhook_outbox.enqueue(event_type, event_data, user_id)
     except Exception as e:
         logger.error(f"Webhook system error: {e}")
 
-async def send_webhook(webhook: Dict, payload: Dict):
-    """Send individual webhook with retry logic"""
-    import aiohttp
-    import asyncio
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    webhook["url"],
-                    json=payload,
-                    headers={"Content-Type": "application/json"},
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    if response.status == 200:
-                        # Update success count
-                        await db.webhooks.update_one(
-                            {"webhook_id": webhook["webhook_id"]},
-                            {
-                                "$inc": {"success_count": 1},
-                                "$set": {"last_triggered": datetime.utcnow()}
-                            }
-                        )
-                        return
-                    else:
-                        raise Exception(f"HTTP {response.status}")
-                        
-        except Exception as e:
-            if attempt == max_retries - 1:
-                # Update failure count on final attempt
-                await db.webhooks.update_one(
-                    {"webhook_id": webhook["webhook_id"]},
-                    {"$inc": {"failure_count": 1}}
-                )
-                logger.error(f"Webhook failed after {max_retries} attempts: {e}")
-            else:
-                # Wait before retry
-                await asyncio.sleep(2 ** attempt)
-
 # User Training & Support System Endpoints
 @api.post("/support/tickets/create")
 async def create_support_ticket(payload: Dict[str, Any] = Body(...), current=Depends(require_user)):
@@ -17295,42 +17224,8 @@ import json
 from functools import lru_cache
 from typing import Optional, Callable, Any
 
-class SmartCache:
-    """Intelligent caching system with TTL and invalidation"""
-    
-    def __init__(self):
-        self.cache = {}
-        self.cache_times = {}
-    
-    def set(self, key: str, value: Any, ttl: int = 3600):
-        """Set cache value with TTL"""
-        self.cache[key] = value
-        self.cache_times[key] = datetime.utcnow() + timedelta(seconds=ttl)
-    
-    def get(self, key: str) -> Optional[Any]:
-        """Get cache value if not expired"""
-        if key in self.cache:
-            if datetime.utcnow() < self.cache_times.get(key, datetime.min):
-                return self.cache[key]
-            else:
-                # Expired - remove from cache
-                self.cache.pop(key, None)
-                self.cache_times.pop(key, None)
-        return None
-    
-    def invalidate(self, pattern: str = None):
-        """Invalidate cache entries matching pattern"""
-        if pattern:
-            keys_to_remove = [k for k in self.cache.keys() if pattern in k]
-            for key in keys_to_remove:
-                self.cache.pop(key, None)
-                self.cache_times.pop(key, None)
-        else:
-            self.cache.clear()
-            self.cache_times.clear()
-
-# Global cache instance
-smart_cache = SmartCache()
+# Shared across workers when REDIS_URL is configured, LRU-bounded per process otherwise
+response_cache = build_cache("responses", max_entries=5000)
 
 # Cached Assessment Schema Endpoint
 @api.get("/assessment/schema/cached")
@@ -17338,7 +17233,7 @@ async def get_cached_assessment_schema(current=Depends(require_user)):
     """Get assessment schema with intelligent caching"""
     
     cache_key = f"assessment_schema_{current.get('role', 'default')}"
-    cached_result = smart_cache.get(cache_key)
+    cached_result = await response_cache.get(cache_key)
     
     if cached_result:
         return cached_result
@@ -17347,7 +17242,7 @@ async def get_cached_assessment_schema(current=Depends(require_user)):
     schema_data = get_cached_assessment_schema()  # Using existing function
     
     # Cache for 30 minutes
-    smart_cache.set(cache_key, schema_data, ttl=1800)
+    await response_cache.set(cache_key, schema_data, ttl=1800, tags=["assessment_schema"])
     
     return schema_data
 
@@ -17360,13 +17255,11 @@ async def get_cached_dashboard_data(role: str, current=Depends(require_user)):
         raise HTTPException(status_code=403, detail="Role mismatch")
     
     cache_key = f"dashboard_{role}_{current['id']}"
-    cached_result = smart_cache.get(cache_key)
+    cached_result = await response_cache.get(cache_key)
     
     if cached_result:
-        # Add cache indicator
-        cached_result["cached"] = True
-        cached_result["cache_time"] = datetime.utcnow().isoformat()
-        return cached_result
+        # Add cache indicator without mutating the cached entry
+        return {**cached_result, "cached": True, "cache_time": datetime.utcnow().isoformat()}
     
     # Generate fresh dashboard data
     if role == "client":
@@ -17381,10 +17274,12 @@ async def get_cached_dashboard_data(role: str, current=Depends(require_user)):
         dashboard_data = {"error": "Invalid role"}
     
     # Cache for 5 minutes
-    smart_cache.set(cache_key, dashboard_data, ttl=300)
+    cache_tags = [f"user:{current['id']}"]
+    if role == "agency":
+        cache_tags.append(f"agency:{current['id']}")
+    await response_cache.set(cache_key, dashboard_data, ttl=300, tags=cache_tags)
     
-    dashboard_data["cached"] = False
-    return dashboard_data
+    return {**dashboard_data, "cached": False}
 
 # Optimized Dashboard Queries
 async def get_optimized_client_dashboard(user_id: str) -> Dict[str, Any]:
@@ -18418,6 +18313,7 @@ async def issue_blockchain_certificate(payload: Dict[str, Any] = Body(...), curr
         }
         
         await db.certificates.insert_one(certificate)
+        await kpi_materializer.increment("certificates")
         
         # Track certificate issuance
         CERTIFICATES_ISSUED.inc()
@@ -18801,7 +18697,7 @@ async def complete_enterprise_onboarding(payload: Dict[str, Any] = Body(...), cu
             "email": organization_data.get("contact_email"),
             "role": "enterprise_admin",
             "organization_id": organization_id,
-            "hashed_password": pbkdf2_sha256.hash("TempPassword123!"),  # Temporary password
+            "hashed_password": await password_hasher.hash("TempPassword123!"),  # Temporary password
             "created_at": datetime.utcnow(),
             "requires_password_reset": True
         }
@@ -19417,6 +19313,84 @@ async def get_blockchain_network_status():
 
 app.include_router(api)
 
+@app.on_event("startup")
+async def ensure_db_indexes():
+    try:
+        await IndexRegistry(db).ensure_indexes()
+    except Exception as e:
+        logger.error(f"Index registry could not be applied: {e}")
+
+@app.on_event("startup")
+async def start_audit_pipeline():
+    await audit_pipeline.start()
+
+@app.on_event("startup")
+async def start_notification_fanout():
+    await notification_fanout.start()
+
+@app.on_event("startup")
+async def start_match_index_watcher():
+    app.state.match_index_watcher = asyncio.create_task(provider_match_index.watch(
+        db.provider_profiles,
+        fallback_interval=float(os.environ.get("MATCH_INDEX_REFRESH_SECONDS", "60"))
+    ))
+
+@app.on_event("startup")
+async def start_kb_search_index():
+    app.state.kb_search = asyncio.create_task(kb_search.run(db.kb_articles))
+
+@app.on_event("startup")
+async def start_kpi_materializer():
+    app.state.kpi_materializer = asyncio.create_task(kpi_materializer.run())
+
+@app.on_event("startup")
+async def start_provider_location_backfill():
+    schedule_provider_location_backfill()
+
+@app.on_event("startup")
+async def start_upload_janitor():
+    app.state.upload_janitor = asyncio.create_task(chunked_uploads.run(
+        float(os.environ.get("UPLOAD_CLEANUP_INTERVAL_SECONDS", "3600"))
+    ))
+
+@app.on_event("startup")
+async def start_evidence_blob_collector():
+    app.state.evidence_collector = asyncio.create_task(evidence_store.run(
+        float(os.environ.get("EVIDENCE_GC_INTERVAL_SECONDS", "3600"))
+    ))
+
+@app.on_event("startup")
+async def start_agency_rollups():
+    await agency_rollups.start()
+
+@app.on_event("startup")
+async def start_webhook_outbox():
+    await webhook_outbox.start()
+
+@app.on_event("startup")
+async def start_push_gateway():
+    await push_hub.start()
+    app.state.dashboard_update_relay = asyncio.create_task(dashboard_update_relay.run(
+        float(os.environ.get("DASHBOARD_RELAY_POLL_SECONDS", "5"))
+    ))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.state.match_index_watcher.cancel()
+    app.state.upload_janitor.cancel()
+    app.state.evidence_collector.cancel()
+    app.state.kpi_materializer.cancel()
+    app.state.kb_search.cancel()
+    app.state.dashboard_update_relay.cancel()
+    app.state.provider_location_backfill.cancel()
+    await push_hub.stop()
+    await webhook_outbox.stop()
+    await agency_rollups.stop()
+    await audit_pipeline.stop()
+    await notification_fanout.stop()
+    await http_client.close()
+    password_hasher.shutdown()
+    certificate_renderer.shutdown()
+    for listener in security_log_handlers:
+        listener.stop()
     client.close()
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Tier Entitlement Resolver for Polaris Platform
+Resolves a client's per-area tier access from license, agency and tier configuration in one
+aggregation and caches the map per client. Tier configurations are created when an agency
+is onboarded, so resolving access never writes.
+"""
+
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOTAL_AREAS = 10
+DEFAULT_AGENCY_ID = "default"
+DEFAULT_PRICING = {
+    "tier1": 25.0,   # Self Assessment - $25
+    "tier2": 50.0,   # Evidence Required - $50
+    "tier3": 100.0   # Verification - $100
+}
+DEFAULT_MONTHLY_ASSESSMENTS_LIMIT = 50
+AGENCY_EXPRESSION = {"$ifNull": ["$agency_user_id", "$agency_id"]}
+
+
+def uniform_access(tier: int) -> Dict[str, int]:
+    return {f"area{i}": tier for i in range(1, TOTAL_AREAS + 1)}
+
+
+def default_tier_configuration(agency_id: str) -> Dict[str, Any]:
+    """The configuration a newly onboarded agency starts with: tier 1 everywhere"""
+    now = datetime.utcnow()
+    return {
+        "_id": str(uuid.uuid4()),
+        "agency_id": agency_id,
+        "tier_access_levels": uniform_access(1),
+        "pricing_per_tier": dict(DEFAULT_PRICING),
+        "monthly_assessments_limit": DEFAULT_MONTHLY_ASSESSMENTS_LIMIT,
+        "created_at": now,
+        "updated_at": now
+    }
+
+
+def license_configuration_pipeline(license_code: str) -> List[Dict[str, Any]]:
+    """
+    License -> agency -> configuration in one round trip. The lookup matches the agency's
+    own configuration and the platform-wide "default" one together; older licenses store
+    the agency as agency_id instead of agency_user_id.
+    """
+    return [
+        {"$match": {"license_code": license_code}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "agency_id": AGENCY_EXPRESSION, "candidates": [AGENCY_EXPRESSION, DEFAULT_AGENCY_ID]}},
+        {"$lookup": {"from": "agency_tier_configurations", "localField": "candidates",
+                     "foreignField": "agency_id", "as": "configurations"}},
+        {"$project": {"agency_id": 1, "configurations": {"$map": {
+            "input": "$configurations",
+            "as": "c",
+            "in": {"agency_id": "$$c.agency_id", "tier_access_levels": "$$c.tier_access_levels"}
+        }}}}
+    ]
+
+
+def _pick_access(agency_id: str, configurations: List[Dict[str, Any]]) -> Tuple[Dict[str, int], bool]:
+    """Access levels from the agency's configuration, else the default one; True when the default applied"""
+    by_agency = {c.get("agency_id"): c for c in configurations}
+    if agency_id in by_agency:
+        return by_agency[agency_id].get("tier_access_levels") or uniform_access(1), False
+    if DEFAULT_AGENCY_ID in by_agency:
+        # Default configuration for QA and testing
+        return by_agency[DEFAULT_AGENCY_ID].get("tier_access_levels") or uniform_access(3), True
+    return uniform_access(1), True
+
+
+class TierEntitlementResolver:
+    """
+    Per-client cache of resolved tier access. Entries are tagged with the client, the
+    license and the agency (plus "default" when the agency had no configuration of its
+    own), so a configuration change or a license update invalidates exactly the clients
+    it affects; the TTL bounds everything else.
+    """
+
+    def __init__(self, db, cache, ttl: int = 300):
+        self.db = db
+        self.cache = cache
+        self.ttl = ttl
+
+    async def resolve(self, client: Dict[str, Any]) -> Dict[str, int]:
+        license_code = client.get("license_code")
+        if not license_code:
+            return uniform_access(1)
+
+        key = f"{client['id']}:{license_code}"
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        access, agency_ids = await self._resolve_license(license_code)
+        tags = [f"tier_client:{client['id']}", f"tier_license:{license_code}"]
+        tags.extend(f"tier_agency:{aid}" for aid in agency_ids)
+        await self.cache.set(key, access, ttl=self.ttl, tags=tags)
+        return access
+
+    async def _resolve_license(self, license_code: str) -> Tuple[Dict[str, int], List[str]]:
+        """Access levels for a license and the agency ids whose configurations they depend on"""
+        rows = await self.db.agency_licenses.aggregate(license_configuration_pipeline(license_code)).to_list(1)
+        if not rows or not rows[0].get("agency_id"):
+            return uniform_access(1), []
+        agency_id = rows[0]["agency_id"]
+        access, from_default = _pick_access(agency_id, rows[0].get("configurations") or [])
+        return access, [agency_id, DEFAULT_AGENCY_ID] if from_default else [agency_id]
+
+    async def ensure_configuration(self, agency_id: str):
+        """Create the agency's default configuration unless it already has one"""
+        config = default_tier_configuration(agency_id)
+        config.pop("agency_id")
+        result = await self.db.agency_tier_configurations.update_one(
+            {"agency_id": agency_id}, {"$setOnInsert": config}, upsert=True
+        )
+        if result.upserted_id is not None:
+            await self.invalidate_agency(agency_id)
+
+    async def invalidate_agency(self, *agency_ids: str):
+        """Drop entries resolved through these agencies; pass "default" when the default configuration changes"""
+        tags = [f"tier_agency:{aid}" for aid in agency_ids if aid]
+        if tags:
+            await self.cache.invalidate_tags(*tags)
+
+    async def invalidate_license(self, *license_codes: str):
+        tags = [f"tier_license:{code}" for code in license_codes if code]
+        if tags:
+            await self.cache.invalidate_tags(*tags)
+
+    async def invalidate_client(self, *user_ids: str):
+        tags = [f"tier_client:{uid}" for uid in user_ids if uid]
+        if tags:
+            await self.cache.invalidate_tags(*tags)
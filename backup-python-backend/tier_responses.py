@@ -0,0 +1,249 @@
+"""
+Tier Assessment Response Store for Polaris Platform
+Records each answer with one atomic update and keeps the session's answer count and
+score as running integer sums, so completion never depends on a stale copy of the session
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COUNTER_PROJECTION = {"status": 1, "total_questions": 1, "answered_count": 1, "score_points": 1, "score_weight": 1,
+                      "tier_completion_score": 1}
+
+
+class SessionNotActive(ValueError):
+    pass
+
+
+def response_score_weight(response: Dict[str, Any], tier_level: int) -> Tuple[int, int]:
+    """
+    Points and weight one response contributes to the tier score. Multipliers are kept
+    in tenths so the running sums stay exact integers under $inc.
+    """
+    answer = str(response.get("response", "")).lower()
+    # Base scoring
+    if answer in ["yes", "true", "1"]:
+        response_score = 100
+    elif answer in ["no", "false", "0"]:
+        response_score = 0
+    elif answer in ["partial", "in_progress"]:
+        response_score = 50
+    else:
+        response_score = 25  # "No, I need help" or other
+
+    # Tier-specific scoring multipliers
+    if tier_level == 1:
+        multiplier = 10  # Self assessment
+    elif tier_level == 2:
+        # Evidence required - higher weight for documented responses
+        if response.get("evidence_provided") or response.get("evidence_url"):
+            multiplier = 12
+        else:
+            multiplier = 8  # Penalize lack of evidence
+    else:  # tier_level == 3
+        # Verification tier - highest standards
+        if response.get("verification_status") == "verified":
+            multiplier = 15
+        elif response.get("evidence_provided") or response.get("evidence_url"):
+            multiplier = 10
+        else:
+            multiplier = 6
+
+    return response_score * multiplier, 100 * multiplier
+
+
+def score_from_sums(points: int, weight: int) -> float:
+    return round((points / weight * 100), 2) if weight > 0 else 0.0
+
+
+def calculate_tier_completion_score(responses: List[Dict], tier_level: int) -> float:
+    """Calculate completion score for a tier-based assessment"""
+    sums = [response_score_weight(response, tier_level) for response in responses]
+    return score_from_sums(sum(p for p, _ in sums), sum(w for _, w in sums))
+
+
+def new_response(question_id: str, response: str, tier_level: int, evidence_provided: bool,
+                 evidence_url: Optional[str]) -> Dict[str, Any]:
+    return {
+        "question_id": question_id,
+        "response": response,
+        "tier_level": tier_level,
+        "evidence_required": tier_level >= 2 and response == "compliant",
+        "evidence_provided": evidence_provided,
+        "evidence_url": evidence_url,
+        "submitted_at": datetime.utcnow(),
+        "verification_status": "pending" if tier_level >= 2 else None
+    }
+
+
+def _stored_score(response: Dict[str, Any], tier_level: int) -> Tuple[int, int]:
+    """What a stored response currently contributes; responses saved before the counters carry no sums"""
+    if response.get("score_points") is None or response.get("score_weight") is None:
+        return response_score_weight(response, tier_level)
+    return response["score_points"], response["score_weight"]
+
+
+class TierResponseStore:
+    """
+    Responses stay embedded in the session document, which every reader already expects.
+    A first answer is a conditional $push plus $inc of the counters; a changed answer is an
+    arrayFilters $set that returns the element it replaced, followed by a $inc of the score
+    difference. Increments commute, so concurrent answers from several tabs all count.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def load(self, session_id: str, user_id: str, question_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Session counters plus only the question being answered, or the whole session when
+        no question is given
+        """
+        query = {"_id": session_id, "user_id": user_id}
+        projection = None
+        if question_id is not None:
+            projection = {**COUNTER_PROJECTION, "tier_level": 1, "questions": {"$elemMatch": {"id": question_id}}}
+        session = await self.collection.find_one(query, projection)
+        if session is not None and "answered_count" not in session:
+            await self._backfill_counters(session_id)
+            session = await self.collection.find_one(query, projection)
+        return session
+
+    async def _backfill_counters(self, session_id: str):
+        """Sessions started before the counters existed get them once, from their stored responses"""
+        full = await self.collection.find_one({"_id": session_id})
+        if full is None:
+            return
+        responses = full.get("responses") or []
+        tier_level = full.get("tier_level", 1)
+        sums = [response_score_weight(response, tier_level) for response in responses]
+        await self.collection.update_one(
+            {"_id": session_id, "answered_count": {"$exists": False}},
+            {"$set": {
+                "total_questions": len(full.get("questions") or []),
+                "answered_count": len(responses),
+                "score_points": sum(p for p, _ in sums),
+                "score_weight": sum(w for _, w in sums)
+            }}
+        )
+
+    async def record(self, session: Dict[str, Any], response_data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Store one response. Returns the session counters after the write and whether this
+        call completed the session. Raises SessionNotActive if the session was completed
+        or removed in the meantime.
+        """
+        session_id = session["_id"]
+        question_id = response_data["question_id"]
+        points, weight = response_score_weight(response_data, session.get("tier_level", 1))
+        now = datetime.utcnow()
+
+        counters = await self.collection.find_one_and_update(
+            {"_id": session_id, "status": "active", "responses.question_id": {"$ne": question_id}},
+            {"$push": {"responses": {**response_data, "score_points": points, "score_weight": weight}},
+             "$inc": {"answered_count": 1, "score_points": points, "score_weight": weight},
+             "$set": {"updated_at": now}},
+            projection=COUNTER_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if counters is None:
+            previous = await self.collection.find_one_and_update(
+                {"_id": session_id, "status": "active", "responses.question_id": question_id},
+                {"$set": {"responses.$[answer]": {**response_data, "score_points": points, "score_weight": weight},
+                          "updated_at": now}},
+                projection={"responses": {"$elemMatch": {"question_id": question_id}}},
+                array_filters=[{"answer.question_id": question_id}]
+            )
+            if previous is None:
+                raise SessionNotActive("Assessment session is not active")
+            old_points, old_weight = _stored_score(previous["responses"][0], session.get("tier_level", 1))
+            counters = await self.collection.find_one_and_update(
+                {"_id": session_id},
+                {"$inc": {"score_points": points - old_points, "score_weight": weight - old_weight}},
+                projection=COUNTER_PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+        return await self._settle(session_id, counters)
+
+    async def record_many(self, session: Dict[str, Any], responses: List[Dict[str, Any]],
+                          batch_id: str) -> Tuple[Dict[str, Any], bool, Dict[str, str]]:
+        """
+        Store several responses for a fully loaded session in one bulk_write. Each update is
+        conditional on the answer it replaces being unchanged since `session` was read; any
+        that lose a race go through record() instead. Returns the counters, whether the
+        session was completed, and "saved" or "rejected" per question.
+        """
+        session_id = session["_id"]
+        tier_level = session.get("tier_level", 1)
+        existing = {r["question_id"]: r for r in session.get("responses") or []}
+        now = datetime.utcnow()
+        requests = []
+        for data in responses:
+            question_id = data["question_id"]
+            points, weight = response_score_weight(data, tier_level)
+            stored = {**data, "batch_id": batch_id, "score_points": points, "score_weight": weight}
+            old = existing.get(question_id)
+            if old is None:
+                requests.append(UpdateOne(
+                    {"_id": session_id, "status": "active", "responses.question_id": {"$ne": question_id}},
+                    {"$push": {"responses": stored},
+                     "$inc": {"answered_count": 1, "score_points": points, "score_weight": weight},
+                     "$set": {"updated_at": now}}
+                ))
+            else:
+                old_points, old_weight = _stored_score(old, tier_level)
+                requests.append(UpdateOne(
+                    {"_id": session_id, "status": "active",
+                     "responses": {"$elemMatch": {"question_id": question_id, "submitted_at": old.get("submitted_at")}}},
+                    {"$set": {"responses.$[answer]": stored, "updated_at": now},
+                     "$inc": {"score_points": points - old_points, "score_weight": weight - old_weight}},
+                    array_filters=[{"answer.question_id": question_id}]
+                ))
+
+        result = await self.collection.bulk_write(requests, ordered=True)
+        outcomes = {data["question_id"]: "saved" for data in responses}
+        if result.modified_count < len(requests):
+            current = await self.collection.find_one({"_id": session_id}, {"responses": 1})
+            written = {r["question_id"] for r in (current or {}).get("responses") or [] if r.get("batch_id") == batch_id}
+            for data in responses:
+                if data["question_id"] in written:
+                    continue
+                try:
+                    await self.record(session, {**data, "batch_id": batch_id})
+                except SessionNotActive:
+                    outcomes[data["question_id"]] = "rejected"
+
+        counters = await self.collection.find_one({"_id": session_id}, COUNTER_PROJECTION)
+        counters, completed_now = await self._settle(session_id, counters)
+        return counters, completed_now, outcomes
+
+    async def _settle(self, session_id: str, counters: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Mark the session completed, or refresh the score of a completed one, from counters
+        that are still current. A concurrent write changes the counters, so the conditional
+        update misses and the latest values are read and settled instead.
+        """
+        completed_now = False
+        while counters and counters.get("answered_count", 0) >= counters.get("total_questions", 0) > 0:
+            score = score_from_sums(counters["score_points"], counters["score_weight"])
+            if counters.get("status") == "completed" and counters.get("tier_completion_score") == score:
+                break
+            update = {"status": "completed", "tier_completion_score": score}
+            if counters.get("status") != "completed":
+                update["completed_at"] = datetime.utcnow()
+            result = await self.collection.update_one(
+                {"_id": session_id, "answered_count": counters["answered_count"],
+                 "score_points": counters["score_points"], "score_weight": counters["score_weight"]},
+                {"$set": update}
+            )
+            if result.modified_count:
+                completed_now = completed_now or counters.get("status") != "completed"
+                counters = {**counters, **update}
+                break
+            counters = await self.collection.find_one({"_id": session_id}, COUNTER_PROJECTION)
+        return counters, completed_now
@@ -0,0 +1,262 @@
+"""
+Webhook Delivery Outbox for Polaris Platform
+Events are written to a MongoDB outbox and delivered by a bounded pool of background workers
+over the shared HTTP client, with per-endpoint concurrency limits, exponential backoff,
+HMAC-signed payloads and a dead-letter state that can be replayed
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from prometheus_client import Counter, Histogram
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_DELIVERIES = Counter('polaris_webhook_deliveries_total', 'Webhook delivery attempts by outcome', ['outcome'])
+WEBHOOK_EVENTS_ENQUEUED = Counter('polaris_webhook_events_enqueued_total', 'Webhook deliveries written to the outbox')
+WEBHOOK_DELIVERY_DURATION = Histogram('polaris_webhook_delivery_seconds', 'Webhook delivery attempt duration')
+
+SIGNATURE_HEADER = "X-Polaris-Signature"
+TIMESTAMP_HEADER = "X-Polaris-Timestamp"
+
+PENDING, DELIVERING, DELIVERED, DEAD, CANCELLED = "pending", "delivering", "delivered", "dead", "cancelled"
+
+
+def _encode_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def endpoint_of(url: str) -> str:
+    """scheme://host:port, the unit per-endpoint concurrency is limited by"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.hostname}:{parts.port or (443 if parts.scheme == 'https' else 80)}"
+
+
+def sign_payload(secret: str, timestamp: int, body: bytes) -> str:
+    """
+    HMAC-SHA256 over "<timestamp>.<body>". Receivers recompute it with their secret and
+    reject stale timestamps, which also stops a captured request from being replayed.
+    """
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(secret: str, timestamp: int, body: bytes, signature: str) -> bool:
+    return hmac.compare_digest(sign_payload(secret, timestamp, body), signature)
+
+
+class WebhookOutbox:
+    """
+    One outbox document per (event, webhook). Workers claim due deliveries with a
+    find_one_and_update that sets a lease, so deliveries survive restarts and several
+    API workers can share the outbox: a lease that expires before the attempt is recorded
+    makes the delivery claimable again. A delivery that fails `max_attempts` times is
+    marked dead and stays until it is replayed.
+    """
+
+    def __init__(self, db, http_client, workers: int = 8, per_endpoint: int = 2, max_attempts: int = 8,
+                 backoff_base: float = 30.0, backoff_max: float = 6 * 3600.0, lease: float = 60.0,
+                 timeout: float = 10.0, poll_interval: float = 2.0):
+        self.db = db
+        self.collection = db.webhook_deliveries
+        self.http_client = http_client
+        self.workers = workers
+        self.per_endpoint = per_endpoint
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._active: Dict[str, int] = {}
+        self._wake = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    async def enqueue(self, event_type: str, data: Dict[str, Any], user_id: Optional[str] = None) -> int:
+        """Write one delivery per active webhook subscribed to `event_type`; returns how many"""
+        query: Dict[str, Any] = {"active": True, "events": event_type}
+        if user_id:
+            query["user_id"] = user_id
+        webhooks = await self.db.webhooks.find(query, {"webhook_id": 1, "user_id": 1, "url": 1}).to_list(None)
+        if not webhooks:
+            return 0
+
+        now = datetime.utcnow()
+        event_id = str(uuid.uuid4())
+        deliveries = [{
+            "_id": str(uuid.uuid4()),
+            "event_id": event_id,
+            "event": event_type,
+            "webhook_id": webhook["webhook_id"],
+            "user_id": webhook.get("user_id"),
+            "url": webhook["url"],
+            "endpoint": endpoint_of(webhook["url"]),
+            "data": data,
+            "occurred_at": now,
+            "status": PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now
+        } for webhook in webhooks]
+        await self.collection.insert_many(deliveries, ordered=False)
+        WEBHOOK_EVENTS_ENQUEUED.inc(len(deliveries))
+        self._wake.set()
+        return len(deliveries)
+
+    async def replay(self, query: Dict[str, Any], statuses: Iterable[str] = (DEAD, DELIVERED)) -> int:
+        """Queue matching finished deliveries again with a fresh attempt budget"""
+        now = datetime.utcnow()
+        result = await self.collection.update_many(
+            {**query, "status": {"$in": list(statuses)}},
+            {"$set": {"status": PENDING, "attempts": 0, "next_attempt_at": now, "replayed_at": now},
+             "$unset": {"lease_id": "", "lease_until": "", "delivered_at": "", "dead_at": ""}}
+        )
+        if result.modified_count:
+            self._wake.set()
+        return result.modified_count
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; anything they had claimed is retried once its lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            # Claims are serialized so the per-endpoint counts they check are never stale
+            async with self._claim_lock:
+                try:
+                    delivery = await self.claim()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Webhook outbox claim failed: {e}")
+                    delivery = None
+                if delivery is not None:
+                    endpoint = delivery["endpoint"]
+                    self._active[endpoint] = self._active.get(endpoint, 0) + 1
+
+            if delivery is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self.deliver(delivery)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook delivery {delivery['_id']} failed unexpectedly: {e}")
+            finally:
+                self._active[endpoint] -= 1
+                if not self._active[endpoint]:
+                    del self._active[endpoint]
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """Lease the oldest due delivery whose endpoint this process is not already saturating"""
+        now = datetime.utcnow()
+        saturated = [endpoint for endpoint, count in self._active.items() if count >= self.per_endpoint]
+        query: Dict[str, Any] = {"$or": [
+            {"status": PENDING, "next_attempt_at": {"$lte": now}},
+            {"status": DELIVERING, "lease_until": {"$lt": now}}
+        ]}
+        if saturated:
+            query["endpoint"] = {"$nin": saturated}
+        return await self.collection.find_one_and_update(
+            query,
+            {"$set": {"status": DELIVERING, "lease_id": str(uuid.uuid4()),
+                      "lease_until": now + timedelta(seconds=self.lease)}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds before the next attempt: exponential with full jitter, capped"""
+        return random.uniform(0.5, 1.0) * min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+
+    async def deliver(self, delivery: Dict[str, Any]):
+        webhook = await self.db.webhooks.find_one({"webhook_id": delivery["webhook_id"]},
+                                                  {"secret": 1, "active": 1})
+        lease = {"_id": delivery["_id"], "lease_id": delivery["lease_id"]}
+        if not webhook or not webhook.get("active"):
+            await self.collection.update_one(lease, {"$set": {"status": CANCELLED, "updated_at": datetime.utcnow()},
+                                                     "$unset": {"lease_id": "", "lease_until": ""}})
+            WEBHOOK_DELIVERIES.labels(outcome="cancelled").inc()
+            return
+
+        attempt = delivery.get("attempts", 0) + 1
+        body = json.dumps({
+            "event": delivery["event"],
+            "timestamp": delivery["occurred_at"].isoformat(),
+            "data": delivery["data"],
+            "metadata": {"webhook_id": delivery["webhook_id"], "delivery_id": delivery["_id"],
+                         "event_id": delivery["event_id"], "attempt": attempt}
+        }, default=_encode_default).encode()
+        timestamp = int(time.time())
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "Polaris-Webhooks/1.0",
+            "X-Polaris-Event": delivery["event"],
+            "X-Polaris-Delivery": delivery["_id"],
+            TIMESTAMP_HEADER: str(timestamp),
+            SIGNATURE_HEADER: sign_payload(webhook.get("secret") or "", timestamp, body)
+        }
+
+        start = time.perf_counter()
+        try:
+            # Retries are the outbox's job; the attempt itself is a single request
+            response = await self.http_client.post(delivery["url"], data=body, headers=headers, retries=0,
+                                                   timeout=self.timeout)
+            error = None if 200 <= response.status < 300 else f"HTTP {response.status}"
+            status_code = response.status
+        except Exception as e:
+            error, status_code = f"{type(e).__name__}: {e}", None
+        WEBHOOK_DELIVERY_DURATION.observe(time.perf_counter() - start)
+
+        now = datetime.utcnow()
+        update: Dict[str, Any] = {"attempts": attempt, "last_attempt_at": now, "last_status": status_code,
+                                  "last_error": error, "updated_at": now}
+        if error is None:
+            update.update(status=DELIVERED, delivered_at=now)
+            outcome, counter = "delivered", {"success_count": 1}
+        elif attempt >= self.max_attempts:
+            update.update(status=DEAD, dead_at=now)
+            outcome, counter = "dead", {"failure_count": 1}
+        else:
+            update.update(status=PENDING, next_attempt_at=now + timedelta(seconds=self.backoff(attempt)))
+            outcome, counter = "retry", None
+
+        result = await self.collection.update_one(lease, {"$set": update, "$unset": {"lease_id": "", "lease_until": ""}})
+        WEBHOOK_DELIVERIES.labels(outcome=outcome).inc()
+        if not result.modified_count:
+            # The lease expired and another worker took the delivery over; its result stands
+            return
+        if counter:
+            webhook_update: Dict[str, Any] = {"$inc": counter}
+            if error is None:
+                webhook_update["$set"] = {"last_triggered": now}
+            await self.db.webhooks.update_one({"webhook_id": delivery["webhook_id"]}, webhook_update)
+        if error is not None:
+            logger.warning(f"Webhook delivery {delivery['_id']} to {delivery['endpoint']} failed "
+                           f"(attempt {attempt}/{self.max_attempts}): {error}")
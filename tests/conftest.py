@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The FastAPI backend modules live beside server.py rather than in an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backup-python-backend"))
@@ -0,0 +1,475 @@
+"""
+In-process stand-ins for external services used by the backend unit tests
+"""
+
+import asyncio
+import copy
+import fnmatch
+import operator
+import time
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+
+class FakeRedis:
+    """Implements the redis.asyncio commands the backend uses, with TTLs on a local clock"""
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.expiry = {}
+        self.pubsubs = []
+        self.clock = time.monotonic
+
+    def _alive(self, key):
+        deadline = self.expiry.get(key)
+        if deadline is not None and deadline <= self.clock():
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.values or key in self.sets
+
+    async def get(self, key):
+        return self.values.get(key) if self._alive(key) else None
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value.encode() if isinstance(value, str) else value
+        if ex is not None:
+            self.expiry[key] = self.clock() + ex
+        else:
+            self.expiry.pop(key, None)
+        return True
+
+    async def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                removed += 1
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+            self.expiry.pop(key, None)
+        return removed
+
+    async def sadd(self, key, *members):
+        self._alive(key)
+        bucket = self.sets.setdefault(key, set())
+        before = len(bucket)
+        bucket.update(m.encode() if isinstance(m, str) else m for m in members)
+        return len(bucket) - before
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, set())) if self._alive(key) else set()
+
+    async def expire(self, key, seconds):
+        if not self._alive(key):
+            return False
+        self.expiry[key] = self.clock() + seconds
+        return True
+
+    async def ttl(self, key):
+        if not self._alive(key):
+            return -2
+        deadline = self.expiry.get(key)
+        return -1 if deadline is None else max(0, int(deadline - self.clock()))
+
+    async def scan_iter(self, match="*"):
+        for key in list(self.values) + list(self.sets):
+            if self._alive(key) and fnmatch.fnmatch(key, match):
+                yield key
+
+    async def publish(self, channel, message):
+        receivers = [p for p in self.pubsubs if channel in p.channels]
+        for pubsub in receivers:
+            pubsub.messages.put_nowait({"type": "message", "channel": channel.encode(), "data": message.encode()})
+        return len(receivers)
+
+    def pubsub(self):
+        pubsub = FakePubSub(self)
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        self.redis.pubsubs.remove(self)
+
+
+def _lookup(doc, path):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _local_values(doc, path):
+    """A $lookup localField that holds an array matches on any of its elements"""
+    value = _lookup(doc, path)
+    return value if isinstance(value, list) else [value]
+
+
+COMPARISONS = {"$lt": operator.lt, "$lte": operator.le, "$gt": operator.gt, "$gte": operator.ge}
+
+
+def _assign(doc, path, value):
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+
+def _values(doc, path):
+    """Every value `path` reaches, descending into arrays the way MongoDB queries do"""
+    values = [doc]
+    for part in path.split("."):
+        reached = []
+        for value in values:
+            if isinstance(value, dict) and part in value:
+                reached.append(value[part])
+            elif isinstance(value, list):
+                reached.extend(item[part] for item in value if isinstance(item, dict) and part in item)
+        values = reached
+    return values + [item for value in values if isinstance(value, list) for item in value]
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, branch) for branch in condition):
+                return False
+            continue
+        values = _values(doc, field)
+        exists = bool(values)
+        values = values or [None]
+        if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            for op, operand in condition.items():
+                if op == "$in" and not any(value in operand for value in values):
+                    return False
+                if op == "$ne" and operand in values:
+                    return False
+                if op == "$nin" and any(value in operand for value in values):
+                    return False
+                if op == "$exists" and exists != bool(operand):
+                    return False
+                if op in COMPARISONS and not any(value is not None and COMPARISONS[op](value, operand)
+                                                 for value in values):
+                    return False
+        elif condition not in values:
+            return False
+    return True
+
+
+def _assign_filtered(doc, path, value, array_filters):
+    """$set on "array.$[name]" or "array.$[name].field" using the matching arrayFilters entry"""
+    array_path, _, rest = path.partition(".$[")
+    name, _, field = rest.partition("]")
+    field = field.lstrip(".")
+    spec = next(f for f in array_filters if any(k.split(".")[0] == name for k in f))
+    element_query = {k[len(name) + 1:]: v for k, v in spec.items()}
+    items = _lookup(doc, array_path) or []
+    for i, item in enumerate(items):
+        if _matches(item, element_query):
+            if field:
+                _assign(item, field, value)
+            else:
+                items[i] = value
+
+
+def _evaluate(expression, doc, variables):
+    """The handful of aggregation expressions the backend's pipelines use"""
+    if isinstance(expression, str) and expression.startswith("$$"):
+        name, _, path = expression[2:].partition(".")
+        return _lookup(variables[name], path) if path else variables[name]
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _lookup(doc, expression[1:])
+    if isinstance(expression, dict):
+        if "$size" in expression:
+            return len(_evaluate(expression["$size"], doc, variables))
+        if "$ifNull" in expression:
+            value, default = expression["$ifNull"]
+            result = _evaluate(value, doc, variables)
+            return result if result is not None else _evaluate(default, doc, variables)
+        if "$map" in expression:
+            spec = expression["$map"]
+            return [_evaluate(spec["in"], doc, {**variables, spec["as"]: item})
+                    for item in _evaluate(spec["input"], doc, variables)]
+        evaluated = {key: _evaluate(value, doc, variables) for key, value in expression.items()}
+        return {key: value for key, value in evaluated.items() if value is not None}
+    if isinstance(expression, list):
+        return [_evaluate(item, doc, variables) for item in expression]
+    return expression
+
+
+def _project(doc, projection):
+    if not projection:
+        return dict(doc)
+    out = {"_id": doc.get("_id")} if projection.get("_id", 1) else {}
+    for field, spec in projection.items():
+        if field == "_id":
+            continue
+        if spec == 1:
+            if field in doc:
+                out[field] = doc[field]
+        elif isinstance(spec, dict) and "$elemMatch" in spec:
+            match = next((item for item in doc.get(field) or [] if _matches(item, spec["$elemMatch"])), None)
+            if match is not None:
+                out[field] = [match]
+        else:
+            out[field] = _evaluate(spec, doc, {})
+    return out
+
+
+def _apply_update(target, update, array_filters):
+    for field, value in update.get("$set", {}).items():
+        if ".$[" in field:
+            _assign_filtered(target, field, value, array_filters or [])
+        else:
+            _assign(target, field, value)
+    for field, value in update.get("$push", {}).items():
+        target.setdefault(field, []).append(value)
+    for field, value in update.get("$addToSet", {}).items():
+        values = target.setdefault(field, [])
+        if value not in values:
+            values.append(value)
+    for field, amount in update.get("$inc", {}).items():
+        target[field] = target.get(field, 0) + amount
+    for field in update.get("$unset", {}):
+        target.pop(field, None)
+
+
+class UpdateResult:
+    def __init__(self, matched, upserted_id=None):
+        self.matched_count = self.modified_count = self.deleted_count = matched
+        self.upserted_id = upserted_id
+
+
+class FakeCursor:
+    def __init__(self, docs, projection=None):
+        # Sorting and limiting see whole documents; the projection applies to what is returned
+        self.docs = docs
+        self.projection = projection
+
+    def limit(self, count):
+        return FakeCursor(self.docs[:count] if count else self.docs, self.projection)
+
+    def sort(self, key, direction=1):
+        docs = list(self.docs)
+        # Stable sorts applied from the least significant key reproduce a compound sort
+        for field, order in reversed(key if isinstance(key, list) else [(key, direction)]):
+            docs.sort(key=lambda d: _lookup(d, field), reverse=order < 0)
+        return FakeCursor(docs, self.projection)
+
+    def batch_size(self, size):
+        return self
+
+    def _results(self):
+        return [_project(d, self.projection) for d in self.docs]
+
+    async def to_list(self, length=None):
+        docs = self._results()
+        return list(docs if length is None else docs[:length])
+
+    def __aiter__(self):
+        self._iter = iter(self._results())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """Equality, $in and $ne queries, field projections and the aggregation stages the backend uses"""
+
+    def __init__(self, database=None):
+        self.database = database
+        self.docs = []
+        self.calls = []
+        # Fields insert_many treats as unique, rejecting duplicates like a unique index would
+        self.unique_fields = []
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    def find(self, query=None, projection=None):
+        self.calls.append("find")
+        return FakeCursor([d for d in self.docs if _matches(d, query or {})], projection)
+
+    async def find_one(self, query=None, projection=None):
+        self.calls.append("find_one")
+        for doc in self.docs:
+            if _matches(doc, query or {}):
+                return _project(doc, projection)
+        return None
+
+    async def count_documents(self, query, limit=None):
+        self.calls.append("count_documents")
+        count = sum(1 for d in self.docs if _matches(d, query))
+        return min(count, limit) if limit else count
+
+    async def insert_one(self, doc):
+        self.calls.append("insert_one")
+        self.docs.append(dict(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls.append("insert_many")
+        errors = []
+        taken = {f: {d[f] for d in self.docs if f in d} for f in self.unique_fields}
+        for index, doc in enumerate(docs):
+            clash = next((f for f in self.unique_fields if f in doc and doc[f] in taken[f]), None)
+            if clash is None:
+                self.docs.append(dict(doc))
+                for f in self.unique_fields:
+                    if f in doc:
+                        taken[f].add(doc[f])
+                continue
+            errors.append({"index": index, "code": 11000, "keyPattern": {clash: 1}, "keyValue": {clash: doc[clash]}})
+            if ordered:
+                break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    async def update_one(self, query, update, upsert=False, array_filters=None):
+        self.calls.append("update_one")
+        target = next((d for d in self.docs if _matches(d, query)), None)
+        inserted = target is None
+        if inserted:
+            if not upsert:
+                return UpdateResult(0)
+            target = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            if "_id" in target and any(d.get("_id") == target["_id"] for d in self.docs):
+                raise DuplicateKeyError(f"E11000 duplicate key error: {target['_id']}")
+            target.update(update.get("$setOnInsert", {}))
+            self.docs.append(target)
+        _apply_update(target, update, array_filters)
+        return UpdateResult(0, target.get("_id")) if inserted else UpdateResult(1)
+
+    async def update_many(self, query, update):
+        self.calls.append("update_many")
+        targets = [d for d in self.docs if _matches(d, query)]
+        for target in targets:
+            _apply_update(target, update, None)
+        return UpdateResult(len(targets))
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False,
+                                  array_filters=None, sort=None):
+        self.calls.append("find_one_and_update")
+        candidates = [d for d in self.docs if _matches(d, query)]
+        if sort:
+            candidates = FakeCursor(candidates).sort(sort).docs
+        target = candidates[0] if candidates else None
+        if target is None and not upsert:
+            return None
+        before = copy.deepcopy(target) if target is not None else None
+        await self.update_one({"_id": target["_id"]} if target is not None else query, update, upsert=upsert,
+                              array_filters=array_filters)
+        # update_one changes the matched document in place or appends the upserted one
+        after = target if target is not None else self.docs[-1]
+        result = copy.deepcopy(after) if return_document else before
+        return _project(result, projection) if result is not None else None
+
+    async def delete_one(self, query):
+        self.calls.append("delete_one")
+        for i, doc in enumerate(self.docs):
+            if _matches(doc, query):
+                del self.docs[i]
+                return UpdateResult(1)
+        return UpdateResult(0)
+
+    async def replace_one(self, query, replacement, upsert=False):
+        self.calls.append("replace_one")
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+        if upsert:
+            self.docs.append({**{k: v for k, v in query.items() if not isinstance(v, dict)}, **replacement})
+
+    async def bulk_write(self, requests, ordered=True):
+        self.calls.append("bulk_write")
+        modified = 0
+        for request in requests:
+            result = await self.update_one(request._filter, request._doc, upsert=request._upsert,
+                                           array_filters=getattr(request, "_array_filters", None))
+            modified += result.modified_count
+        return UpdateResult(modified)
+
+    async def create_index(self, keys, background=False, **options):
+        """Same naming and option-conflict behaviour as MongoDB's createIndexes"""
+        self.calls.append("create_index")
+        keys = list(keys)
+        name = options.pop("name", None) or "_".join(f"{field}_{direction}" for field, direction in keys)
+        spec = {"key": keys, **options}
+        existing = self.indexes.get(name)
+        if existing is not None and existing != spec:
+            raise OperationFailure(f"Index with name: {name} already exists with different options", code=85)
+        self.indexes[name] = spec
+        return name
+
+    def list_indexes(self):
+        return FakeCursor([{"name": name, **spec} for name, spec in self.indexes.items()])
+
+    def aggregate(self, pipeline):
+        self.calls.append("aggregate")
+        docs = self.docs
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [d for d in docs if _matches(d, stage["$match"])]
+            elif "$project" in stage:
+                docs = [_project(d, stage["$project"]) for d in docs]
+            elif "$lookup" in stage:
+                spec = stage["$lookup"]
+                foreign = self.database.collections.get(spec["from"], FakeCollection()).docs
+                docs = [{**d, spec["as"]: [dict(f) for f in foreign
+                                           if _lookup(f, spec["foreignField"]) in _local_values(d, spec["localField"])]}
+                        for d in docs]
+            elif "$limit" in stage:
+                docs = docs[:stage["$limit"]]
+            elif "$unwind" in stage:
+                field = stage["$unwind"][1:]
+                docs = [{**d, field: item} for d in docs for item in d.get(field) or []]
+            elif "$replaceRoot" in stage:
+                docs = [dict(_evaluate(stage["$replaceRoot"]["newRoot"], d, {})) for d in docs]
+            elif "$group" in stage:
+                spec = stage["$group"]
+                groups = {}
+                for d in docs:
+                    key = _evaluate(spec["_id"], d, {})
+                    group = groups.setdefault(key, {"_id": key})
+                    for field, accumulator in spec.items():
+                        if field != "_id":
+                            group[field] = group.get(field, 0) + _evaluate(accumulator["$sum"], d, {})
+                docs = list(groups.values())
+            else:
+                raise NotImplementedError(f"FakeCollection does not support {list(stage)}")
+        return FakeCursor(docs)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(self)
+        return self.collections[name]
+
+    def __getitem__(self, name):
+        return getattr(self, name)
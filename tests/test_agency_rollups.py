@@ -0,0 +1,150 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from agency_rollups import AgencyRollupStore, agency_overview
+from tests.fakes import FakeDatabase
+
+
+async def legacy_client_metrics(db, agency_id):
+    """Per-client metrics as get_agency_business_intelligence computed them before the rollups"""
+    sponsored_clients = await db.users.find({"role": "client"}).to_list(None)
+    agency_clients = []
+    for client in sponsored_clients:
+        if client.get("license_code"):
+            license_record = await db.license_codes.find_one({"code": client["license_code"]})
+            if license_record and license_record.get("agency_user_id") == agency_id:
+                agency_clients.append(client)
+
+    client_metrics = []
+    for client in agency_clients:
+        tier_sessions = await db.tier_assessment_sessions.find({"user_id": client["id"]}).to_list(None)
+        completed_areas = critical_gaps = evidence_required = evidence_submitted = evidence_approved = 0
+        for session in tier_sessions:
+            if session.get("status") == "completed":
+                completed_areas += 1
+            for response in session.get("responses", []):
+                if response.get("response") in ["gap_exists", "no_help"]:
+                    critical_gaps += 1
+                elif response.get("response") == "compliant" and response.get("tier_level", 1) >= 2:
+                    evidence_required += 1
+                    evidence_record = await db.assessment_evidence.find_one({
+                        "session_id": session["_id"], "question_id": response.get("question_id")})
+                    if evidence_record:
+                        evidence_submitted += 1
+                        if evidence_record.get("review_status") == "approved":
+                            evidence_approved += 1
+        active_services = await db.service_requests.count_documents({
+            "client_id": client["id"], "status": {"$in": ["active", "in_progress", "pending"]}})
+        completed_services = await db.engagements.count_documents({"client_id": client["id"], "status": "completed"})
+
+        completion_rate = (completed_areas / 10) * 100
+        evidence_approval_rate = (evidence_approved / evidence_required) * 100 if evidence_required > 0 else 0
+        client_metrics.append({
+            "client_id": client["id"],
+            "client_email": client["email"],
+            "company_name": client.get("company_name", "Unknown"),
+            "registration_date": client.get("created_at"),
+            "assessment_completion": completion_rate,
+            "readiness_score": round((completion_rate * 0.6) + (evidence_approval_rate * 0.4), 1),
+            "critical_gaps": critical_gaps,
+            "evidence_required": evidence_required,
+            "evidence_submitted": evidence_submitted,
+            "evidence_approved": evidence_approved,
+            "active_services": active_services,
+            "completed_services": completed_services,
+            "compliance_status": "compliant" if critical_gaps == 0 and evidence_approval_rate >= 80 else "needs_attention"
+        })
+    return client_metrics
+
+
+def seed(db, rng):
+    for agency in range(3):
+        for n in range(2):
+            db.license_codes.docs.append({"code": f"LIC-{agency}-{n}", "agency_user_id": f"agency-{agency}"})
+    for c in range(30):
+        cid = f"client-{c}"
+        db.users.docs.append({
+            "_id": cid, "id": cid, "email": f"{cid}@example.com", "role": rng.choice(["client", "client", "provider"]),
+            "license_code": rng.choice([None, "LIC-0-0", "LIC-0-1", "LIC-1-0", "LIC-2-1", "UNKNOWN"]),
+            "created_at": datetime(2024, 1, 1) + timedelta(days=c)
+        })
+        for s in range(rng.randint(0, 3)):
+            sid = f"{cid}-s{s}"
+            responses = []
+            for q in range(rng.randint(0, 6)):
+                response = {"question_id": f"q{q}", "response": rng.choice(["compliant", "gap_exists", "no_help", "partial"])}
+                if rng.random() > 0.2:
+                    response["tier_level"] = rng.randint(1, 3)
+                responses.append(response)
+                for _ in range(rng.choice([0, 0, 1, 2])):
+                    db.assessment_evidence.docs.append({"session_id": sid, "question_id": f"q{q}", "user_id": cid,
+                                                        "review_status": rng.choice(["approved", "pending", "rejected"])})
+            db.tier_assessment_sessions.docs.append({"_id": sid, "user_id": cid, "responses": responses,
+                                                     "status": rng.choice(["active", "completed"])})
+        for i in range(rng.randint(0, 3)):
+            db.service_requests.docs.append({"_id": f"{cid}-sr{i}", "client_id": cid,
+                                             "status": rng.choice(["active", "pending", "closed"])})
+            db.engagements.docs.append({"_id": f"{cid}-e{i}", "client_id": cid,
+                                        "status": rng.choice(["active", "completed"])})
+
+
+def by_client(metrics):
+    return {m["client_id"]: m for m in metrics}
+
+
+def test_rollups_match_legacy_metrics():
+    for seed_value in range(10):
+        db = FakeDatabase()
+        seed(db, random.Random(seed_value))
+        store = AgencyRollupStore(db)
+        for agency in ("agency-0", "agency-1", "agency-2", "agency-none"):
+            expected = asyncio.run(legacy_client_metrics(db, agency))
+            _, details = asyncio.run(store.for_agency(agency))
+            assert by_client(details) == by_client(expected)
+            assert agency_overview(details) == agency_overview(expected)
+
+
+def test_session_completion_refreshes_rollup_without_rescan():
+    db = FakeDatabase()
+    seed(db, random.Random(4))
+    store = AgencyRollupStore(db)
+    client = next(u for u in db.users.docs if u["role"] == "client" and u["license_code"] == "LIC-0-0")
+
+    async def scenario():
+        await store.for_agency("agency-0")
+        db.tier_assessment_sessions.docs.append({"_id": "new", "user_id": client["id"], "status": "completed",
+                                                 "responses": [{"question_id": "q1", "response": "gap_exists"}]})
+        before = by_client((await store.for_agency("agency-0"))[1])[client["id"]]
+        await store.refresh_quietly(client["id"])
+        db.tier_assessment_sessions.calls.clear()
+        after = by_client((await store.for_agency("agency-0"))[1])[client["id"]]
+        return before, after
+
+    before, after = asyncio.run(scenario())
+    assert after["critical_gaps"] == before["critical_gaps"] + 1
+    # Fresh rollups are served as stored; no session reads on the dashboard path
+    assert db.tier_assessment_sessions.calls == []
+
+
+def test_scheduled_refreshes_are_batched_off_the_request_path():
+    db = FakeDatabase()
+    seed(db, random.Random(5))
+    store = AgencyRollupStore(db, debounce=0.05)
+    clients = [u["id"] for u in db.users.docs if u["role"] == "client"][:3]
+
+    async def scenario():
+        await store.start()
+        for cid in clients + clients[:1]:
+            store.schedule(cid)
+        # Nothing is computed until the burst has settled
+        immediate = list(db.tier_assessment_sessions.calls)
+        await asyncio.sleep(0.2)
+        batched = list(db.tier_assessment_sessions.calls)
+        store.schedule(None, "client-late")
+        await store.stop()
+        return immediate, batched
+
+    immediate, batched = asyncio.run(scenario())
+    assert immediate == [] and batched == ["aggregate"]
+    assert {r["_id"] for r in db.agency_client_rollups.docs} == set(clients) | {"client-late"}
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from datetime import datetime
+
+from audit_pipeline import AuditPipeline
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.batches = []
+
+    async def insert_many(self, documents, ordered=True):
+        self.batches.append(list(documents))
+
+
+def test_events_are_written_in_batches_and_flushed_on_stop():
+    async def scenario():
+        collection = RecordingCollection()
+        pipeline = AuditPipeline(collection, batch_size=10, flush_interval=0.05)
+        await pipeline.start()
+        for i in range(25):
+            pipeline.submit({"event_id": i, "severity": "LOW"})
+        await asyncio.sleep(0.2)
+        pipeline.submit({"event_id": 25, "severity": "LOW"})
+        await pipeline.stop()
+        return collection.batches
+
+    batches = asyncio.run(scenario())
+    assert [len(b) for b in batches] == [10, 10, 5, 1]
+    assert [e["event_id"] for b in batches for e in b] == list(range(26))
+
+
+def test_stop_writes_the_batch_the_writer_is_holding():
+    async def scenario():
+        collection = RecordingCollection()
+        # The writer takes the events and then waits for more until flush_interval passes
+        pipeline = AuditPipeline(collection, batch_size=100, flush_interval=60)
+        await pipeline.start()
+        for i in range(10):
+            pipeline.submit({"event_id": i, "severity": "HIGH"})
+        await asyncio.sleep(0.05)
+        assert pipeline.queue.empty()
+        await pipeline.stop()
+        return collection.batches
+
+    batches = asyncio.run(scenario())
+    assert [e["event_id"] for b in batches for e in b] == list(range(10))
+
+
+def test_overflow_drops_low_severity_and_spills_the_rest(tmp_path):
+    spill = tmp_path / "audit_spill.jsonl"
+
+    async def scenario():
+        collection = RecordingCollection()
+        pipeline = AuditPipeline(collection, max_queue=1, spill_path=str(spill))
+        accepted = [
+            pipeline.submit({"event_id": 1, "severity": "LOW"}),
+            pipeline.submit({"event_id": 2, "severity": "LOW"}),
+            pipeline.submit({"event_id": 3, "severity": "HIGH"}),
+        ]
+        spilled = [json.loads(line)["event_id"] for line in spill.read_text().splitlines()]
+        # Spilled events are replayed ahead of new traffic on the next start
+        await pipeline.start()
+        await pipeline.stop()
+        return accepted, spilled, collection.batches
+
+    accepted, spilled, batches = asyncio.run(scenario())
+    assert accepted == [True, False, True]
+    assert spilled == [3]
+    assert [[e["event_id"] for e in b] for b in batches] == [[3], [1]]
+    assert not spill.exists()
+
+
+def test_replayed_events_keep_their_datetimes(tmp_path):
+    spill = tmp_path / "audit_spill.jsonl"
+    timestamp = datetime(2026, 10, 1, 12, 30)
+
+    async def scenario():
+        collection = RecordingCollection()
+        pipeline = AuditPipeline(collection, max_queue=1, spill_path=str(spill))
+        pipeline.submit({"event_id": 1, "severity": "HIGH"})
+        pipeline.submit({"event_id": 2, "severity": "HIGH", "timestamp": timestamp, "details": {"at": timestamp}})
+        await pipeline.start()
+        await pipeline.stop()
+        return collection.batches
+
+    replayed = asyncio.run(scenario())[0][0]
+    assert replayed["timestamp"] == timestamp and replayed["details"] == {"at": timestamp}
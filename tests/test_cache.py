@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime
+
+from cache import MemoryCacheBackend, RedisCacheBackend, TieredCache
+from tests.fakes import FakeRedis
+
+
+def test_memory_tier_evicts_least_recently_used():
+    async def scenario():
+        cache = MemoryCacheBackend(name="test_lru", max_entries=2)
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.get("a")
+        await cache.set("c", 3)
+        return len(cache), await cache.get("a"), await cache.get("b"), await cache.get("c")
+
+    assert asyncio.run(scenario()) == (2, 1, None, 3)
+
+
+def test_memory_tier_expires_entries():
+    async def scenario():
+        cache = MemoryCacheBackend(name="test_ttl")
+        await cache.set("a", 1, ttl=0)
+        return await cache.get("a"), len(cache)
+
+    assert asyncio.run(scenario()) == (None, 0)
+
+
+def test_tag_invalidation_reaches_both_tiers():
+    async def scenario():
+        shared = RedisCacheBackend(FakeRedis(), name="test_tags")
+        cache = TieredCache(MemoryCacheBackend(name="test_tags", max_ttl=30), shared, name="test_tags")
+        await cache.set("dash:1", {"score": 10}, tags=["user:1", "agency:9"])
+        await cache.set("dash:2", {"score": 20}, tags=["user:2", "agency:9"])
+        await cache.set("dash:3", {"score": 30}, tags=["user:3"])
+        removed = await cache.invalidate_tags("agency:9")
+        return removed, await cache.get("dash:1"), await shared.get("dash:2"), await cache.get("dash:3")
+
+    assert asyncio.run(scenario()) == (4, None, None, {"score": 30})
+
+
+def test_a_short_lived_entry_does_not_shorten_its_tag_set():
+    redis = FakeRedis()
+    shared = RedisCacheBackend(redis, name="test_tag_ttl")
+
+    async def scenario():
+        await shared.set("report:1", {"pages": 40}, ttl=3600, tags=["agency:9"])
+        await shared.set("badge:1", {"count": 2}, ttl=5, tags=["agency:9"])
+        now = redis.clock()
+        redis.clock = lambda: now + 60
+        removed = await shared.invalidate_tags("agency:9")
+        return removed, await shared.get("report:1")
+
+    assert asyncio.run(scenario()) == (1, None)
+
+
+def test_shared_tier_is_visible_to_another_worker():
+    async def scenario():
+        redis = FakeRedis()
+        worker_a = TieredCache(MemoryCacheBackend(name="test_workers", max_ttl=30),
+                               RedisCacheBackend(redis, name="test_workers"), name="test_workers")
+        worker_b = TieredCache(MemoryCacheBackend(name="test_workers", max_ttl=30),
+                               RedisCacheBackend(redis, name="test_workers"), name="test_workers")
+        await worker_a.set("schema", {"areas": 10}, tags=["assessment_schema"])
+        return await worker_b.get("schema")
+
+    assert asyncio.run(scenario()) == {"areas": 10}
+
+
+def test_a_local_fill_keeps_its_tags():
+    async def scenario():
+        redis = FakeRedis()
+        worker_a = TieredCache(MemoryCacheBackend(name="test_fill", max_ttl=30),
+                               RedisCacheBackend(redis, name="test_fill"), name="test_fill")
+        worker_b = TieredCache(MemoryCacheBackend(name="test_fill", max_ttl=30),
+                               RedisCacheBackend(redis, name="test_fill"), name="test_fill")
+        await worker_a.set("principal:u1", {"role": "client"}, tags=["principal:u1"])
+        filled = await worker_b.get("principal:u1")
+        await worker_b.invalidate_tags("principal:u1")
+        return filled, await worker_b.get("principal:u1"), len(worker_b.local)
+
+    assert asyncio.run(scenario()) == ({"role": "client"}, None, 0)
+
+
+def test_shared_tier_round_trips_datetimes():
+    locked_until = datetime(2030, 1, 1, 12, 30)
+
+    async def scenario():
+        shared = RedisCacheBackend(FakeRedis(), name="test_dates")
+        await shared.set("principal", {"id": "u1", "locked_until": locked_until})
+        return await shared.get("principal")
+
+    assert asyncio.run(scenario()) == {"id": "u1", "locked_until": locked_until}
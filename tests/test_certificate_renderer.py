@@ -0,0 +1,103 @@
+import asyncio
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+import certificate_renderer
+from certificate_renderer import CertificateRenderer, pdf_response
+
+
+def certificate(cert_id):
+    return {"_id": cert_id, "client_user_id": "c1", "agency_user_id": "a1", "session_id": "s1",
+            "readiness_percent": 82.5, "issued_at": datetime(2026, 9, 30)}
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    calls = []
+    original = certificate_renderer.render_certificate_pdf
+
+    def counting(cert, verify_url):
+        calls.append(verify_url)
+        return original(cert, verify_url)
+
+    monkeypatch.setattr(certificate_renderer, "render_certificate_pdf", counting)
+    return calls
+
+
+def test_concurrent_downloads_render_once_and_share_the_cache(tmp_path, renders):
+    renderer = CertificateRenderer(tmp_path, executor=ThreadPoolExecutor(2))
+
+    async def scenario():
+        results = await asyncio.gather(*(renderer.render(certificate("cert-1"), "https://polaris.test/")
+                                         for _ in range(5)))
+        other_host = await renderer.render(certificate("cert-1"), "https://other.test/")
+        return results, other_host
+
+    results, other_host = asyncio.run(scenario())
+    assert len({pdf for pdf, _ in results}) == 1 and len({etag for _, etag in results}) == 1
+    assert results[0][0].startswith(b"%PDF")
+    assert other_host[1] != results[0][1]
+    assert renders == ["https://polaris.test/verify/cert/cert-1", "https://other.test/verify/cert/cert-1"]
+
+    # A fresh process (empty LRU) reads the disk cache; a new template version renders again
+    restarted = CertificateRenderer(tmp_path, executor=ThreadPoolExecutor(1))
+    pdf, etag = asyncio.run(restarted.render(certificate("cert-1"), "https://polaris.test/"))
+    assert (pdf, etag) == results[0] and len(renders) == 2
+    bumped = CertificateRenderer(tmp_path, template_version="2", executor=ThreadPoolExecutor(1))
+    assert asyncio.run(bumped.render(certificate("cert-1"), "https://polaris.test/"))[1] != etag
+    assert len(renders) == 3
+
+
+def test_a_cancelled_download_does_not_fail_the_others(tmp_path, renders):
+    renderer = CertificateRenderer(tmp_path, executor=ThreadPoolExecutor(1))
+
+    async def scenario():
+        first = asyncio.create_task(renderer.render(certificate("cert-1"), "https://polaris.test/"))
+        await asyncio.sleep(0)
+        others = [asyncio.create_task(renderer.render(certificate("cert-1"), "https://polaris.test/"))
+                  for _ in range(3)]
+        await asyncio.sleep(0)
+        first.cancel()
+        return first, await asyncio.gather(*others)
+
+    first, others = asyncio.run(scenario())
+    assert first.cancelled()
+    assert len({pdf for pdf, _ in others}) == 1 and others[0][0].startswith(b"%PDF")
+    assert len(renders) == 1
+
+
+def test_memory_cache_is_bounded_by_bytes(tmp_path, renders):
+    renderer = CertificateRenderer(tmp_path, max_memory_bytes=1, executor=ThreadPoolExecutor(1))
+    asyncio.run(renderer.render(certificate("cert-1"), "https://polaris.test/"))
+    assert renderer._memory_bytes == 0 and not renderer._memory
+
+
+def test_pdf_response_honours_etag_and_ranges():
+    pdf, etag = b"%PDF-" + bytes(range(200)), '"abc"'
+    assert pdf_response(pdf, etag, "c.pdf", {}).body == pdf
+    assert pdf_response(pdf, etag, "c.pdf", {"if-none-match": etag}).status_code == 304
+    partial = pdf_response(pdf, etag, "c.pdf", {"range": "bytes=0-4"})
+    assert partial.status_code == 206 and partial.body == b"%PDF-"
+    assert partial.headers["content-range"] == f"bytes 0-4/{len(pdf)}"
+    # A range against a different version falls back to the whole file
+    assert pdf_response(pdf, etag, "c.pdf", {"range": "bytes=0-4", "if-range": '"old"'}).status_code == 200
+    assert pdf_response(pdf, etag, "c.pdf", {"range": "bytes=999-"}).status_code == 416
+
+
+def test_agency_zip_contains_every_certificate(tmp_path, renders):
+    renderer = CertificateRenderer(tmp_path, max_workers=2, executor=ThreadPoolExecutor(2))
+    certs = [certificate(f"cert-{i}") for i in range(7)]
+
+    async def collect():
+        return b"".join([chunk async for chunk in renderer.stream_zip(certs, "https://polaris.test/")])
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(collect())))
+    assert archive.namelist() == [f"Polaris_Certificate_cert-{i}.pdf" for i in range(7)]
+    assert all(archive.read(name).startswith(b"%PDF") for name in archive.namelist())
+    assert len(renders) == 7
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from chat_history import ChatHistory, InvalidCursor, decode_cursor, encode_cursor, is_read
+from tests.fakes import FakeDatabase
+
+START = datetime(2026, 10, 1, 9, 0)
+
+
+def chat(count, chat_id="c1"):
+    db = FakeDatabase()
+    # Pairs of messages share a timestamp so the _id tie-breaker matters
+    db.chat_messages.docs = [{"_id": f"m{i:03d}", "chat_id": chat_id, "sender_id": "bob" if i % 3 else "alice",
+                              "content": str(i), "timestamp": START + timedelta(seconds=i // 2)}
+                             for i in range(count)]
+    db.chat_participants.docs = [{"_id": "p1", "chat_id": chat_id, "user_id": "alice"}]
+    return db
+
+
+def test_pages_walk_back_through_the_whole_history_without_gaps():
+    db = chat(125)
+    history = ChatHistory(db)
+
+    async def walk():
+        seen, before, pages = [], None, 0
+        while True:
+            messages, has_more = await history.page("c1", before=before, limit=50)
+            seen = messages + seen
+            pages += 1
+            if not has_more:
+                return seen, pages
+            before = encode_cursor(messages[0])
+
+    seen, pages = asyncio.run(walk())
+    assert [m["_id"] for m in seen] == [f"m{i:03d}" for i in range(125)]
+    assert pages == 3
+
+
+def test_after_cursor_returns_only_newer_messages():
+    db = chat(10)
+    history = ChatHistory(db)
+    messages, has_more = asyncio.run(history.page("c1", after=encode_cursor(db.chat_messages.docs[6]), limit=2))
+    assert [m["_id"] for m in messages] == ["m007", "m008"] and has_more
+
+
+def test_unread_counts_come_from_the_watermark_and_it_only_moves_forward():
+    db = chat(10)
+    history = ChatHistory(db)
+    docs = db.chat_messages.docs
+
+    async def scenario():
+        before = await history.unread_count("c1", "alice", None)
+        moved = await history.mark_read("c1", "alice", docs[5])
+        stale = await history.mark_read("c1", "alice", docs[2])
+        participant = db.chat_participants.docs[0]
+        watermark = await history.watermark("c1", "alice", participant)
+        return before, moved, stale, watermark, await history.unread_count("c1", "alice", watermark)
+
+    before, moved, stale, watermark, after = asyncio.run(scenario())
+    from_bob = [m for m in docs if m["sender_id"] == "bob"]
+    assert before == len(from_bob)
+    assert moved and not stale
+    assert watermark == (docs[5]["timestamp"], "m005")
+    assert after == len([m for m in from_bob if m["_id"] > "m005"])
+    assert is_read(docs[4], "alice", watermark) and not is_read(docs[7], "alice", watermark)
+    assert "update_many" not in db.chat_messages.calls
+
+
+def test_legacy_read_by_arrays_seed_the_watermark():
+    db = chat(6)
+    db.chat_messages.docs[3]["read_by"] = ["alice"]
+    history = ChatHistory(db)
+    watermark = asyncio.run(history.watermark("c1", "alice", db.chat_participants.docs[0]))
+    assert watermark == (db.chat_messages.docs[3]["timestamp"], "m003")
+    assert db.chat_participants.docs[0]["last_read_id"] == "m003"
+
+
+def test_cursors_round_trip_and_reject_garbage():
+    message = {"_id": "m1", "timestamp": START}
+    assert decode_cursor(encode_cursor(message)) == (START, "m1")
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
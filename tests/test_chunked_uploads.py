@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import io
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from chunked_uploads import ChunkedUploadService, IncompleteUpload, UploadTooLarge
+from tests.fakes import FakeDatabase
+
+
+class Stream:
+    """The async read(n) interface of fastapi.UploadFile"""
+
+    def __init__(self, data):
+        self.buffer = io.BytesIO(data)
+
+    async def read(self, size):
+        return self.buffer.read(size)
+
+
+def chunks_of(payload, size):
+    return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+
+def test_parallel_out_of_order_chunks_assemble_in_place(tmp_path):
+    db = FakeDatabase()
+    service = ChunkedUploadService(db.uploads, tmp_path, chunk_size=1000)
+    payload = os.urandom(9500)
+    parts = chunks_of(payload, 1000)
+
+    async def scenario():
+        record = await service.initiate("proposal_attachment", "../proposal.pdf", "application/pdf", len(payload),
+                                        user_id="u1")
+        order = list(range(len(parts)))
+        random.Random(3).shuffle(order)
+        first, rest = order[:4], order[4:]
+        await asyncio.gather(*(service.receive_chunk(record, i, Stream(parts[i]),
+                                                     hashlib.sha256(parts[i]).hexdigest()) for i in first))
+        stored = await db.uploads.find_one({"_id": record["_id"]})
+        missing = service.missing_chunks(stored)
+        with pytest.raises(IncompleteUpload) as excinfo:
+            await service.complete(stored)
+        await asyncio.gather(*(service.receive_chunk(record, i, Stream(parts[i])) for i in rest))
+        done = await service.complete(await db.uploads.find_one({"_id": record["_id"]}))
+        return sorted(rest), missing, excinfo.value.missing, done
+
+    rest, missing, reported, done = asyncio.run(scenario())
+    assert missing == reported == rest
+    assert done["status"] == "completed" and done["final_size"] == 9500
+    assert open(done["stored_path"], "rb").read() == payload
+    # The client-supplied name cannot escape the upload directory
+    assert os.path.dirname(done["stored_path"]) == str(tmp_path)
+    assert not any(p.name.endswith(".partial") for p in tmp_path.iterdir())
+    stored = db.uploads.docs[0]
+    assert stored["chunk_sha256"]["9"] == hashlib.sha256(parts[9]).hexdigest()
+
+
+def test_bad_chunks_are_rejected_and_not_recorded(tmp_path):
+    db = FakeDatabase()
+    service = ChunkedUploadService(db.uploads, tmp_path, chunk_size=100)
+
+    async def scenario():
+        record = await service.initiate("business_logo", "logo.png", "image/png", 250, user_id="u1")
+        errors = []
+        for index, data, sha in [(0, b"x" * 100, "0" * 64), (1, b"x" * 99, None), (2, b"x" * 51, None),
+                                 (3, b"x" * 50, None)]:
+            try:
+                await service.receive_chunk(record, index, Stream(data), sha)
+            except ValueError as e:
+                errors.append(str(e))
+        await service.receive_chunk(record, 2, Stream(b"y" * 50))
+        return errors
+
+    errors = asyncio.run(scenario())
+    assert len(errors) == 4
+    assert "SHA-256" in errors[0]
+    assert db.uploads.docs[0]["received_chunks"] == [2]
+
+
+def test_abandoned_uploads_are_removed(tmp_path):
+    db = FakeDatabase()
+    service = ChunkedUploadService(db.uploads, tmp_path, chunk_size=100, max_age=3600)
+
+    async def scenario():
+        stale = await service.initiate("business_logo", "a.png", "image/png", 300, user_id="u1")
+        fresh = await service.initiate("business_logo", "b.png", "image/png", 300, user_id="u1")
+        old = datetime.utcnow() - timedelta(hours=2)
+        await db.uploads.update_one({"_id": stale["_id"]}, {"$set": {"created_at": old, "updated_at": old}})
+        # A long-running upload that is still receiving chunks is kept
+        await db.uploads.update_one({"_id": fresh["_id"]}, {"$set": {"created_at": old}})
+        return stale, fresh, await service.cleanup_abandoned()
+
+    stale, fresh, removed = asyncio.run(scenario())
+    assert removed == 1
+    assert not service.partial_path(stale["_id"]).exists()
+    assert service.partial_path(fresh["_id"]).exists()
+    assert {d["_id"]: d["status"] for d in db.uploads.docs} == {stale["_id"]: "abandoned", fresh["_id"]: "initiated"}
+
+
+def test_oversized_uploads_are_refused_before_allocating(tmp_path):
+    db = FakeDatabase()
+    service = ChunkedUploadService(db.uploads, tmp_path, max_sizes={"business_logo": 1000})
+
+    async def scenario():
+        with pytest.raises(UploadTooLarge) as excinfo:
+            await service.initiate("business_logo", "logo.png", "image/png", 1001, user_id="u1")
+        return excinfo.value, await service.initiate("business_logo", "logo.png", "image/png", 1000, user_id="u1")
+
+    error, accepted = asyncio.run(scenario())
+    assert error.limit == 1000
+    assert [d["_id"] for d in db.uploads.docs] == [accepted["_id"]]
+    assert [p.name for p in tmp_path.iterdir()] == [f"{accepted['_id']}.partial"]
+
+
+def test_completions_stuck_assembling_are_settled(tmp_path):
+    db = FakeDatabase()
+    service = ChunkedUploadService(db.uploads, tmp_path, chunk_size=100, assemble_timeout=60)
+
+    async def scenario():
+        renamed = await service.initiate("business_logo", "a.png", "image/png", 100, user_id="u1")
+        pending = await service.initiate("business_logo", "b.png", "image/png", 100, user_id="u1")
+        for record in (renamed, pending):
+            await service.receive_chunk(record, 0, Stream(b"z" * 100))
+        # The first process renamed the file and died before recording it; the second died before renaming
+        os.replace(service.partial_path(renamed["_id"]), service.final_path(renamed))
+        old = datetime.utcnow() - timedelta(minutes=5)
+        await db.uploads.update_many({}, {"$set": {"status": "assembling", "updated_at": old}})
+        recovered = await service.recover_assembling()
+        retried = await service.complete(await db.uploads.find_one({"_id": pending["_id"]}))
+        return renamed, recovered, retried
+
+    renamed, recovered, retried = asyncio.run(scenario())
+    assert recovered == 2
+    settled = next(d for d in db.uploads.docs if d["_id"] == renamed["_id"])
+    assert settled["status"] == "completed" and settled["stored_path"] == str(service.final_path(renamed))
+    assert retried["status"] == "completed" and open(retried["stored_path"], "rb").read() == b"z" * 100
@@ -0,0 +1,150 @@
+import asyncio
+import random
+
+from cache import MemoryCacheBackend
+from client_dashboard import ClientDashboardReadModel
+from tests.fakes import FakeDatabase
+
+
+async def legacy_home_client(db, current, count_opportunities):
+    """The /home/client handler before the read model, with its reads in their original order"""
+    tier_sessions = await db.tier_assessment_sessions.find({"user_id": current["id"]}).to_list(None)
+    valid_sessions = []
+    for session in tier_sessions:
+        area_id = session.get("area_id", "")
+        if area_id.startswith("area") and session.get("user_id") == current["id"]:
+            try:
+                area_num = int(area_id.replace("area", ""))
+                if 1 <= area_num <= 10:
+                    valid_sessions.append(session)
+            except ValueError:
+                continue
+    tier_sessions = valid_sessions
+
+    total_areas = 10
+    completed_area_ids = set()
+    critical_gaps = total_questions = answered_questions = 0
+    evidence_required_questions = evidence_submitted_questions = 0
+    for session in tier_sessions:
+        if session.get("status") == "completed":
+            if session.get("area_id"):
+                completed_area_ids.add(session.get("area_id"))
+        total_questions += len(session.get("questions", []))
+        answered_questions += len(session.get("responses", []))
+        for response in session.get("responses", []):
+            if response.get("response") in ["gap_exists", "no_help"]:
+                critical_gaps += 1
+            elif response.get("response") == "compliant":
+                if response.get("tier_level", 1) >= 2:
+                    evidence_required_questions += 1
+                    if await db.assessment_evidence.find_one({"session_id": session["_id"],
+                                                              "question_id": response.get("question_id")}):
+                        evidence_submitted_questions += 1
+
+    completed_areas = min(len(completed_area_ids), total_areas)
+    completion_percentage = min(100.0, max(0.0, round((completed_areas / total_areas) * 100, 1)))
+    evidence_approval_rate = 0
+    if evidence_required_questions > 0:
+        approved = await db.assessment_evidence.count_documents({"user_id": current["id"], "review_status": "approved"})
+        evidence_approval_rate = min(100.0, (approved / evidence_required_questions) * 100)
+    readiness_score = round((completion_percentage * 0.6) + (evidence_approval_rate * 0.4), 1)
+
+    active_services = await db.service_requests.count_documents({
+        "client_id": current["id"], "status": {"$in": ["active", "in_progress", "pending"]}})
+    cert = await db.certificates.find_one({"client_user_id": current["id"]})
+    opportunities_count = await count_opportunities(current)
+    prof = await db.business_profiles.find_one({"user_id": current["id"]})
+    agency_info = None
+    if current.get("license_code"):
+        license_record = await db.license_codes.find_one({"code": current["license_code"]})
+        if license_record:
+            agency = await db.users.find_one({"id": license_record.get("agency_user_id")})
+            if agency:
+                agency_info = {"agency_id": agency["id"], "agency_email": agency["email"],
+                               "company_name": agency.get("company_name", "Local Agency")}
+
+    return {
+        "readiness": readiness_score,
+        "completion_percentage": completion_percentage,
+        "critical_gaps": critical_gaps,
+        "active_services": active_services,
+        "total_questions": total_questions,
+        "answered_questions": answered_questions,
+        "evidence_required": evidence_required_questions,
+        "evidence_submitted": evidence_submitted_questions,
+        "has_certificate": bool(cert),
+        "opportunities": opportunities_count,
+        "profile_complete": bool(prof and prof.get("logo_upload_id")),
+        "agency_info": agency_info,
+        "assessment_areas": {
+            "total": total_areas,
+            "completed": completed_areas,
+            "in_progress": len([s for s in tier_sessions if s.get("status") == "active"])
+        }
+    }
+
+
+def seed(db, rng, uid):
+    db.users.docs.append({"_id": "agency-1", "id": "agency-1", "email": "agency@example.com", "company_name": "City"})
+    db.license_codes.docs.append({"code": "LIC-1", "agency_user_id": "agency-1"})
+    db.business_profiles.docs.append({"user_id": uid, "logo_upload_id": "logo-1"})
+    db.certificates.docs.append({"_id": "cert-1", "client_user_id": uid})
+    for i in range(4):
+        db.service_requests.docs.append({"_id": f"sr{i}", "client_id": uid, "status": rng.choice(["active", "pending", "closed"])})
+
+    areas = ["area1", "area3", "area3", "area10", "area11", "areaX", "other"]
+    for s, area in enumerate(areas):
+        questions = [{"id": f"q{s}-{q}"} for q in range(rng.randint(3, 8))]
+        responses = []
+        for q in questions[:rng.randint(0, len(questions))]:
+            response = {"question_id": q["id"], "response": rng.choice(["compliant", "gap_exists", "no_help", "partial"])}
+            if rng.random() > 0.2:
+                response["tier_level"] = rng.randint(1, 3)
+            responses.append(response)
+            if rng.random() > 0.5:
+                db.assessment_evidence.docs.append({"session_id": f"s{s}", "question_id": q["id"], "user_id": uid,
+                                                    "review_status": rng.choice(["approved", "pending"])})
+        db.tier_assessment_sessions.docs.append({
+            "_id": f"s{s}", "user_id": uid if s != 2 else "someone-else", "area_id": area,
+            "status": rng.choice(["active", "completed"]), "questions": questions, "responses": responses
+        })
+
+
+def test_read_model_matches_legacy_dashboard():
+    async def count_opportunities(current):
+        return 7
+
+    for seed_value in range(20):
+        rng = random.Random(seed_value)
+        db = FakeDatabase()
+        current = {"id": "client-1", "license_code": "LIC-1"}
+        seed(db, rng, current["id"])
+        model = ClientDashboardReadModel(db, MemoryCacheBackend(name="test_dashboard"), count_opportunities)
+
+        expected = asyncio.run(legacy_home_client(db, current, count_opportunities))
+        assert asyncio.run(model.build(current)) == expected
+
+
+def test_dashboard_cached_until_invalidated():
+    async def count_opportunities(current):
+        return 0
+
+    db = FakeDatabase()
+    current = {"id": "client-1"}
+    seed(db, random.Random(7), current["id"])
+    model = ClientDashboardReadModel(db, MemoryCacheBackend(name="test_dashboard"), count_opportunities)
+
+    async def scenario():
+        first = await model.get(current)
+        db.service_requests.docs.append({"_id": "new", "client_id": "client-1", "status": "active"})
+        cached = await model.get(current)
+        await model.invalidate("client-1")
+        fresh = await model.get(current)
+        return first, cached, fresh
+
+    first, cached, fresh = asyncio.run(scenario())
+    assert cached == first
+    assert fresh["active_services"] == first["active_services"] + 1
+    # One evidence query for the whole dashboard regardless of how many answers need it
+    assert db.assessment_evidence.calls.count("find") == 2
+    assert "find_one" not in db.assessment_evidence.calls
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from evidence_store import BlobTooLarge, EvidenceBlobStore, blob_response, parse_range
+from tests.fakes import FakeDatabase
+
+
+class Stream:
+    """The async read(n) interface of fastapi.UploadFile"""
+
+    def __init__(self, data):
+        self.buffer = io.BytesIO(data)
+
+    async def read(self, size):
+        return self.buffer.read(size)
+
+
+def test_identical_documents_are_stored_once_and_reference_counted(tmp_path):
+    db = FakeDatabase()
+    store = EvidenceBlobStore(db, tmp_path)
+    payload = os.urandom(3 * 1024 * 1024 + 17)
+
+    async def scenario():
+        first = await store.put(Stream(payload), "application/pdf")
+        second = await store.put(Stream(payload), "application/pdf")
+        other = await store.put(Stream(b"another document"), "text/plain")
+        return first, second, other
+
+    first, second, other = asyncio.run(scenario())
+    assert first["sha256"] == second["sha256"] == hashlib.sha256(payload).hexdigest()
+    assert first["created"] and not second["created"] and other["created"]
+    assert open(first["path"], "rb").read() == payload
+    blob = next(d for d in db.evidence_blobs.docs if d["_id"] == first["sha256"])
+    assert blob["ref_count"] == 2 and blob["size"] == len(payload)
+    assert not list((tmp_path / "incoming").iterdir())
+
+
+def test_oversized_upload_is_rejected_without_a_blob(tmp_path):
+    db = FakeDatabase()
+    store = EvidenceBlobStore(db, tmp_path)
+
+    with pytest.raises(BlobTooLarge):
+        asyncio.run(store.put(Stream(b"x" * 2048), max_size=1024))
+    assert db.evidence_blobs.docs == []
+    assert not list((tmp_path / "incoming").iterdir())
+
+
+def test_only_released_blobs_past_the_grace_period_are_collected(tmp_path):
+    db = FakeDatabase()
+    store = EvidenceBlobStore(db, tmp_path, grace=60)
+
+    async def scenario():
+        shared = await store.put(Stream(b"shared"))
+        await store.put(Stream(b"shared"))
+        orphan = await store.put(Stream(b"orphan"))
+        recent = await store.put(Stream(b"recent"))
+        for sha in (shared["sha256"], orphan["sha256"], recent["sha256"]):
+            await store.release(sha)
+        for doc in db.evidence_blobs.docs:
+            if doc["_id"] != recent["sha256"]:
+                doc["released_at"] = datetime.utcnow() - timedelta(minutes=5)
+        return shared, orphan, recent, await store.collect_garbage()
+
+    shared, orphan, recent, removed = asyncio.run(scenario())
+    assert removed == 1
+    assert not os.path.exists(orphan["path"])
+    assert os.path.exists(shared["path"]) and os.path.exists(recent["path"])
+    assert {d["_id"] for d in db.evidence_blobs.docs} == {shared["sha256"], recent["sha256"]}
+
+
+def test_a_put_during_collection_keeps_its_file(tmp_path):
+    db = FakeDatabase()
+    store = EvidenceBlobStore(db, tmp_path, grace=60)
+    delete_one = db.evidence_blobs.delete_one
+    stored = {}
+
+    async def delete_then_put(query):
+        result = await delete_one(query)
+        # The same document is uploaded again while the collector is still running
+        stored["again"] = await store.put(Stream(b"orphan"))
+        return result
+
+    async def scenario():
+        orphan = await store.put(Stream(b"orphan"))
+        await store.release(orphan["sha256"])
+        db.evidence_blobs.docs[0]["released_at"] = datetime.utcnow() - timedelta(minutes=5)
+        db.evidence_blobs.delete_one = delete_then_put
+        return await store.collect_garbage()
+
+    assert asyncio.run(scenario()) == 1
+    again = stored["again"]
+    assert again["created"] and open(again["path"], "rb").read() == b"orphan"
+    assert [(d["_id"], d["ref_count"]) for d in db.evidence_blobs.docs] == [(again["sha256"], 1)]
+
+
+def test_a_blob_being_deleted_cannot_be_referenced(tmp_path):
+    db = FakeDatabase()
+    store = EvidenceBlobStore(db, tmp_path, grace=60)
+
+    async def scenario():
+        orphan = await store.put(Stream(b"orphan"))
+        await store.release(orphan["sha256"])
+        # A collector has marked the blob and is about to remove its file
+        db.evidence_blobs.docs[0]["deleting"] = datetime.utcnow()
+        again = asyncio.ensure_future(store.put(Stream(b"orphan")))
+        await asyncio.sleep(0.1)
+        waiting = not again.done()
+        os.unlink(orphan["path"])
+        await db.evidence_blobs.delete_one({"_id": orphan["sha256"]})
+        return waiting, await again
+
+    waiting, again = asyncio.run(scenario())
+    assert waiting
+    assert again["created"] and open(again["path"], "rb").read() == b"orphan"
+    assert db.evidence_blobs.docs[0]["ref_count"] == 1 and "deleting" not in db.evidence_blobs.docs[0]
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_range_download_reads_only_the_requested_bytes(tmp_path):
+    path = tmp_path / "blob"
+    payload = os.urandom(5000)
+    path.write_bytes(payload)
+
+    async def body(response):
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    partial = blob_response(str(path), "report.pdf", "bytes=1000-1999")
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == "bytes 1000-1999/5000"
+    assert asyncio.run(body(partial)) == payload[1000:2000]
+    assert blob_response(str(path), "report.pdf").status_code == 200
+    assert blob_response(str(path), "report.pdf", "bytes=6000-").status_code == 416
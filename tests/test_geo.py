@@ -0,0 +1,50 @@
+import asyncio
+
+from geo import METERS_PER_MILE, centroid_operations, geo_near_pipeline, locate_provider, parse_centroid
+from tests.fakes import FakeDatabase
+
+
+def test_centroids_are_validated_before_upsert():
+    assert parse_centroid({"zip": 30301, "lat": "33.75", "lng": -84.39}) == ("30301", 33.75, -84.39)
+    assert parse_centroid({"zip": "30301", "lat": 95, "lng": -84.39}) is None
+    assert parse_centroid({"zip": "30301", "lat": "n/a", "lng": -84.39}) is None
+    assert parse_centroid({"lat": 33.75, "lng": -84.39}) is None
+
+    ops = centroid_operations([{"zip": "30301", "lat": 33.75, "lng": -84.39}, {"zip": "bad"}, "not a dict"])
+    assert len(ops) == 1
+    assert ops[0]._doc["$set"]["location"] == {"type": "Point", "coordinates": [-84.39, 33.75]}
+    assert ops[0]._upsert
+
+
+def test_geo_near_pipeline_pages_within_radius():
+    pipeline = geo_near_pipeline(33.75, -84.39, 25, offset=20, limit=10)
+    geo_near = pipeline[0]["$geoNear"]
+    assert geo_near["near"]["coordinates"] == [-84.39, 33.75]
+    assert geo_near["maxDistance"] == 25 * METERS_PER_MILE
+    assert geo_near["distanceMultiplier"] * METERS_PER_MILE == 1
+    assert geo_near["query"]["approval_status"] == "approved"
+    page = pipeline[1]["$facet"]["providers"]
+    assert page[:2] == [{"$skip": 20}, {"$limit": 10}]
+
+
+def test_a_provider_is_placed_as_soon_as_their_zip_changes():
+    db = FakeDatabase()
+    db.zip_centroids.docs = [{"zip": "30301", "lat": 33.75, "lng": -84.39},
+                             {"zip": "10001", "lat": 40.75, "lng": -73.99}]
+    db.users.docs = [{"_id": "p1", "id": "p1", "role": "provider"},
+                     {"_id": "c1", "id": "c1", "role": "client", "zipcode": "30301"}]
+
+    async def scenario():
+        placed = [await locate_provider(db, "p1")]
+        db.business_profiles.docs = [{"user_id": "p1", "zipcode": "30301"}]
+        placed.append(await locate_provider(db, "p1"))
+        db.users.docs[0]["location"] = {"zipcode": "10001"}
+        placed.append(await locate_provider(db, "p1"))
+        placed.append(await locate_provider(db, "c1"))
+        return placed
+
+    assert asyncio.run(scenario()) == [False, True, True, False]
+    provider, client = db.users.docs
+    assert provider["geo_location"] == {"type": "Point", "coordinates": [-73.99, 40.75]}
+    assert provider["geo_zip"] == "10001"
+    assert "geo_location" not in client
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from http_client import AsyncHTTPClient
+
+
+async def start_stub(routes):
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_concurrent_oauth_lookups_do_not_serialize():
+    delay = 0.2
+
+    async def session_data(request):
+        await asyncio.sleep(delay)
+        return web.json_response({"email": f"{request.headers['X-Session-ID']}@example.com"})
+
+    async def scenario():
+        runner, base = await start_stub([web.get("/auth/v1/env/oauth/session-data", session_data)])
+        client = AsyncHTTPClient(max_per_host=20)
+        try:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*[
+                client.get(f"{base}/auth/v1/env/oauth/session-data", headers={"X-Session-ID": f"s{i}"})
+                for i in range(10)
+            ])
+            elapsed = time.perf_counter() - start
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return elapsed, [r.json()["email"] for r in responses]
+
+    elapsed, emails = asyncio.run(scenario())
+    assert emails == [f"s{i}@example.com" for i in range(10)]
+    # Ten logins back to back would take 10 * delay
+    assert elapsed < delay * 4
+
+
+def test_per_host_limit_bounds_concurrency():
+    active = {"now": 0, "peak": 0}
+
+    async def slow(request):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        return web.Response(text="ok")
+
+    async def scenario():
+        runner, base = await start_stub([web.get("/slow", slow)])
+        client = AsyncHTTPClient(max_per_host=2)
+        try:
+            await asyncio.gather(*[client.get(f"{base}/slow") for _ in range(6)])
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+    assert active["peak"] == 2
+
+
+def test_retries_transient_status_then_succeeds():
+    calls = {"count": 0}
+
+    async def flaky(request):
+        calls["count"] += 1
+        if calls["count"] < 3:
+            return web.Response(status=503)
+        return web.json_response({"ok": True})
+
+    async def scenario():
+        runner, base = await start_stub([web.get("/flaky", flaky), web.post("/flaky", flaky)])
+        client = AsyncHTTPClient(retries=2, backoff_base=0.01)
+        try:
+            response = await client.get(f"{base}/flaky")
+            calls["count"] = 0
+            # POST is not idempotent, so it is not retried unless asked
+            post_response = await client.post(f"{base}/flaky")
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return response.status, response.json(), post_response.status
+
+    assert asyncio.run(scenario()) == (200, {"ok": True}, 503)
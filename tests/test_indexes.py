@@ -0,0 +1,70 @@
+import asyncio
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+from indexes import INDEX_REGISTRY, IndexRegistry, _key_signature
+from tests.fakes import FakeDatabase
+
+
+REGISTRY = {
+    "users": [
+        {"keys": [("email", ASCENDING)], "unique": True},
+        {"keys": [("role", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "sessions": [
+        {"keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "dashboard_updates": [
+        {"keys": [("processed", ASCENDING), ("timestamp", ASCENDING)],
+         "partialFilterExpression": {"processed": False}},
+    ],
+}
+
+
+def test_declared_indexes_are_created_with_their_options():
+    db = FakeDatabase()
+
+    result = asyncio.run(IndexRegistry(db, REGISTRY).ensure_indexes())
+
+    assert result["failed"] == []
+    assert sorted(result["ensured"]) == sorted([
+        "users.email_1", "users.role_1_created_at_-1", "sessions.expires_at_1",
+        "dashboard_updates.processed_1_timestamp_1",
+    ])
+    assert db.users.indexes["email_1"]["unique"] is True
+    assert db.sessions.indexes["expires_at_1"]["expireAfterSeconds"] == 0
+    assert db.dashboard_updates.indexes["processed_1_timestamp_1"]["partialFilterExpression"] == {"processed": False}
+
+
+def test_applying_the_registry_again_is_a_no_op():
+    db = FakeDatabase()
+    registry = IndexRegistry(db)
+
+    async def scenario():
+        first = await registry.ensure_indexes()
+        snapshot = {name: dict(collection.indexes) for name, collection in db.collections.items()}
+        second = await registry.ensure_indexes()
+        return first, second, snapshot
+
+    first, second, snapshot = asyncio.run(scenario())
+    assert first["failed"] == [] and second["failed"] == []
+    assert first["ensured"] == second["ensured"]
+    assert len(first["ensured"]) == sum(len(specs) for specs in INDEX_REGISTRY.values())
+    assert {name: collection.indexes for name, collection in db.collections.items()} == snapshot
+
+
+def test_a_conflicting_index_is_reported_without_blocking_the_rest():
+    db = FakeDatabase()
+    # Created by hand earlier without the unique option
+    asyncio.run(db.users.create_index([("email", ASCENDING)]))
+
+    result = asyncio.run(IndexRegistry(db, REGISTRY).ensure_indexes())
+
+    assert [f["keys"] for f in result["failed"]] == [(("email", 1),)]
+    assert "users.role_1_created_at_-1" in result["ensured"]
+    assert "sessions.expires_at_1" in result["ensured"]
+
+
+def test_text_indexes_compare_by_their_stored_signature():
+    declared = _key_signature([("title", TEXT), ("content", TEXT)])
+    assert declared == _key_signature({"_fts": "text", "_ftsx": 1})
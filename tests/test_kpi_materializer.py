@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from kpi_materializer import EMPTY_KPIS, KPIMaterializer, median
+from tests.fakes import FakeDatabase
+
+
+def test_median_matches_previous_definition():
+    assert median([]) is None
+    assert median([3.0, 1.0, 2.0]) == 2.0
+    assert median([4.0, 1.0, 3.0, 2.0]) == 2.5
+
+
+def test_fresh_shared_snapshot_is_adopted_without_recomputing():
+    db = FakeDatabase()
+    db.platform_kpis.docs.append({"_id": "landing", **EMPTY_KPIS, "total_clients": 42,
+                                  "computed_at": datetime.utcnow() - timedelta(seconds=10)})
+    materializer = KPIMaterializer(db, interval=300)
+
+    async def scenario():
+        await asyncio.gather(*[materializer.ensure_ready() for _ in range(20)])
+
+    asyncio.run(scenario())
+    assert materializer.snapshot()["total_clients"] == 42
+    assert db.users.calls == []
+    assert db.platform_kpis.calls == ["find_one"]
+
+
+def test_increments_update_document_snapshot_and_etag():
+    db = FakeDatabase()
+    db.platform_kpis.docs.append({"_id": "landing", **EMPTY_KPIS, "certificates": 5, "computed_at": datetime.utcnow()})
+    materializer = KPIMaterializer(db)
+
+    async def scenario():
+        await materializer.ensure_ready()
+        before = materializer.etag
+        await materializer.increment("certificates")
+        return before
+
+    before = asyncio.run(scenario())
+    assert materializer.snapshot()["certificates"] == 6
+    assert db.platform_kpis.docs[0]["certificates"] == 6
+    assert materializer.etag != before
+    with pytest.raises(ValueError):
+        asyncio.run(materializer.increment("gaps_addressed_30d"))
+
+
+def test_increments_during_a_recount_survive_it():
+    db = FakeDatabase()
+    db.users.docs = [{"_id": f"c{i}", "role": "client"} for i in range(3)]
+    db.platform_kpis.docs.append({"_id": "landing", **EMPTY_KPIS, "total_clients": 1, "opportunities_open": 9,
+                                  "computed_at": datetime.utcnow() - timedelta(days=1)})
+    materializer = KPIMaterializer(db)
+    compute = materializer.compute
+
+    async def compute_while_a_client_registers():
+        kpis = await compute()
+        # Registered after the recount read users, so only the increment counts it
+        db.users.docs.append({"_id": "c3", "role": "client"})
+        await materializer.increment("total_clients")
+        return kpis
+
+    materializer.compute = compute_while_a_client_registers
+    kpis = asyncio.run(materializer.refresh())
+
+    assert kpis["total_clients"] == 4 and kpis["opportunities_open"] == 0
+    assert db.platform_kpis.docs[0]["total_clients"] == 4
+    assert materializer.snapshot()["total_clients"] == 4
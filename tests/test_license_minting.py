@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import license_minting
+from license_minting import (LicenseMinter, LicenseMintingError, generate_codes, release_license_quota,
+                             reserve_license_quota)
+from tests.fakes import FakeDatabase
+
+
+def licenses():
+    db = FakeDatabase()
+    db.agency_licenses.unique_fields = ["license_code"]
+    return db
+
+
+def test_generated_codes_are_distinct_ten_digit_strings():
+    codes = generate_codes(10000)
+    assert len(set(codes)) == 10000
+    assert all(len(code) == 10 and code.isdigit() for code in codes)
+    assert sorted(generate_codes(50, digits=2, exclude={f"{i:02d}" for i in range(50)})) == \
+        [str(i) for i in range(50, 100)]
+
+
+def test_a_batch_of_ten_thousand_is_one_insert():
+    db = licenses()
+    minted = asyncio.run(LicenseMinter(db.agency_licenses).mint(10000, agency_id="a1"))
+    assert len(minted) == len(db.agency_licenses.docs) == 10000
+    assert db.agency_licenses.calls == ["insert_many"]
+    assert {doc["status"] for doc in minted} == {"available"}
+
+
+def test_only_collided_codes_are_regenerated(monkeypatch):
+    db = licenses()
+    db.agency_licenses.docs = [{"_id": "old", "license_code": "0000000001"}]
+    batches = iter([["0000000001", "0000000002", "0000000003"], ["0000000004"]])
+    monkeypatch.setattr(license_minting, "generate_codes", lambda count, exclude=None: next(batches))
+
+    minted = asyncio.run(LicenseMinter(db.agency_licenses).mint(3, agency_id="a1", tier="tier_1"))
+    assert sorted(doc["license_code"] for doc in minted) == ["0000000002", "0000000003", "0000000004"]
+    assert db.agency_licenses.calls == ["insert_many", "insert_many"]
+    assert all(doc["tier"] == "tier_1" for doc in minted)
+
+
+def test_persistent_collisions_report_what_was_minted(monkeypatch):
+    db = licenses()
+    db.agency_licenses.docs = [{"_id": "old", "license_code": "0000000001"}]
+    monkeypatch.setattr(license_minting, "generate_codes",
+                        lambda count, exclude=None: ["0000000001"] if count == 1 else ["0000000001", "0000000009"])
+
+    with pytest.raises(LicenseMintingError) as excinfo:
+        asyncio.run(LicenseMinter(db.agency_licenses, max_attempts=3).mint(2))
+    assert [doc["license_code"] for doc in excinfo.value.minted] == ["0000000009"]
+
+
+def test_other_write_errors_are_not_retried():
+    class Failing:
+        async def insert_many(self, docs, ordered=True):
+            raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "validation"}]})
+
+    with pytest.raises(BulkWriteError):
+        asyncio.run(LicenseMinter(Failing()).mint(1))
+
+
+def test_quota_reservation_is_a_conditional_increment():
+    db = FakeDatabase()
+
+    async def scenario():
+        first = await reserve_license_quota(db.subscription_usage, "a1", "2026-10", 6, 10)
+        over = await reserve_license_quota(db.subscription_usage, "a1", "2026-10", 5, 10)
+        exact = await reserve_license_quota(db.subscription_usage, "a1", "2026-10", 4, 10)
+        await release_license_quota(db.subscription_usage, "a1", "2026-10", 3)
+        unlimited = await reserve_license_quota(db.subscription_usage, "a1", "2026-10", 500, -1)
+        return first, over, exact, unlimited
+
+    first, over, exact, unlimited = asyncio.run(scenario())
+    assert first["license_codes_generated"] == 6
+    assert over is None
+    assert exact["license_codes_generated"] == 10
+    assert unlimited["license_codes_generated"] == 507
+    assert len(db.subscription_usage.docs) == 1
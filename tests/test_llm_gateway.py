@@ -0,0 +1,105 @@
+import asyncio
+
+from cache import MemoryCacheBackend
+from llm_gateway import LLMGateway, SemanticCache
+
+
+class RecordingMetric:
+    def __init__(self):
+        self.results = []
+
+    def labels(self, feature, cache):
+        self.results.append((feature, cache))
+        return self
+
+    def observe(self, value):
+        pass
+
+
+def make_gateway(semantic=None, delay=0.0, fail=False):
+    calls = []
+
+    async def complete(system_message, prompt, provider, model, session_id):
+        calls.append(prompt)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("model unavailable")
+        return f"answer {len(calls)}"
+
+    metric = RecordingMetric()
+    gateway = LLMGateway(complete, MemoryCacheBackend(name="test_llm"), semantic=semantic, duration_metric=metric)
+    return gateway, calls, metric
+
+
+def test_normalized_prompts_hit_exact_cache():
+    gateway, calls, metric = make_gateway()
+
+    async def scenario():
+        first = await gateway.complete("kb_content", "Create a  guide\nfor SAM registration", system_message="sys")
+        second = await gateway.complete("kb_content", "create a guide for SAM   registration ", system_message="sys")
+        other = await gateway.complete("kb_content", "Create a guide for SAM registration", system_message="other")
+        return first, second, other
+
+    assert asyncio.run(scenario()) == ("answer 1", "answer 1", "answer 2")
+    assert len(calls) == 2
+    assert metric.results == [("kb_content", "miss"), ("kb_content", "exact"), ("kb_content", "miss")]
+
+
+def test_identical_in_flight_prompts_share_one_call():
+    gateway, calls, metric = make_gateway(delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(*[gateway.complete("ai_assistance", "same question") for _ in range(10)])
+
+    assert asyncio.run(scenario()) == ["answer 1"] * 10
+    assert len(calls) == 1
+    assert sorted(result for _, result in metric.results) == ["coalesced"] * 9 + ["miss"]
+
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    gateway, calls, _ = make_gateway(delay=0.05)
+
+    async def scenario():
+        owner = asyncio.create_task(gateway.complete("ai_assistance", "same question"))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(gateway.complete("ai_assistance", "same question")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        answers = await asyncio.gather(*waiters)
+        cached = await gateway.complete("ai_assistance", "same question")
+        return owner.cancelled(), answers, cached
+
+    owner_cancelled, answers, cached = asyncio.run(scenario())
+    assert owner_cancelled
+    assert answers == ["answer 1"] * 3 and cached == "answer 1"
+    assert len(calls) == 1
+
+
+def test_semantic_tier_matches_rephrasings_within_scope_only():
+    gateway, calls, _ = make_gateway(semantic=SemanticCache(threshold=0.7))
+
+    async def ask(question, scope):
+        return await gateway.complete("ai_assistance", f"{scope}: {question}",
+                                      semantic_text=question, semantic_scope=scope)
+
+    async def scenario():
+        first = await ask("How do I register my business in SAM.gov?", "area1")
+        rephrased = await ask("how do i register my business in sam.gov", "area1")
+        other_area = await ask("How do I register my business in SAM.gov?", "area2")
+        return first, rephrased, other_area
+
+    assert asyncio.run(scenario()) == ("answer 1", "answer 1", "answer 2")
+
+
+def test_failures_are_not_cached():
+    gateway, calls, _ = make_gateway(fail=True)
+
+    async def scenario():
+        for _ in range(2):
+            try:
+                await gateway.complete("ai_coach", "hello")
+            except RuntimeError:
+                pass
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
@@ -0,0 +1,133 @@
+import asyncio
+import random
+
+from matching_engine import ProviderEntry, ProviderMatchIndex, score_match
+from tests.fakes import FakeDatabase
+
+AREAS = [f"area{i}" for i in range(1, 10)]
+
+
+def legacy_scores(req, providers, keep_zero):
+    """Scoring loop the /match endpoints used before the index"""
+    matches = []
+    for p in providers:
+        score = 0
+        if req["area_id"] in (p.get("service_areas") or []):
+            score += 50
+        b = req.get("budget") or 0
+        pmin = p.get("price_min") or 0
+        pmax = p.get("price_max") or 0
+        if pmin and pmax and pmin <= b <= pmax:
+            score += 40
+        elif pmin and b >= pmin * 0.8:
+            score += 20
+        if p.get("availability"):
+            score += 10
+        if keep_zero or score > 0:
+            matches.append((p["_id"], score))
+    matches.sort(key=lambda x: x[1], reverse=True)
+    return matches
+
+
+def random_providers(rng, count):
+    providers = []
+    for i in range(count):
+        pmin = rng.choice([0, None, rng.randint(100, 5000)])
+        providers.append({
+            "_id": f"p{i}",
+            "user_id": f"u{i}",
+            "service_areas": rng.sample(AREAS, rng.randint(0, 3)) if rng.random() > 0.1 else None,
+            "price_min": pmin,
+            "price_max": (pmin or 0) + rng.randint(0, 5000) if rng.random() > 0.2 else None,
+            "availability": rng.random() > 0.6,
+        })
+    return providers
+
+
+def test_top_k_matches_legacy_ordering():
+    rng = random.Random(7)
+    providers = random_providers(rng, 2000)
+    index = ProviderMatchIndex()
+    index.load(providers)
+
+    for _ in range(200):
+        req = {"area_id": rng.choice(AREAS + ["area10"]), "budget": rng.choice([0, None, rng.randint(50, 12000)])}
+        budget = req.get("budget") or 0
+        expected_top10 = legacy_scores(req, providers, keep_zero=False)[:10]
+        expected_top5 = legacy_scores(req, providers, keep_zero=True)[:5]
+        assert [(p.provider_id, m.score) for m, p in index.top_k(req["area_id"], budget, 10)] == expected_top10
+        assert [(p.provider_id, m.score) for m, p in index.top_k(req["area_id"], budget, 5, include_zero=True)] == expected_top5
+
+
+def test_incremental_updates_keep_collection_order():
+    rng = random.Random(11)
+    providers = random_providers(rng, 300)
+    index = ProviderMatchIndex()
+    index.load(providers)
+
+    # Mongo updates in place (position kept), inserts append, deletes drop out
+    providers[5] = {**providers[5], "service_areas": ["area1"], "price_min": 100, "price_max": 900, "availability": True}
+    index.upsert(providers[5])
+    new_provider = {"_id": "p_new", "service_areas": ["area1"], "price_min": 100, "price_max": 900, "availability": True}
+    providers.append(new_provider)
+    index.upsert(new_provider)
+    removed = providers.pop(10)
+    index.remove(removed["_id"])
+
+    req = {"area_id": "area1", "budget": 500}
+    expected = legacy_scores(req, providers, keep_zero=True)[:50]
+    assert [(p.provider_id, m.score) for m, p in index.top_k("area1", 500, 50, include_zero=True)] == expected
+
+
+def test_eligibility_matches_provider_side_filter():
+    provider = ProviderEntry({"_id": "p", "service_areas": ["area1"], "price_min": 0, "price_max": 1000})
+    assert score_match("area1", 1000, provider).eligible
+    assert not score_match("area1", 1001, provider).eligible
+    assert not score_match("area2", 500, provider).eligible
+
+    open_range = ProviderEntry({"_id": "q", "service_areas": ["area1"]})
+    assert score_match("area1", 10 ** 6, open_range).eligible
+
+    min_only = ProviderEntry({"_id": "r", "service_areas": ["area1"], "price_min": 500})
+    assert score_match("area1", 900, min_only).eligible
+    assert not score_match("area1", 400, min_only).eligible
+
+
+def test_concurrent_first_queries_share_one_load():
+    db = FakeDatabase()
+    db.provider_profiles.docs = random_providers(random.Random(3), 50)
+    index = ProviderMatchIndex()
+
+    async def scenario():
+        await asyncio.gather(*(index.ensure_loaded(db.provider_profiles) for _ in range(10)))
+
+    asyncio.run(scenario())
+    assert len(index) == 50
+    assert db.provider_profiles.calls == ["find"]
+
+
+def test_watcher_survives_a_failed_fallback_refresh():
+    db = FakeDatabase()
+    db.provider_profiles.docs = random_providers(random.Random(4), 5)
+    index = ProviderMatchIndex()
+    find = db.provider_profiles.find
+    failures = iter([RuntimeError("primary stepped down")])
+
+    def flaky_find(*args, **kwargs):
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        return find(*args, **kwargs)
+
+    db.provider_profiles.find = flaky_find
+
+    async def scenario():
+        # FakeCollection has no change streams, so the watcher polls
+        watcher = asyncio.create_task(index.watch(db.provider_profiles, fallback_interval=0.01))
+        while not index.loaded:
+            assert not watcher.done()
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+
+    asyncio.run(scenario())
+    assert len(index) == 5
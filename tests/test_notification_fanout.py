@@ -0,0 +1,77 @@
+import asyncio
+
+from notification_fanout import NotificationFanout
+from tests.fakes import FakeDatabase
+
+
+def seed(db, providers):
+    db.service_requests.docs.append({"_id": "req-1", "budget": 5000})
+    for i in range(providers):
+        db.enhanced_provider_profiles.docs.append({
+            "provider_id": f"prov-{i}",
+            "service_areas": ["area1", "area2"] if i % 3 else ["area3"],
+            "profile_status": "active" if i % 5 else "inactive"
+        })
+
+
+def test_fan_out_writes_notifications_in_batches():
+    db = FakeDatabase()
+    seed(db, 120)
+    fanout = NotificationFanout(db, batch_size=25)
+
+    sent = asyncio.run(fanout.fan_out("area1", "req-1"))
+
+    expected = {f"prov-{i}" for i in range(120) if i % 3 and i % 5}
+    assert sent == len(expected)
+    assert {n["provider_id"] for n in db.provider_notifications.docs} == expected
+    assert db.provider_notifications.calls == ["insert_many"] * 3
+    assert db.dashboard_updates.calls == ["insert_many"] * 3
+    by_id = {n["_id"]: n for n in db.provider_notifications.docs}
+    for update in db.dashboard_updates.docs:
+        assert update["data"] == by_id[update["data"]["_id"]]
+        assert update["user_id"] == update["data"]["provider_id"]
+    assert all(n["client_budget"] == 5000 and n["request_id"] == "req-1" for n in db.provider_notifications.docs)
+
+
+def test_submitted_jobs_run_in_background_and_drain_on_stop():
+    db = FakeDatabase()
+    seed(db, 10)
+
+    async def scenario():
+        fanout = NotificationFanout(db)
+        await fanout.start()
+        fanout.submit("area3", "req-1")
+        fanout.submit("area1", "missing")
+        await asyncio.sleep(0.05)
+        written = len(db.provider_notifications.docs)
+        fanout.submit("area1", "req-1")
+        await fanout.stop()
+        return written
+
+    written = asyncio.run(scenario())
+    assert written == 3
+    assert len(db.provider_notifications.docs) == 3 + 5
+
+
+def test_stop_finishes_the_job_being_fanned_out():
+    db = FakeDatabase()
+    seed(db, 120)
+    insert_many = db.dashboard_updates.insert_many
+
+    async def slow_insert_many(docs, ordered=True):
+        await asyncio.sleep(0.01)
+        await insert_many(docs, ordered=ordered)
+
+    db.dashboard_updates.insert_many = slow_insert_many
+
+    async def scenario():
+        fanout = NotificationFanout(db, batch_size=10)
+        await fanout.start()
+        fanout.submit("area1", "req-1")
+        # Let the worker get part-way through its batches before shutdown
+        while not db.provider_notifications.docs:
+            await asyncio.sleep(0)
+        await fanout.stop()
+
+    asyncio.run(scenario())
+    assert len(db.provider_notifications.docs) == len([i for i in range(120) if i % 3 and i % 5])
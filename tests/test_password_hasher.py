@@ -0,0 +1,61 @@
+import asyncio
+
+from passlib.hash import pbkdf2_sha256
+
+from password_hasher import PasswordHasher, hash_scheme
+
+
+def test_new_hashes_use_bcrypt_and_verify():
+    hasher = PasswordHasher(max_workers=2, bcrypt_rounds=4)
+
+    async def scenario():
+        hashed = await hasher.hash("Correct-Horse-1")
+        return hashed, await hasher.verify("Correct-Horse-1", hashed), await hasher.verify("wrong", hashed)
+
+    hashed, good, bad = asyncio.run(scenario())
+    assert hash_scheme(hashed) == "bcrypt"
+    assert (good, bad) == (True, False)
+
+
+def test_legacy_pbkdf2_hash_is_upgraded_on_success_only():
+    hasher = PasswordHasher(max_workers=2, bcrypt_rounds=4)
+    legacy = pbkdf2_sha256.hash("Legacy-Pass-1")
+
+    async def scenario():
+        return (await hasher.verify_and_update("wrong", legacy),
+                await hasher.verify_and_update("Legacy-Pass-1", legacy))
+
+    failed, (valid, new_hash) = asyncio.run(scenario())
+    assert failed == (False, None)
+    assert valid and hash_scheme(new_hash) == "bcrypt"
+    assert not hasher.needs_rehash("Legacy-Pass-1", new_hash)
+
+
+def test_passwords_beyond_bcrypt_limit_stay_on_pbkdf2():
+    hasher = PasswordHasher(max_workers=1, bcrypt_rounds=4)
+    password = "x" * 100
+
+    hashed = asyncio.run(hasher.hash(password))
+    assert hash_scheme(hashed) == "pbkdf2_sha256"
+    assert not hasher.needs_rehash(password, hashed)
+
+
+def test_event_loop_stays_responsive_while_hashing():
+    hasher = PasswordHasher(max_workers=2, bcrypt_rounds=10)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(*[hasher.hash(f"Password-{i}") for i in range(4)])
+        task.cancel()
+        return ticks
+
+    # Hashing inline would block the loop and the ticker would barely run
+    assert asyncio.run(scenario()) > 5
@@ -0,0 +1,160 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from push_gateway import DashboardUpdateRelay, PushHub, RedisBackplane, chat_channel, user_channel
+from tests.fakes import FakeDatabase, FakeRedis
+
+
+def events(subscription):
+    messages = []
+    while not subscription.queue.empty():
+        messages.append(json.loads(subscription.queue.get_nowait()))
+    return messages
+
+
+def test_events_reach_only_the_subscribed_connections():
+    hub = PushHub()
+
+    async def scenario():
+        await hub.start()
+        alice, bob = await hub.connect("alice"), await hub.connect("bob")
+        await hub.join(bob, chat_channel("c1"))
+        await hub.publish(user_channel("alice"), "notification", {"title": "hi", "at": datetime(2026, 10, 1)})
+        await hub.publish(chat_channel("c1"), "chat.message", {"content": "hello"})
+        await hub.leave(bob, chat_channel("c1"))
+        await hub.publish(chat_channel("c1"), "chat.message", {"content": "missed"})
+        return events(alice), events(bob)
+
+    alice, bob = asyncio.run(scenario())
+    assert alice == [{"type": "notification", "channel": "user:alice",
+                      "data": {"title": "hi", "at": "2026-10-01T00:00:00"}}]
+    assert [e["data"]["content"] for e in bob] == ["hello"]
+
+
+def test_a_connection_that_falls_behind_is_told_to_resync():
+    hub = PushHub(max_queue=3)
+
+    async def scenario():
+        await hub.start()
+        slow = await hub.connect("slow")
+        for i in range(5):
+            await hub.publish(user_channel("slow"), "notification", {"n": i})
+        return events(slow)
+
+    assert asyncio.run(scenario()) == [{"type": "resync"}, {"type": "notification", "channel": "user:slow",
+                                                            "data": {"n": 4}}]
+
+
+def test_redis_backplane_carries_events_between_workers():
+    redis = FakeRedis()
+    worker_a, worker_b = PushHub(RedisBackplane(redis)), PushHub(RedisBackplane(redis))
+
+    async def scenario():
+        await worker_a.start()
+        await worker_b.start()
+        connection = await worker_b.connect("u1")
+        await worker_a.publish(user_channel("u1"), "dashboard.invalidate", {"dashboard": "client"})
+        received = await connection.get(timeout=2)
+        await worker_b.disconnect(connection)
+        subscribed = set(redis.pubsubs[1].channels)
+        await worker_a.stop()
+        await worker_b.stop()
+        return json.loads(received), subscribed
+
+    received, subscribed = asyncio.run(scenario())
+    assert received["type"] == "dashboard.invalidate"
+    # Only the standing control channel remains once the last local subscriber leaves
+    assert subscribed == {"polaris:push:_"}
+    assert redis.pubsubs == []
+
+
+def test_relay_pushes_each_fresh_update_once():
+    db = FakeDatabase()
+    now = datetime.utcnow()
+    db.dashboard_updates.docs = [
+        {"_id": "old", "user_id": "u1", "update_type": "x", "data": {}, "timestamp": now - timedelta(days=2),
+         "processed": False},
+        {"_id": "new", "user_id": "u1", "update_type": "new_provider_response", "data": {"request_id": "r1"},
+         "timestamp": now, "processed": False},
+        {"_id": "done", "user_id": "u1", "update_type": "x", "data": {}, "timestamp": now, "processed": True},
+    ]
+    hub = PushHub()
+
+    async def scenario():
+        await hub.start()
+        connection = await hub.connect("u1")
+        relays = [DashboardUpdateRelay(db.dashboard_updates, hub, batch_size=1) for _ in range(2)]
+        pushed = await asyncio.gather(*(relay.drain() for relay in relays))
+        return pushed, events(connection)
+
+    pushed, received = asyncio.run(scenario())
+    assert sum(pushed) == 1
+    assert [e["data"]["id"] for e in received] == ["new"]
+    assert all(doc["processed"] for doc in db.dashboard_updates.docs)
+
+
+class FlakyStream:
+    """A change stream that reports one insert and then fails, like a dropped connection"""
+
+    def __init__(self):
+        self.events = [{"operationType": "insert"}]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.events:
+            return self.events.pop()
+        raise RuntimeError("connection closed")
+
+    async def try_next(self):
+        return None
+
+
+def test_relay_reopens_the_change_stream_after_a_failure():
+    db = FakeDatabase()
+    collection = db.dashboard_updates
+    hub = PushHub()
+    opened = []
+    drain_failures = iter([RuntimeError("primary stepped down")])
+
+    def watch(pipeline):
+        opened.append(pipeline)
+        return FlakyStream()
+
+    collection.watch = watch
+
+    async def scenario():
+        await hub.start()
+        connection = await hub.connect("u1")
+        relay = DashboardUpdateRelay(collection, hub)
+        drain = relay.drain
+
+        async def flaky_drain():
+            error = next(drain_failures, None)
+            if error is not None:
+                raise error
+            return await drain()
+
+        relay.drain = flaky_drain
+        task = asyncio.create_task(relay.run(fallback_interval=0.01))
+        deadline = asyncio.get_running_loop().time() + 5
+        while len(opened) < 3:
+            assert not task.done() and asyncio.get_running_loop().time() < deadline
+            await asyncio.sleep(0.01)
+        collection.docs.append({"_id": "u", "user_id": "u1", "update_type": "x", "data": {},
+                                "timestamp": datetime.utcnow(), "processed": False})
+        while not collection.docs[0]["processed"]:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        return events(connection)
+
+    received = asyncio.run(scenario())
+    assert [e["data"]["id"] for e in received] == ["u"]
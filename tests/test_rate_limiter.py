@@ -0,0 +1,63 @@
+import asyncio
+
+from rate_limiter import MemoryRateLimitStore, RateLimiter, RateLimitMiddleware, RateLimitRule, gcra
+
+
+def test_gcra_allows_burst_then_refills_evenly():
+    tat, now, results = None, 1000.0, []
+    for _ in range(6):
+        allowed, new_tat, retry_after, _ = gcra(tat, now, limit=5, period=300)
+        results.append(allowed)
+        if allowed:
+            tat = new_tat
+    assert results == [True] * 5 + [False]
+    assert retry_after == 60.0
+    assert gcra(tat, now + 60, limit=5, period=300)[0] is True
+
+
+def test_memory_store_is_bounded():
+    async def scenario():
+        store = MemoryRateLimitStore(max_keys=100)
+        for i in range(1000):
+            await store.check(f"ip:{i}", limit=5, period=60)
+        return len(store)
+
+    assert asyncio.run(scenario()) == 100
+
+
+def _call(app, path, user=None, client=("10.0.0.1", 1234)):
+    scope = {"type": "http", "method": "GET", "path": path, "headers": [], "client": client, "user": user}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = sent[0]
+    return start["status"], dict(start["headers"])
+
+
+def test_middleware_keys_per_user_and_sets_retry_after():
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    app = RateLimitMiddleware(
+        endpoint,
+        limiter=RateLimiter(MemoryRateLimitStore()),
+        rules=[RateLimitRule("api", "/api/", limit=2, period=60, prefix=True)],
+        identify=lambda scope: scope["user"],
+    )
+
+    assert _call(app, "/api/x", user="alice")[0] == 200
+    assert _call(app, "/api/x", user="alice")[0] == 200
+    status, headers = _call(app, "/api/x", user="alice")
+    assert status == 429
+    assert headers[b"retry-after"] == b"30"
+    # Same address, different principal: separate budget
+    assert _call(app, "/api/x", user="bob")[0] == 200
+    # Paths outside every rule pass through untouched
+    assert _call(app, "/health", user="alice")[0] == 200
@@ -0,0 +1,107 @@
+import asyncio
+
+from search_engine import BM25Index, KnowledgeBaseSearch, decode_cursor, highlight, text_search_pipeline
+
+ARTICLES = [
+    {"_id": "a1", "title": "SAM registration guide", "content": "Steps to register in SAM.gov for federal contracting.",
+     "tags": ["sam", "registration"], "area_ids": ["area1"], "content_type": "guide", "status": "published"},
+    {"_id": "a2", "title": "Insurance checklist", "content": "Registration of insurance policies is not SAM related.",
+     "tags": ["insurance"], "area_ids": ["area2"], "content_type": "checklist", "status": "published"},
+    {"_id": "a3", "title": "Cybersecurity basics", "content": "Password policies and registration of devices.",
+     "tags": ["cyber"], "area_ids": ["area3"], "content_type": "guide", "status": "draft"},
+]
+
+
+def build_kb():
+    kb = KnowledgeBaseSearch()
+    for article in ARTICLES:
+        kb.upsert(article)
+    return kb
+
+
+class SlowArticles:
+    """A kb_articles collection whose cursor yields to the loop between documents"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.finds = 0
+
+    def find(self, query=None, projection=None):
+        self.finds += 1
+        return self._cursor()
+
+    async def _cursor(self):
+        for doc in self.docs:
+            await asyncio.sleep(0)
+            yield doc
+
+
+def test_title_and_tag_hits_outrank_body_mentions():
+    result = build_kb().search("sam registration", include_drafts=True)
+    assert [a["id"] for a in result["items"]] == ["a1", "a2", "a3"]
+    assert result["total"] == 3
+    assert result["items"][0]["highlights"]["title"] == "<mark>SAM</mark> <mark>registration</mark> guide"
+
+
+def test_filters_and_facets_apply_to_all_matches():
+    kb = build_kb()
+    published = kb.search("registration")
+    assert {a["id"] for a in published["items"]} == {"a1", "a2"}
+    assert published["facets"]["content_type"] == [{"value": "checklist", "count": 1}, {"value": "guide", "count": 1}]
+    assert [a["id"] for a in kb.search("registration", area_id="area2")["items"]] == ["a2"]
+
+
+def test_cursor_pages_cover_every_match_once():
+    index = BM25Index({"title": 1.0})
+    for i in range(57):
+        index.upsert(f"d{i:02d}", {"title": "alpha " + "beta " * (i % 5)})
+    seen, cursor = [], None
+    while True:
+        page = index.search("alpha beta", limit=10, cursor=cursor)
+        seen.extend(doc_id for _, doc_id in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    full = index.search("alpha beta", limit=100)
+    assert seen == [doc_id for _, doc_id in full["items"]]
+    assert len(set(seen)) == 57
+
+
+def test_removed_documents_leave_the_index():
+    kb = build_kb()
+    kb.remove("a1")
+    kb.upsert({**ARTICLES[1], "title": "Updated checklist", "tags": []})
+    assert [a["id"] for a in kb.search("sam")["items"]] == ["a2"]
+    assert kb.search("insurance")["total"] == 1
+    assert len(kb.index) == 2
+
+
+def test_concurrent_first_searches_share_one_load():
+    articles = SlowArticles(ARTICLES)
+    kb = KnowledgeBaseSearch()
+
+    async def scenario():
+        await asyncio.gather(*(kb.ensure_loaded(articles) for _ in range(5)))
+        await kb.ensure_loaded(articles)
+
+    asyncio.run(scenario())
+    assert articles.finds == 1
+    assert kb.search("registration")["total"] == 2
+
+
+def test_highlight_escapes_markup():
+    assert highlight("<b>SAM</b> & more", ["sam"]) == "&lt;b&gt;<mark>SAM</mark>&lt;/b&gt; &amp; more"
+
+
+def test_text_search_pipeline_resumes_after_cursor():
+    first = text_search_pipeline({"status": "open"}, "janitorial", limit=20)
+    assert first[0]["$match"] == {"status": "open", "$text": {"$search": "janitorial"}}
+    assert first[-1] == {"$limit": 21}
+
+    cursor = BM25Index({"title": 1.0})
+    cursor.upsert("x", {"title": "janitorial"})
+    cursor.upsert("y", {"title": "janitorial"})
+    token = cursor.search("janitorial", limit=1)["next_cursor"]
+    score, doc_id = decode_cursor(token)
+    resumed = text_search_pipeline({"status": "open"}, "janitorial", limit=20, cursor=token)
+    assert resumed[2]["$match"] == {"$or": [{"_score": {"$lt": score}}, {"_score": score, "_id": {"$gt": doc_id}}]}
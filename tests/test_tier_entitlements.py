@@ -0,0 +1,94 @@
+import asyncio
+
+from cache import build_cache
+from tier_entitlements import TierEntitlementResolver, uniform_access
+from tests.fakes import FakeDatabase
+
+
+def client(user_id="c1", license_code="0000000001"):
+    return {"id": user_id, "role": "client", "license_code": license_code}
+
+
+def resolver(db):
+    return TierEntitlementResolver(db, build_cache("test_tier_entitlements", redis_url=""))
+
+
+def seeded():
+    db = FakeDatabase()
+    db.agency_licenses.docs = [
+        {"_id": "l1", "license_code": "0000000001", "agency_user_id": "a1"},
+        {"_id": "l2", "license_code": "0000000002", "agency_id": "a2"},
+        {"_id": "balance", "agency_id": "a1", "tier1": 5},
+    ]
+    db.agency_tier_configurations.docs = [
+        {"_id": "t1", "agency_id": "a1", "tier_access_levels": {**uniform_access(1), "area3": 3}},
+    ]
+    return db
+
+
+def test_access_resolves_in_one_query_and_is_cached_per_client():
+    db = seeded()
+    entitlements = resolver(db)
+
+    async def scenario():
+        first = await entitlements.resolve(client())
+        again = await entitlements.resolve(client())
+        return first, again
+
+    first, again = asyncio.run(scenario())
+    assert first == again and first["area3"] == 3 and first["area1"] == 1
+    assert db.agency_licenses.calls == ["aggregate"]
+    assert db.agency_tier_configurations.calls == []
+
+
+def test_resolving_never_writes():
+    db = seeded()
+    db.agency_tier_configurations.docs = []
+    entitlements = resolver(db)
+
+    async def scenario():
+        return [await entitlements.resolve(client("c2", code)) for code in ("0000000002", "9999999999", None)]
+
+    assert asyncio.run(scenario()) == [uniform_access(1)] * 3
+    assert db.agency_tier_configurations.docs == []
+
+
+def test_the_default_configuration_applies_only_to_agencies_without_one():
+    db = seeded()
+    db.agency_tier_configurations.docs.append(
+        {"_id": "td", "agency_id": "default", "tier_access_levels": uniform_access(3)})
+    entitlements = resolver(db)
+
+    async def scenario():
+        return await entitlements.resolve(client()), await entitlements.resolve(client("c2", "0000000002"))
+
+    own, legacy_license = asyncio.run(scenario())
+    assert own["area1"] == 1 and legacy_license == uniform_access(3)
+
+
+def test_configuration_changes_invalidate_the_agencys_clients():
+    db = seeded()
+    entitlements = resolver(db)
+
+    async def scenario():
+        await entitlements.resolve(client())
+        await entitlements.resolve(client("c2", "0000000002"))
+        # a2 is onboarded and upgrades area5; a1's clients keep their cached entry
+        await entitlements.ensure_configuration("a2")
+        await db.agency_tier_configurations.update_one({"agency_id": "a2"},
+                                                       {"$set": {"tier_access_levels.area5": 2}})
+        await entitlements.invalidate_agency("a2")
+        return await entitlements.resolve(client()), await entitlements.resolve(client("c2", "0000000002"))
+
+    a1_access, a2_access = asyncio.run(scenario())
+    assert a2_access == {**uniform_access(1), "area5": 2}
+    assert a1_access["area3"] == 3
+    assert db.agency_licenses.calls == ["aggregate"] * 3
+    assert len(db.agency_tier_configurations.docs) == 2
+
+
+def test_onboarding_keeps_an_existing_configuration():
+    db = seeded()
+    asyncio.run(resolver(db).ensure_configuration("a1"))
+    assert len(db.agency_tier_configurations.docs) == 1
+    assert db.agency_tier_configurations.docs[0]["tier_access_levels"]["area3"] == 3
@@ -0,0 +1,143 @@
+import asyncio
+import random
+
+from tier_responses import TierResponseStore, calculate_tier_completion_score
+from tests.fakes import FakeDatabase
+
+
+def session_doc(session_id="s1", questions=4, tier_level=2, **fields):
+    return {"_id": session_id, "user_id": "u1", "tier_level": tier_level, "status": "active",
+            "questions": [{"id": f"q{i}", "tier_level": 1} for i in range(questions)], "responses": [],
+            "total_questions": questions, "answered_count": 0, "score_points": 0, "score_weight": 0,
+            "tier_completion_score": None, **fields}
+
+
+def answer(question_id, response, evidence=False):
+    return {"question_id": question_id, "response": response, "evidence_provided": evidence, "evidence_url": None}
+
+
+def test_concurrent_answers_are_all_kept_and_scored_incrementally():
+    db = FakeDatabase()
+    db.tier_assessment_sessions.docs = [session_doc()]
+    store = TierResponseStore(db.tier_assessment_sessions)
+    answers = [answer("q0", "yes", True), answer("q1", "no"), answer("q0", "partial"),
+               answer("q2", "yes"), answer("q1", "yes", True), answer("q3", "no")]
+
+    async def submit(data):
+        session = await store.load("s1", "u1", data["question_id"])
+        return await store.record(session, data)
+
+    async def scenario():
+        # Two tabs: every answer loads the session before any of them writes
+        return await asyncio.gather(*(submit(data) for data in answers))
+
+    results = asyncio.run(scenario())
+    stored = db.tier_assessment_sessions.docs[0]
+    latest = {data["question_id"]: data for data in answers}
+    assert sorted(r["question_id"] for r in stored["responses"]) == ["q0", "q1", "q2", "q3"]
+    assert {r["question_id"]: r["response"] for r in stored["responses"]} == \
+        {q: data["response"] for q, data in latest.items()}
+    assert stored["answered_count"] == 4
+    assert stored["status"] == "completed"
+    assert stored["tier_completion_score"] == calculate_tier_completion_score(list(latest.values()), 2)
+    assert sum(completed for _, completed in results) == 1
+    assert "replace_one" not in db.tier_assessment_sessions.calls
+
+
+def test_the_last_answer_completes_the_session_with_its_score():
+    db = FakeDatabase()
+    db.tier_assessment_sessions.docs = [session_doc(questions=2, tier_level=1)]
+    store = TierResponseStore(db.tier_assessment_sessions)
+
+    async def scenario():
+        for data in [answer("q0", "yes"), answer("q1", "no")]:
+            counters, completed = await store.record(await store.load("s1", "u1", data["question_id"]), data)
+        return counters, completed
+
+    counters, completed = asyncio.run(scenario())
+    assert completed and counters["tier_completion_score"] == 50.0
+
+
+def test_legacy_sessions_get_counters_from_their_responses():
+    db = FakeDatabase()
+    legacy = session_doc(tier_level=3, responses=[answer("q0", "yes", True), answer("q1", "in_progress")])
+    for field in ("total_questions", "answered_count", "score_points", "score_weight"):
+        legacy.pop(field)
+    db.tier_assessment_sessions.docs = [legacy]
+    store = TierResponseStore(db.tier_assessment_sessions)
+
+    async def scenario():
+        session = await store.load("s1", "u1", "q1")
+        return session, await store.record(session, answer("q1", "yes"))
+
+    session, (counters, completed) = asyncio.run(scenario())
+    assert session["questions"] == [{"id": "q1", "tier_level": 1}]
+    assert counters["answered_count"] == 2 and counters["total_questions"] == 4 and not completed
+    # q0 keeps its evidence weight (x1.0); the replaced q1 answer has none (x0.6)
+    stored = db.tier_assessment_sessions.docs[0]
+    assert (stored["score_points"], stored["score_weight"]) == (1000 + 600, 1000 + 600)
+
+
+def test_running_sums_match_a_full_recompute():
+    rng = random.Random(7)
+    db = FakeDatabase()
+    db.tier_assessment_sessions.docs = [session_doc(questions=30, tier_level=3)]
+    store = TierResponseStore(db.tier_assessment_sessions)
+    latest = {}
+
+    async def scenario():
+        for _ in range(120):
+            data = answer(f"q{rng.randrange(29)}", rng.choice(["yes", "no", "partial", "help"]), rng.random() < 0.5)
+            latest[data["question_id"]] = data
+            await store.record(await store.load("s1", "u1", data["question_id"]), data)
+
+    asyncio.run(scenario())
+    stored = db.tier_assessment_sessions.docs[0]
+    assert stored["status"] == "active" and stored["answered_count"] == len(latest)
+    points = sum(r["score_points"] for r in stored["responses"])
+    assert stored["score_points"] == points
+    assert round(stored["score_points"] / stored["score_weight"] * 100, 2) == \
+        calculate_tier_completion_score(list(latest.values()), 3)
+
+
+def test_a_batch_is_one_bulk_write_from_one_read():
+    db = FakeDatabase()
+    db.tier_assessment_sessions.docs = [session_doc(responses=[])]
+    store = TierResponseStore(db.tier_assessment_sessions)
+
+    async def scenario():
+        await store.record(await store.load("s1", "u1", "q0"), answer("q0", "no"))
+        session = await store.load("s1", "u1")
+        db.tier_assessment_sessions.calls.clear()
+        return await store.record_many(session, [answer(f"q{i}", "yes", True) for i in range(4)], "batch-1")
+
+    counters, completed, outcomes = asyncio.run(scenario())
+    calls = db.tier_assessment_sessions.calls
+    # The fake bulk_write applies its requests through update_one
+    assert calls[0] == "bulk_write" and calls[-2:] == ["find_one", "update_one"]
+    assert "find_one_and_update" not in calls
+    assert outcomes == {f"q{i}": "saved" for i in range(4)}
+    assert completed and counters["tier_completion_score"] == 100.0
+    stored = db.tier_assessment_sessions.docs[0]
+    assert stored["answered_count"] == 4 and {r["batch_id"] for r in stored["responses"]} == {"batch-1"}
+
+
+def test_batch_answers_changed_since_the_read_fall_back_to_single_writes():
+    db = FakeDatabase()
+    db.tier_assessment_sessions.docs = [session_doc(questions=3, tier_level=1)]
+    store = TierResponseStore(db.tier_assessment_sessions)
+
+    async def scenario():
+        await store.record(await store.load("s1", "u1", "q0"), answer("q0", "no"))
+        session = await store.load("s1", "u1")
+        # Another tab answers q0 again and q1 for the first time after the batch read the session
+        for data in [answer("q0", "partial"), answer("q1", "no")]:
+            await store.record(await store.load("s1", "u1", data["question_id"]), {**data, "submitted_at": "later"})
+        return await store.record_many(session, [answer("q0", "yes"), answer("q1", "yes"), answer("q2", "yes")],
+                                       "batch-2")
+
+    counters, completed, outcomes = asyncio.run(scenario())
+    stored = db.tier_assessment_sessions.docs[0]
+    assert outcomes == {"q0": "saved", "q1": "saved", "q2": "saved"}
+    assert {r["question_id"]: r["response"] for r in stored["responses"]} == {"q0": "yes", "q1": "yes", "q2": "yes"}
+    assert stored["answered_count"] == 3 and completed and counters["tier_completion_score"] == 100.0
@@ -0,0 +1,181 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+from http_client import AsyncHTTPClient
+from webhook_delivery import SIGNATURE_HEADER, TIMESTAMP_HEADER, WebhookOutbox, verify_signature
+from tests.fakes import FakeDatabase
+from tests.test_http_client import start_stub
+
+
+def registered(base, *hooks):
+    db = FakeDatabase()
+    db.webhooks.docs = [
+        {"_id": hook_id, "webhook_id": hook_id, "user_id": "u1", "url": f"{base}{path}",
+         "events": ["assessment.completed"], "secret": f"{hook_id}-secret", "active": active,
+         "success_count": 0, "failure_count": 0}
+        for hook_id, path, active in hooks
+    ]
+    return db
+
+
+async def until(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def statuses(db):
+    return sorted(doc["status"] for doc in db.webhook_deliveries.docs)
+
+
+def test_deliveries_are_signed_and_recorded():
+    received = []
+
+    async def hook(request):
+        received.append((dict(request.headers), await request.read()))
+        return web.Response(status=204)
+
+    async def scenario():
+        runner, base = await start_stub([web.post("/hook", hook)])
+        db = registered(base, ("w1", "/hook", True), ("off", "/hook", False))
+        client = AsyncHTTPClient()
+        outbox = WebhookOutbox(db, client, workers=2)
+        try:
+            await outbox.start()
+            queued = await outbox.enqueue("assessment.completed", {"score": 3})
+            await until(lambda: statuses(db) == ["delivered"])
+        finally:
+            await outbox.stop()
+            await client.close()
+            await runner.cleanup()
+        return db, queued
+
+    db, queued = asyncio.run(scenario())
+    assert queued == 1
+    headers, body = received[0]
+    assert verify_signature("w1-secret", int(headers[TIMESTAMP_HEADER]), body, headers[SIGNATURE_HEADER])
+    assert not verify_signature("other-secret", int(headers[TIMESTAMP_HEADER]), body, headers[SIGNATURE_HEADER])
+    payload = json.loads(body)
+    assert payload["data"] == {"score": 3} and payload["metadata"]["attempt"] == 1
+    assert db.webhooks.docs[0]["success_count"] == 1 and db.webhooks.docs[0]["last_triggered"]
+
+
+def test_failing_endpoint_backs_off_until_dead_and_can_be_replayed():
+    calls = {"n": 0}
+
+    async def flaky(request):
+        calls["n"] += 1
+        return web.Response(status=500 if calls["n"] <= 3 else 200)
+
+    async def scenario():
+        runner, base = await start_stub([web.post("/hook", flaky)])
+        db = registered(base, ("w1", "/hook", True))
+        client = AsyncHTTPClient()
+        outbox = WebhookOutbox(db, client, workers=1, max_attempts=3, backoff_base=0.01, poll_interval=0.01)
+        try:
+            await outbox.start()
+            await outbox.enqueue("assessment.completed", {})
+            await until(lambda: statuses(db) == ["dead"])
+            dead = dict(db.webhook_deliveries.docs[0])
+            replayed = await outbox.replay({"webhook_id": "w1"}, statuses=["dead"])
+            await until(lambda: statuses(db) == ["delivered"])
+        finally:
+            await outbox.stop()
+            await client.close()
+            await runner.cleanup()
+        return db, dead, replayed
+
+    db, dead, replayed = asyncio.run(scenario())
+    assert dead["attempts"] == 3 and dead["last_error"] == "HTTP 500"
+    assert replayed == 1 and calls["n"] == 4
+    assert db.webhook_deliveries.docs[0]["attempts"] == 1
+    assert db.webhooks.docs[0]["failure_count"] == 1 and db.webhooks.docs[0]["success_count"] == 1
+
+
+def test_a_delivery_leased_by_a_stopped_worker_is_retried():
+    async def hook(request):
+        return web.Response(status=200)
+
+    async def scenario():
+        runner, base = await start_stub([web.post("/hook", hook)])
+        db = registered(base, ("w1", "/hook", True))
+        client = AsyncHTTPClient()
+        crashed = WebhookOutbox(db, client)
+        outbox = WebhookOutbox(db, client, workers=1, poll_interval=0.01)
+        try:
+            await crashed.enqueue("assessment.completed", {})
+            # The first process claims the delivery and dies before recording the attempt
+            lost = await crashed.claim()
+            db.webhook_deliveries.docs[0]["lease_until"] = datetime.utcnow() - timedelta(seconds=1)
+            await outbox.start()
+            await until(lambda: statuses(db) == ["delivered"])
+            # Recording under the expired lease is a no-op
+            await crashed.deliver(lost)
+        finally:
+            await outbox.stop()
+            await client.close()
+            await runner.cleanup()
+        return db
+
+    db = asyncio.run(scenario())
+    assert statuses(db) == ["delivered"] and db.webhook_deliveries.docs[0]["attempts"] == 1
+    assert db.webhooks.docs[0]["success_count"] == 1
+
+
+def test_a_slow_endpoint_does_not_hold_every_worker():
+    active = {"slow": 0, "peak": 0}
+
+    async def slow(request):
+        active["slow"] += 1
+        active["peak"] = max(active["peak"], active["slow"])
+        await asyncio.sleep(0.1)
+        active["slow"] -= 1
+        return web.Response(status=200)
+
+    async def fast(request):
+        return web.Response(status=200)
+
+    async def scenario():
+        slow_runner, slow_base = await start_stub([web.post("/hook", slow)])
+        fast_runner, fast_base = await start_stub([web.post("/hook", fast)])
+        db = registered(slow_base, ("slow", "/hook", True))
+        db.webhooks.docs.append({**db.webhooks.docs[0], "_id": "fast", "webhook_id": "fast",
+                                 "url": f"{fast_base}/hook"})
+        client = AsyncHTTPClient()
+        outbox = WebhookOutbox(db, client, workers=4, per_endpoint=2, poll_interval=0.01)
+        try:
+            for _ in range(6):
+                await outbox.enqueue("assessment.completed", {})
+            await outbox.start()
+            await until(lambda: all(doc["status"] == "delivered" for doc in db.webhook_deliveries.docs
+                                    if doc["webhook_id"] == "fast"))
+            fast_done_early = any(doc["status"] != "delivered" for doc in db.webhook_deliveries.docs
+                                  if doc["webhook_id"] == "slow")
+            await until(lambda: statuses(db) == ["delivered"] * 12)
+        finally:
+            await outbox.stop()
+            await client.close()
+            await slow_runner.cleanup()
+            await fast_runner.cleanup()
+        return fast_done_early
+
+    assert asyncio.run(scenario())
+    assert active["peak"] == 2
+
+
+def test_deliveries_to_a_deactivated_webhook_are_cancelled():
+    async def scenario():
+        db = registered("http://127.0.0.1:9", ("w1", "/hook", True))
+        outbox = WebhookOutbox(db, http_client=None)
+        await outbox.enqueue("assessment.completed", {})
+        db.webhooks.docs[0]["active"] = False
+        await outbox.deliver(await outbox.claim())
+        return db
+
+    db = asyncio.run(scenario())
+    assert statuses(db) == ["cancelled"]
+    assert "lease_id" not in db.webhook_deliveries.docs[0]